@@ -0,0 +1,346 @@
+"""
+승인 제어(admission control) 및 사용자별 요청 제한
+/ai/schedule/generate, /chatbot/edit-schedule 처럼 OpenAI를 호출하는 비싼 라우트에
+라우트별 동시 실행 수 제한과 크기가 제한된 대기열을 두고,
+검증된 사용자(uid)별 토큰 버킷으로 한 사용자가 워커와 OpenAI 할당량을 독점하지 못하게 합니다.
+버킷 키는 인증 토큰을 검증해 얻은 uid만 사용하고 요청 본문의 business_id는 보지 않으므로,
+다른 비즈니스의 ID를 보내 그 비즈니스의 버킷을 소진시킬 수 없습니다. (토큰이 없거나 유효하지 않으면 클라이언트 주소)
+제한을 넘은 요청은 429와 Retry-After로 거절합니다.
+
+환경 변수:
+    ADMISSION_LIMITS=/ai/schedule/generate=2:8   라우트=동시실행:대기열 (쉼표 구분)
+    ADMISSION_QUEUE_TIMEOUT=30                   대기열 최대 대기 시간(초)
+    RATE_LIMIT_PER_MINUTE=10                     사용자별 분당 요청 수 (0이면 비활성)
+    RATE_LIMIT_BURST=5                           버킷 크기 (순간 허용량)
+    RATE_LIMIT_REDIS_URL=redis://...             설정 시 인스턴스 간 공유 버킷 사용
+"""
+
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Optional
+
+from responses import FastJSONResponse
+from app_logging import get_logger, fields
+
+logger = get_logger("admission")
+
+DEFAULT_LIMITS = "/ai/schedule/generate=2:8,/chatbot/edit-schedule=2:8,/chatbot/conversation=4:16"
+QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", 30))
+RATE_LIMIT_PER_MINUTE = float(os.getenv("RATE_LIMIT_PER_MINUTE", 10))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", 5))
+
+
+def parse_limits(value: str) -> dict:
+    """'/path=동시실행:대기열,...' 형식을 {경로: (동시실행, 대기열)}로 파싱합니다."""
+    limits = {}
+    for item in (value or "").split(","):
+        path, sep, spec = item.strip().rpartition("=")
+        if not sep or not path:
+            continue
+        concurrency, _, queue_size = spec.partition(":")
+        limits[path.strip()] = (int(concurrency), int(queue_size or 0))
+    return limits
+
+
+# 라우트별 동시 실행 제한
+class RouteLimiter:
+    """동시 실행 수 제한 + 크기 제한 대기열 (FIFO)"""
+
+    def __init__(self, route: str, max_concurrent: int, max_queue: int, queue_timeout: float = QUEUE_TIMEOUT):
+        self.route = route
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters = deque()
+        self.admitted = 0
+        self.rejected = {"queue_full": 0, "queue_timeout": 0}
+        # 처리 시간 지수 이동 평균 (Retry-After 추정용)
+        self.avg_seconds = 1.0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> Optional[str]:
+        """실행 슬롯을 얻습니다. 거절되면 사유 문자열, 성공하면 None을 반환합니다."""
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return None
+        if len(self._waiters) >= self.max_queue:
+            self.rejected["queue_full"] += 1
+            return "queue_full"
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected["queue_timeout"] += 1
+            return "queue_timeout"
+        except BaseException:
+            # 슬롯을 넘겨받은 직후 취소되면 다음 대기자에게 돌려줌
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        self.admitted += 1
+        return None
+
+    def release(self, elapsed: Optional[float] = None):
+        """슬롯을 반납합니다. 대기자가 있으면 슬롯을 그대로 넘깁니다."""
+        if elapsed is not None:
+            self.avg_seconds = self.avg_seconds * 0.8 + elapsed * 0.2
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def retry_after(self) -> int:
+        """대기열이 빠지는 데 걸릴 예상 시간(초)"""
+        backlog = (len(self._waiters) + 1) / max(self.max_concurrent, 1)
+        return max(1, math.ceil(self.avg_seconds * backlog))
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "max_concurrent": self.max_concurrent,
+            "queue_depth": self.queue_depth,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+        }
+
+
+# 토큰 버킷 저장소
+class LocalBucketBackend:
+    """인스턴스 메모리 토큰 버킷 저장소 (LRU로 키 수 제한)"""
+
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, capacity: float, cost: float = 1.0):
+        """토큰을 소비합니다. (허용 여부, 재시도까지 남은 초)를 반환합니다."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SharedBucketBackend:
+    """
+    Redis 호환 클라이언트(hmget/hset/pexpire)를 사용하는 공유 토큰 버킷 저장소
+    여러 인스턴스가 같은 버킷을 보도록 벽시계 시간을 사용합니다.
+    읽기-계산-쓰기가 원자적이지 않아 동시 요청에서 약간 초과 허용될 수 있습니다.
+    """
+
+    def __init__(self, client, prefix: str = "ratelimit:"):
+        self.client = client
+        self.prefix = prefix
+
+    def take(self, key: str, rate: float, capacity: float, cost: float = 1.0):
+        now = time.time()
+        redis_key = self.prefix + key
+        raw_tokens, raw_updated_at = self.client.hmget(redis_key, "tokens", "updated_at")
+        tokens = capacity if raw_tokens is None else float(raw_tokens)
+        updated_at = now if raw_updated_at is None else float(raw_updated_at)
+        tokens = min(capacity, tokens + max(0.0, now - updated_at) * rate)
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        self.client.hset(redis_key, mapping={"tokens": tokens, "updated_at": now})
+        # 버킷이 가득 찰 시간이 지나면 키를 만료시켜 저장소 크기를 제한
+        self.client.pexpire(redis_key, int(math.ceil(capacity / rate * 1000)) + 1000)
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+
+def backend_from_env():
+    """RATE_LIMIT_REDIS_URL이 있으면 공유 저장소, 없거나 연결 실패 시 메모리 저장소를 반환합니다."""
+    url = os.getenv("RATE_LIMIT_REDIS_URL")
+    if not url:
+        return LocalBucketBackend()
+    try:
+        import redis
+        client = redis.Redis.from_url(url)
+        client.ping()
+        logger.info("공유 요청 제한 저장소 연결됨")
+        return SharedBucketBackend(client)
+    except Exception as e:
+        logger.warning("공유 요청 제한 저장소 연결 실패, 메모리 저장소를 사용합니다", extra=fields(error=str(e)))
+        return LocalBucketBackend()
+
+
+class BusinessRateLimiter:
+    """사용자별 토큰 버킷 요청 제한"""
+
+    def __init__(self, backend=None, per_minute: float = RATE_LIMIT_PER_MINUTE, burst: float = RATE_LIMIT_BURST):
+        self.backend = backend if backend is not None else backend_from_env()
+        self.rate = per_minute / 60.0
+        self.capacity = max(burst, 1.0)
+        self.limited = 0
+
+    def take(self, route: str, caller_key: str):
+        """(허용 여부, Retry-After 초)를 반환합니다."""
+        try:
+            allowed, wait_seconds = self.backend.take(f"{route}:{caller_key}", self.rate, self.capacity)
+        except Exception as e:
+            # 공유 저장소 장애 시에는 제한하지 않음 (가용성 우선)
+            logger.warning("요청 제한 저장소 오류", extra=fields(error=str(e)))
+            return True, 0
+        if not allowed:
+            self.limited += 1
+        return allowed, max(1, math.ceil(wait_seconds))
+
+
+# 요청 본문 버퍼링 (Idempotency 미들웨어와 공유)
+async def buffer_body(receive):
+    """요청 본문을 모두 읽고, 같은 본문을 다시 전달하는 receive를 반환합니다."""
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    body = b"".join(chunks)
+    replayed = False
+
+    async def replay():
+        nonlocal replayed
+        if not replayed:
+            replayed = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+
+    return body, replay
+
+
+async def caller_key(scope) -> str:
+    """검증된 토큰의 uid, 토큰이 없거나 유효하지 않으면 클라이언트 주소를 키로 사용합니다."""
+    from utils import authenticate_token
+    for key, value in scope.get("headers", []):
+        if key != b"authorization":
+            continue
+        scheme, _, token = value.decode("latin-1").partition(" ")
+        if scheme.lower() == "bearer" and token:
+            try:
+                # verify_id_token은 공개 키를 가져올 때 블로킹될 수 있어 스레드에서 실행
+                user = await asyncio.to_thread(authenticate_token, token.strip())
+                return "uid:" + user["uid"]
+            except Exception:
+                pass
+        break
+    client = scope.get("client")
+    return "client:" + (client[0] if client else "unknown")
+
+
+# 미들웨어
+limiters = {}
+rate_limiter = None
+
+
+def configure(limits: Optional[dict] = None, per_minute: float = RATE_LIMIT_PER_MINUTE,
+              burst: float = RATE_LIMIT_BURST, backend=None, queue_timeout: float = QUEUE_TIMEOUT):
+    """라우트 제한과 사용자별 요청 제한을 설정합니다. (per_minute가 0이면 요청 제한 비활성)"""
+    global rate_limiter
+    if limits is None:
+        limits = parse_limits(os.getenv("ADMISSION_LIMITS", DEFAULT_LIMITS))
+    limiters.clear()
+    for route, (max_concurrent, max_queue) in limits.items():
+        limiters[route] = RouteLimiter(route, max_concurrent, max_queue, queue_timeout)
+    rate_limiter = BusinessRateLimiter(backend, per_minute, burst) if per_minute > 0 else None
+
+
+async def _reject(scope, receive, send, reason: str, retry_after: int):
+    response = FastJSONResponse(
+        {"detail": "요청이 많아 잠시 후 다시 시도해주세요", "reason": reason, "retry_after": retry_after},
+        status_code=429,
+        headers={"Retry-After": str(retry_after)},
+    )
+    await response(scope, receive, send)
+
+
+class AdmissionMiddleware:
+    """제한 대상 라우트에 사용자별 요청 제한과 동시 실행 제한을 적용하는 ASGI 미들웨어"""
+
+    def __init__(self, app):
+        self.app = app
+        if not limiters:
+            configure()
+
+    async def __call__(self, scope, receive, send):
+        limiter = limiters.get(scope.get("path")) if scope["type"] == "http" else None
+        if limiter is None or scope.get("method") != "POST":
+            await self.app(scope, receive, send)
+            return
+
+        # 거절된 요청도 메트릭에서 라우트별로 집계되도록 경로를 남김
+        scope["route_hint"] = limiter.route
+
+        if rate_limiter is not None:
+            caller = await caller_key(scope)
+            allowed, retry_after = rate_limiter.take(limiter.route, caller)
+            if not allowed:
+                logger.info("사용자별 요청 제한", extra=fields(caller=caller, retry_after=retry_after))
+                await _reject(scope, receive, send, "rate_limited", retry_after)
+                return
+
+        reason = await limiter.acquire()
+        if reason is not None:
+            retry_after = limiter.retry_after()
+            logger.info("동시 실행 제한으로 거절", extra=fields(reason=reason, queue_depth=limiter.queue_depth))
+            await _reject(scope, receive, send, reason, retry_after)
+            return
+
+        start_time = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(time.perf_counter() - start_time)
+
+
+def get_stats() -> dict:
+    """라우트별 동시 실행/대기열 통계를 반환합니다."""
+    return {
+        "routes": {route: limiter.stats() for route, limiter in limiters.items()},
+        "rate_limited": rate_limiter.limited if rate_limiter is not None else 0,
+    }
+
+
+def collect_metrics() -> list:
+    """metrics.registry.register_collector 용 승인 제어 메트릭을 반환합니다."""
+    items = list(limiters.items())
+    return [
+        ("admission_active_requests", "gauge", "라우트별 실행 중인 요청 수",
+         [({"route": route}, limiter.active) for route, limiter in items]),
+        ("admission_queue_depth", "gauge", "라우트별 대기열 길이",
+         [({"route": route}, limiter.queue_depth) for route, limiter in items]),
+        ("admission_rejected_total", "counter", "승인 제어로 거절된 요청 수",
+         [({"route": route, "reason": reason}, count)
+          for route, limiter in items for reason, count in limiter.rejected.items()]),
+        ("rate_limited_total", "counter", "사용자별 요청 제한으로 거절된 요청 수",
+         [({}, rate_limiter.limited if rate_limiter is not None else 0)]),
+    ]
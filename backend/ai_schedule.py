@@ -3,220 +3,344 @@ AI 스케줄 생성 관련 API 엔드포인트
 AI를 사용한 스케줄 생성, 조회, 관리 등의 기능을 제공합니다.
 """
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
 from datetime import datetime
+import asyncio
 import uuid
 import time
 from typing import Optional
 from models import AIScheduleRequest, GeneratedSchedule
-from utils import get_current_user, call_openai_api
+from responses import FastJSONResponse
+from etag import (
+    validators, compute_content_hash, make_etag, etag_matches, not_modified,
+    set_etag_headers, check_cached_validator, schedule_key, invalidate_schedule
+)
+from fingerprint import fingerprint_schedule_request, find_schedule_by_fingerprint
+from write_behind import schedule_writer, merge_pending, durability
+from archive import rehydrate
+import tenants
+import shift_index
+from department_generation import generate_departments, merge_department_schedules, total_hours as department_total_hours
+from circuit_breaker import openai_guard, UpstreamUnavailable
+from utils import get_current_user
+from app_logging import get_logger, fields, summarize
 
-router = APIRouter(prefix="/ai/schedule", tags=["AI 스케줄"])
+router = APIRouter(prefix="/ai/schedule", tags=["AI 스케줄"], default_response_class=FastJSONResponse)
+logger = get_logger("ai_schedule")
+
+def _find_existing_schedule(schedule_request: AIScheduleRequest, fingerprint: str) -> Optional[dict]:
+    """같은 입력으로 이미 생성된 스케줄을 찾습니다. (조회 실패 시 새로 생성하도록 None)"""
+    # 아직 저장 대기 중인 스케줄 먼저 확인
+    for _, data in schedule_writer.pending_items(
+        lambda d: d.get("request_fingerprint") == fingerprint
+        and d.get("business_id") == schedule_request.business_id
+        and d.get("week_start_date") == schedule_request.week_start_date
+    ):
+        return data
+    
+    from utils import db
+    if not db:
+        return None
+    try:
+        return find_schedule_by_fingerprint(
+            db, schedule_request.business_id, schedule_request.week_start_date, fingerprint
+        )
+    except Exception as e:
+        logger.warning("기존 스케줄 조회 실패", extra=fields(error=str(e)))
+        return None
+
+def _reused_response(existing: dict) -> dict:
+    logger.info("동일한 입력의 기존 스케줄 반환", extra=fields(schedule_id=existing.get("schedule_id")))
+    return {
+        "message": "동일한 조건으로 생성된 스케줄이 있어 기존 스케줄을 반환합니다",
+        "schedule_id": existing.get("schedule_id"),
+        "reused": True,
+        "durability": durability(existing.get("schedule_id")),
+        "schedule": existing
+    }
+
+def _build_rule_based_schedule(schedule_request: AIScheduleRequest, schedule_id: str, fingerprint: Optional[str]) -> dict:
+    """선호 요일 기반 규칙으로 스케줄을 생성합니다. (개발 모드 생성과 AI 대체 경로에서 사용)"""
+    # 기본 스케줄 데이터 생성
+    schedule_data = {
+        "schedule_id": schedule_id,
+        "business_id": schedule_request.business_id,
+        "week_start_date": schedule_request.week_start_date,
+        "week_end_date": schedule_request.week_end_date,
+        "schedule_data": {},
+        "total_workers": len(schedule_request.employee_preferences),
+        "total_hours": 0,
+        "satisfaction_score": 0.0,
+        "created_at": datetime.now().isoformat(),
+        "status": "completed",
+        "request_fingerprint": fingerprint
+    }
+    
+    # 각 직원별 스케줄 생성 (간단한 로직)
+    for employee in schedule_request.employee_preferences:
+        employee_schedule = {
+            "employee_id": employee.worker_id,
+            "department_id": employee.department_id,
+            "work_fields": employee.work_fields,
+            "schedule": {
+                "월": ["09:00-17:00"] if "월" in employee.preferred_work_days else [],
+                "화": ["09:00-17:00"] if "화" in employee.preferred_work_days else [],
+                "수": ["09:00-17:00"] if "수" in employee.preferred_work_days else [],
+                "목": ["09:00-17:00"] if "목" in employee.preferred_work_days else [],
+                "금": ["09:00-17:00"] if "금" in employee.preferred_work_days else [],
+                "토": ["10:00-16:00"] if "토" in employee.preferred_work_days else [],
+                "일": []
+            }
+        }
+        schedule_data["schedule_data"][employee.worker_id] = employee_schedule
+    
+    # 만족도 점수 계산 (간단한 로직)
+    total_preferences = len(schedule_request.employee_preferences)
+    satisfied_preferences = sum(1 for emp in schedule_request.employee_preferences 
+                              if len(emp.preferred_work_days) > 0)
+    schedule_data["satisfaction_score"] = satisfied_preferences / total_preferences if total_preferences > 0 else 0.0
+    
+    # 총 근무 시간 계산
+    total_hours = 0
+    for emp_schedule in schedule_data["schedule_data"].values():
+        for day_schedule in emp_schedule["schedule"].values():
+            total_hours += len(day_schedule) * 8  # 각 시간대를 8시간으로 가정
+    schedule_data["total_hours"] = total_hours
+    return schedule_data
+
+async def _fallback_response(schedule_request: AIScheduleRequest, schedule_id: str, reason: str) -> dict:
+    """AI를 사용할 수 없을 때 규칙 기반 스케줄로 응답합니다. (지문은 저장하지 않아 다음 요청은 AI를 다시 시도)"""
+    logger.warning("AI 대신 규칙 기반 스케줄 생성", extra=fields(
+        business_id=schedule_request.business_id, reason=reason
+    ))
+    openai_guard.record_fallback(reason)
+    schedule_data = _build_rule_based_schedule(schedule_request, schedule_id, None)
+    schedule_data["ai_generated"] = False
+    schedule_data["generation"] = {"mode": "fallback", "reason": reason}
+    schedule_data["content_hash"] = compute_content_hash(schedule_data)
+    
+    shift_conflicts = await _save_schedule(schedule_id, schedule_data)
+    
+    return {
+        "message": "AI 응답을 받을 수 없어 기본 규칙으로 스케줄을 생성했습니다",
+        "schedule_id": schedule_id,
+        "ai_generated": False,
+        "fallback_reason": reason,
+        "durability": durability(schedule_id),
+        "shift_conflicts": shift_conflicts,
+        "schedule": schedule_data
+    }
+
+async def _save_schedule(schedule_id: str, schedule_data: dict) -> list:
+    """
+    스케줄을 쓰기 지연 큐에 넣고(응답은 저장 완료를 기다리지 않음)
+    같은 직원의 다른 비즈니스 근무/예약과 겹치는 근무를 반환합니다.
+    겹침 검사는 색인을 Firestore에서 읽을 수 있으므로 이벤트 루프를 막지 않도록 스레드에서 실행합니다.
+    """
+    from utils import db
+    if not db:
+        return []
+    schedule_writer.enqueue(schedule_id, schedule_data)
+    invalidate_schedule(schedule_id, schedule_data["business_id"])
+    return await asyncio.to_thread(shift_index.record_schedule, schedule_data, db)
 
 # AI 스케줄 생성 (개발 모드)
 @router.post("/generate-dev")
-async def generate_ai_schedule_for_employer_dev(schedule_request: AIScheduleRequest):
-    """개발 모드에서 AI 스케줄을 생성합니다."""
+async def generate_ai_schedule_for_employer_dev(schedule_request: AIScheduleRequest, force: bool = False):
+    """개발 모드에서 AI 스케줄을 생성합니다. (같은 입력이면 force=true가 아닌 한 기존 스케줄 반환)"""
     try:
-        print(f"🚀 AI 스케줄 생성 요청 받음 (개발 모드): {schedule_request}")
+        logger.info("AI 스케줄 생성 요청 받음 (개발 모드)", extra=fields(request=summarize(schedule_request)))
         start_time = time.time()
         
+        # 동일 입력 재생성 방지
+        fingerprint = fingerprint_schedule_request(schedule_request)
+        existing = None if force else _find_existing_schedule(schedule_request, fingerprint)
+        if existing is not None:
+            return {**_reused_response(existing), "generation_time": time.time() - start_time}
+        
         # AI 스케줄 생성 로직 (간단한 버전)
         schedule_id = str(uuid.uuid4())
         
-        # 기본 스케줄 데이터 생성
-        schedule_data = {
-            "schedule_id": schedule_id,
-            "business_id": schedule_request.business_id,
-            "week_start_date": schedule_request.week_start_date,
-            "week_end_date": schedule_request.week_end_date,
-            "schedule_data": {},
-            "total_workers": len(schedule_request.employee_preferences),
-            "total_hours": 0,
-            "satisfaction_score": 0.0,
-            "created_at": datetime.now().isoformat(),
-            "status": "completed"
-        }
+        schedule_data = _build_rule_based_schedule(schedule_request, schedule_id, fingerprint)
+        schedule_data["content_hash"] = compute_content_hash(schedule_data)
         
-        # 각 직원별 스케줄 생성 (간단한 로직)
-        for employee in schedule_request.employee_preferences:
-            employee_schedule = {
-                "employee_id": employee.worker_id,
-                "department_id": employee.department_id,
-                "work_fields": employee.work_fields,
-                "schedule": {
-                    "월": ["09:00-17:00"] if "월" in employee.preferred_work_days else [],
-                    "화": ["09:00-17:00"] if "화" in employee.preferred_work_days else [],
-                    "수": ["09:00-17:00"] if "수" in employee.preferred_work_days else [],
-                    "목": ["09:00-17:00"] if "목" in employee.preferred_work_days else [],
-                    "금": ["09:00-17:00"] if "금" in employee.preferred_work_days else [],
-                    "토": ["10:00-16:00"] if "토" in employee.preferred_work_days else [],
-                    "일": []
-                }
-            }
-            schedule_data["schedule_data"][employee.worker_id] = employee_schedule
-        
-        # 만족도 점수 계산 (간단한 로직)
-        total_preferences = len(schedule_request.employee_preferences)
-        satisfied_preferences = sum(1 for emp in schedule_request.employee_preferences 
-                                  if len(emp.preferred_work_days) > 0)
-        schedule_data["satisfaction_score"] = satisfied_preferences / total_preferences if total_preferences > 0 else 0.0
-        
-        # 총 근무 시간 계산
-        total_hours = 0
-        for emp_schedule in schedule_data["schedule_data"].values():
-            for day_schedule in emp_schedule["schedule"].values():
-                total_hours += len(day_schedule) * 8  # 각 시간대를 8시간으로 가정
-        schedule_data["total_hours"] = total_hours
-        
-        # 데이터베이스에 저장
-        from utils import db
-        if db:
-            db.collection("ai_schedules").document(schedule_id).set(schedule_data)
+        # 데이터베이스에 저장 (쓰기 지연 큐, 응답은 저장 완료를 기다리지 않음)
+        shift_conflicts = await _save_schedule(schedule_id, schedule_data)
         
         end_time = time.time()
         generation_time = end_time - start_time
         
-        print(f"✅ AI 스케줄 생성 완료: {generation_time:.2f}초")
+        logger.info("AI 스케줄 생성 완료", extra=fields(
+            schedule_id=schedule_id, generation_ms=round(generation_time * 1000, 2),
+            total_workers=schedule_data["total_workers"]
+        ))
         
         return {
             "message": "AI 스케줄이 성공적으로 생성되었습니다",
             "schedule_id": schedule_id,
             "generation_time": generation_time,
+            "durability": durability(schedule_id),
+            "shift_conflicts": shift_conflicts,
             "schedule": schedule_data
         }
         
     except Exception as e:
-        print(f"❌ AI 스케줄 생성 오류: {e}")
+        logger.exception("AI 스케줄 생성 오류")
         raise HTTPException(status_code=500, detail=f"AI 스케줄 생성 중 오류가 발생했습니다: {str(e)}")
 
 # AI 스케줄 생성 (일반 모드)
 @router.post("/generate")
-async def generate_ai_schedule_for_employer(schedule_request: AIScheduleRequest, current_user: dict = Depends(get_current_user)):
-    """AI를 사용하여 스케줄을 생성합니다."""
+async def generate_ai_schedule_for_employer(schedule_request: AIScheduleRequest, force: bool = False, current_user: dict = Depends(get_current_user)):
+    """AI를 사용하여 스케줄을 생성합니다. (같은 입력이면 force=true가 아닌 한 LLM 호출 없이 기존 스케줄 반환)"""
     try:
-        print(f"AI 스케줄 생성 요청 받음: {schedule_request}")
-        print(f"현재 사용자: {current_user}")
+        logger.info("AI 스케줄 생성 요청 받음", extra=fields(
+            request=summarize(schedule_request), uid=current_user.get("uid")
+        ))
         
         # 권한 검증
         if current_user["uid"] != schedule_request.business_id:
             raise HTTPException(status_code=403, detail="권한이 없습니다")
         
+        # 동일 입력 재생성 방지
+        fingerprint = fingerprint_schedule_request(schedule_request)
+        existing = None if force else _find_existing_schedule(schedule_request, fingerprint)
+        if existing is not None:
+            return _reused_response(existing)
+        
         # AI 스케줄 생성 로직
         schedule_id = str(uuid.uuid4())
         
-        # OpenAI를 사용한 스케줄 생성
-        messages = [
-            {
-                "role": "system",
-                "content": "당신은 직원 스케줄 관리 전문가입니다. 직원들의 선호도와 부서별 필요 인원을 고려하여 최적의 스케줄을 생성해주세요."
-            },
-            {
-                "role": "user",
-                "content": f"""
-                다음 정보를 바탕으로 최적의 스케줄을 생성해주세요:
-                
-                비즈니스 ID: {schedule_request.business_id}
-                주간 기간: {schedule_request.week_start_date} ~ {schedule_request.week_end_date}
-                
-                부서별 필요 인원:
-                {schedule_request.department_staffing}
-                
-                직원 선호도:
-                {schedule_request.employee_preferences}
-                
-                제약사항:
-                {schedule_request.schedule_constraints}
-                
-                각 직원별로 요일별 근무 시간을 JSON 형태로 반환해주세요.
-                """
-            }
-        ]
+        # 부서별 프롬프트로 나눠 병렬 생성 (max_tokens 초과로 응답이 잘리지 않도록)
+        # OpenAI 회로가 열려 있거나 지연 예산을 넘기면 규칙 기반 생성으로 대체
+        deadline = openai_guard.deadline("/ai/schedule/generate")
+        
+        async def guarded_call(messages, **kwargs):
+            return await openai_guard.call(messages, deadline=deadline, **kwargs)
         
         try:
-            ai_response = call_openai_api(messages)
-            print(f"AI 응답: {ai_response}")
+            results = await generate_departments(schedule_request, guarded_call)
+            unavailable = next(
+                (result["exception"] for result in results if isinstance(result["exception"], UpstreamUnavailable)), None
+            )
+            if unavailable is not None:
+                return await _fallback_response(schedule_request, schedule_id, unavailable.reason)
+            if results and all(result["error"] for result in results):
+                return await _fallback_response(schedule_request, schedule_id, "upstream_error")
+            merged, conflicts = merge_department_schedules(results)
+            logger.debug("부서별 AI 응답 수신", extra=fields(
+                departments=len(results), conflicts=len(conflicts),
+                elapsed=max((result["elapsed"] for result in results), default=0)
+            ))
             
-            # AI 응답을 파싱하여 스케줄 데이터 생성
-            # 실제 구현에서는 더 정교한 파싱이 필요합니다.
             schedule_data = {
                 "schedule_id": schedule_id,
                 "business_id": schedule_request.business_id,
                 "week_start_date": schedule_request.week_start_date,
                 "week_end_date": schedule_request.week_end_date,
-                "schedule_data": {},
-                "total_workers": len(schedule_request.employee_preferences),
-                "total_hours": 0,
+                "schedule_data": merged,
+                "total_workers": len(merged),
+                "total_hours": department_total_hours(merged),
                 "satisfaction_score": 0.0,
                 "created_at": datetime.now().isoformat(),
                 "status": "completed",
                 "ai_generated": True,
-                "ai_response": ai_response
+                "ai_response": {result["department_id"]: result["response"] for result in results},
+                "generation": {
+                    "mode": "per_department",
+                    "departments": len(results),
+                    "failed_departments": [result["department_id"] for result in results if result["error"]],
+                    "defaulted_workers": sorted({w for result in results for w in result["defaulted"]}),
+                    "conflicts": conflicts,
+                    "elapsed_by_department": {result["department_id"]: result["elapsed"] for result in results},
+                },
+                "request_fingerprint": fingerprint
             }
+            schedule_data["content_hash"] = compute_content_hash(schedule_data)
             
-            # 각 직원별 기본 스케줄 생성
-            for employee in schedule_request.employee_preferences:
-                employee_schedule = {
-                    "employee_id": employee.worker_id,
-                    "department_id": employee.department_id,
-                    "work_fields": employee.work_fields,
-                    "schedule": {
-                        "월": ["09:00-17:00"] if "월" in employee.preferred_work_days else [],
-                        "화": ["09:00-17:00"] if "화" in employee.preferred_work_days else [],
-                        "수": ["09:00-17:00"] if "수" in employee.preferred_work_days else [],
-                        "목": ["09:00-17:00"] if "목" in employee.preferred_work_days else [],
-                        "금": ["09:00-17:00"] if "금" in employee.preferred_work_days else [],
-                        "토": ["10:00-16:00"] if "토" in employee.preferred_work_days else [],
-                        "일": []
-                    }
-                }
-                schedule_data["schedule_data"][employee.worker_id] = employee_schedule
-            
-            # 데이터베이스에 저장
-            from utils import db
-            if db:
-                db.collection("ai_schedules").document(schedule_id).set(schedule_data)
+            # 데이터베이스에 저장 (쓰기 지연 큐, 응답은 저장 완료를 기다리지 않음)
+            shift_conflicts = await _save_schedule(schedule_id, schedule_data)
             
             return {
                 "message": "AI 스케줄이 성공적으로 생성되었습니다",
                 "schedule_id": schedule_id,
+                "durability": durability(schedule_id),
+                "shift_conflicts": shift_conflicts,
                 "schedule": schedule_data
             }
             
         except Exception as ai_error:
-            print(f"AI 처리 오류: {ai_error}")
+            logger.warning("AI 처리 오류", extra=fields(error=str(ai_error)))
             raise HTTPException(status_code=500, detail="AI 처리 중 오류가 발생했습니다")
             
     except Exception as e:
-        print(f"스케줄 생성 오류: {e}")
+        logger.warning("스케줄 생성 오류", extra=fields(error=str(e)))
         raise HTTPException(status_code=400, detail=str(e))
 
 # 생성된 스케줄 조회
 @router.get("/{schedule_id}")
-async def get_generated_schedule(schedule_id: str, current_user: dict = Depends(get_current_user)):
-    """생성된 스케줄을 조회합니다."""
+async def get_generated_schedule(schedule_id: str, request: Request, response: Response, current_user: dict = Depends(get_current_user)):
+    """생성된 스케줄을 조회합니다. (If-None-Match 지원)"""
     try:
-        print(f"스케줄 조회 요청: {schedule_id}, 사용자: {current_user['uid']}")
+        logger.debug("스케줄 조회 요청", extra=fields(schedule_id=schedule_id, uid=current_user["uid"]))
+        
+        # 검증자 캐시 적중 시 Firestore 조회 없이 304 응답
+        if_none_match = request.headers.get("if-none-match")
+        cached_response = check_cached_validator(schedule_key(schedule_id), if_none_match, owner=current_user["uid"])
+        if cached_response is not None:
+            return cached_response
         
         from utils import db
         if not db:
             raise HTTPException(status_code=500, detail="데이터베이스 연결이 필요합니다")
         
-        schedule_doc = db.collection("ai_schedules").document(schedule_id).get()
+        # 저장 대기 중인 스케줄은 큐에서 바로 반환 (read-your-writes)
+        schedule_data = schedule_writer.get(schedule_id)
+        if schedule_data is None:
+            # 스케줄은 소유 비즈니스(요청자)만 조회할 수 있으므로 요청자의 비즈니스 범위에서 찾음
+            schedule_doc = tenants.collection("ai_schedules").get(current_user["uid"], schedule_id)
+            
+            if not schedule_doc.exists:
+                raise HTTPException(status_code=404, detail="스케줄을 찾을 수 없습니다")
+            
+            # 보관된 스케줄은 보관 저장소에서 원본을 복원
+            schedule_data = rehydrate(schedule_id, schedule_doc.to_dict())
         
-        if not schedule_doc.exists:
-            raise HTTPException(status_code=404, detail="스케줄을 찾을 수 없습니다")
+        # 권한 확인
+        if current_user["uid"] != schedule_data.get("business_id"):
+            raise HTTPException(status_code=403, detail="권한이 없습니다")
         
-        schedule_data = schedule_doc.to_dict()
+        etag = make_etag(schedule_data)
+        validators.set(schedule_key(schedule_id), etag, owner=schedule_data.get("business_id"))
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        
+        set_etag_headers(response, etag)
+        return {"schedule": schedule_data, "durability": durability(schedule_id)}
+        
+    except Exception as e:
+        logger.warning("스케줄 조회 오류", extra=fields(schedule_id=schedule_id, error=str(e)))
+        raise HTTPException(status_code=400, detail=str(e))
+
+# 스케줄 저장 상태 조회
+@router.get("/{schedule_id}/durability")
+async def get_schedule_durability(schedule_id: str, current_user: dict = Depends(get_current_user)):
+    """생성된 스케줄의 저장 상태(pending/persisted/failed)를 조회합니다."""
+    try:
+        schedule_data = schedule_writer.get(schedule_id)
+        if schedule_data is None:
+            schedule_doc = tenants.collection("ai_schedules").get(current_user["uid"], schedule_id)
+            if not schedule_doc.exists:
+                raise HTTPException(status_code=404, detail="스케줄을 찾을 수 없습니다")
+            schedule_data = schedule_doc.to_dict()
         
         # 권한 확인
         if current_user["uid"] != schedule_data.get("business_id"):
             raise HTTPException(status_code=403, detail="권한이 없습니다")
         
-        return {"schedule": schedule_data}
-        
+        return {"schedule_id": schedule_id, "durability": durability(schedule_id)}
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"스케줄 조회 오류: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
 # 비즈니스의 모든 스케줄 조회
@@ -224,7 +348,7 @@ async def get_generated_schedule(schedule_id: str, current_user: dict = Depends(
 async def get_generated_schedules(business_id: str, current_user: dict = Depends(get_current_user)):
     """특정 비즈니스의 모든 생성된 스케줄을 조회합니다."""
     try:
-        print(f"비즈니스 스케줄 목록 조회: {business_id}, 사용자: {current_user['uid']}")
+        logger.debug("비즈니스 스케줄 목록 조회", extra=fields(business_id=business_id, uid=current_user["uid"]))
         
         # 권한 확인
         if current_user["uid"] != business_id:
@@ -234,26 +358,26 @@ async def get_generated_schedules(business_id: str, current_user: dict = Depends
         if not db:
             raise HTTPException(status_code=500, detail="데이터베이스 연결이 필요합니다")
         
-        schedules = db.collection("ai_schedules").where("business_id", "==", business_id).stream()
+        schedules = tenants.collection("ai_schedules").query(business_id).stream()
         schedule_list = []
         
-        for schedule_doc in schedules:
-            schedule_data = schedule_doc.to_dict()
+        for schedule_id, schedule_data in merge_pending(schedules, schedule_writer, lambda d: d.get("business_id") == business_id):
             schedule_list.append({
-                "schedule_id": schedule_doc.id,
+                "schedule_id": schedule_id,
                 "week_start_date": schedule_data.get("week_start_date"),
                 "week_end_date": schedule_data.get("week_end_date"),
                 "total_workers": schedule_data.get("total_workers", 0),
                 "total_hours": schedule_data.get("total_hours", 0),
                 "satisfaction_score": schedule_data.get("satisfaction_score", 0.0),
                 "created_at": schedule_data.get("created_at"),
-                "status": schedule_data.get("status", "unknown")
+                "status": schedule_data.get("status", "unknown"),
+                "durability": durability(schedule_id)
             })
         
         return {"schedules": schedule_list}
         
     except Exception as e:
-        print(f"스케줄 목록 조회 오류: {e}")
+        logger.warning("스케줄 목록 조회 오류", extra=fields(business_id=business_id, error=str(e)))
         raise HTTPException(status_code=400, detail=str(e))
 
 # 스케줄 생성 가이드
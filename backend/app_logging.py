@@ -0,0 +1,238 @@
+"""
+구조화 로깅
+큐 기반 비동기(non-blocking) 핸들러로 JSON 로그를 출력합니다.
+요청 페이로드는 repr 대신 개수/크기 요약(summarize)으로 기록하고,
+라우트별 샘플링과 환경 변수 기반 레벨 설정을 지원합니다.
+
+환경 변수:
+    LOG_LEVEL=INFO                       전체 로그 레벨
+    LOG_LEVELS=uriwork.ai_schedule=DEBUG 로거별 레벨 (쉼표 구분)
+    LOG_FORMAT=json                      json 또는 text
+    LOG_SAMPLE_RATE=1.0                  기본 샘플링 비율 (WARNING 이상은 항상 기록)
+    LOG_SAMPLE_RATES=/ai/schedule/generate=0.1  라우트별 샘플링 비율 (쉼표 구분)
+    LOG_QUEUE_SIZE=10000                 로그 큐 크기 (가득 차면 버림)
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+
+ROOT_LOGGER_NAME = "uriwork"
+
+_listener = None
+dropped_records = 0
+
+
+def _parse_pairs(value: str) -> dict:
+    """'a=1,b=2' 형식의 환경 변수를 dict로 파싱합니다."""
+    pairs = {}
+    for item in (value or "").split(","):
+        key, sep, raw = item.strip().rpartition("=")
+        if sep and key:
+            pairs[key.strip()] = raw.strip()
+    return pairs
+
+
+# 페이로드 요약
+class LazySummary:
+    """로그 기록이 실제로 출력될 때만 계산되는 페이로드 요약"""
+
+    __slots__ = ("obj",)
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def resolve(self):
+        return _summarize(self.obj)
+
+
+def summarize(obj) -> LazySummary:
+    """
+    로그용 페이로드 요약을 만듭니다.
+    리스트는 개수, 문자열은 길이, 모델/딕셔너리는 필드별 요약으로 표현하여
+    대용량 요청의 전체 repr을 만들지 않으며, 레벨/샘플링으로 걸러진 기록에서는 계산하지 않습니다.
+    """
+    return LazySummary(obj)
+
+
+def _summarize(obj, depth: int = 0):
+    if obj is None or isinstance(obj, (bool, int, float)):
+        return obj
+    if isinstance(obj, str):
+        return obj if len(obj) <= 64 else {"type": "str", "len": len(obj)}
+    if isinstance(obj, (list, tuple, set)):
+        return {"type": "list", "count": len(obj)}
+    if hasattr(obj, "model_fields") or hasattr(obj, "__fields__"):
+        model_fields = getattr(obj, "model_fields", None) or getattr(obj, "__fields__", {})
+        if depth >= 1:
+            return {"type": type(obj).__name__}
+        summary = {"type": type(obj).__name__}
+        for name in model_fields:
+            summary[name] = _summarize(getattr(obj, name, None), depth + 1)
+        return summary
+    if isinstance(obj, dict):
+        if depth >= 1 or len(obj) > 20:
+            return {"type": "dict", "keys": len(obj)}
+        return {str(k): _summarize(v, depth + 1) for k, v in obj.items()}
+    return {"type": type(obj).__name__}
+
+
+def fields(**kwargs) -> dict:
+    """logger 호출의 extra 인자로 구조화 필드를 전달합니다."""
+    return {"fields": kwargs}
+
+
+def _current_route():
+    try:
+        from metrics import current_cost
+    except ImportError:
+        return None
+    cost = current_cost()
+    return cost.route if cost is not None else None
+
+
+# 포매터
+class JsonFormatter(logging.Formatter):
+    """한 줄 JSON 로그 포매터"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        route = getattr(record, "route", None)
+        if route:
+            entry["route"] = route
+        extra_fields = getattr(record, "fields", None)
+        if extra_fields:
+            entry.update(extra_fields)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """개발용 사람이 읽기 쉬운 포매터"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = f"{record.levelname:<7} {record.name}: {record.getMessage()}"
+        extra_fields = getattr(record, "fields", None)
+        if extra_fields:
+            line += " " + json.dumps(extra_fields, ensure_ascii=False, default=str)
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+# 필터 및 핸들러
+class RouteSamplingFilter(logging.Filter):
+    """라우트별 샘플링 (WARNING 이상은 항상 통과)"""
+
+    def __init__(self, default_rate: float = 1.0, route_rates: dict = None):
+        super().__init__()
+        self.default_rate = default_rate
+        self.route_rates = route_rates or {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        route = _current_route()
+        record.route = route
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.route_rates.get(route, self.default_rate) if route else self.default_rate
+        return rate >= 1.0 or random.random() < rate
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    큐가 가득 차면 기록을 버리는 QueueHandler
+    호출 스레드에서는 메시지 조립과 예외 문자열화만 하고 JSON 직렬화는 리스너 스레드에서 수행합니다.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        extra_fields = getattr(record, "fields", None)
+        if extra_fields:
+            record.fields = {
+                key: value.resolve() if isinstance(value, LazySummary) else value
+                for key, value in extra_fields.items()
+            }
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        global dropped_records
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped_records += 1
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """출력 시점의 sys.stdout에 기록하는 핸들러 (stdout 교체에 대응)"""
+
+    def emit(self, record):
+        self.stream = sys.stdout
+        super().emit(record)
+
+
+def setup_logging():
+    """uriwork 로거에 큐 기반 구조화 로깅을 설정합니다. (여러 번 호출해도 안전)"""
+    global _listener
+    root = logging.getLogger(ROOT_LOGGER_NAME)
+    if _listener is not None:
+        return root
+
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    for name, level in _parse_pairs(os.getenv("LOG_LEVELS", "")).items():
+        logging.getLogger(name).setLevel(level.upper())
+
+    output = _StdoutHandler()
+    if os.getenv("LOG_FORMAT", "json").lower() == "text":
+        output.setFormatter(TextFormatter())
+    else:
+        output.setFormatter(JsonFormatter())
+
+    log_queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", 10000)))
+    queue_handler = DroppingQueueHandler(log_queue)
+    route_rates = {route: float(rate) for route, rate in _parse_pairs(os.getenv("LOG_SAMPLE_RATES", "")).items()}
+    queue_handler.addFilter(RouteSamplingFilter(float(os.getenv("LOG_SAMPLE_RATE", 1.0)), route_rates))
+
+    root.handlers = [queue_handler]
+    root.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return root
+
+
+def shutdown_logging():
+    """남은 로그를 모두 출력하고 리스너를 종료합니다."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    """uriwork 하위 로거를 반환합니다. (최초 호출 시 로깅 설정)"""
+    setup_logging()
+    return logging.getLogger(f"{ROOT_LOGGER_NAME}.{name}")
+
+
+def collect_metrics() -> list:
+    """metrics.registry.register_collector 용 로깅 메트릭을 반환합니다."""
+    return [
+        ("log_dropped_records_total", "counter", "로그 큐가 가득 차 버려진 기록 수", [({}, dropped_records)]),
+    ]
@@ -0,0 +1,356 @@
+"""
+오래된 AI 스케줄 보관(archival)
+보관 기준일보다 오래된 ai_schedules 문서의 전체 내용(schedule_data, ai_response 포함)을
+압축해서 보관 저장소로 옮기고, 원래 문서는 목록 조회에 필요한 요약 필드만 남긴 작은 묘비(tombstone)로 바꿉니다.
+묘비 문서를 읽는 조회 경로는 rehydrate()로 원본을 투명하게 복원합니다.
+
+보관 저장소:
+    firestore  ai_schedules_archive 컬렉션에 압축 blob 저장 (기본)
+    local      ARCHIVE_LOCAL_DIR 디렉터리에 파일로 저장 (오브젝트 스토리지 대용)
+
+압축은 zstandard가 설치되어 있으면 zstd, 없으면 zlib을 사용하며 blob마다 코덱을 기록합니다.
+
+환경 변수:
+    ARCHIVE_HORIZON_DAYS=180     주 종료일이 이 일수보다 오래된 스케줄을 보관
+    ARCHIVE_STORE=firestore      firestore 또는 local
+    ARCHIVE_LOCAL_DIR=./archive  local 저장소 디렉터리
+    ARCHIVE_CACHE_SIZE=64        복원한 스케줄 캐시 크기 (보관된 스케줄은 바뀌지 않음)
+
+실행:
+    python archive.py --horizon-days 180 [--business-id ID] [--dry-run]
+"""
+
+import argparse
+import json
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from app_logging import get_logger, fields
+import tenants
+
+# zstandard는 선택적 의존성 (없으면 zlib 사용)
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = get_logger("archive")
+
+HORIZON_DAYS = int(os.getenv("ARCHIVE_HORIZON_DAYS", 180))
+ARCHIVE_STORE = os.getenv("ARCHIVE_STORE", "firestore")
+ARCHIVE_LOCAL_DIR = os.getenv("ARCHIVE_LOCAL_DIR", "./archive")
+CACHE_SIZE = int(os.getenv("ARCHIVE_CACHE_SIZE", 64))
+
+HOT_COLLECTION = "ai_schedules"
+ARCHIVE_COLLECTION = "ai_schedules_archive"
+
+# 묘비에 남기는 필드 (스케줄 목록, 지문 재사용, 실시간 피드 요약에 필요한 것)
+TOMBSTONE_FIELDS = (
+    "schedule_id", "business_id", "week_start_date", "week_end_date", "total_workers", "total_hours",
+    "satisfaction_score", "created_at", "updated_at", "status", "content_hash", "request_fingerprint",
+)
+
+
+# 압축
+def default_codec() -> str:
+    return "zstd" if zstandard is not None else "zlib"
+
+
+def compress(data: dict, codec: Optional[str] = None) -> tuple:
+    """문서를 JSON으로 직렬화해 압축합니다. (codec, blob) 반환"""
+    codec = codec or default_codec()
+    raw = json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+    if codec == "zstd":
+        return codec, zstandard.ZstdCompressor(level=10).compress(raw)
+    if codec == "zlib":
+        return codec, zlib.compress(raw, 9)
+    raise ValueError(f"지원하지 않는 압축 코덱: {codec}")
+
+
+def decompress(codec: str, blob: bytes) -> dict:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstd로 보관된 스케줄을 읽으려면 zstandard 패키지가 필요합니다")
+        raw = zstandard.ZstdDecompressor().decompress(blob)
+    elif codec == "zlib":
+        raw = zlib.decompress(blob)
+    else:
+        raise ValueError(f"지원하지 않는 압축 코덱: {codec}")
+    return json.loads(raw)
+
+
+# 보관 저장소
+class FirestoreArchiveStore:
+    """ai_schedules_archive 컬렉션에 압축 blob을 저장합니다. (문서 한도 1MiB)"""
+
+    def __init__(self, collection: str = ARCHIVE_COLLECTION, db=None):
+        self.collection = collection
+        self._db = db
+
+    def _ref(self, schedule_id: str):
+        db = self._db
+        if db is None:
+            from utils import db
+        return db.collection(self.collection).document(schedule_id)
+
+    def put(self, schedule_id: str, record: dict):
+        self._ref(schedule_id).set(record)
+
+    def get(self, schedule_id: str) -> Optional[dict]:
+        doc = self._ref(schedule_id).get()
+        return doc.to_dict() if doc.exists else None
+
+    def delete(self, schedule_id: str):
+        self._ref(schedule_id).delete()
+
+
+class LocalArchiveStore:
+    """디렉터리에 blob 파일과 메타데이터를 저장합니다. (오브젝트 스토리지 대용)"""
+
+    def __init__(self, directory: str = ARCHIVE_LOCAL_DIR):
+        self.directory = directory
+
+    def _paths(self, schedule_id: str) -> tuple:
+        base = os.path.join(self.directory, os.path.basename(schedule_id))
+        return base + ".json", base + ".bin"
+
+    def put(self, schedule_id: str, record: dict):
+        os.makedirs(self.directory, exist_ok=True)
+        meta_path, blob_path = self._paths(schedule_id)
+        meta = {key: value for key, value in record.items() if key != "blob"}
+        # blob을 먼저 쓰고 메타데이터를 원자적으로 교체 (메타데이터가 있으면 blob도 있음)
+        with open(blob_path + ".tmp", "wb") as f:
+            f.write(record["blob"])
+        os.replace(blob_path + ".tmp", blob_path)
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    def get(self, schedule_id: str) -> Optional[dict]:
+        meta_path, blob_path = self._paths(schedule_id)
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, encoding="utf-8") as f:
+            record = json.load(f)
+        with open(blob_path, "rb") as f:
+            record["blob"] = f.read()
+        return record
+
+    def delete(self, schedule_id: str):
+        for path in self._paths(schedule_id):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def store_from_env():
+    if ARCHIVE_STORE == "local":
+        return LocalArchiveStore(ARCHIVE_LOCAL_DIR)
+    return FirestoreArchiveStore()
+
+
+store = store_from_env()
+
+
+def configure(archive_store=None):
+    """보관 저장소를 교체합니다. (테스트/벤치마크용)"""
+    global store
+    store = archive_store or store_from_env()
+    _cache.clear()
+
+
+# 묘비와 복원
+def is_archived(data: Optional[dict]) -> bool:
+    return bool(data) and data.get("archived") is True
+
+
+def make_tombstone(schedule: dict, record: dict) -> dict:
+    tombstone = {field: schedule[field] for field in TOMBSTONE_FIELDS if field in schedule}
+    tombstone.update({
+        "archived": True,
+        "archived_at": record["archived_at"],
+        "archive_codec": record["codec"],
+        # 직원별 조회가 해당 직원이 없는 보관 스케줄을 복원하지 않도록 직원 목록을 남김
+        "worker_ids": sorted((schedule.get("schedule_data") or {}).keys()),
+    })
+    return tombstone
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_stats = {"archived_total": 0, "rehydrated_total": 0, "cache_hits_total": 0, "restored_total": 0}
+
+
+def rehydrate(schedule_id: str, data: dict) -> dict:
+    """묘비 문서면 보관 저장소에서 원본을 복원해 반환하고, 아니면 그대로 반환합니다."""
+    if not is_archived(data):
+        return data
+    with _cache_lock:
+        cached = _cache.get(schedule_id)
+        if cached is not None:
+            _cache.move_to_end(schedule_id)
+            _stats["cache_hits_total"] += 1
+            return cached
+    record = store.get(schedule_id)
+    if record is None:
+        raise LookupError(f"보관된 스케줄을 찾을 수 없습니다: {schedule_id}")
+    schedule = decompress(record["codec"], record["blob"])
+    with _cache_lock:
+        _stats["rehydrated_total"] += 1
+        _cache[schedule_id] = schedule
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return schedule
+
+
+def restore(schedule_id: str, business_id: str, db=None) -> bool:
+    """보관된 스케줄을 원래 컬렉션으로 되돌립니다. (수정 전 호출, 보관돼 있지 않으면 False)"""
+    hot = tenants.collection(HOT_COLLECTION, db)
+    doc = hot.get(business_id, schedule_id)
+    if not doc.exists or not is_archived(doc.to_dict()):
+        return False
+    schedule = rehydrate(schedule_id, doc.to_dict())
+    hot.set(business_id, schedule_id, schedule)
+    store.delete(schedule_id)
+    with _cache_lock:
+        _cache.pop(schedule_id, None)
+        _stats["restored_total"] += 1
+    logger.info("보관된 스케줄 복원", extra=fields(schedule_id=schedule_id))
+    return True
+
+
+# 보관 작업
+def _week_end(schedule: dict) -> Optional[date]:
+    for key, extra_days in (("week_end_date", 0), ("week_start_date", 6)):
+        value = schedule.get(key)
+        if value:
+            try:
+                return datetime.strptime(str(value)[:10], "%Y-%m-%d").date() + timedelta(days=extra_days)
+            except ValueError:
+                continue
+    return None
+
+
+def _swap_tombstone(transaction, doc, refs: list, tombstone: dict) -> bool:
+    """
+    트랜잭션 안에서 스냅샷을 읽은 뒤 문서가 바뀌지 않았으면 모든 저장 경로를 묘비로 바꿉니다.
+    (바뀌었으면 False, 커밋 전에 다른 요청이 쓰면 재실행됨)
+    """
+    paths = {ref.path for ref in refs}
+    reads = refs if doc.reference.path in paths else [doc.reference, *refs]
+    snapshots = {ref.path: ref.get(transaction=transaction) for ref in reads}
+    current = snapshots[doc.reference.path]
+    if not current.exists or current.update_time != doc.update_time:
+        return False
+    for ref in refs:
+        transaction.set(ref, tombstone)
+    return True
+
+
+def archive_schedules(db=None, horizon_days: int = HORIZON_DAYS, business_id: Optional[str] = None,
+                      dry_run: bool = False, today: Optional[date] = None) -> dict:
+    """
+    주 종료일이 보관 기준일보다 오래된 스케줄을 보관합니다.
+    보관 저장소에 먼저 쓰고 복원 검증 후 묘비로 바꾸므로 중간에 중단돼도 다시 실행하면 됩니다.
+    묘비 교체는 트랜잭션으로 하여 조회 후 수정된 스케줄은 덮어쓰지 않고 건너뜁니다.
+    """
+    from google.cloud import firestore
+    from export import iter_documents
+    from write_behind import schedule_writer
+    from etag import invalidate_schedule
+
+    hot = tenants.collection(HOT_COLLECTION, db)
+    cutoff = (today or date.today()) - timedelta(days=horizon_days)
+    # 하위 컬렉션으로 이전된 뒤에는 전체 비즈니스를 collection_group으로 조회
+    query = hot.query(business_id) if business_id else hot.all()
+    # 주 시작일 기준으로 넉넉하게 조회한 뒤 종료일로 다시 거름
+    query = query.where("week_start_date", "<", cutoff.isoformat()).order_by("week_start_date")
+
+    result = {"cutoff": cutoff.isoformat(), "scanned": 0, "archived": 0, "skipped": 0,
+              "original_bytes": 0, "archived_bytes": 0}
+    scoped = not business_id and hot.reads_scoped()
+    for doc in iter_documents(query):
+        # 이전 후 남아 있는 최상위 컬렉션 사본은 건너뜀
+        if scoped and not hot.is_scoped(doc.reference):
+            continue
+        result["scanned"] += 1
+        schedule = doc.to_dict() or {}
+        week_end = _week_end(schedule)
+        # 이미 보관됐거나, 기준일 이후 주이거나, 아직 쓰기 지연 큐에 있는 스케줄은 건너뜀
+        if is_archived(schedule) or week_end is None or week_end >= cutoff or schedule_writer.get(doc.id) is not None:
+            result["skipped"] += 1
+            continue
+
+        codec, blob = compress(schedule)
+        if decompress(codec, blob) != json.loads(json.dumps(schedule, default=str)):
+            logger.error("보관 검증 실패", extra=fields(schedule_id=doc.id))
+            result["skipped"] += 1
+            continue
+        original_size = len(json.dumps(schedule, ensure_ascii=False, default=str).encode("utf-8"))
+        result["original_bytes"] += original_size
+        result["archived_bytes"] += len(blob)
+        if dry_run:
+            result["archived"] += 1
+            continue
+
+        record = {
+            "schedule_id": doc.id,
+            "business_id": schedule.get("business_id"),
+            "codec": codec,
+            "blob": blob,
+            "original_size": original_size,
+            "archived_at": datetime.now().isoformat(),
+        }
+        store.put(doc.id, record)
+        tombstone = make_tombstone(schedule, record)
+        refs = hot.refs(schedule["business_id"], doc.id) if schedule.get("business_id") else [doc.reference]
+        if not firestore.transactional(_swap_tombstone)(hot.db.transaction(), doc, refs, tombstone):
+            # 읽은 뒤 수정된 스케줄은 다음 실행에서 다시 판단 (수정 내용을 묘비로 덮지 않음)
+            store.delete(doc.id)
+            logger.info("보관 중 수정된 스케줄 건너뜀", extra=fields(schedule_id=doc.id))
+            result["skipped"] += 1
+            result["original_bytes"] -= original_size
+            result["archived_bytes"] -= len(blob)
+            continue
+        invalidate_schedule(doc.id, schedule.get("business_id"))
+        result["archived"] += 1
+        with _cache_lock:
+            _stats["archived_total"] += 1
+
+    logger.info("스케줄 보관 완료", extra=fields(dry_run=dry_run, **result))
+    return result
+
+
+def get_stats() -> dict:
+    with _cache_lock:
+        return {**_stats, "cache_size": len(_cache), "codec": default_codec()}
+
+
+def collect_metrics() -> list:
+    """metrics.registry.register_collector 용 보관 메트릭을 반환합니다."""
+    stats = get_stats()
+    return [
+        ("archive_schedules_archived_total", "counter", "보관한 스케줄 수", [({}, stats["archived_total"])]),
+        ("archive_rehydrations_total", "counter", "보관 저장소에서 복원한 횟수", [({}, stats["rehydrated_total"])]),
+        ("archive_cache_hits_total", "counter", "복원 캐시 적중 수", [({}, stats["cache_hits_total"])]),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="오래된 AI 스케줄을 압축 보관합니다")
+    parser.add_argument("--horizon-days", type=int, default=HORIZON_DAYS)
+    parser.add_argument("--business-id")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    from utils import load_environment
+    load_environment()
+    result = archive_schedules(horizon_days=args.horizon_days, business_id=args.business_id, dry_run=args.dry_run)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,12 +4,12 @@
 """
 
 from fastapi import APIRouter, HTTPException, Depends
-from firebase_admin import auth
 from datetime import datetime
 from models import UserCreate, UserLogin
-from utils import get_current_user
+from responses import FastJSONResponse
+from utils import get_current_user, get_auth
 
-router = APIRouter(prefix="/auth", tags=["인증"])
+router = APIRouter(prefix="/auth", tags=["인증"], default_response_class=FastJSONResponse)
 
 # 사용자 등록
 @router.post("/register")
@@ -17,7 +17,7 @@ async def register_user(user: UserCreate):
     """사용자를 등록합니다."""
     try:
         # Firebase Auth로 사용자 생성
-        user_record = auth.create_user(
+        user_record = get_auth().create_user(
             email=user.email,
             password=user.password,
             display_name=user.name
@@ -0,0 +1,286 @@
+"""
+라우터 엔드투엔드 벤치마크
+메모리 Firestore(fakes.FakeFirestore)와 OpenAI 스텁 위에서 main.py에 등록된
+모든 라우터를 지정한 동시성으로 호출하고 p50/p95/p99 지연 시간과 처리량을 보고합니다.
+외부 서비스 없이 실행되므로 성능 회귀 기준선으로 사용할 수 있습니다.
+
+사용법:
+    python bench_routers.py --requests 200 --concurrency 16 --read-latency 0.002 --write-latency 0.004
+    python bench_routers.py --only ai_schedule --json bench_routers.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+import httpx
+
+import fakes
+
+BUSINESS_ID = "dev_user_123"
+WORKER_ID = "dev_user_123"
+AUTH_HEADERS = {"Authorization": "Bearer dev_token_123"}
+DAYS = ["월", "화", "수", "목", "금", "토", "일"]
+
+
+def build_schedule_request(employee_count: int = 20) -> dict:
+    """AIScheduleRequest 형태의 요청 본문을 생성합니다."""
+    return {
+        "business_id": BUSINESS_ID,
+        "week_start_date": "2024-01-01",
+        "week_end_date": "2024-01-07",
+        "department_staffing": [
+            {
+                "business_id": BUSINESS_ID,
+                "department_id": f"dept_{d}",
+                "department_name": f"파트 {d}",
+                "required_staff_count": 3,
+                "work_hours": {day: ["09:00-18:00"] for day in DAYS[:6]},
+            }
+            for d in range(3)
+        ],
+        "employee_preferences": [
+            {
+                "worker_id": WORKER_ID if i == 0 else f"worker_{i:04d}",
+                "business_id": BUSINESS_ID,
+                "department_id": f"dept_{i % 3}",
+                "work_fields": [f"field_{i % 4}"],
+                "preferred_off_days": [DAYS[(i + 5) % 7]],
+                "preferred_work_days": DAYS[i % 3: i % 3 + 4],
+                "preferred_work_hours": ["09:00-12:00", "12:00-18:00"],
+            }
+            for i in range(employee_count)
+        ],
+        "schedule_constraints": {},
+    }
+
+
+def seed(db, schedule_count: int, code_count: int) -> list:
+    """벤치마크용 초기 데이터를 채우고 사용 가능한 초대 코드 목록을 반환합니다."""
+    request = build_schedule_request()
+    for i in range(schedule_count):
+        schedule_id = f"seed_schedule_{i:04d}"
+        db.collection("ai_schedules").document(schedule_id).set({
+            "schedule_id": schedule_id,
+            "business_id": BUSINESS_ID,
+            "week_start_date": "2024-01-01",
+            "week_end_date": "2024-01-07",
+            "schedule_data": {
+                emp["worker_id"]: {
+                    "employee_id": emp["worker_id"],
+                    "department_id": emp["department_id"],
+                    "work_fields": emp["work_fields"],
+                    "schedule": {day: ["09:00-17:00"] if day in emp["preferred_work_days"] else [] for day in DAYS},
+                }
+                for emp in request["employee_preferences"]
+            },
+            "total_workers": len(request["employee_preferences"]),
+            "total_hours": 0,
+            "satisfaction_score": 0.8,
+            "created_at": datetime.now().isoformat(),
+            "status": "completed",
+        })
+    db.collection("worker_schedules").document(f"{WORKER_ID}_{BUSINESS_ID}").set({
+        "worker_id": WORKER_ID,
+        "business_id": BUSINESS_ID,
+        "updated_at": datetime.now().isoformat(),
+    })
+    codes = []
+    for i in range(code_count):
+        code = f"BENCH{i:05d}"
+        db.collection("worker_codes").document(code).set({
+            "business_id": BUSINESS_ID,
+            "code": code,
+            "created_at": datetime.now().isoformat(),
+            "expires_at": "2999-01-01T00:00:00",
+            "used": False,
+        })
+        codes.append(code)
+    return codes
+
+
+def build_scenarios(codes: list) -> list:
+    """(라우터, 이름, 요청 생성 함수) 목록을 반환합니다. 요청 생성 함수는 반복 번호를 받습니다."""
+    schedule_request = build_schedule_request()
+    code_iter = iter(codes)
+
+    def fixed(method, url, **kwargs):
+        return lambda i: (method, url, kwargs)
+
+    return [
+        ("main", "GET /health", fixed("GET", "/health")),
+        ("main", "GET /", fixed("GET", "/")),
+        ("auth", "POST /auth/register", lambda i: ("POST", "/auth/register", {"json": {
+            "email": f"bench{i}_{time.perf_counter_ns()}@example.com", "password": "password123",
+            "user_type": "worker", "name": f"벤치 {i}"}})),
+        ("auth", "POST /auth/login", fixed("POST", "/auth/login", json={"email": "a@example.com", "password": "x"})),
+        ("business", "POST /business/calendar", fixed("POST", "/business/calendar", headers=AUTH_HEADERS)),
+        ("business", "GET /business/calendar/{id}", fixed("GET", f"/business/calendar/{BUSINESS_ID}", headers=AUTH_HEADERS)),
+        ("business", "POST /business/generate-code", fixed("POST", "/business/generate-code", headers=AUTH_HEADERS)),
+        ("business", "POST /business/category", fixed("POST", "/business/category", headers=AUTH_HEADERS, json={
+            "business_id": BUSINESS_ID, "category_name": "카페"})),
+        ("business", "POST /business/department", fixed("POST", "/business/department", headers=AUTH_HEADERS, json={
+            "business_id": BUSINESS_ID, "department_name": "주방", "required_staff_count": 2})),
+        ("business", "GET /business/departments/{id}", fixed("GET", f"/business/departments/{BUSINESS_ID}", headers=AUTH_HEADERS)),
+        ("business", "POST /business/workfield", fixed("POST", "/business/workfield", headers=AUTH_HEADERS, json={
+            "business_id": BUSINESS_ID, "field_name": "바리스타"})),
+        ("business", "POST /business/schedule-settings", fixed("POST", "/business/schedule-settings", headers=AUTH_HEADERS, json={
+            "business_id": BUSINESS_ID, "schedule_type": "weekly", "week_count": 1, "deadline_days": 3,
+            "custom_work_hours": {}})),
+        ("business", "POST /business/subscription/create", fixed("POST", "/business/subscription/create", headers=AUTH_HEADERS, json={
+            "business_id": BUSINESS_ID, "plan_type": "basic"})),
+        ("worker", "POST /worker/use-code/{code}", lambda i: ("POST", f"/worker/use-code/{next(code_iter)}", {"headers": AUTH_HEADERS})),
+        ("worker", "POST /worker/schedule-preferences", fixed("POST", "/worker/schedule-preferences", headers=AUTH_HEADERS, json={
+            "worker_id": WORKER_ID, "business_id": BUSINESS_ID, "department_id": "dept_0", "work_fields": ["field_0"],
+            "preferred_off_days": ["일"], "min_work_hours": 4, "max_work_hours": 8,
+            "preferred_work_days": ["월", "화"], "preferred_work_hours": ["09:00-12:00"]})),
+        ("worker", "GET /worker/my-schedule/...", fixed("GET", f"/worker/my-schedule/{BUSINESS_ID}/{WORKER_ID}", headers=AUTH_HEADERS)),
+        ("worker", "GET /worker/preference-schedule/...", fixed("GET", f"/worker/preference-schedule/{BUSINESS_ID}/{WORKER_ID}", headers=AUTH_HEADERS)),
+        # 같은 직원의 같은 시각이면 이중 예약(409)이 되므로 요청마다 날짜를 바꿈
+        ("booking", "POST /booking/create", lambda i: ("POST", "/booking/create", {"headers": AUTH_HEADERS, "json": {
+            "business_id": BUSINESS_ID, "worker_id": WORKER_ID, "date": (date(2024, 1, 2) + timedelta(days=i)).isoformat(),
+            "time": "10:00", "service_type": "커트"}})),
+        ("booking", "GET /booking/{id}", fixed("GET", f"/booking/{BUSINESS_ID}", headers=AUTH_HEADERS)),
+        ("chatbot", "POST /chatbot/message", fixed("POST", "/chatbot/message", headers=AUTH_HEADERS, params={"message": "예약 하고 싶어요"})),
+        ("chatbot", "POST /chatbot/parse-schedule", fixed("POST", "/chatbot/parse-schedule", headers=AUTH_HEADERS, json={
+            "userInput": "내일 오후 3시 미용실 예약"})),
+        ("chatbot", "POST /chatbot/create-booking", fixed("POST", "/chatbot/create-booking", headers=AUTH_HEADERS, json={
+            "date": "2024-01-02", "time": "15:00", "service": "미용실"})),
+        ("chatbot", "POST /chatbot/generate-schedule", fixed("POST", "/chatbot/generate-schedule", headers=AUTH_HEADERS, json={
+            "date": "2024-01-02", "time": "15:00", "service": "미용실"})),
+        ("chatbot", "POST /chatbot/edit-schedule", fixed("POST", "/chatbot/edit-schedule", headers=AUTH_HEADERS, json={
+            "scheduleId": "seed_schedule_0000", "editRequest": "월요일 오전 근무를 오후로 바꿔주세요",
+            "currentSchedule": {"business_id": BUSINESS_ID, "schedule_data": {}}, "businessId": BUSINESS_ID})),
+        ("ai_schedule", "POST /ai/schedule/generate-dev", fixed("POST", "/ai/schedule/generate-dev", params={"force": "true"},
+                                                                json=schedule_request)),
+        ("ai_schedule", "POST /ai/schedule/generate", fixed("POST", "/ai/schedule/generate", headers=AUTH_HEADERS,
+                                                            params={"force": "true"}, json=schedule_request)),
+        ("ai_schedule", "POST /ai/schedule/generate (reuse)", fixed("POST", "/ai/schedule/generate", headers=AUTH_HEADERS,
+                                                                    json=schedule_request)),
+        ("ai_schedule", "GET /ai/schedule/{id}", fixed("GET", "/ai/schedule/seed_schedule_0000", headers=AUTH_HEADERS)),
+        ("ai_schedule", "GET /ai/schedule/schedules/{id}", fixed("GET", f"/ai/schedule/schedules/{BUSINESS_ID}", headers=AUTH_HEADERS)),
+    ]
+
+
+def percentile(values: list, pct: float) -> float:
+    """정렬된 값 목록에서 백분위수를 계산합니다. (nearest-rank)"""
+    if not values:
+        return 0.0
+    index = max(0, min(len(values) - 1, int(round(pct / 100 * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+async def run_scenario(client: httpx.AsyncClient, build_request, total: int, concurrency: int) -> dict:
+    """하나의 시나리오를 지정한 동시성으로 실행합니다."""
+    latencies = []
+    statuses = {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        method, url, kwargs = build_request(i)
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "mean_ms": round(statistics.fmean(latencies), 3) if latencies else 0.0,
+        "throughput_rps": round(total / elapsed, 1) if elapsed > 0 else 0.0,
+        "statuses": statuses,
+    }
+
+
+async def run(args) -> dict:
+    # 대체 구현을 설치하면 db가 초기화된 것으로 표시되어 Firebase 지연 초기화가 일어나지 않음
+    import main
+    import admission
+
+    # 같은 비즈니스로 반복 호출하므로 비즈니스별 요청 제한은 끄고 동시 실행 제한만 유지
+    admission.configure(per_minute=0)
+
+    db = fakes.install(
+        latency={"read": args.read_latency, "write": args.write_latency, "commit": args.write_latency},
+        openai_latency=args.openai_latency,
+        jitter=args.jitter,
+        seed=args.seed,
+    )
+
+    scenarios = build_scenarios(seed(db, args.seed_schedules, args.requests + 1))
+    if args.only:
+        scenarios = [s for s in scenarios if s[0] in args.only]
+
+    results = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for router_name, name, build_request in scenarios:
+            reads_before = db.stats["reads"]
+            writes_before = db.stats["writes"]
+            result = await run_scenario(client, build_request, args.requests, args.concurrency)
+            result["router"] = router_name
+            result["firestore_reads_per_request"] = round((db.stats["reads"] - reads_before) / args.requests, 2)
+            result["firestore_writes_per_request"] = round((db.stats["writes"] - writes_before) / args.requests, 2)
+            results[name] = result
+    return results
+
+
+def print_report(results: dict):
+    header = f"{'시나리오':<40} {'p50':>9} {'p95':>9} {'p99':>9} {'rps':>9} {'R/req':>6} {'W/req':>6}  상태"
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        statuses = ",".join(f"{code}x{count}" for code, count in sorted(r["statuses"].items()))
+        print(
+            f"{name:<40} {r['p50_ms']:>8.2f}ms {r['p95_ms']:>7.2f}ms {r['p99_ms']:>7.2f}ms "
+            f"{r['throughput_rps']:>9.1f} {r['firestore_reads_per_request']:>6.1f} "
+            f"{r['firestore_writes_per_request']:>6.1f}  {statuses}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="모든 라우터 엔드투엔드 벤치마크 (오프라인)")
+    parser.add_argument("--requests", type=int, default=100, help="시나리오별 요청 수")
+    parser.add_argument("--concurrency", type=int, default=8, help="동시 요청 수")
+    parser.add_argument("--read-latency", type=float, default=0.0, help="Firestore 읽기 지연(초)")
+    parser.add_argument("--write-latency", type=float, default=0.0, help="Firestore 쓰기 지연(초)")
+    parser.add_argument("--openai-latency", type=float, default=0.0, help="OpenAI 스텁 지연(초)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="지연 시간 흔들림 비율 (0.2 = ±20%%)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--seed-schedules", type=int, default=20, help="미리 채울 ai_schedules 문서 수")
+    parser.add_argument("--only", nargs="*", help="특정 라우터만 실행 (예: ai_schedule worker)")
+    parser.add_argument("--json", help="결과를 저장할 JSON 파일 경로")
+    args = parser.parse_args()
+
+    # 벤치마크 중 애플리케이션 로그 출력을 숨김
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    print_report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"\n결과 저장: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+스케줄 생성 규모별 벤치마크
+workload.py의 합성 요청(직원 10명 ~ 10,000명)으로 다음을 규모별로 측정합니다.
+    generate_dev   POST /ai/schedule/generate-dev?force=true (메모리 Firestore 위 엔드투엔드)
+    rule_based     요청 검증 + 규칙 기반 스케줄/만족도 계산 (_build_rule_based_schedule)
+    fingerprint    동일 입력 판별용 요청 지문 계산
+
+지연 시간(p50/p95)은 워밍업 1회 뒤 반복 측정하고, 최대 메모리는 tracemalloc을 켠 별도 1회로 측정합니다.
+결과를 JSON 기준선으로 저장하고, 기준선이 있으면 비교해 허용 비율(--threshold)을 넘게 나빠진 항목이 있으면
+종료 코드 1로 끝납니다. 기준선은 실행한 머신에 따라 달라지므로 같은 머신에서 만든 것과 비교합니다.
+
+사용법:
+    python bench_scaling.py --update-baseline                    # 기준선 저장 (bench_scaling_baseline.json)
+    python bench_scaling.py                                      # 기준선과 비교
+    python bench_scaling.py --tiers 10 100 1000 --threshold 0.2 --json result.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import httpx
+
+import fakes
+import workload
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_scaling_baseline.json")
+SCENARIOS = ("generate_dev", "rule_based", "fingerprint")
+
+# 비교 항목과 노이즈로 보는 절대 차이 (이보다 작게 나빠지면 비율과 관계없이 통과)
+COMPARED_METRICS = {
+    "p50_ms": "min_delta_ms",
+    "peak_memory_kb": "min_delta_kb",
+    "response_bytes": None,
+}
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def default_repeat(employee_count: int) -> int:
+    """작은 규모는 여러 번, 큰 규모는 적게 (최소 3회)"""
+    return max(3, min(30, 3000 // employee_count))
+
+
+# 시나리오
+def build_runners(client: httpx.AsyncClient, body: dict) -> dict:
+    """시나리오 이름 → 응답 크기(바이트)를 돌려주는 비동기 실행 함수"""
+    from models import AIScheduleRequest
+    from ai_schedule import _build_rule_based_schedule
+    from fingerprint import fingerprint_schedule_request
+    from responses import dumps
+
+    async def generate_dev():
+        response = await client.post("/ai/schedule/generate-dev", params={"force": "true"}, json=body)
+        if response.status_code != 200:
+            raise RuntimeError(f"generate-dev {response.status_code}: {response.text[:200]}")
+        return len(response.content)
+
+    async def rule_based():
+        schedule = _build_rule_based_schedule(AIScheduleRequest(**body), "bench_schedule", None)
+        return len(dumps(schedule))
+
+    async def fingerprint():
+        return len(fingerprint_schedule_request(AIScheduleRequest(**body)))
+
+    return {"generate_dev": generate_dev, "rule_based": rule_based, "fingerprint": fingerprint}
+
+
+async def measure(run, repeat: int) -> dict:
+    response_bytes = await run()  # 워밍업 (직원 색인 등 첫 호출 비용 제외)
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await run()
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    try:
+        await run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "runs": repeat,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "mean_ms": round(statistics.fmean(latencies), 3),
+        "peak_memory_kb": round(peak / 1024, 1),
+        "response_bytes": response_bytes,
+    }
+
+
+async def run(args) -> dict:
+    import main
+    import admission
+    import write_behind
+
+    admission.configure(per_minute=0)
+    fakes.install(
+        latency={"read": args.read_latency, "write": args.write_latency, "commit": args.write_latency},
+        seed=args.seed,
+    )
+
+    results = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for employee_count in args.tiers:
+            body = workload.generate_schedule_request(employee_count, seed=args.seed)
+            request_bytes = len(json.dumps(body, ensure_ascii=False).encode("utf-8"))
+            runners = build_runners(client, body)
+            repeat = args.repeat or default_repeat(employee_count)
+            tier = {}
+            for name in args.scenarios:
+                tier[name] = {**await measure(runners[name], repeat), "request_bytes": request_bytes}
+            results[str(employee_count)] = tier
+            # 다음 규모로 넘어가기 전 쓰기 지연 큐 비우기
+            write_behind.schedule_writer.flush()
+    write_behind.stop_all()
+    return results
+
+
+# 기준선 비교
+def compare(results: dict, baseline: dict, threshold: float, floors: dict) -> list:
+    """기준선보다 threshold 넘게 나빠진 항목 [(규모, 시나리오, 항목, 기준값, 현재값), ...]"""
+    regressions = []
+    for tier, scenarios in results.items():
+        for name, current in scenarios.items():
+            previous = (baseline.get(tier) or {}).get(name)
+            if not previous:
+                continue
+            for metric, floor_name in COMPARED_METRICS.items():
+                before, after = previous.get(metric), current.get(metric)
+                if before is None or after is None:
+                    continue
+                floor = floors.get(floor_name, 0) if floor_name else 0
+                if after > before * (1 + threshold) and after - before > floor:
+                    regressions.append((tier, name, metric, before, after))
+    return regressions
+
+
+def environment() -> dict:
+    import responses
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "orjson": responses.orjson is not None,
+    }
+
+
+def print_report(results: dict, baseline: dict = None):
+    header = f"{'직원 수':>8} {'시나리오':<14} {'p50':>10} {'p95':>10} {'최대 메모리':>12} {'요청':>11} {'응답':>11}  기준선 대비"
+    print(header)
+    print("-" * len(header))
+    for tier, scenarios in results.items():
+        for name, r in scenarios.items():
+            previous = ((baseline or {}).get(tier) or {}).get(name)
+            change = f"{(r['p50_ms'] / previous['p50_ms'] - 1) * 100:+.1f}%" if previous and previous.get("p50_ms") else "-"
+            print(
+                f"{tier:>8} {name:<14} {r['p50_ms']:>8.2f}ms {r['p95_ms']:>8.2f}ms {r['peak_memory_kb']:>10,.0f}KB "
+                f"{r['request_bytes']:>11,d} {r['response_bytes']:>11,d}  {change}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="스케줄 생성 규모별 벤치마크 (오프라인)")
+    parser.add_argument("--tiers", type=int, nargs="*", default=list(workload.SIZE_TIERS), help="직원 수 규모")
+    parser.add_argument("--scenarios", nargs="*", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--repeat", type=int, default=0, help="규모별 반복 횟수 (0이면 규모에 따라 자동)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--read-latency", type=float, default=0.0, help="Firestore 읽기 지연(초)")
+    parser.add_argument("--write-latency", type=float, default=0.0, help="Firestore 쓰기 지연(초)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="기준선 JSON 경로")
+    parser.add_argument("--update-baseline", action="store_true", help="비교하지 않고 결과를 기준선으로 저장")
+    parser.add_argument("--threshold", type=float, default=0.25, help="허용하는 악화 비율 (0.25 = 25%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="이보다 작은 지연 시간 증가는 무시")
+    parser.add_argument("--min-delta-kb", type=float, default=256.0, help="이보다 작은 메모리 증가는 무시")
+    parser.add_argument("--json", help="결과를 저장할 JSON 파일 경로")
+    args = parser.parse_args()
+
+    # 벤치마크 중 애플리케이션 로그 출력을 숨김
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    report = {
+        "created_at": datetime.now().isoformat(),
+        "environment": environment(),
+        "config": {"seed": args.seed, "read_latency": args.read_latency, "write_latency": args.write_latency},
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"결과 저장: {args.json}")
+
+    if args.update_baseline or not os.path.exists(args.baseline):
+        print_report(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n기준선 저장: {args.baseline}")
+        return
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    print_report(results, baseline.get("results"))
+    if baseline.get("environment") != report["environment"]:
+        print(f"\n⚠️ 기준선과 실행 환경이 다릅니다: {baseline.get('environment')}")
+    if baseline.get("config") != report["config"]:
+        print(f"⚠️ 기준선과 설정이 다릅니다: {baseline.get('config')}")
+
+    regressions = compare(results, baseline.get("results") or {}, args.threshold,
+                          {"min_delta_ms": args.min_delta_ms, "min_delta_kb": args.min_delta_kb})
+    if regressions:
+        print(f"\n❌ 기준선 대비 {args.threshold * 100:.0f}% 넘게 나빠진 항목")
+        for tier, name, metric, before, after in regressions:
+            print(f"  직원 {tier}명 {name} {metric}: {before} → {after} ({(after / before - 1) * 100:+.1f}%)")
+        sys.exit(1)
+    print(f"\n✅ 회귀 없음 (허용 {args.threshold * 100:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
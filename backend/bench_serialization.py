@@ -0,0 +1,106 @@
+"""
+직렬화/압축 벤치마크
+500명 규모 스케줄 응답을 기준으로 표준 JSON과 orjson의 인코딩 시간,
+그리고 압축 방식별 전송 바이트 수를 비교합니다.
+
+사용법: python bench_serialization.py [--employees 500] [--repeat 50]
+"""
+
+import argparse
+import json
+import time
+import uuid
+from datetime import datetime
+
+import responses
+
+DAYS = ["월", "화", "수", "목", "금", "토", "일"]
+
+
+def build_schedule_response(employee_count: int) -> dict:
+    """generate-dev 응답과 동일한 형태의 대용량 스케줄을 생성합니다."""
+    schedule_id = str(uuid.uuid4())
+    schedule_data = {}
+    for i in range(employee_count):
+        worker_id = f"worker_{i:05d}"
+        work_days = DAYS[i % 3: i % 3 + 5]
+        schedule_data[worker_id] = {
+            "employee_id": worker_id,
+            "department_id": f"dept_{i % 8}",
+            "work_fields": [f"field_{i % 5}", f"field_{(i + 2) % 5}"],
+            "schedule": {
+                day: (["10:00-16:00"] if day == "토" else ["09:00-17:00"]) if day in work_days else []
+                for day in DAYS
+            },
+        }
+
+    return {
+        "message": "AI 스케줄이 성공적으로 생성되었습니다",
+        "schedule_id": schedule_id,
+        "generation_time": 0.0123,
+        "schedule": {
+            "schedule_id": schedule_id,
+            "business_id": "business_bench",
+            "week_start_date": "2024-01-01",
+            "week_end_date": "2024-01-07",
+            "schedule_data": schedule_data,
+            "total_workers": employee_count,
+            "total_hours": employee_count * 40,
+            "satisfaction_score": 0.87,
+            "created_at": datetime.now().isoformat(),
+            "status": "completed",
+        },
+    }
+
+
+def encode_stdlib(content) -> bytes:
+    """Starlette 기본 JSONResponse와 동일한 방식의 인코딩"""
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def time_encoder(encoder, content, repeat: int) -> float:
+    """인코더의 평균 실행 시간(ms)을 측정합니다."""
+    encoder(content)  # 워밍업
+    start = time.perf_counter()
+    for _ in range(repeat):
+        encoder(content)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="스케줄 응답 직렬화/압축 벤치마크")
+    parser.add_argument("--employees", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    content = build_schedule_response(args.employees)
+
+    print(f"📦 직원 {args.employees}명 스케줄 응답, 반복 {args.repeat}회")
+    print()
+    print("인코딩 시간")
+    stdlib_ms = time_encoder(encode_stdlib, content, args.repeat)
+    print(f"  json (기본)   : {stdlib_ms:8.3f} ms")
+    if responses.orjson is not None:
+        fast_ms = time_encoder(responses.dumps, content, args.repeat)
+        print(f"  orjson        : {fast_ms:8.3f} ms  ({stdlib_ms / fast_ms:.1f}x)")
+    else:
+        print("  orjson        : 설치되지 않음")
+
+    body = responses.dumps(content)
+    print()
+    print("전송 바이트 수")
+    print(f"  identity      : {len(body):10,d} bytes")
+    encodings = ["gzip"] + (["br"] if responses.brotli is not None else [])
+    for encoding in encodings:
+        compress_ms = time_encoder(lambda b: responses.compress(b, encoding), body, args.repeat)
+        compressed = responses.compress(body, encoding)
+        ratio = len(compressed) / len(body) * 100
+        print(f"  {encoding:<13} : {len(compressed):10,d} bytes  ({ratio:5.1f}%, 압축 {compress_ms:.3f} ms)")
+    if responses.brotli is None:
+        print("  br            : brotli 미설치")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+콜드 스타트 벤치마크
+`python -X importtime -c "import main"`을 새 프로세스로 여러 번 실행하여
+main 모듈 import 시간(=요청을 받기 전까지의 시작 비용)과 누적 시간이 큰 모듈을 보고합니다.
+중앙값이 예산을 넘으면 0이 아닌 종료 코드로 끝나므로 CI에서 회귀 검사로 사용할 수 있습니다.
+
+사용법: python bench_startup.py [--runs 5] [--budget-ms 1500] [--top 15] [--json startup.json]
+환경 변수: STARTUP_BUDGET_MS (--budget-ms 기본값)
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_importtime(stderr: str) -> dict:
+    """-X importtime 출력을 {모듈: (self_us, cumulative_us)}로 파싱합니다."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            modules[name.strip()] = (int(self_us), int(cumulative_us))
+        except ValueError:
+            continue
+    return modules
+
+
+def run_once(module: str) -> dict:
+    """새 인터프리터에서 모듈을 import하고 import 시간 정보를 수집합니다."""
+    env = dict(os.environ)
+    # 워밍업은 lifespan에서 시작되므로 import만으로는 실행되지 않지만, 로그 출력은 줄임
+    env.setdefault("LOG_LEVEL", "WARNING")
+    start_time = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+    )
+    wall_ms = (time.perf_counter() - start_time) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} 실패:\n{result.stderr[-2000:]}")
+
+    modules = parse_importtime(result.stderr)
+    import_ms = modules.get(module, (0, 0))[1] / 1000
+    return {"wall_ms": wall_ms, "import_ms": import_ms, "modules": modules}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="main 모듈 콜드 스타트 벤치마크")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("STARTUP_BUDGET_MS", 1500)))
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--json", help="결과를 JSON 파일로 저장")
+    args = parser.parse_args()
+
+    runs = [run_once(args.module) for _ in range(args.runs)]
+    import_ms = statistics.median(run["import_ms"] for run in runs)
+    wall_ms = statistics.median(run["wall_ms"] for run in runs)
+
+    # 마지막 실행 기준 누적 시간 상위 모듈 (import 대상 자신 제외)
+    modules = runs[-1]["modules"]
+    top = sorted(
+        ((name, times) for name, times in modules.items() if name != args.module),
+        key=lambda item: item[1][1], reverse=True,
+    )[:args.top]
+
+    print(f"🚀 import {args.module} ({args.runs}회 중앙값)")
+    print(f"  import 시간   : {import_ms:8.1f} ms")
+    print(f"  프로세스 전체 : {wall_ms:8.1f} ms")
+    print(f"  예산          : {args.budget_ms:8.1f} ms")
+    print()
+    print("누적 시간 상위 모듈")
+    for name, (self_us, cumulative_us) in top:
+        print(f"  {cumulative_us / 1000:8.1f} ms  (self {self_us / 1000:6.1f})  {name}")
+
+    report = {
+        "module": args.module,
+        "runs": args.runs,
+        "import_ms": round(import_ms, 1),
+        "wall_ms": round(wall_ms, 1),
+        "budget_ms": args.budget_ms,
+        "top_modules": [
+            {"module": name, "self_ms": self_us / 1000, "cumulative_ms": cumulative_us / 1000}
+            for name, (self_us, cumulative_us) in top
+        ],
+    }
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if import_ms > args.budget_ms:
+        print()
+        print(f"❌ 시작 시간 예산 초과: {import_ms:.1f} ms > {args.budget_ms:.1f} ms")
+        sys.exit(1)
+    print()
+    print("✅ 시작 시간 예산 이내")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,12 +4,20 @@
 """
 
 from fastapi import APIRouter, HTTPException, Depends
-from datetime import datetime
+from datetime import datetime, timedelta
+import asyncio
 import uuid
 from models import BookingCreate
+from responses import FastJSONResponse
 from utils import get_current_user
+import tenants
+import shift_index
+import forecast
 
-router = APIRouter(prefix="/booking", tags=["예약"])
+router = APIRouter(prefix="/booking", tags=["예약"], default_response_class=FastJSONResponse)
+
+# 직원별 하루 예약 구간 장부 (비즈니스와 관계없이 직원 × 날짜 문서 하나)
+SLOT_COLLECTION = "booking_slots"
 
 # 예약 생성
 @router.post("/create")
@@ -30,13 +38,83 @@ async def create_booking(booking: BookingCreate, current_user: dict = Depends(ge
             "created_at": datetime.now().isoformat()
         }
         
+        # 담당 직원이 그 시간에 다른 예약이나 다른 비즈니스 근무가 있으면 거절 (색인으로 먼저 확인)
+        conflicts = await asyncio.to_thread(shift_index.check_booking, booking_data)
+        if conflicts:
+            raise HTTPException(status_code=409, detail={
+                "message": "담당 직원이 해당 시간에 다른 근무나 예약이 있습니다",
+                "conflicts": conflicts
+            })
+        
+        # 겹침 확인과 저장을 한 트랜잭션으로 (같은 직원/시간의 동시 예약이 둘 다 저장되지 않도록)
+        from google.cloud import firestore
         from utils import db
-        db.collection("bookings").document(booking_id).set(booking_data)
+        overlaps = await asyncio.to_thread(
+            firestore.transactional(_create_booking), db.transaction(), booking_data
+        )
+        if overlaps:
+            raise HTTPException(status_code=409, detail={
+                "message": "담당 직원이 해당 시간에 다른 근무나 예약이 있습니다",
+                "conflicts": overlaps
+            })
+        await asyncio.to_thread(shift_index.record_booking, booking_data)
+        await asyncio.to_thread(forecast.record_booking, booking_data)
         
         return {"message": "예약이 생성되었습니다", "booking_id": booking_id}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+def _slot_refs(worker_id: str, start: datetime, end: datetime) -> list:
+    """예약 구간이 걸친 날짜별 장부 문서 참조 (자정을 넘는 예약은 다음 날 장부에도 기록)"""
+    from utils import db
+    refs, day = [], start.date()
+    while day <= (end - timedelta(minutes=1)).date():
+        refs.append(db.collection(SLOT_COLLECTION).document(f"{worker_id}_{day.isoformat()}"))
+        day += timedelta(days=1)
+    return refs
+
+def _create_booking(transaction, booking_data: dict) -> list:
+    """
+    트랜잭션 안에서 담당 직원의 장부와 겹치는 예약이 없으면 예약과 장부를 함께 씁니다.
+    겹치면 쓰지 않고 겹친 예약 목록을 반환합니다. (충돌 시 재실행됨)
+    """
+    intervals = shift_index.booking_intervals(booking_data)
+    if not intervals:
+        for ref in tenants.collection("bookings").refs(booking_data["business_id"], booking_data["booking_id"]):
+            transaction.set(ref, booking_data)
+        return []
+    interval = intervals[0]
+    refs = _slot_refs(interval.worker_id, interval.start, interval.end)
+    ledgers = []
+    for ref in refs:
+        snapshot = ref.get(transaction=transaction)
+        ledgers.append((snapshot.to_dict() or {}).get("slots", []) if snapshot.exists else [])
+    overlaps = [
+        other for other in (
+            shift_index.Interval(datetime.fromisoformat(slot["start"]), datetime.fromisoformat(slot["end"]),
+                                 interval.worker_id, slot.get("business_id"), shift_index.BOOKING,
+                                 slot.get("booking_id"), slot.get("service_type") or "")
+            for slots in ledgers for slot in slots
+        )
+        if other.start < interval.end and interval.start < other.end
+    ]
+    if overlaps:
+        return shift_index.conflicts_to_dict([(interval, overlaps)], interval.business_id)
+    slot = {
+        "booking_id": interval.source_id,
+        "business_id": interval.business_id,
+        "service_type": interval.label,
+        "start": interval.start.isoformat(),
+        "end": interval.end.isoformat(),
+    }
+    for ref in tenants.collection("bookings").refs(booking_data["business_id"], booking_data["booking_id"]):
+        transaction.set(ref, booking_data)
+    for ref, slots in zip(refs, ledgers):
+        transaction.set(ref, {"worker_id": interval.worker_id, "slots": slots + [slot]})
+    return []
+
 # 예약 목록 조회
 @router.get("/{business_id}")
 async def get_bookings(business_id: str, current_user: dict = Depends(get_current_user)):
@@ -44,13 +122,11 @@ async def get_bookings(business_id: str, current_user: dict = Depends(get_curren
     try:
         # 권한 확인
         if current_user["uid"] != business_id:
-            from utils import db
-            permission_doc = db.collection("permissions").document(f"{business_id}_{current_user['uid']}").get()
+            permission_doc = tenants.collection("permissions").get(business_id, f"{business_id}_{current_user['uid']}")
             if not permission_doc.exists:
                 raise HTTPException(status_code=403, detail="권한이 없습니다")
         
-        from utils import db
-        bookings = db.collection("bookings").where("business_id", "==", business_id).stream()
+        bookings = tenants.collection("bookings").query(business_id).stream()
         booking_list = [doc.to_dict() for doc in bookings]
         
         return {"bookings": booking_list}
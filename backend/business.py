@@ -5,14 +5,19 @@
 
 from fastapi import APIRouter, HTTPException, Depends
 from datetime import datetime, timedelta
+import os
+import secrets
 import uuid
 from models import (
     BusinessCategory, Department, WorkField, WorkSchedule, 
-    Business, CalendarPermission, SubscriptionCreate
+    Business, CalendarPermission, SubscriptionCreate, WorkerCodeBatch
 )
+from responses import FastJSONResponse
 from utils import get_current_user
+import config_cache
+import tenants
 
-router = APIRouter(prefix="/business", tags=["비즈니스"])
+router = APIRouter(prefix="/business", tags=["비즈니스"], default_response_class=FastJSONResponse)
 
 # 업자 캘린더 생성
 @router.post("/calendar")
@@ -41,29 +46,75 @@ async def create_business_calendar(current_user: dict = Depends(get_current_user
         
         from utils import db
         db.collection("calendars").document(business_id).set(calendar_data)
+        config_cache.put("calendars", business_id, calendar_data)
         return {"message": "캘린더가 생성되었습니다", "calendar_id": business_id}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 # 노동자 코드 생성
+# 헷갈리기 쉬운 문자(0/O, 1/I/L)를 뺀 32자 → 8자리 코드는 40비트
+CODE_ALPHABET = "ABCDEFGHJKMNPQRSTUVWXYZ23456789"
+CODE_LENGTH = 8
+# 배치 하나의 쓰기 한도
+MAX_CODES_PER_REQUEST = int(os.getenv("WORKER_CODE_BATCH_MAX", 500))
+CODE_CREATE_ATTEMPTS = 3
+
+def _new_worker_codes(count: int) -> list:
+    codes = set()
+    while len(codes) < count:
+        codes.add("".join(secrets.choice(CODE_ALPHABET) for _ in range(CODE_LENGTH)))
+    return sorted(codes)
+
+def _create_worker_codes(business_id: str, count: int, expires_in_hours: int = 24) -> tuple:
+    """
+    초대 코드 count개를 배치 한 번으로 생성합니다. (코드 목록, 만료 시각) 반환
+    create는 같은 코드가 이미 있으면 배치 전체가 실패하므로 기존 코드를 덮어쓰지 않고 새 코드로 다시 시도합니다.
+    """
+    from google.api_core.exceptions import AlreadyExists
+    from utils import db
+    created_at = datetime.now()
+    expires_at = (created_at + timedelta(hours=expires_in_hours)).isoformat()
+    
+    for attempt in range(CODE_CREATE_ATTEMPTS):
+        codes = _new_worker_codes(count)
+        batch = db.batch()
+        for code in codes:
+            batch.create(db.collection("worker_codes").document(code), {
+                "business_id": business_id,
+                "code": code,
+                "created_at": created_at.isoformat(),
+                "expires_at": expires_at,
+                "used": False
+            })
+        try:
+            batch.commit()
+            return codes, expires_at
+        except AlreadyExists:
+            continue
+    raise RuntimeError("초대 코드 생성에 실패했습니다. 다시 시도해주세요")
+
 @router.post("/generate-code")
 async def generate_worker_code(current_user: dict = Depends(get_current_user)):
     """직원 초대 코드를 생성합니다."""
     try:
-        business_id = current_user["uid"]
-        code = str(uuid.uuid4())[:8].upper()
-        
-        code_data = {
-            "business_id": business_id,
-            "code": code,
-            "created_at": datetime.now().isoformat(),
-            "expires_at": (datetime.now() + timedelta(hours=24)).isoformat(),
-            "used": False
-        }
+        codes, expires_at = _create_worker_codes(current_user["uid"], 1)
+        return {"code": codes[0], "expires_at": expires_at}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/generate-codes")
+async def generate_worker_codes(code_batch: WorkerCodeBatch, current_user: dict = Depends(get_current_user)):
+    """직원 초대 코드를 한 번에 여러 개 생성합니다. (매장 단위 온보딩)"""
+    try:
+        if not 1 <= code_batch.count <= MAX_CODES_PER_REQUEST:
+            raise HTTPException(status_code=400, detail=f"코드는 한 번에 1~{MAX_CODES_PER_REQUEST}개까지 생성할 수 있습니다")
+        if code_batch.expires_in_hours <= 0:
+            raise HTTPException(status_code=400, detail="만료 시간은 1시간 이상이어야 합니다")
         
-        from utils import db
-        db.collection("worker_codes").document(code).set(code_data)
-        return {"code": code, "expires_at": code_data["expires_at"]}
+        codes, expires_at = _create_worker_codes(current_user["uid"], code_batch.count, code_batch.expires_in_hours)
+        return {"codes": codes, "count": len(codes), "expires_at": expires_at}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -108,8 +159,8 @@ async def create_department(department: Department, current_user: dict = Depends
             "created_at": datetime.now().isoformat()
         }
         
-        from utils import db
-        db.collection("departments").document(department_id).set(department_data)
+        tenants.collection("departments").set(department.business_id, department_id, department_data)
+        config_cache.invalidate("departments", department.business_id)
         return {"message": "파트가 생성되었습니다", "department_id": department_id}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -131,8 +182,8 @@ async def create_work_field(work_field: WorkField, current_user: dict = Depends(
             "created_at": datetime.now().isoformat()
         }
         
-        from utils import db
-        db.collection("work_fields").document(field_id).set(field_data)
+        tenants.collection("work_fields").set(work_field.business_id, field_id, field_data)
+        config_cache.invalidate("work_fields", work_field.business_id)
         return {"message": "주요분야가 생성되었습니다", "field_id": field_id}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -157,10 +208,70 @@ async def create_schedule_settings(schedule: WorkSchedule, current_user: dict =
         
         from utils import db
         db.collection("work_schedules").document(schedule.business_id).set(schedule_data)
+        config_cache.put("work_schedules", schedule.business_id, schedule_data)
         return {"message": "스케줄 설정이 저장되었습니다"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+# 비즈니스 접근 권한 확인 (소유자 또는 권한을 받은 직원)
+def _check_business_access(business_id: str, current_user: dict):
+    if current_user["uid"] == business_id:
+        return
+    permission_doc = tenants.collection("permissions").get(business_id, f"{business_id}_{current_user['uid']}")
+    if not permission_doc.exists:
+        raise HTTPException(status_code=403, detail="권한이 없습니다")
+
+# 캘린더 설정 조회
+@router.get("/calendar/{business_id}")
+async def get_business_calendar(business_id: str, current_user: dict = Depends(get_current_user)):
+    """비즈니스 캘린더 설정을 조회합니다. (설정 캐시 사용)"""
+    try:
+        _check_business_access(business_id, current_user)
+        calendar = config_cache.get_calendar(business_id)
+        if calendar is None:
+            raise HTTPException(status_code=404, detail="캘린더를 찾을 수 없습니다")
+        return {"calendar": calendar}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# 스케줄 설정 조회
+@router.get("/schedule-settings/{business_id}")
+async def get_schedule_settings(business_id: str, current_user: dict = Depends(get_current_user)):
+    """비즈니스 스케줄 설정을 조회합니다. (설정 캐시 사용)"""
+    try:
+        _check_business_access(business_id, current_user)
+        return {"schedule_settings": config_cache.get_work_schedule(business_id)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# 파트 목록 조회
+@router.get("/departments/{business_id}")
+async def get_departments(business_id: str, current_user: dict = Depends(get_current_user)):
+    """비즈니스 부서 목록을 조회합니다. (설정 캐시 사용)"""
+    try:
+        _check_business_access(business_id, current_user)
+        return {"departments": config_cache.list_departments(business_id)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# 주요분야 목록 조회
+@router.get("/workfields/{business_id}")
+async def get_work_fields(business_id: str, current_user: dict = Depends(get_current_user)):
+    """비즈니스 주요분야 목록을 조회합니다. (설정 캐시 사용)"""
+    try:
+        _check_business_access(business_id, current_user)
+        return {"work_fields": config_cache.list_work_fields(business_id)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 # 구독 생성
 @router.post("/subscription/create")
 async def create_subscription(subscription: SubscriptionCreate, current_user: dict = Depends(get_current_user)):
@@ -0,0 +1,356 @@
+"""
+챗봇 대화 세션 저장소와 토큰 예산 관리
+(사용자, 대화) 단위로 최근 대화를 보관하여 클라이언트가 전체 기록을 다시 보내지 않아도 이어서 대화할 수 있게 합니다.
+최근 K턴은 그대로 두고 그보다 오래된 턴은 누적 요약(rolling summary)으로 접으며,
+프롬프트가 예산을 넘지 않도록 잘라내므로 대화가 길어져도 턴마다 LLM 입력 크기가 일정합니다.
+
+세션은 인스턴스 메모리에만 있으며 TTL과 전체 메모리 한도를 넘으면 오래된 세션부터 제거됩니다.
+(제거되거나 다른 인스턴스로 요청이 가면 새 대화로 시작)
+
+환경 변수:
+    CHAT_SESSION_TTL=1800             마지막 사용 후 세션 유지 시간(초)
+    CHAT_SESSION_MAX=5000             최대 세션 수
+    CHAT_SESSION_MAX_BYTES=33554432   전체 세션 메모리 한도(바이트, 대략치)
+    CHAT_KEEP_TURNS=4                 그대로 유지하는 최근 턴 수
+    CHAT_FOLD_BATCH=4                 이만큼 턴이 더 쌓이면 한 번에 요약으로 접음
+    CHAT_MESSAGE_TOKENS=300           메시지 하나의 최대 토큰 (넘으면 잘라서 보관)
+    CHAT_SUMMARY_TOKENS=400           요약의 최대 토큰
+    CHAT_PROMPT_TOKENS=2000           한 번의 호출에 보내는 프롬프트 최대 토큰
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Optional
+
+from app_logging import get_logger, fields
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+logger = get_logger("chat_sessions")
+
+SESSION_TTL = float(os.getenv("CHAT_SESSION_TTL", 1800))
+MAX_SESSIONS = int(os.getenv("CHAT_SESSION_MAX", 5000))
+MAX_BYTES = int(os.getenv("CHAT_SESSION_MAX_BYTES", 32 * 1024 * 1024))
+KEEP_TURNS = int(os.getenv("CHAT_KEEP_TURNS", 4))
+FOLD_BATCH = int(os.getenv("CHAT_FOLD_BATCH", 4))
+MESSAGE_TOKENS = int(os.getenv("CHAT_MESSAGE_TOKENS", 300))
+SUMMARY_TOKENS = int(os.getenv("CHAT_SUMMARY_TOKENS", 400))
+PROMPT_TOKENS = int(os.getenv("CHAT_PROMPT_TOKENS", 2000))
+
+# 메시지마다 붙는 역할/구분자 토큰 (OpenAI 채팅 형식 기준)
+MESSAGE_OVERHEAD = 4
+
+
+# 토큰 계산
+_encoding = None
+
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None and tiktoken is not None:
+        _encoding = tiktoken.get_encoding("cl100k_base")
+    return _encoding
+
+
+def _char_tokens(char: str) -> float:
+    # tiktoken이 없을 때의 근사치: 영문/숫자는 4자당 1토큰, 한글 등은 글자당 1토큰
+    return 0.25 if ord(char) < 128 else 1.0
+
+
+def count_tokens(text: str) -> int:
+    """텍스트의 토큰 수 (tiktoken이 없으면 근사치)"""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return int(sum(_char_tokens(char) for char in text) + 0.999)
+
+
+def truncate_tokens(text: str, max_tokens: int, keep: str = "head") -> str:
+    """텍스트를 max_tokens 이하로 자릅니다. keep="tail"이면 뒷부분을 남깁니다."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text)
+        tokens = tokens[:max_tokens] if keep == "head" else tokens[-max_tokens:]
+        return encoding.decode(tokens)
+    chars = text if keep == "head" else reversed(text)
+    used, kept = 0.0, []
+    for char in chars:
+        used += _char_tokens(char)
+        if used > max_tokens:
+            break
+        kept.append(char)
+    return "".join(kept) if keep == "head" else "".join(reversed(kept))
+
+
+def message_tokens(messages: list) -> int:
+    return sum(count_tokens(message["content"]) + MESSAGE_OVERHEAD for message in messages)
+
+
+# 세션
+class ChatSession:
+    """대화 하나의 상태 (요약 + 최근 턴)"""
+
+    def __init__(self, user_id: str, conversation_id: str):
+        self.user_id = user_id
+        self.conversation_id = conversation_id
+        self.summary = ""
+        # (사용자 메시지, 챗봇 응답) 쌍
+        self.turns = deque()
+        self.total_turns = 0
+        self.summarized_turns = 0
+        self.created_at = time.time()
+        self.last_used = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def add_turn(self, user_message: str, reply: str):
+        self.turns.append((user_message, reply))
+        self.total_turns += 1
+
+    def size_bytes(self) -> int:
+        size = len(self.summary.encode("utf-8")) + 256
+        for user_message, reply in self.turns:
+            size += len(user_message.encode("utf-8")) + len(reply.encode("utf-8")) + 64
+        return size
+
+    def to_dict(self) -> dict:
+        return {
+            "conversation_id": self.conversation_id,
+            "summary": self.summary,
+            "turns": [{"user": user_message, "assistant": reply} for user_message, reply in self.turns],
+            "total_turns": self.total_turns,
+            "summarized_turns": self.summarized_turns,
+        }
+
+
+class SessionStore:
+    """TTL + LRU + 메모리 한도 기반 세션 저장소"""
+
+    def __init__(self, ttl: float = SESSION_TTL, max_sessions: int = MAX_SESSIONS, max_bytes: int = MAX_BYTES):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._sessions = OrderedDict()
+        self._sizes = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+        self.evictions = {}
+
+    def get(self, user_id: str, conversation_id: str) -> Optional[ChatSession]:
+        key = (user_id, conversation_id)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                return None
+            if time.monotonic() - session.last_used > self.ttl:
+                self._remove(key, "ttl")
+                return None
+            session.last_used = time.monotonic()
+            self._sessions.move_to_end(key)
+            return session
+
+    def get_or_create(self, user_id: str, conversation_id: str) -> ChatSession:
+        session = self.get(user_id, conversation_id)
+        if session is not None:
+            return session
+        # 다시 오지 않는 세션이 한도까지 남아 있지 않도록 새 세션을 만들 때 가끔 만료 세션을 정리
+        if time.monotonic() - self._last_sweep > self.ttl / 10:
+            self.sweep()
+        with self._lock:
+            key = (user_id, conversation_id)
+            session = self._sessions.get(key)
+            if session is None:
+                session = ChatSession(user_id, conversation_id)
+                self._sessions[key] = session
+                self._sizes[key] = 0
+            self._enforce_limits(keep=key)
+            return session
+
+    def account(self, session: ChatSession):
+        """세션 내용이 바뀐 뒤 메모리 사용량을 다시 계산하고 한도를 적용합니다."""
+        key = (session.user_id, session.conversation_id)
+        size = session.size_bytes()
+        with self._lock:
+            if self._sessions.get(key) is not session:
+                return
+            self._bytes += size - self._sizes.get(key, 0)
+            self._sizes[key] = size
+            self._enforce_limits(keep=key)
+
+    def delete(self, user_id: str, conversation_id: str) -> bool:
+        with self._lock:
+            key = (user_id, conversation_id)
+            if key not in self._sessions:
+                return False
+            self._remove(key, "deleted")
+            return True
+
+    def sweep(self) -> int:
+        """만료된 세션을 정리합니다. (정리한 세션 수 반환)"""
+        now = time.monotonic()
+        with self._lock:
+            self._last_sweep = now
+            expired = [key for key, session in self._sessions.items() if now - session.last_used > self.ttl]
+            for key in expired:
+                self._remove(key, "ttl")
+        return len(expired)
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+            self._sizes.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": dict(self.evictions),
+            }
+
+    def _remove(self, key, reason: str):
+        self._sessions.pop(key, None)
+        self._bytes -= self._sizes.pop(key, 0)
+        self.evictions[reason] = self.evictions.get(reason, 0) + 1
+
+    def _enforce_limits(self, keep=None):
+        # 가장 오래 사용하지 않은 세션부터 제거 (방금 사용한 세션은 유지)
+        while self._sessions and (len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes):
+            key = next(iter(self._sessions))
+            if key == keep:
+                if len(self._sessions) == 1:
+                    break
+                self._sessions.move_to_end(key)
+                continue
+            self._remove(key, "capacity")
+
+
+# 토큰 예산
+Summarizer = Callable[[str, list], Awaitable[str]]
+
+
+def _turn_lines(turns) -> list:
+    return [f"사용자: {user_message}\n챗봇: {reply}" for user_message, reply in turns]
+
+
+def extractive_summary(previous: str, turns, max_tokens: int = SUMMARY_TOKENS) -> str:
+    """LLM 없이 만드는 요약 (이전 요약 + 접는 턴을 짧게 잘라 이어 붙이고 최근 내용을 남김)"""
+    per_turn = max(16, max_tokens // max(1, 2 * len(turns)))
+    lines = [truncate_tokens(line, per_turn) for line in _turn_lines(turns)]
+    return truncate_tokens("\n".join(filter(None, [previous, *lines])), max_tokens, keep="tail")
+
+
+class TokenBudget:
+    """최근 턴 유지 / 오래된 턴 요약 / 프롬프트 크기 제한"""
+
+    def __init__(self, keep_turns: int = KEEP_TURNS, fold_batch: int = FOLD_BATCH,
+                 message_tokens: int = MESSAGE_TOKENS, summary_tokens: int = SUMMARY_TOKENS,
+                 prompt_tokens: int = PROMPT_TOKENS):
+        self.keep_turns = keep_turns
+        self.fold_batch = max(1, fold_batch)
+        self.message_tokens = message_tokens
+        self.summary_tokens = summary_tokens
+        self.prompt_tokens = prompt_tokens
+        self.summaries = {"llm": 0, "extractive": 0}
+
+    def clip(self, text: str) -> str:
+        """보관/전송할 메시지 하나를 message_tokens 이하로 자릅니다."""
+        return truncate_tokens(text.strip(), self.message_tokens)
+
+    def needs_fold(self, session: ChatSession) -> bool:
+        return len(session.turns) >= self.keep_turns + self.fold_batch
+
+    async def fold(self, session: ChatSession, summarizer: Optional[Summarizer] = None):
+        """최근 keep_turns를 제외한 턴을 요약에 합칩니다. (요약 실패 시 추출 요약)"""
+        count = len(session.turns) - self.keep_turns
+        if count <= 0:
+            return
+        folded = [session.turns[index] for index in range(count)]
+        summary = None
+        if summarizer is not None:
+            try:
+                summary = await summarizer(session.summary, folded)
+                self.summaries["llm"] += 1
+            except Exception as e:
+                logger.warning("대화 요약 실패, 추출 요약 사용", extra=fields(error=str(e)))
+        if not summary:
+            summary = extractive_summary(session.summary, folded, self.summary_tokens)
+            self.summaries["extractive"] += 1
+        session.summary = truncate_tokens(summary.strip(), self.summary_tokens, keep="tail")
+        for _ in range(count):
+            session.turns.popleft()
+        session.summarized_turns += count
+
+    def build_messages(self, system_prompt: str, session: ChatSession, user_message: str) -> list:
+        """
+        [시스템, 요약, 최근 턴..., 새 메시지] 프롬프트를 만듭니다.
+        합계가 prompt_tokens를 넘으면 오래된 턴부터 뺍니다. (요약에 접히기 전까지는 세션에 남아 있음)
+        """
+        head = [{"role": "system", "content": system_prompt}]
+        if session.summary:
+            head.append({"role": "system", "content": f"이전 대화 요약:\n{session.summary}"})
+        tail = [{"role": "user", "content": user_message}]
+        budget = self.prompt_tokens - message_tokens(head) - message_tokens(tail)
+
+        history = []
+        for user_text, reply in reversed(session.turns):
+            pair = [{"role": "user", "content": user_text}, {"role": "assistant", "content": reply}]
+            cost = message_tokens(pair)
+            if cost > budget:
+                break
+            history[:0] = pair
+            budget -= cost
+        return head + history + tail
+
+
+store = SessionStore()
+budget = TokenBudget()
+
+# 진행 중인 백그라운드 요약 작업 (가비지 컬렉션 방지)
+_fold_tasks = set()
+
+
+def schedule_fold(session: ChatSession, summarizer: Optional[Summarizer] = None):
+    """응답을 돌려준 뒤 백그라운드에서 오래된 턴을 요약합니다. 다음 턴은 세션 잠금으로 요약이 끝나길 기다립니다."""
+    async def run():
+        async with session.lock:
+            await budget.fold(session, summarizer)
+            store.account(session)
+
+    task = asyncio.ensure_future(run())
+    _fold_tasks.add(task)
+    task.add_done_callback(_fold_tasks.discard)
+    return task
+
+
+def configure(session_store: Optional[SessionStore] = None, token_budget: Optional[TokenBudget] = None):
+    """저장소와 예산 설정을 바꿉니다. (테스트/벤치마크용)"""
+    global store, budget
+    store = session_store or SessionStore()
+    budget = token_budget or TokenBudget()
+
+
+def collect_metrics() -> list:
+    """metrics.registry.register_collector 용 대화 세션 메트릭을 반환합니다."""
+    stats = store.stats()
+    return [
+        ("chat_sessions", "gauge", "메모리에 있는 챗봇 대화 세션 수", [({}, stats["sessions"])]),
+        ("chat_session_bytes", "gauge", "챗봇 대화 세션이 사용하는 메모리(대략치)", [({}, stats["bytes"])]),
+        ("chat_session_evictions_total", "counter", "제거된 챗봇 대화 세션 수",
+         [({"reason": reason}, count) for reason, count in stats["evictions"].items()]),
+        ("chat_summaries_total", "counter", "오래된 대화를 요약으로 접은 횟수",
+         [({"mode": mode}, count) for mode, count in budget.summaries.items()]),
+    ]
@@ -5,33 +5,142 @@ AI 챗봇 메시지 처리, 스케줄 파싱, 예약 생성 등의 챗봇 기능
 
 from fastapi import APIRouter, HTTPException, Depends
 from datetime import datetime, timedelta
+import asyncio
 import uuid
 import re
-from utils import get_current_user, call_openai_api
+from responses import FastJSONResponse
+from etag import compute_content_hash, invalidate_schedule
+from utils import get_current_user
+from write_behind import schedule_writer
+from archive import restore
+from circuit_breaker import openai_guard, UpstreamUnavailable
+import chat_sessions
+import shift_index
+import tenants
+from app_logging import get_logger, fields, summarize
 
-router = APIRouter(prefix="/chatbot", tags=["챗봇"])
+router = APIRouter(prefix="/chatbot", tags=["챗봇"], default_response_class=FastJSONResponse)
+logger = get_logger("chatbot")
 
 # 챗봇 메시지 처리
 @router.post("/message")
 async def process_chatbot_message(message: str, current_user: dict = Depends(get_current_user)):
     """챗봇 메시지를 처리하고 응답을 생성합니다."""
     try:
-        # 간단한 챗봇 응답 로직
-        response = "안녕하세요! AI 스케줄 생성 챗봇입니다. 🗓️\n\n스케줄을 생성하거나 예약 관련 문의를 도와드릴 수 있습니다."
-        
-        if "예약" in message:
-            response = "예약을 원하시면 자연어로 입력해주세요. 예: '내일 오후 2시 미용실 예약'"
-        elif "취소" in message:
-            response = "예약 취소는 예약 목록에서 해당 예약을 선택하여 취소할 수 있습니다."
-        elif "시간" in message:
-            response = "운영 시간은 평일 09:00-18:00, 토요일 10:00-16:00입니다."
-        elif "스케줄" in message:
-            response = "스케줄을 생성하거나 수정할 수 있습니다. 원하는 날짜와 시간을 알려주세요."
-        
-        return {"response": response}
+        return {"response": _keyword_response(message)}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+def _keyword_response(message: str) -> str:
+    # 간단한 챗봇 응답 로직 (대화 세션에서 OpenAI를 쓸 수 없을 때도 사용)
+    response = "안녕하세요! AI 스케줄 생성 챗봇입니다. 🗓️\n\n스케줄을 생성하거나 예약 관련 문의를 도와드릴 수 있습니다."
+    
+    if "예약" in message:
+        response = "예약을 원하시면 자연어로 입력해주세요. 예: '내일 오후 2시 미용실 예약'"
+    elif "취소" in message:
+        response = "예약 취소는 예약 목록에서 해당 예약을 선택하여 취소할 수 있습니다."
+    elif "시간" in message:
+        response = "운영 시간은 평일 09:00-18:00, 토요일 10:00-16:00입니다."
+    elif "스케줄" in message:
+        response = "스케줄을 생성하거나 수정할 수 있습니다. 원하는 날짜와 시간을 알려주세요."
+    return response
+
+# 대화 세션
+CONVERSATION_SYSTEM_PROMPT = (
+    "당신은 근무 스케줄과 예약을 도와주는 한국어 챗봇입니다. "
+    "이전 대화 요약과 최근 대화를 참고하여 간결하게 답해주세요."
+)
+CONVERSATION_ROUTE = "/chatbot/conversation"
+
+async def _summarize_turns(previous_summary: str, turns: list) -> str:
+    """오래된 턴을 이전 요약과 합쳐 새 요약을 만듭니다."""
+    conversation = "\n".join(f"사용자: {user_message}\n챗봇: {reply}" for user_message, reply in turns)
+    messages = [
+        {
+            "role": "system",
+            "content": "대화 내용을 이후 대화에 필요한 사실(날짜, 시간, 직원, 요청 사항, 결정된 내용) 위주로 짧게 요약해주세요."
+        },
+        {
+            "role": "user",
+            "content": f"이전 요약:\n{previous_summary or '(없음)'}\n\n이어진 대화:\n{conversation}"
+        }
+    ]
+    return await openai_guard.call(
+        messages,
+        deadline=openai_guard.deadline(CONVERSATION_ROUTE),
+        max_tokens=chat_sessions.budget.summary_tokens
+    )
+
+@router.post("/conversation")
+async def send_conversation_message(conversation_request: dict, current_user: dict = Depends(get_current_user)):
+    """
+    대화 세션에 메시지를 보내고 응답을 받습니다.
+    conversation_id가 없으면 새 대화를 시작하며, 이후 요청에는 응답의 conversation_id를 보내면 됩니다.
+    """
+    try:
+        message = (conversation_request.get("message") or "").strip()
+        if not message:
+            raise HTTPException(status_code=400, detail="메시지가 필요합니다")
+        conversation_id = conversation_request.get("conversation_id") or str(uuid.uuid4())
+        
+        session = chat_sessions.store.get_or_create(current_user["uid"], conversation_id)
+        budget = chat_sessions.budget
+        user_message = budget.clip(message)
+        
+        # 같은 대화의 요청(과 백그라운드 요약)은 순서대로 처리
+        async with session.lock:
+            messages = budget.build_messages(CONVERSATION_SYSTEM_PROMPT, session, user_message)
+            prompt_tokens = chat_sessions.message_tokens(messages)
+            fallback_reason = None
+            try:
+                reply = await openai_guard.call(
+                    messages,
+                    deadline=openai_guard.deadline(CONVERSATION_ROUTE),
+                    max_tokens=budget.message_tokens
+                )
+            except Exception as ai_error:
+                fallback_reason = ai_error.reason if isinstance(ai_error, UpstreamUnavailable) else "error"
+                openai_guard.record_fallback(fallback_reason)
+                logger.warning("대화 응답 생성 실패, 기본 응답 사용", extra=fields(
+                    conversation_id=conversation_id, reason=fallback_reason, error=str(ai_error)
+                ))
+                reply = _keyword_response(message)
+            
+            session.add_turn(user_message, budget.clip(reply))
+            chat_sessions.store.account(session)
+            if budget.needs_fold(session):
+                chat_sessions.schedule_fold(session, _summarize_turns)
+        
+        result = {
+            "conversation_id": conversation_id,
+            "response": reply,
+            "ai_generated": fallback_reason is None,
+            "turn": session.total_turns,
+            "prompt_tokens": prompt_tokens
+        }
+        if fallback_reason:
+            result["fallback_reason"] = fallback_reason
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/conversation/{conversation_id}")
+async def get_conversation(conversation_id: str, current_user: dict = Depends(get_current_user)):
+    """대화 세션의 요약과 최근 턴을 조회합니다."""
+    session = chat_sessions.store.get(current_user["uid"], conversation_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="대화를 찾을 수 없습니다")
+    return session.to_dict()
+
+@router.delete("/conversation/{conversation_id}")
+async def delete_conversation(conversation_id: str, current_user: dict = Depends(get_current_user)):
+    """대화 세션을 종료합니다."""
+    if not chat_sessions.store.delete(current_user["uid"], conversation_id):
+        raise HTTPException(status_code=404, detail="대화를 찾을 수 없습니다")
+    return {"message": "대화가 종료되었습니다", "conversation_id": conversation_id}
+
 # 스케줄 요청 파싱
 @router.post("/parse-schedule")
 async def parse_schedule_request(user_input: dict, current_user: dict = Depends(get_current_user)):
@@ -147,11 +256,13 @@ async def generate_chatbot_schedule(schedule_request: dict, current_user: dict =
         raise HTTPException(status_code=400, detail=str(e))
 
 # AI를 통한 스케줄 수정
+EDIT_SCHEDULE_ROUTE = "/chatbot/edit-schedule"
+
 @router.post("/edit-schedule")
 async def edit_schedule_with_ai(edit_request: dict, current_user: dict = Depends(get_current_user)):
     """AI를 사용하여 스케줄을 수정합니다."""
     try:
-        print(f"AI 스케줄 수정 요청 받음: {edit_request}")
+        logger.info("AI 스케줄 수정 요청 받음", extra=fields(request=summarize(edit_request)))
         
         schedule_id = edit_request.get("scheduleId")
         edit_request_text = edit_request.get("editRequest")
@@ -161,6 +272,12 @@ async def edit_schedule_with_ai(edit_request: dict, current_user: dict = Depends
         if not all([schedule_id, edit_request_text, current_schedule, business_id]):
             raise HTTPException(status_code=400, detail="필수 필드가 누락되었습니다")
         
+        # 권한 확인 (비즈니스 본인 또는 권한이 있는 직원)
+        if current_user["uid"] != business_id:
+            permission_doc = tenants.collection("permissions").get(business_id, f"{business_id}_{current_user['uid']}")
+            if not permission_doc.exists:
+                raise HTTPException(status_code=403, detail="권한이 없습니다")
+        
         # AI를 사용하여 스케줄 수정 제안 생성
         messages = [
             {
@@ -179,12 +296,26 @@ async def edit_schedule_with_ai(edit_request: dict, current_user: dict = Depends
             }
         ]
         
+        # OpenAI 회로가 열려 있거나 지연 예산을 넘기면 스케줄을 바꾸지 않고 그대로 돌려줌
+        try:
+            ai_response = await openai_guard.call(messages, deadline=openai_guard.deadline(EDIT_SCHEDULE_ROUTE))
+        except Exception as ai_error:
+            fallback_reason = ai_error.reason if isinstance(ai_error, UpstreamUnavailable) else "upstream_error"
+            openai_guard.record_fallback(fallback_reason)
+            logger.warning("AI 스케줄 수정 실패, 수정하지 않음", extra=fields(
+                schedule_id=schedule_id, reason=fallback_reason, error=str(ai_error)
+            ))
+            return {
+                "message": "AI 응답을 받을 수 없어 스케줄을 수정하지 않았습니다. 잠시 후 다시 시도해주세요",
+                "modified_schedule": current_schedule,
+                "ai_generated": False,
+                "fallback_reason": fallback_reason
+            }
+        
         try:
-            ai_response = call_openai_api(messages)
             # AI 응답을 파싱하여 수정된 스케줄 생성
             # 실제 구현에서는 더 정교한 파싱이 필요합니다.
             
-            from utils import db
             # 수정된 스케줄을 데이터베이스에 저장
             updated_schedule = {
                 **current_schedule,
@@ -193,19 +324,41 @@ async def edit_schedule_with_ai(edit_request: dict, current_user: dict = Depends
                 "ai_suggestion": ai_response,
                 "updated_at": datetime.now().isoformat()
             }
+            updated_schedule["content_hash"] = compute_content_hash(updated_schedule)
             
-            db.collection("ai_schedules").document(schedule_id).update(updated_schedule)
+            # 아직 저장 대기 중인 스케줄이면 저장된 뒤에 수정 (저장하지 못했으면 수정할 문서가 없음)
+            if not await asyncio.to_thread(schedule_writer.ensure_persisted, schedule_id):
+                raise HTTPException(status_code=503, detail="스케줄이 아직 저장되지 않았습니다. 잠시 후 다시 시도해주세요")
+            # 다른 비즈니스의 스케줄 ID로 복원/수정하지 않도록 저장된 문서의 비즈니스 확인
+            stored = tenants.collection("ai_schedules").get(business_id, schedule_id)
+            if not stored.exists or (stored.to_dict() or {}).get("business_id") != business_id:
+                raise HTTPException(status_code=404, detail="스케줄을 찾을 수 없습니다")
+            # 보관된 스케줄이면 원래 컬렉션으로 되돌린 뒤 수정 (묘비에 수정이 섞이지 않도록)
+            restore(schedule_id, business_id)
+            tenants.collection("ai_schedules").update(business_id, schedule_id, updated_schedule)
+            invalidate_schedule(schedule_id, business_id)
+            # 수정된 근무로 이중 근무 색인 갱신
+            shift_conflicts = await asyncio.to_thread(
+                shift_index.record_schedule,
+                {**updated_schedule, "schedule_id": schedule_id, "business_id": business_id}
+            )
             
             return {
                 "message": "스케줄이 AI에 의해 수정되었습니다",
                 "modified_schedule": updated_schedule,
-                "ai_suggestion": ai_response
+                "ai_suggestion": ai_response,
+                "ai_generated": True,
+                "shift_conflicts": shift_conflicts
             }
             
-        except Exception as ai_error:
-            print(f"AI 처리 오류: {ai_error}")
+        except HTTPException:
+            raise
+        except Exception as save_error:
+            logger.warning("AI 수정 스케줄 저장 오류", extra=fields(error=str(save_error)))
             raise HTTPException(status_code=500, detail="AI 처리 중 오류가 발생했습니다")
             
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"스케줄 수정 오류: {e}")
+        logger.warning("스케줄 수정 오류", extra=fields(error=str(e)))
         raise HTTPException(status_code=400, detail=str(e))
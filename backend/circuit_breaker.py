@@ -0,0 +1,260 @@
+"""
+OpenAI 호출 회로 차단기(circuit breaker)와 지연 예산(latency budget)
+OpenAI가 느리거나 오류를 내면 요청이 그만큼 기다렸다가 실패하므로,
+연속 실패(또는 너무 느린 호출)가 쌓이면 회로를 열어 한동안 호출하지 않고 바로 대체 경로로 보냅니다.
+엔드포인트별 지연 예산을 넘기면 기다리지 않고 BudgetExceeded를 발생시키며,
+선택적으로 일정 시간 안에 응답이 없으면 같은 요청을 한 번 더 보내(hedging) 먼저 온 응답을 씁니다.
+
+상태:
+    closed     정상 호출
+    open       호출하지 않고 CircuitOpenError (OPENAI_BREAKER_RESET 후 half_open)
+    half_open  시험 호출 하나만 허용, 성공하면 closed / 실패하면 다시 open
+
+환경 변수:
+    OPENAI_BREAKER_FAILURES=5       회로를 여는 연속 실패 수
+    OPENAI_BREAKER_RESET=30         회로를 연 뒤 시험 호출까지 기다리는 시간(초)
+    OPENAI_SLOW_CALL_SECONDS=20     이보다 오래 걸린 호출은 실패로 집계
+    OPENAI_LATENCY_BUDGET=25        기본 지연 예산(초)
+    OPENAI_LATENCY_BUDGETS=/ai/schedule/generate=25   엔드포인트별 지연 예산(초, 쉼표로 구분)
+    OPENAI_HEDGE_AFTER=0            이 시간(초) 안에 응답이 없으면 한 번 더 호출 (0이면 사용 안 함)
+"""
+
+import asyncio
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+from app_logging import get_logger, fields
+
+logger = get_logger("circuit_breaker")
+
+BREAKER_FAILURES = int(os.getenv("OPENAI_BREAKER_FAILURES", 5))
+BREAKER_RESET = float(os.getenv("OPENAI_BREAKER_RESET", 30))
+SLOW_CALL_SECONDS = float(os.getenv("OPENAI_SLOW_CALL_SECONDS", 20))
+DEFAULT_BUDGET = float(os.getenv("OPENAI_LATENCY_BUDGET", 25))
+HEDGE_AFTER = float(os.getenv("OPENAI_HEDGE_AFTER", 0))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class UpstreamUnavailable(Exception):
+    """대체 경로로 처리해야 하는 상위 서비스 상태"""
+    reason = "unavailable"
+
+
+class CircuitOpenError(UpstreamUnavailable):
+    reason = "circuit_open"
+
+
+class BudgetExceeded(UpstreamUnavailable):
+    reason = "budget_exceeded"
+
+
+def parse_budgets(spec: str) -> dict:
+    """'/ai/schedule/generate=25,/chatbot/edit-schedule=20' → {경로: 초}"""
+    budgets = {}
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        path, _, seconds = item.partition("=")
+        budgets[path.strip()] = float(seconds)
+    return budgets
+
+
+class CircuitBreaker:
+    """연속 실패 기반 회로 차단기 (결과는 작업 스레드에서 기록되므로 락으로 보호)"""
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURES, reset_timeout: float = BREAKER_RESET,
+                 half_open_max: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max = half_open_max
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._half_open_in_flight = 0
+        self._lock = threading.Lock()
+        self.opens_total = 0
+        self.rejected_total = 0
+
+    def allow(self) -> bool:
+        """호출해도 되는지 확인합니다. half_open에서는 시험 호출 수만큼만 허용합니다."""
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    self.rejected_total += 1
+                    return False
+                self.state = HALF_OPEN
+                self._half_open_in_flight = 0
+            if self.state == HALF_OPEN:
+                if self._half_open_in_flight >= self.half_open_max:
+                    self.rejected_total += 1
+                    return False
+                self._half_open_in_flight += 1
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+            if self.state == HALF_OPEN:
+                self.state = CLOSED
+                self._half_open_in_flight = 0
+                logger.info("회로 차단기 닫힘", extra=fields(breaker=self.name))
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.consecutive_failures >= self.failure_threshold):
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self._half_open_in_flight = 0
+                self.opens_total += 1
+                logger.warning("회로 차단기 열림", extra=fields(
+                    breaker=self.name, consecutive_failures=self.consecutive_failures
+                ))
+
+    def retry_after(self) -> float:
+        with self._lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def reset(self):
+        with self._lock:
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self._half_open_in_flight = 0
+
+
+class GuardedCaller:
+    """동기 호출 함수를 회로 차단기, 지연 예산, hedging으로 감싼 비동기 호출기"""
+
+    def __init__(self, breaker: CircuitBreaker, call: Optional[Callable] = None,
+                 slow_call_seconds: float = SLOW_CALL_SECONDS, hedge_after: float = HEDGE_AFTER,
+                 budgets: Optional[dict] = None, default_budget: float = DEFAULT_BUDGET):
+        self.breaker = breaker
+        self._call = call
+        self.slow_call_seconds = slow_call_seconds
+        self.hedge_after = hedge_after
+        self.budgets = budgets if budgets is not None else parse_budgets(os.getenv("OPENAI_LATENCY_BUDGETS", ""))
+        self.default_budget = default_budget
+        self.calls_total = 0
+        self.hedges_total = 0
+        self.hedge_wins_total = 0
+        self.budget_exceeded_total = 0
+        self.fallbacks = {}
+
+    def budget(self, route: str) -> float:
+        return self.budgets.get(route, self.default_budget)
+
+    def deadline(self, route: str) -> float:
+        """지금부터 route의 지연 예산이 끝나는 이벤트 루프 시각"""
+        return asyncio.get_running_loop().time() + self.budget(route)
+
+    def record_fallback(self, reason: str):
+        self.fallbacks[reason] = self.fallbacks.get(reason, 0) + 1
+
+    def _invoke(self, messages, kwargs):
+        # 작업 스레드에서 실행 (요청이 먼저 포기해도 결과는 회로 차단기에 반영)
+        call = self._call
+        if call is None:
+            from utils import call_openai_api as call
+        started = time.perf_counter()
+        try:
+            content = call(messages, **kwargs)
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        if time.perf_counter() - started > self.slow_call_seconds:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return content
+
+    def _start(self, messages, kwargs) -> asyncio.Future:
+        self.calls_total += 1
+        task = asyncio.ensure_future(asyncio.to_thread(self._invoke, messages, kwargs))
+        # 포기한 호출의 예외가 "never retrieved" 경고로 남지 않도록 회수
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return task
+
+    async def call(self, messages, deadline: Optional[float] = None, **kwargs):
+        """
+        회로가 닫혀 있으면 호출하고 deadline(이벤트 루프 시각)까지 응답을 기다립니다.
+        회로가 열려 있으면 CircuitOpenError, 예산을 넘기면 BudgetExceeded를 발생시킵니다.
+        """
+        loop = asyncio.get_running_loop()
+        if deadline is not None and deadline <= loop.time():
+            self.budget_exceeded_total += 1
+            raise BudgetExceeded("지연 예산을 초과했습니다")
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.breaker.name} 회로가 열려 있습니다")
+        primary = self._start(messages, kwargs)
+        pending = {primary}
+        hedged = self.hedge_after <= 0
+        last_error = None
+        while pending:
+            remaining = None if deadline is None else deadline - loop.time()
+            if remaining is not None and remaining <= 0:
+                break
+            wait = remaining
+            if not hedged:
+                wait = self.hedge_after if remaining is None else min(remaining, self.hedge_after)
+            done, pending = await asyncio.wait(pending, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is not primary:
+                        self.hedge_wins_total += 1
+                    return task.result()
+                last_error = task.exception()
+            # hedge 시간이 지나도록 응답이 없으면 한 번 더 호출 (회로가 정상일 때만)
+            if not hedged and not done and pending and (deadline is None or deadline > loop.time()):
+                hedged = True
+                if self.breaker.state == CLOSED:
+                    self.hedges_total += 1
+                    pending.add(self._start(messages, kwargs))
+            elif not hedged and done:
+                hedged = True
+        if last_error is not None and not pending:
+            raise last_error
+        self.budget_exceeded_total += 1
+        raise BudgetExceeded("지연 예산을 초과했습니다")
+
+    def stats(self) -> dict:
+        return {
+            "state": self.breaker.state,
+            "consecutive_failures": self.breaker.consecutive_failures,
+            "opens_total": self.breaker.opens_total,
+            "rejected_total": self.breaker.rejected_total,
+            "calls_total": self.calls_total,
+            "hedges_total": self.hedges_total,
+            "hedge_wins_total": self.hedge_wins_total,
+            "budget_exceeded_total": self.budget_exceeded_total,
+            "fallbacks": dict(self.fallbacks),
+        }
+
+
+openai_breaker = CircuitBreaker("openai")
+openai_guard = GuardedCaller(openai_breaker)
+
+
+def collect_metrics() -> list:
+    """metrics.registry.register_collector 용 회로 차단기 메트릭을 반환합니다."""
+    stats = openai_guard.stats()
+    states = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+    return [
+        ("openai_breaker_state", "gauge", "OpenAI 회로 상태 (0=closed, 1=half_open, 2=open)",
+         [({}, states[stats["state"]])]),
+        ("openai_breaker_opens_total", "counter", "OpenAI 회로가 열린 횟수", [({}, stats["opens_total"])]),
+        ("openai_breaker_rejected_total", "counter", "회로가 열려 거절된 호출 수", [({}, stats["rejected_total"])]),
+        ("openai_hedges_total", "counter", "hedging으로 추가 발송한 호출 수", [({}, stats["hedges_total"])]),
+        ("openai_hedge_wins_total", "counter", "추가 발송한 호출이 먼저 응답한 횟수", [({}, stats["hedge_wins_total"])]),
+        ("openai_budget_exceeded_total", "counter", "지연 예산 초과 수", [({}, stats["budget_exceeded_total"])]),
+        ("openai_fallbacks_total", "counter", "규칙 기반 생성으로 대체한 응답 수",
+         [({"reason": reason}, count) for reason, count in stats["fallbacks"].items()]),
+    ]
@@ -0,0 +1,222 @@
+"""
+설정 문서 읽기 캐시 (read-through)
+calendars, work_schedules, departments, work_fields 처럼 자주 바뀌지 않지만
+스케줄/예약 흐름마다 필요한 문서를 컬렉션별 TTL과 LRU 크기 제한으로 캐시합니다.
+쓰기 엔드포인트에서의 write-through 무효화와 선택적 on_snapshot 푸시 무효화를 지원합니다.
+"""
+
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Optional
+
+from app_logging import get_logger, fields
+import tenants
+
+logger = get_logger("config_cache")
+
+# 캐시 미스를 나타내는 내부 표식
+_MISSING = object()
+
+
+class ReadThroughCache:
+    """TTL + LRU 기반 read-through 캐시"""
+
+    def __init__(self, name: str, ttl: float, max_entries: int):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: str, loader: Callable[[], object]):
+        """캐시에서 값을 조회하고, 없으면 loader로 읽어 채웁니다."""
+        value = self._lookup(key)
+        if value is not _MISSING:
+            return copy.deepcopy(value)
+
+        value = loader()
+        self.put(key, value)
+        return copy.deepcopy(value)
+
+    def put(self, key: str, value):
+        """값을 캐시에 기록합니다. (write-through)"""
+        with self._lock:
+            self._entries[key] = (copy.deepcopy(value), time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: str):
+        """특정 키를 캐시에서 제거합니다."""
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """히트율 등 캐시 통계를 반환합니다."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _lookup(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return _MISSING
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return _MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+
+# 컬렉션별 캐시 설정 (환경 변수로 조정 가능)
+def _cache_for(collection: str, default_ttl: float, default_max: int) -> ReadThroughCache:
+    env_prefix = f"CONFIG_CACHE_{collection.upper()}"
+    ttl = float(os.getenv(f"{env_prefix}_TTL", default_ttl))
+    max_entries = int(os.getenv(f"{env_prefix}_MAX", default_max))
+    return ReadThroughCache(collection, ttl, max_entries)
+
+
+caches = {
+    "calendars": _cache_for("calendars", 600, 5000),
+    "work_schedules": _cache_for("work_schedules", 600, 5000),
+    "departments": _cache_for("departments", 300, 5000),
+    "work_fields": _cache_for("work_fields", 300, 5000),
+}
+
+
+def _get_db():
+    from utils import db
+    return db
+
+
+# 설정 문서 조회 헬퍼
+def get_calendar(business_id: str) -> Optional[dict]:
+    """비즈니스 캘린더 설정을 조회합니다."""
+    def load():
+        doc = _get_db().collection("calendars").document(business_id).get()
+        return doc.to_dict() if doc.exists else None
+    return caches["calendars"].get(business_id, load)
+
+
+def get_work_schedule(business_id: str) -> Optional[dict]:
+    """비즈니스 스케줄 설정을 조회합니다."""
+    def load():
+        doc = _get_db().collection("work_schedules").document(business_id).get()
+        return doc.to_dict() if doc.exists else None
+    return caches["work_schedules"].get(business_id, load)
+
+
+def list_departments(business_id: str) -> list:
+    """비즈니스의 부서 목록을 조회합니다."""
+    def load():
+        docs = tenants.collection("departments", _get_db()).query(business_id).stream()
+        return [doc.to_dict() for doc in docs]
+    return caches["departments"].get(business_id, load)
+
+
+def list_work_fields(business_id: str) -> list:
+    """비즈니스의 주요분야 목록을 조회합니다."""
+    def load():
+        docs = tenants.collection("work_fields", _get_db()).query(business_id).stream()
+        return [doc.to_dict() for doc in docs]
+    return caches["work_fields"].get(business_id, load)
+
+
+# 쓰기 경로용 헬퍼
+def put(collection: str, business_id: str, value):
+    """문서 단위 컬렉션에 write-through로 값을 기록합니다."""
+    caches[collection].put(business_id, value)
+
+
+def invalidate(collection: str, business_id: str):
+    """컬렉션의 비즈니스 항목을 무효화합니다."""
+    caches[collection].invalidate(business_id)
+
+
+def get_stats() -> dict:
+    """모든 설정 캐시의 통계를 반환합니다."""
+    return {name: cache.stats() for name, cache in caches.items()}
+
+
+def collect_metrics() -> list:
+    """metrics.registry.register_collector 용 캐시 메트릭을 반환합니다."""
+    stats = get_stats()
+    return [
+        ("config_cache_hits_total", "counter", "설정 캐시 적중 수",
+         [({"collection": name}, s["hits"]) for name, s in stats.items()]),
+        ("config_cache_misses_total", "counter", "설정 캐시 미스 수",
+         [({"collection": name}, s["misses"]) for name, s in stats.items()]),
+        ("config_cache_hit_ratio", "gauge", "설정 캐시 적중률",
+         [({"collection": name}, s["hit_rate"]) for name, s in stats.items()]),
+        ("config_cache_entries", "gauge", "설정 캐시 항목 수",
+         [({"collection": name}, s["size"]) for name, s in stats.items()]),
+    ]
+
+
+# on_snapshot 기반 푸시 무효화 (선택)
+_watches = []
+
+
+def _on_snapshot(collection: str):
+    def callback(doc_snapshots, changes, read_time):
+        for change in changes:
+            data = change.document.to_dict() or {}
+            business_id = data.get("business_id") or change.document.id
+            invalidate(collection, business_id)
+    return callback
+
+
+def start_listeners(db=None):
+    """
+    설정 컬렉션에 on_snapshot 리스너를 등록합니다.
+    생성 엔드포인트는 문서를 set으로 덮어쓰며 created_at을 갱신하므로,
+    시작 시각 이후 created_at만 구독하여 전체 컬렉션 초기 스냅샷 비용을 피합니다.
+    """
+    db = db or _get_db()
+    if db is None or _watches:
+        return
+    started_at = datetime.now().isoformat()
+    for collection in caches:
+        # 비즈니스 단위 컬렉션은 저장 모드에 따라 최상위 컬렉션 또는 collection_group을 구독
+        source = tenants.collection(collection, db).all() if collection in tenants.TENANT_COLLECTIONS else db.collection(collection)
+        query = source.where("created_at", ">=", started_at)
+        _watches.append(query.on_snapshot(_on_snapshot(collection)))
+    logger.info("설정 캐시 리스너 시작", extra=fields(collections=list(caches)))
+
+
+def stop_listeners():
+    """등록된 on_snapshot 리스너를 해제합니다."""
+    while _watches:
+        watch = _watches.pop()
+        try:
+            watch.unsubscribe()
+        except Exception as e:
+            logger.warning("설정 캐시 리스너 해제 실패", extra=fields(error=str(e)))
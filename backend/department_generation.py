@@ -0,0 +1,228 @@
+"""
+부서별 병렬 AI 스케줄 생성
+모든 부서를 하나의 프롬프트로 보내면 직원이 많은 비즈니스에서 max_tokens에 걸려 응답이 잘리거나 실패하므로,
+부서마다 작은 프롬프트로 나눠 동시에(동시 실행 수 제한) 호출한 뒤 결과를 합칩니다.
+전체 소요 시간은 부서 수의 합이 아니라 가장 느린 부서 하나에 가깝습니다.
+
+여러 부서에 속한 직원은 부서 우선순위(priority_level이 높은 부서 먼저)대로 배정하고,
+같은 날 이미 배정된 시간과 겹치는 근무는 버린 뒤 conflicts에 기록합니다.
+응답을 해석할 수 없는 부서나 빠진 직원은 선호 요일 기반 기본 스케줄로 채웁니다.
+
+환경 변수:
+    AI_DEPARTMENT_CONCURRENCY=4    동시에 호출하는 부서 수
+    AI_DEPARTMENT_MAX_TOKENS=1500  부서별 응답 최대 토큰 수
+"""
+
+import asyncio
+import json
+import os
+import re
+import time
+from typing import Callable, Optional
+
+from app_logging import get_logger, fields
+
+logger = get_logger("department_generation")
+
+DEPARTMENT_CONCURRENCY = int(os.getenv("AI_DEPARTMENT_CONCURRENCY", 4))
+DEPARTMENT_MAX_TOKENS = int(os.getenv("AI_DEPARTMENT_MAX_TOKENS", 1500))
+
+DAYS = ["월", "화", "수", "목", "금", "토", "일"]
+SLOT_PATTERN = re.compile(r"^([01]\d|2[0-3]):[0-5]\d-([01]\d|2[0-4]):[0-5]\d$")
+
+
+def preference_schedule(employee) -> dict:
+    """선호 요일 기반 기본 스케줄 (평일 09:00-17:00, 토요일 10:00-16:00, 일요일 휴무)"""
+    return {
+        day: ([] if day == "일" or day not in employee.preferred_work_days
+              else ["10:00-16:00" if day == "토" else "09:00-17:00"])
+        for day in DAYS
+    }
+
+
+def group_by_department(schedule_request) -> list:
+    """(부서 인원 설정 또는 None, 부서 ID, 직원 목록)을 우선순위가 높은 부서부터 반환합니다."""
+    staffing_by_id = {staffing.department_id: staffing for staffing in schedule_request.department_staffing}
+    employees_by_department = {}
+    for employee in schedule_request.employee_preferences:
+        employees_by_department.setdefault(employee.department_id, []).append(employee)
+    groups = [
+        (staffing_by_id.get(department_id), department_id, employees)
+        for department_id, employees in employees_by_department.items()
+    ]
+    groups.sort(key=lambda group: -(group[0].priority_level if group[0] else 0))
+    return groups
+
+
+def department_messages(schedule_request, staffing, department_id: str, employees: list) -> list:
+    staffing_text = (
+        f"필요 인원: {staffing.required_staff_count}명, 운영 시간: {staffing.work_hours}, 우선순위: {staffing.priority_level}"
+        if staffing else "부서 인원 설정 없음"
+    )
+    employee_lines = "\n".join(
+        f"- {employee.worker_id}: 선호 요일 {employee.preferred_work_days}, 휴무 희망 {employee.preferred_off_days}, "
+        f"선호 시간 {employee.preferred_work_hours}, 하루 {employee.min_work_hours}~{employee.max_work_hours}시간"
+        for employee in employees
+    )
+    return [
+        {
+            "role": "system",
+            "content": "당신은 직원 스케줄 관리 전문가입니다. 한 부서의 주간 스케줄만 생성하고 JSON만 반환하세요."
+        },
+        {
+            "role": "user",
+            "content": f"""
+            비즈니스 ID: {schedule_request.business_id}
+            주간 기간: {schedule_request.week_start_date} ~ {schedule_request.week_end_date}
+            부서: {department_id} ({staffing_text})
+            제약사항: {schedule_request.schedule_constraints}
+
+            직원:
+            {employee_lines}
+
+            {{"직원ID": {{"월": ["09:00-17:00"], ...}}}} 형태의 JSON으로 요일별 근무 시간을 반환해주세요.
+            """
+        }
+    ]
+
+
+def _extract_json(text: str) -> Optional[dict]:
+    if not text:
+        return None
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end <= start:
+        return None
+    try:
+        parsed = json.loads(text[start:end + 1])
+    except ValueError:
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
+
+def parse_department_response(text: str, employees: list) -> tuple:
+    """
+    부서 응답을 {직원ID: {요일: [시간대]}}로 해석합니다.
+    모르는 직원/요일과 형식이 틀린 시간대는 버리고, 빠진 직원은 기본 스케줄로 채웁니다.
+    (스케줄, 기본 스케줄로 채운 직원 ID 목록) 반환
+    """
+    parsed = _extract_json(text) or {}
+    schedules = {}
+    defaulted = []
+    for employee in employees:
+        days = parsed.get(employee.worker_id)
+        if not isinstance(days, dict):
+            schedules[employee.worker_id] = preference_schedule(employee)
+            defaulted.append(employee.worker_id)
+            continue
+        schedules[employee.worker_id] = {
+            day: [slot for slot in (days.get(day) or []) if isinstance(slot, str) and SLOT_PATTERN.match(slot)]
+            for day in DAYS
+        }
+    return schedules, defaulted
+
+
+async def generate_departments(schedule_request, call: Callable, concurrency: int = DEPARTMENT_CONCURRENCY,
+                               max_tokens: int = DEPARTMENT_MAX_TOKENS) -> list:
+    """
+    부서별 프롬프트를 동시 실행 수를 제한해 호출합니다.
+    call은 (messages, max_tokens=...)를 받는 비동기 함수입니다. (예: GuardedCaller.call)
+    실패한 부서는 error/exception을 담아 반환하고 (예외를 전파하지 않음) 직원은 기본 스케줄로 채웁니다.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(staffing, department_id, employees):
+        async with semaphore:
+            started = time.perf_counter()
+            result = {"department_id": department_id, "staffing": staffing, "employees": employees,
+                      "error": None, "exception": None}
+            try:
+                messages = department_messages(schedule_request, staffing, department_id, employees)
+                result["response"] = await call(messages, max_tokens=max_tokens)
+                result["schedules"], result["defaulted"] = parse_department_response(result["response"], employees)
+            except Exception as e:
+                logger.warning("부서 스케줄 생성 실패", extra=fields(department_id=department_id, error=str(e)))
+                result["error"] = str(e) or type(e).__name__
+                result["exception"] = e
+                result["response"] = None
+                result["schedules"] = {employee.worker_id: preference_schedule(employee) for employee in employees}
+                result["defaulted"] = [employee.worker_id for employee in employees]
+            result["elapsed"] = round(time.perf_counter() - started, 3)
+            return result
+
+    return await asyncio.gather(*(run(*group) for group in group_by_department(schedule_request)))
+
+
+def _minutes(slot: str) -> tuple:
+    start, end = slot.split("-")
+    start_minutes = int(start[:2]) * 60 + int(start[3:])
+    end_minutes = int(end[:2]) * 60 + int(end[3:])
+    if end_minutes <= start_minutes:
+        end_minutes += 24 * 60
+    return start_minutes, end_minutes
+
+
+def _overlaps(slot: str, other: str) -> bool:
+    start, end = _minutes(slot)
+    other_start, other_end = _minutes(other)
+    return start < other_end and other_start < end
+
+
+def merge_department_schedules(results: list) -> tuple:
+    """
+    부서별 결과를 직원별 스케줄로 합칩니다. results는 우선순위가 높은 부서 순서입니다.
+    (직원ID -> 스케줄 항목, 충돌 목록) 반환
+    """
+    merged = {}
+    assigned = {}  # (직원ID, 요일) -> [(시간대, 부서ID)]
+    conflicts = []
+    for result in results:
+        department_id = result["department_id"]
+        for employee in result["employees"]:
+            worker_id = employee.worker_id
+            entry = merged.get(worker_id)
+            if entry is None:
+                entry = merged[worker_id] = {
+                    "employee_id": worker_id,
+                    "department_id": department_id,
+                    "work_fields": list(employee.work_fields),
+                    "schedule": {day: [] for day in DAYS},
+                }
+            else:
+                entry["work_fields"] = sorted(set(entry["work_fields"]) | set(employee.work_fields))
+                entry.setdefault("department_ids", [entry["department_id"]]).append(department_id)
+
+            for day, slots in result["schedules"].get(worker_id, {}).items():
+                taken = assigned.setdefault((worker_id, day), [])
+                for slot in slots:
+                    clash = next((item for item in taken if _overlaps(slot, item[0])), None)
+                    if clash is not None:
+                        conflicts.append({
+                            "worker_id": worker_id,
+                            "day": day,
+                            "kept": {"department_id": clash[1], "time": clash[0]},
+                            "dropped": {"department_id": department_id, "time": slot},
+                        })
+                        continue
+                    taken.append((slot, department_id))
+                    entry["schedule"][day].append(slot)
+                    entry.setdefault("assignments", {}).setdefault(day, []).append(
+                        {"time": slot, "department_id": department_id}
+                    )
+
+    # 한 부서에만 속한 직원은 부서별 배정 정보가 필요 없음
+    for entry in merged.values():
+        if "department_ids" not in entry:
+            entry.pop("assignments", None)
+        for day in DAYS:
+            entry["schedule"][day].sort()
+    return merged, conflicts
+
+
+def total_hours(schedule_data: dict) -> float:
+    hours = 0.0
+    for entry in schedule_data.values():
+        for slots in entry["schedule"].values():
+            for slot in slots:
+                start, end = _minutes(slot)
+                hours += (end - start) / 60
+    return round(hours, 2)
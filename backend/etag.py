@@ -0,0 +1,178 @@
+"""
+ETag 및 조건부 GET 지원
+저장된 content_hash 또는 updated_at으로 강한 ETag를 만들고,
+If-None-Match 처리와 프로세스 내 검증자(validator) 캐시를 제공합니다.
+검증자 캐시에 적중하면 Firestore 문서를 읽지 않고 304를 응답할 수 있습니다.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import Response
+
+# 검증자 캐시 설정 (다른 인스턴스의 쓰기는 TTL 이후 반영됨)
+VALIDATOR_TTL = float(os.getenv("ETAG_VALIDATOR_TTL", 30))
+VALIDATOR_MAX_ENTRIES = int(os.getenv("ETAG_VALIDATOR_MAX_ENTRIES", 10000))
+
+
+def compute_content_hash(data) -> str:
+    """데이터의 정규화된 JSON으로부터 콘텐츠 해시를 계산합니다."""
+    if isinstance(data, dict):
+        data = {k: v for k, v in data.items() if k != "content_hash"}
+    canonical = json.dumps(
+        data, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+
+
+def make_etag(data: Optional[dict]) -> str:
+    """문서로부터 강한 ETag를 생성합니다. (content_hash > updated_at > 전체 해시)"""
+    if data is None:
+        return '"none"'
+    content_hash = data.get("content_hash")
+    if not content_hash and data.get("updated_at"):
+        content_hash = hashlib.sha256(
+            f"{data.get('updated_at')}|{compute_content_hash(data)}".encode("utf-8")
+        ).hexdigest()[:32]
+    if not content_hash:
+        content_hash = compute_content_hash(data)
+    return f'"{content_hash}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 헤더가 ETag와 일치하는지 확인합니다. (약한 비교: 압축 응답의 W/ ETag도 일치)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag.removeprefix("W/") in candidates
+
+
+def not_modified(etag: str) -> Response:
+    """304 Not Modified 응답을 생성합니다."""
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+
+def set_etag_headers(response: Response, etag: str):
+    """응답에 ETag 관련 헤더를 설정합니다."""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+
+
+class ValidatorCache:
+    """
+    리소스 키별 ETag 검증자 캐시
+    각 항목은 ETag, 소유자(권한 확인용), 태그(일괄 무효화용)를 가집니다.
+    """
+
+    def __init__(self, ttl: float = VALIDATOR_TTL, max_entries: int = VALIDATOR_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[dict]:
+        """유효한 검증자를 반환합니다. 만료되었으면 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry["expires_at"] < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, etag: str, owner: Optional[str] = None, tags=()):
+        """검증자를 저장합니다."""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = {
+                "etag": etag,
+                "owner": owner,
+                "tags": tuple(tags),
+                "expires_at": time.monotonic() + self.ttl,
+            }
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+
+    def invalidate(self, key: str):
+        """특정 리소스의 검증자를 제거합니다."""
+        with self._lock:
+            self._remove(key)
+
+    def invalidate_tag(self, tag: str):
+        """태그에 속한 모든 검증자를 제거합니다."""
+        with self._lock:
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+            self._tags.pop(tag, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry["tags"]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+# 전역 검증자 캐시
+validators = ValidatorCache()
+
+
+def check_cached_validator(key: str, if_none_match: Optional[str], owner: Optional[str] = None) -> Optional[Response]:
+    """캐시된 검증자와 If-None-Match가 일치하면 304 응답을 반환합니다."""
+    if not if_none_match:
+        return None
+    entry = validators.get(key)
+    if entry is None:
+        return None
+    if owner is not None and entry["owner"] != owner:
+        return None
+    if etag_matches(if_none_match, entry["etag"]):
+        return not_modified(entry["etag"])
+    return None
+
+
+# 리소스 키 및 태그 헬퍼
+def schedule_key(schedule_id: str) -> str:
+    return f"ai_schedule:{schedule_id}"
+
+
+def my_schedule_key(business_id: str, worker_id: str) -> str:
+    return f"my_schedule:{business_id}:{worker_id}"
+
+
+def preference_key(business_id: str, worker_id: str) -> str:
+    return f"preference:{worker_id}_{business_id}"
+
+
+def business_schedules_tag(business_id: str) -> str:
+    return f"ai_schedules:{business_id}"
+
+
+def invalidate_schedule(schedule_id: str, business_id: Optional[str] = None):
+    """스케줄 쓰기 후 관련 검증자를 무효화합니다."""
+    validators.invalidate(schedule_key(schedule_id))
+    if business_id:
+        validators.invalidate_tag(business_schedules_tag(business_id))
@@ -0,0 +1,362 @@
+"""
+스케줄/예약 내보내기 API 엔드포인트
+iCalendar(ICS, 근무 하나당 VEVENT 하나)와 CSV로 내보냅니다.
+Firestore 커서로 페이지 단위 조회한 결과를 제너레이터로 바로 흘려보내므로
+내보내는 기간이 길어도 메모리 사용량은 페이지 크기만큼으로 일정합니다.
+
+최상위 컬렉션을 쓰는 동안(TENANT_STORAGE_MODE=global)에는 ai_schedules 범위 조회에
+(business_id, week_start_date), bookings 범위 조회에 (business_id, date) 복합 색인이 필요합니다.
+
+환경 변수:
+    EXPORT_PAGE_SIZE=50            페이지당 조회 문서 수
+    EXPORT_TIMEZONE=Asia/Seoul     ICS 시간대 (비우면 시간대 없는 로컬 시각)
+    EXPORT_BOOKING_MINUTES=60      예약 일정 길이(분)
+"""
+
+import csv
+import io
+import os
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterator, Optional
+
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
+
+from responses import FastJSONResponse
+from utils import get_current_user
+from archive import is_archived, rehydrate
+import tenants
+from app_logging import get_logger, fields
+
+router = APIRouter(prefix="/export", tags=["내보내기"], default_response_class=FastJSONResponse)
+logger = get_logger("export")
+
+PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", 50))
+EXPORT_TIMEZONE = os.getenv("EXPORT_TIMEZONE", "Asia/Seoul")
+BOOKING_MINUTES = int(os.getenv("EXPORT_BOOKING_MINUTES", 60))
+
+# date.weekday() 순서 (월요일 = 0)
+DAYS = ["월", "화", "수", "목", "금", "토", "일"]
+
+SCHEDULE_CSV_COLUMNS = [
+    "schedule_id", "week_start_date", "worker_id", "department_id", "date", "day", "start", "end", "hours",
+]
+BOOKING_CSV_COLUMNS = ["booking_id", "date", "time", "worker_id", "service_type", "status", "notes"]
+
+
+# Firestore 커서 페이지 조회
+def iter_documents(query, page_size: int = PAGE_SIZE) -> Iterator:
+    """정렬된 쿼리를 start_after 커서로 페이지 단위로 읽어 스냅샷을 하나씩 내보냅니다."""
+    cursor = None
+    while True:
+        page_query = query.limit(page_size)
+        if cursor is not None:
+            page_query = page_query.start_after(cursor)
+        page = list(page_query.stream())
+        yield from page
+        if len(page) < page_size:
+            return
+        cursor = page[-1]
+
+
+# 근무 시간 계산
+def _parse_date(value: Optional[str]) -> Optional[date]:
+    if not value:
+        return None
+    return datetime.strptime(value[:10], "%Y-%m-%d").date()
+
+
+def _parse_slot(slot: str):
+    """'09:00-17:00' → (시작 분, 종료 분), 종료가 시작보다 이르면 다음 날로 계산"""
+    start, _, end = slot.partition("-")
+    start_hour, start_minute = (int(part) for part in start.strip().split(":"))
+    end_hour, end_minute = (int(part) for part in end.strip().split(":"))
+    start_minutes = start_hour * 60 + start_minute
+    end_minutes = end_hour * 60 + end_minute
+    if end_minutes <= start_minutes:
+        end_minutes += 24 * 60
+    return start_minutes, end_minutes
+
+
+def iter_shifts(schedule: dict, worker_id: Optional[str] = None,
+                start_date: Optional[date] = None, end_date: Optional[date] = None) -> Iterator[dict]:
+    """스케줄 문서의 근무를 (직원, 날짜, 시간대) 단위로 펼칩니다."""
+    week_start = _parse_date(schedule.get("week_start_date"))
+    if week_start is None:
+        return
+    week_end = _parse_date(schedule.get("week_end_date")) or week_start + timedelta(days=6)
+    day_dates = {}
+    current = week_start
+    while current <= week_end and len(day_dates) < 7:
+        day_dates.setdefault(DAYS[current.weekday()], current)
+        current += timedelta(days=1)
+
+    entries = schedule.get("schedule_data") or {}
+    if worker_id is not None:
+        entries = {worker_id: entries[worker_id]} if worker_id in entries else {}
+
+    for entry_worker_id, entry in entries.items():
+        for day, slots in (entry.get("schedule") or {}).items():
+            shift_date = day_dates.get(day)
+            if shift_date is None:
+                continue
+            if (start_date and shift_date < start_date) or (end_date and shift_date > end_date):
+                continue
+            for index, slot in enumerate(slots or []):
+                try:
+                    start_minutes, end_minutes = _parse_slot(slot)
+                except ValueError:
+                    continue
+                day_start = datetime.combine(shift_date, datetime.min.time())
+                yield {
+                    "schedule_id": schedule.get("schedule_id"),
+                    "week_start_date": schedule.get("week_start_date"),
+                    "worker_id": entry_worker_id,
+                    "department_id": entry.get("department_id"),
+                    "date": shift_date,
+                    "day": day,
+                    "index": index,
+                    "start": day_start + timedelta(minutes=start_minutes),
+                    "end": day_start + timedelta(minutes=end_minutes),
+                }
+
+
+# iCalendar 형식
+def _ics_escape(value) -> str:
+    text = "" if value is None else str(value)
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def _ics_line(line: str) -> str:
+    """RFC 5545에 따라 75옥텟마다 줄을 접습니다."""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    parts = []
+    current = ""
+    limit = 75
+    for char in line:
+        if len((current + char).encode("utf-8")) > limit:
+            parts.append(current)
+            current = char
+            limit = 74  # 이어지는 줄은 앞의 공백 한 칸 포함
+        else:
+            current += char
+    parts.append(current)
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _ics_datetime(value: datetime) -> str:
+    return value.strftime("%Y%m%dT%H%M%S")
+
+
+def _ics_header(calendar_name: str) -> str:
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//UriWork//Schedule Export//KO",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_ics_escape(calendar_name)}",
+    ]
+    if EXPORT_TIMEZONE:
+        lines.append(f"X-WR-TIMEZONE:{EXPORT_TIMEZONE}")
+        lines.extend(_vtimezone(EXPORT_TIMEZONE))
+    return "".join(_ics_line(line) for line in lines)
+
+
+def _vtimezone(name: str) -> list:
+    """일광 절약 시간이 없는 시간대의 최소 VTIMEZONE 블록"""
+    try:
+        from zoneinfo import ZoneInfo
+        offset = datetime.now(ZoneInfo(name)).utcoffset() or timedelta(0)
+    except Exception:
+        return []
+    minutes = int(offset.total_seconds() // 60)
+    sign = "+" if minutes >= 0 else "-"
+    offset_text = f"{sign}{abs(minutes) // 60:02d}{abs(minutes) % 60:02d}"
+    return [
+        "BEGIN:VTIMEZONE",
+        f"TZID:{name}",
+        "BEGIN:STANDARD",
+        "DTSTART:19700101T000000",
+        f"TZOFFSETFROM:{offset_text}",
+        f"TZOFFSETTO:{offset_text}",
+        "END:STANDARD",
+        "END:VTIMEZONE",
+    ]
+
+
+def _ics_event(uid: str, start: datetime, end: datetime, summary: str, description: str = "",
+               stamp: str = "") -> str:
+    tz = f";TZID={EXPORT_TIMEZONE}" if EXPORT_TIMEZONE else ""
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{uid}",
+        f"DTSTAMP:{stamp}",
+        f"DTSTART{tz}:{_ics_datetime(start)}",
+        f"DTEND{tz}:{_ics_datetime(end)}",
+        f"SUMMARY:{_ics_escape(summary)}",
+    ]
+    if description:
+        lines.append(f"DESCRIPTION:{_ics_escape(description)}")
+    lines.append("END:VEVENT")
+    return "".join(_ics_line(line) for line in lines)
+
+
+def _utc_stamp() -> str:
+    return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _csv_row(values: list) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue()
+
+
+# 스케줄 내보내기 제너레이터
+def _schedule_query(db, business_id: str, start_date: Optional[date], end_date: Optional[date]):
+    query = tenants.collection("ai_schedules", db).query(business_id)
+    # 주 시작일 기준이므로 시작일 6일 전 주까지 포함해야 범위에 걸친 근무를 놓치지 않음
+    if start_date:
+        query = query.where("week_start_date", ">=", (start_date - timedelta(days=6)).isoformat())
+    if end_date:
+        query = query.where("week_start_date", "<=", end_date.isoformat())
+    return query.order_by("week_start_date")
+
+
+def _iter_schedule_shifts(db, business_id, worker_id, start_date, end_date) -> Iterator[dict]:
+    for doc in iter_documents(_schedule_query(db, business_id, start_date, end_date)):
+        schedule = doc.to_dict() or {}
+        if is_archived(schedule):
+            if worker_id is not None and worker_id not in schedule.get("worker_ids", []):
+                continue
+            schedule = rehydrate(doc.id, schedule)
+        schedule.setdefault("schedule_id", doc.id)
+        yield from iter_shifts(schedule, worker_id, start_date, end_date)
+
+
+def schedule_ics(db, business_id: str, worker_id=None, start_date=None, end_date=None) -> Iterator[str]:
+    yield _ics_header(f"근무 스케줄 ({worker_id or business_id})")
+    stamp = _utc_stamp()
+    for shift in _iter_schedule_shifts(db, business_id, worker_id, start_date, end_date):
+        uid = f"{shift['schedule_id']}-{shift['worker_id']}-{shift['date'].isoformat()}-{shift['index']}@uriwork"
+        summary = f"근무: {shift['worker_id']}"
+        if shift["department_id"]:
+            summary += f" ({shift['department_id']})"
+        yield _ics_event(uid, shift["start"], shift["end"], summary, f"스케줄 {shift['schedule_id']}", stamp)
+    yield _ics_line("END:VCALENDAR")
+
+
+def schedule_csv(db, business_id: str, worker_id=None, start_date=None, end_date=None) -> Iterator[str]:
+    yield _csv_row(SCHEDULE_CSV_COLUMNS)
+    for shift in _iter_schedule_shifts(db, business_id, worker_id, start_date, end_date):
+        hours = round((shift["end"] - shift["start"]).total_seconds() / 3600, 2)
+        yield _csv_row([
+            shift["schedule_id"], shift["week_start_date"], shift["worker_id"], shift["department_id"],
+            shift["date"].isoformat(), shift["day"], shift["start"].strftime("%H:%M"),
+            shift["end"].strftime("%H:%M"), hours,
+        ])
+
+
+# 예약 내보내기 제너레이터
+def _iter_bookings(db, business_id, worker_id, start_date, end_date) -> Iterator[dict]:
+    query = tenants.collection("bookings", db).query(business_id)
+    if worker_id:
+        query = query.where("worker_id", "==", worker_id)
+    if start_date:
+        query = query.where("date", ">=", start_date.isoformat())
+    if end_date:
+        query = query.where("date", "<=", end_date.isoformat())
+    for doc in iter_documents(query.order_by("date")):
+        booking = doc.to_dict() or {}
+        booking.setdefault("booking_id", doc.id)
+        yield booking
+
+
+def booking_ics(db, business_id: str, worker_id=None, start_date=None, end_date=None) -> Iterator[str]:
+    yield _ics_header(f"예약 ({worker_id or business_id})")
+    stamp = _utc_stamp()
+    for booking in _iter_bookings(db, business_id, worker_id, start_date, end_date):
+        try:
+            start = datetime.strptime(f"{booking.get('date')} {booking.get('time')}", "%Y-%m-%d %H:%M")
+        except (TypeError, ValueError):
+            continue
+        summary = f"예약: {booking.get('service_type') or '서비스'}"
+        description = f"담당 {booking.get('worker_id')}"
+        if booking.get("notes"):
+            description += f"\n{booking['notes']}"
+        yield _ics_event(f"{booking['booking_id']}@uriwork", start, start + timedelta(minutes=BOOKING_MINUTES),
+                         summary, description, stamp)
+    yield _ics_line("END:VCALENDAR")
+
+
+def booking_csv(db, business_id: str, worker_id=None, start_date=None, end_date=None) -> Iterator[str]:
+    yield _csv_row(BOOKING_CSV_COLUMNS)
+    for booking in _iter_bookings(db, business_id, worker_id, start_date, end_date):
+        yield _csv_row([booking.get(column) for column in BOOKING_CSV_COLUMNS])
+
+
+# 엔드포인트 공통 처리
+MEDIA_TYPES = {"ics": "text/calendar", "csv": "text/csv"}
+
+
+def _resolve_worker_filter(business_id: str, current_user: dict, worker_id: Optional[str]) -> Optional[str]:
+    """비즈니스 본인은 전체(또는 요청한 직원)를, 권한이 있는 직원은 본인 데이터만 내보낼 수 있습니다."""
+    if current_user["uid"] == business_id:
+        return worker_id
+    permission_doc = tenants.collection("permissions").get(business_id, f"{business_id}_{current_user['uid']}")
+    if not permission_doc.exists:
+        raise HTTPException(status_code=403, detail="권한이 없습니다")
+    return current_user["uid"]
+
+
+def _export_response(kind: str, generators: dict, business_id: str, format: str, start_date, end_date,
+                     worker_id, current_user) -> StreamingResponse:
+    try:
+        if format not in generators:
+            raise HTTPException(status_code=400, detail="format은 ics 또는 csv여야 합니다")
+        worker_filter = _resolve_worker_filter(business_id, current_user, worker_id)
+        start = _parse_date(start_date)
+        end = _parse_date(end_date)
+        if start and end and start > end:
+            raise HTTPException(status_code=400, detail="start_date가 end_date보다 늦습니다")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    from utils import db
+    if not db:
+        raise HTTPException(status_code=500, detail="데이터베이스 연결이 필요합니다")
+
+    logger.info("내보내기 시작", extra=fields(
+        kind=kind, business_id=business_id, format=format, worker_id=worker_filter,
+        start_date=start_date, end_date=end_date
+    ))
+    filename = f"{kind}_{business_id}{'_' + worker_filter if worker_filter else ''}.{format}"
+    return StreamingResponse(
+        generators[format](db, business_id, worker_filter, start, end),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+# 스케줄 내보내기
+@router.get("/schedules/{business_id}")
+async def export_schedules(business_id: str, format: str = "ics", start_date: Optional[str] = None,
+                           end_date: Optional[str] = None, worker_id: Optional[str] = None,
+                           current_user: dict = Depends(get_current_user)):
+    """AI 스케줄 근무를 ICS 또는 CSV로 스트리밍합니다. (start_date/end_date: YYYY-MM-DD)"""
+    return _export_response("schedules", {"ics": schedule_ics, "csv": schedule_csv},
+                            business_id, format, start_date, end_date, worker_id, current_user)
+
+
+# 예약 내보내기
+@router.get("/bookings/{business_id}")
+async def export_bookings(business_id: str, format: str = "ics", start_date: Optional[str] = None,
+                          end_date: Optional[str] = None, worker_id: Optional[str] = None,
+                          current_user: dict = Depends(get_current_user)):
+    """예약을 ICS 또는 CSV로 스트리밍합니다. (start_date/end_date: YYYY-MM-DD)"""
+    return _export_response("bookings", {"ics": booking_ics, "csv": booking_csv},
+                            business_id, format, start_date, end_date, worker_id, current_user)
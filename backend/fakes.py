@@ -0,0 +1,897 @@
+"""
+오프라인 실행용 대체 구현 (in-memory)
+이 백엔드가 사용하는 Firestore 기능(collection/collection_group/document/get/set/update/where/stream,
+배치, 트랜잭션, on_snapshot)의 메모리 구현과 call_openai_api 스텁,
+Firebase Auth 스텁, 공유 요청 제한 저장소용 Redis 호환 스텁을 제공합니다. 지연 시간을 주입하여 네트워크 비용을 흉내낼 수 있습니다.
+
+사용 예:
+    import fakes
+    db = fakes.install(latency={"read": 0.005, "write": 0.01}, openai_latency=0.5)
+"""
+
+import copy
+import itertools
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Callable, Optional, Union
+
+try:
+    from google.api_core import exceptions as gexc
+    from google.cloud.firestore_v1 import transforms
+except ImportError:
+    gexc = None
+    transforms = None
+
+
+class FakeAborted(Exception):
+    """트랜잭션 충돌 (google.api_core 미설치 시 사용)"""
+
+
+class FakeAlreadyExists(Exception):
+    """문서 중복 생성 (google.api_core 미설치 시 사용)"""
+
+
+class FakeNotFound(Exception):
+    """존재하지 않는 문서 수정 (google.api_core 미설치 시 사용)"""
+
+
+Aborted = gexc.Aborted if gexc else FakeAborted
+AlreadyExists = gexc.AlreadyExists if gexc else FakeAlreadyExists
+NotFound = gexc.NotFound if gexc else FakeNotFound
+
+
+# 존재하지 않는 필드를 나타내는 내부 표식
+_MISSING = object()
+
+
+# 필드 경로 처리
+def _split_field_path(path: str) -> list:
+    """`a.b.\\`월\\`` 형태의 필드 경로를 구성 요소로 분리합니다."""
+    parts, current, quoted = [], "", False
+    for ch in path:
+        if ch == "`":
+            quoted = not quoted
+        elif ch == "." and not quoted:
+            parts.append(current)
+            current = ""
+        else:
+            current += ch
+    parts.append(current)
+    return parts
+
+
+def _get_field(data: dict, path: str):
+    value = data
+    for part in _split_field_path(path):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _apply_value(current, value):
+    """Firestore 변환 값(Increment, ArrayUnion 등)을 적용합니다."""
+    if transforms is None:
+        return value
+    if value is transforms.SERVER_TIMESTAMP:
+        return datetime.now(timezone.utc)
+    if isinstance(value, transforms.Increment):
+        base = current if isinstance(current, (int, float)) else 0
+        return base + value.value
+    if isinstance(value, transforms.ArrayUnion):
+        base = list(current) if isinstance(current, list) else []
+        return base + [v for v in value.values if v not in base]
+    if isinstance(value, transforms.ArrayRemove):
+        base = list(current) if isinstance(current, list) else []
+        return [v for v in base if v not in value.values]
+    if isinstance(value, dict):
+        return {k: _apply_value(_MISSING, v) for k, v in value.items()}
+    return value
+
+
+def _is_delete(value) -> bool:
+    return transforms is not None and value is transforms.DELETE_FIELD
+
+
+def _set_field(data: dict, path: str, value):
+    parts = _split_field_path(path)
+    target = data
+    for part in parts[:-1]:
+        if not isinstance(target.get(part), dict):
+            target[part] = {}
+        target = target[part]
+    if _is_delete(value):
+        target.pop(parts[-1], None)
+    else:
+        target[parts[-1]] = _apply_value(target.get(parts[-1], _MISSING), value)
+
+
+def _merge(target: dict, source: dict):
+    for key, value in source.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value)
+        elif _is_delete(value):
+            target.pop(key, None)
+        else:
+            target[key] = _apply_value(target.get(key, _MISSING), value)
+
+
+# 쿼리 비교 연산자
+def _compare(op: str, left, right) -> bool:
+    if left is _MISSING:
+        return False
+    try:
+        if op == "==":
+            return left == right
+        if op == "!=":
+            return left != right
+        if op == "<":
+            return left < right
+        if op == "<=":
+            return left <= right
+        if op == ">":
+            return left > right
+        if op == ">=":
+            return left >= right
+        if op == "in":
+            return left in right
+        if op == "not-in":
+            return left not in right
+        if op == "array-contains":
+            return isinstance(left, list) and right in left
+        if op == "array-contains-any":
+            return isinstance(left, list) and any(v in left for v in right)
+    except TypeError:
+        return False
+    raise ValueError(f"지원하지 않는 연산자입니다: {op}")
+
+
+class LatencyModel:
+    """작업 종류별 지연 시간 주입 (초 단위, jitter는 비율)"""
+
+    def __init__(self, latency: Union[float, dict, None] = None, jitter: float = 0.0, seed: Optional[int] = None):
+        if isinstance(latency, dict):
+            self.latency = {"read": 0.0, "write": 0.0, "commit": 0.0, **latency}
+        else:
+            value = float(latency or 0.0)
+            self.latency = {"read": value, "write": value, "commit": value}
+        self.jitter = jitter
+        self._random = random.Random(seed)
+
+    def wait(self, kind: str):
+        delay = self.latency.get(kind, 0.0)
+        if delay <= 0:
+            return
+        if self.jitter:
+            delay *= 1 + self._random.uniform(-self.jitter, self.jitter)
+        time.sleep(max(delay, 0.0))
+
+
+class FakeDocumentSnapshot:
+    """DocumentSnapshot 대체 구현"""
+
+    def __init__(self, reference, data: Optional[dict], update_time=None):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+        self.exists = data is not None
+        self.update_time = update_time
+        self.create_time = update_time
+        self.read_time = datetime.now(timezone.utc)
+
+    def to_dict(self) -> Optional[dict]:
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field_path: str):
+        value = _get_field(self._data or {}, field_path)
+        if value is _MISSING:
+            raise KeyError(field_path)
+        return copy.deepcopy(value)
+
+
+class FakeDocumentReference:
+    """DocumentReference 대체 구현"""
+
+    def __init__(self, client, path: str):
+        self._client = client
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    @property
+    def parent(self):
+        return FakeCollectionReference(self._client, self.path.rsplit("/", 1)[0])
+
+    def collection(self, name: str):
+        return FakeCollectionReference(self._client, f"{self.path}/{name}")
+
+    def get(self, field_paths=None, transaction=None, **kwargs):
+        if transaction is not None:
+            return transaction.get(self)
+        self._client._latency.wait("read")
+        return self._client._snapshot(self.path, count_read=True)
+
+    def set(self, document_data: dict, merge: bool = False, **kwargs):
+        self._client._latency.wait("write")
+        self._client._write([("set", self.path, document_data, merge)])
+
+    def create(self, document_data: dict, **kwargs):
+        self._client._latency.wait("write")
+        self._client._write([("create", self.path, document_data, False)])
+
+    def update(self, field_updates: dict, **kwargs):
+        self._client._latency.wait("write")
+        self._client._write([("update", self.path, field_updates, False)])
+
+    def delete(self, **kwargs):
+        self._client._latency.wait("write")
+        self._client._write([("delete", self.path, None, False)])
+
+    def on_snapshot(self, callback):
+        return self._client._watch(self, callback)
+
+    def __eq__(self, other):
+        return isinstance(other, FakeDocumentReference) and other.path == self.path
+
+    def __hash__(self):
+        return hash(self.path)
+
+
+class FakeQuery:
+    """Query 대체 구현 (where/order_by/limit/start_after/offset)"""
+
+    ASCENDING = "ASCENDING"
+    DESCENDING = "DESCENDING"
+
+    def __init__(self, client, collection_path: str, filters=(), orders=(), limit_count=None,
+                 offset_count=0, cursor=None):
+        self._client = client
+        self._collection_path = collection_path
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit_count
+        self._offset = offset_count
+        self._cursor = cursor
+
+    def _copy(self, **changes):
+        params = {
+            "filters": self._filters,
+            "orders": self._orders,
+            "limit_count": self._limit,
+            "offset_count": self._offset,
+            "cursor": self._cursor,
+        }
+        params.update(changes)
+        return FakeQuery(self._client, self._collection_path, **params)
+
+    def where(self, field_path: Optional[str] = None, op_string: Optional[str] = None, value=None, *, filter=None):
+        if filter is not None:
+            field_path = getattr(filter, "field_path", None)
+            op_string = getattr(filter, "op_string", None)
+            value = getattr(filter, "value", None)
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path: str, direction: str = ASCENDING):
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count: int):
+        return self._copy(limit_count=count)
+
+    def offset(self, num_to_skip: int):
+        return self._copy(offset_count=num_to_skip)
+
+    def start_after(self, document_fields_or_snapshot):
+        return self._copy(cursor=("after", document_fields_or_snapshot))
+
+    def start_at(self, document_fields_or_snapshot):
+        return self._copy(cursor=("at", document_fields_or_snapshot))
+
+    def _matches(self, data: dict) -> bool:
+        return all(_compare(op, _get_field(data, field), value) for field, op, value in self._filters)
+
+    def _sort_key(self, doc_id: str, data: dict):
+        key = []
+        for field, direction in self._orders:
+            value = doc_id if field == "__name__" else _get_field(data, field)
+            key.append((value is _MISSING, value if value is not _MISSING else None))
+        key.append(doc_id)
+        return key
+
+    def _cursor_values(self):
+        kind, target = self._cursor
+        if isinstance(target, FakeDocumentSnapshot):
+            data = target.to_dict() or {}
+            return kind, self._sort_key(self._snapshot_key(target), data)
+        if isinstance(target, dict):
+            return kind, [(False, target.get(field)) for field, _ in self._orders]
+        return kind, [(False, v) for v in (target if isinstance(target, (list, tuple)) else [target])]
+
+    def _snapshot_key(self, snapshot) -> str:
+        return snapshot.id
+
+    def _document_path(self, key: str) -> str:
+        return f"{self._collection_path}/{key}"
+
+    def _source_items(self) -> list:
+        return self._client._collection_items(self._collection_path, self._matches, copy_data=False)
+
+    def _watches_collection(self, collection_path: str) -> bool:
+        return collection_path == self._collection_path
+
+    def _run(self) -> list:
+        # 정렬/커서/limit을 적용한 뒤 남은 문서만 복사 (실제 Firestore처럼 limit이 읽기 비용을 줄임)
+        items = self._source_items()
+        if self._orders:
+            # 값이 같으면 문서 ID 순 (커서가 문서 ID로 동률을 가르므로)
+            items.sort(key=lambda item: item[0])
+            # 여러 정렬 방향을 지원하기 위해 뒤에서부터 안정 정렬
+            for index in range(len(self._orders) - 1, -1, -1):
+                field, direction = self._orders[index]
+                items.sort(
+                    key=lambda item: self._sort_key(item[0], item[1])[index],
+                    reverse=(direction == self.DESCENDING),
+                )
+        if self._cursor is not None:
+            kind, cursor_key = self._cursor_values()
+            size = len(cursor_key)
+
+            def after_cursor(item):
+                key = self._sort_key(item[0], item[1])[:size]
+                for (field, direction), current, boundary in zip(
+                    list(self._orders) + [("__name__", self.ASCENDING)], key, cursor_key
+                ):
+                    if current == boundary:
+                        continue
+                    try:
+                        greater = current > boundary
+                    except TypeError:
+                        greater = False
+                    return greater if direction != self.DESCENDING else not greater
+                return kind == "at"
+
+            items = [item for item in items if after_cursor(item)]
+        if self._offset:
+            items = items[self._offset:]
+        if self._limit is not None:
+            items = items[:self._limit]
+        return [(doc_id, copy.deepcopy(data)) for doc_id, data in items]
+
+    def stream(self, transaction=None, **kwargs):
+        self._client._latency.wait("read")
+        items = self._run()
+        self._client.stats["queries"] += 1
+        for doc_id, data in items:
+            self._client.stats["reads"] += 1
+            ref = FakeDocumentReference(self._client, self._document_path(doc_id))
+            if transaction is not None:
+                transaction._record_read(ref.path)
+            # _run()이 이미 사본을 반환하므로 다시 복사하지 않음
+            yield FakeDocumentSnapshot(ref, data, self._client._update_times.get(ref.path))
+
+    def get(self, transaction=None, **kwargs):
+        return list(self.stream(transaction=transaction))
+
+    def on_snapshot(self, callback):
+        return self._client._watch(self, callback)
+
+
+class FakeCollectionGroup(FakeQuery):
+    """collection_group 쿼리 대체 구현 (같은 이름의 모든 하위 컬렉션, 정렬 기준은 전체 문서 경로)"""
+
+    def _copy(self, **changes):
+        params = {
+            "filters": self._filters,
+            "orders": self._orders,
+            "limit_count": self._limit,
+            "offset_count": self._offset,
+            "cursor": self._cursor,
+        }
+        params.update(changes)
+        return FakeCollectionGroup(self._client, self._collection_path, **params)
+
+    def _snapshot_key(self, snapshot) -> str:
+        return snapshot.reference.path
+
+    def _document_path(self, key: str) -> str:
+        return key
+
+    def _source_items(self) -> list:
+        return self._client._group_items(self._collection_path, self._matches)
+
+    def _watches_collection(self, collection_path: str) -> bool:
+        return collection_path.rsplit("/", 1)[-1] == self._collection_path
+
+
+class FakeCollectionReference(FakeQuery):
+    """CollectionReference 대체 구현"""
+
+    def __init__(self, client, path: str):
+        super().__init__(client, path)
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def document(self, document_id: Optional[str] = None):
+        document_id = document_id or uuid.uuid4().hex[:20]
+        return FakeDocumentReference(self._client, f"{self.path}/{document_id}")
+
+    def add(self, document_data: dict, document_id: Optional[str] = None):
+        ref = self.document(document_id)
+        ref.create(document_data)
+        return datetime.now(timezone.utc), ref
+
+    def list_documents(self, page_size: Optional[int] = None):
+        return [self.document(doc_id) for doc_id, _ in self._client._collection_items(self.path)]
+
+
+class FakeWriteBatch:
+    """WriteBatch 대체 구현 (commit 시 원자적으로 적용)"""
+
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def set(self, reference, document_data: dict, merge: bool = False):
+        self._writes.append(("set", reference.path, document_data, merge))
+
+    def create(self, reference, document_data: dict):
+        self._writes.append(("create", reference.path, document_data, False))
+
+    def update(self, reference, field_updates: dict, **kwargs):
+        self._writes.append(("update", reference.path, field_updates, False))
+
+    def delete(self, reference, **kwargs):
+        self._writes.append(("delete", reference.path, None, False))
+
+    def __len__(self):
+        return len(self._writes)
+
+    def commit(self, **kwargs):
+        self._client._latency.wait("commit")
+        writes, self._writes = self._writes, []
+        self._client._write(writes)
+        return [SimpleNamespace(update_time=datetime.now(timezone.utc)) for _ in writes]
+
+
+class FakeTransaction(FakeWriteBatch):
+    """
+    Transaction 대체 구현 (낙관적 동시성 제어)
+    firestore.transactional 데코레이터가 사용하는 내부 훅을 구현하므로
+    운영 코드와 동일하게 @firestore.transactional 로 사용할 수 있습니다.
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, client, max_attempts: int = 5, read_only: bool = False):
+        super().__init__(client)
+        self._max_attempts = max_attempts
+        self._read_only = read_only
+        self._id = None
+        self._read_versions = {}
+
+    # firestore.transactional 훅
+    def _clean_up(self):
+        self._writes = []
+        self._read_versions = {}
+        self._id = None
+
+    def _begin(self, retry_id=None):
+        self._id = next(self._ids)
+
+    def _rollback(self):
+        self._clean_up()
+
+    def _commit(self):
+        self._client._latency.wait("commit")
+        writes, self._writes = self._writes, []
+        self._client._write(writes, expected_versions=self._read_versions)
+        self._clean_up()
+        return []
+
+    @property
+    def in_progress(self):
+        return self._id is not None
+
+    def _record_read(self, path: str):
+        self._read_versions.setdefault(path, self._client._versions.get(path, 0))
+
+    def get(self, ref_or_query, **kwargs):
+        if isinstance(ref_or_query, FakeDocumentReference):
+            self._client._latency.wait("read")
+            self._record_read(ref_or_query.path)
+            return self._client._snapshot(ref_or_query.path, count_read=True)
+        return ref_or_query.stream(transaction=self)
+
+    def run(self, fn: Callable, *args, **kwargs):
+        """데코레이터 없이 fn(transaction, ...)을 재시도하며 실행합니다."""
+        last_error = None
+        for _ in range(self._max_attempts):
+            self._clean_up()
+            self._begin()
+            try:
+                result = fn(self, *args, **kwargs)
+                self._commit()
+                return result
+            except Aborted as e:
+                last_error = e
+            except BaseException:
+                self._rollback()
+                raise
+        raise ValueError(f"트랜잭션이 {self._max_attempts}회 재시도 후 실패했습니다") from last_error
+
+
+class FakeWatch:
+    """on_snapshot 구독 핸들"""
+
+    def __init__(self, client, target, callback):
+        self._client = client
+        self.target = target
+        self.callback = callback
+        self.active = True
+        self._known = {}
+        self._initialized = False
+
+    def unsubscribe(self):
+        self.active = False
+        self._client._unwatch(self)
+
+    close = unsubscribe
+
+
+class FakeFirestore:
+    """
+    Firestore 클라이언트 대체 구현
+    stats에 읽기/쓰기/쿼리 횟수를 누적하여 벤치마크에서 비용을 확인할 수 있습니다.
+    """
+
+    def __init__(self, latency: Union[float, dict, None] = None, jitter: float = 0.0, seed: Optional[int] = None):
+        self._latency = LatencyModel(latency, jitter, seed)
+        self._collections = {}
+        self._versions = {}
+        self._update_times = {}
+        self._lock = threading.RLock()
+        self._watches = []
+        self.stats = {"reads": 0, "writes": 0, "queries": 0, "commits": 0}
+
+    # 공개 API
+    def collection(self, path: str):
+        return FakeCollectionReference(self, path)
+
+    def document(self, path: str):
+        return FakeDocumentReference(self, path)
+
+    def batch(self):
+        return FakeWriteBatch(self)
+
+    def transaction(self, max_attempts: int = 5, read_only: bool = False):
+        return FakeTransaction(self, max_attempts=max_attempts, read_only=read_only)
+
+    def get_all(self, references, field_paths=None, transaction=None):
+        self._latency.wait("read")
+        for ref in references:
+            if transaction is not None:
+                transaction._record_read(ref.path)
+            yield self._snapshot(ref.path, count_read=True)
+
+    def collection_group(self, collection_id: str):
+        return FakeCollectionGroup(self, collection_id)
+
+    def collections(self):
+        roots = {path for path in self._collections if "/" not in path}
+        return [FakeCollectionReference(self, path) for path in sorted(roots)]
+
+    def reset(self):
+        """모든 데이터와 통계를 초기화합니다."""
+        with self._lock:
+            self._collections.clear()
+            self._versions.clear()
+            self._update_times.clear()
+            for key in self.stats:
+                self.stats[key] = 0
+
+    def dump(self) -> dict:
+        """전체 데이터를 {컬렉션 경로: {문서 ID: 데이터}} 형태로 반환합니다."""
+        with self._lock:
+            return copy.deepcopy({path: dict(docs) for path, docs in self._collections.items()})
+
+    # 내부 구현
+    def _collection_items(self, collection_path: str, predicate: Optional[Callable] = None,
+                          copy_data: bool = True) -> list:
+        """컬렉션 문서 목록 (predicate가 있으면 일치하는 문서만, copy_data가 False면 원본 참조)"""
+        with self._lock:
+            docs = self._collections.get(collection_path, {})
+            return [
+                (doc_id, copy.deepcopy(data) if copy_data else data) for doc_id, data in docs.items()
+                if predicate is None or predicate(data)
+            ]
+
+    def _group_items(self, collection_id: str, predicate: Optional[Callable] = None) -> list:
+        """이름이 collection_id인 모든 컬렉션의 (문서 경로, 원본 데이터) 목록"""
+        with self._lock:
+            return [
+                (f"{path}/{doc_id}", data)
+                for path, docs in self._collections.items()
+                if path.rsplit("/", 1)[-1] == collection_id
+                for doc_id, data in docs.items()
+                if predicate is None or predicate(data)
+            ]
+
+    def _snapshot(self, path: str, count_read: bool = False) -> FakeDocumentSnapshot:
+        collection_path, doc_id = path.rsplit("/", 1)
+        with self._lock:
+            data = self._collections.get(collection_path, {}).get(doc_id)
+            data = copy.deepcopy(data) if data is not None else None
+            update_time = self._update_times.get(path)
+        if count_read:
+            self.stats["reads"] += 1
+        return FakeDocumentSnapshot(FakeDocumentReference(self, path), data, update_time)
+
+    def _write(self, writes: list, expected_versions: Optional[dict] = None):
+        changed = []
+        with self._lock:
+            if expected_versions:
+                for path, version in expected_versions.items():
+                    if self._versions.get(path, 0) != version:
+                        raise Aborted("트랜잭션 충돌: 문서가 다른 요청에 의해 변경되었습니다")
+
+            # 검증 후 일괄 적용 (원자성 보장)
+            staged = {}
+            for op, path, data, merge in writes:
+                collection_path, doc_id = path.rsplit("/", 1)
+                current = staged.get(path, self._collections.get(collection_path, {}).get(doc_id))
+                if op == "create":
+                    if current is not None:
+                        raise AlreadyExists(f"문서가 이미 존재합니다: {path}")
+                    new_data = {}
+                    _merge(new_data, data)
+                elif op == "set":
+                    new_data = copy.deepcopy(current) if (merge and current is not None) else {}
+                    _merge(new_data, data)
+                elif op == "update":
+                    if current is None:
+                        raise NotFound(f"문서를 찾을 수 없습니다: {path}")
+                    new_data = copy.deepcopy(current)
+                    for field, value in data.items():
+                        _set_field(new_data, field, value)
+                else:
+                    new_data = None
+                staged[path] = new_data
+
+            now = datetime.now(timezone.utc)
+            for path, new_data in staged.items():
+                collection_path, doc_id = path.rsplit("/", 1)
+                docs = self._collections.setdefault(collection_path, {})
+                if new_data is None:
+                    docs.pop(doc_id, None)
+                else:
+                    docs[doc_id] = copy.deepcopy(new_data)
+                self._versions[path] = self._versions.get(path, 0) + 1
+                self._update_times[path] = now
+                changed.append(collection_path)
+            self.stats["writes"] += len(writes)
+            self.stats["commits"] += 1
+            watches = list(self._watches)
+
+        # 리스너 알림 (쓰기 스레드에서 동기 호출)
+        for watch in watches:
+            if isinstance(watch.target, FakeDocumentReference):
+                watched = watch.target.path.rsplit("/", 1)[0] in changed
+            else:
+                watched = any(watch.target._watches_collection(path) for path in changed)
+            if watched:
+                self._notify(watch)
+
+    def _watch(self, target, callback) -> FakeWatch:
+        watch = FakeWatch(self, target, callback)
+        with self._lock:
+            self._watches.append(watch)
+        self._notify(watch)
+        return watch
+
+    def _unwatch(self, watch: FakeWatch):
+        with self._lock:
+            if watch in self._watches:
+                self._watches.remove(watch)
+
+    def _notify(self, watch: FakeWatch):
+        if not watch.active:
+            return
+        if isinstance(watch.target, FakeDocumentReference):
+            snapshot = self._snapshot(watch.target.path)
+            current = {snapshot.id: snapshot} if snapshot.exists else {}
+        else:
+            current = {
+                key: FakeDocumentSnapshot(FakeDocumentReference(self, watch.target._document_path(key)), data)
+                for key, data in watch.target._run()
+            }
+
+        changes = []
+        ordered = list(current)
+        for index, (doc_id, snapshot) in enumerate(current.items()):
+            previous = watch._known.get(doc_id)
+            if previous is None:
+                changes.append(_change("ADDED", snapshot, -1, index))
+            elif previous != snapshot.to_dict():
+                changes.append(_change("MODIFIED", snapshot, index, index))
+        for doc_id, data in watch._known.items():
+            if doc_id not in current:
+                ref = FakeDocumentReference(self, _target_path(watch.target, doc_id))
+                changes.append(_change("REMOVED", FakeDocumentSnapshot(ref, data), -1, -1))
+        watch._known = {doc_id: snapshot.to_dict() for doc_id, snapshot in current.items()}
+
+        if changes or not watch._initialized:
+            watch._initialized = True
+            watch.callback([current[doc_id] for doc_id in ordered], changes, datetime.now(timezone.utc))
+
+
+def _target_path(target, key: str) -> str:
+    if isinstance(target, FakeDocumentReference):
+        return target.path
+    return target._document_path(key)
+
+
+def _change(kind: str, snapshot, old_index: int, new_index: int):
+    return SimpleNamespace(
+        type=SimpleNamespace(name=kind),
+        document=snapshot,
+        old_index=old_index,
+        new_index=new_index,
+    )
+
+
+# OpenAI 스텁
+class StubOpenAI:
+    """
+    call_openai_api 대체 구현
+    responder(messages)가 주어지면 그 결과를, 아니면 요청 내용을 요약한 JSON을 반환합니다.
+    """
+
+    def __init__(self, latency: float = 0.0, responder: Optional[Callable] = None, fail_rate: float = 0.0,
+                 seed: Optional[int] = None):
+        self.latency = latency
+        self.responder = responder
+        self.fail_rate = fail_rate
+        self.calls = 0
+        self._random = random.Random(seed)
+
+    def __call__(self, messages, model="gpt-3.5-turbo", temperature=0.1, max_tokens=2000):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.fail_rate and self._random.random() < self.fail_rate:
+            raise RuntimeError("스텁 OpenAI 호출 실패 (주입된 오류)")
+        if self.responder is not None:
+            return self.responder(messages)
+        prompt_chars = sum(len(m.get("content", "")) for m in messages)
+        return json.dumps({"stub": True, "model": model, "prompt_chars": prompt_chars}, ensure_ascii=False)
+
+
+# Firebase Auth 스텁
+class FakeAuth:
+    """firebase_admin.auth 중 이 백엔드가 사용하는 함수의 대체 구현"""
+
+    def __init__(self):
+        self.users = {}
+
+    def create_user(self, email=None, password=None, display_name=None, uid=None, **kwargs):
+        if any(user.email == email for user in self.users.values()):
+            raise ValueError(f"이미 존재하는 이메일입니다: {email}")
+        uid = uid or uuid.uuid4().hex[:28]
+        record = SimpleNamespace(uid=uid, email=email, display_name=display_name)
+        self.users[uid] = record
+        return record
+
+    def verify_id_token(self, token, **kwargs):
+        uid = token.split(":", 1)[-1]
+        return {"uid": uid}
+
+    def get_users(self, identifiers):
+        """UidIdentifier/EmailIdentifier 목록으로 조회 (실제 API처럼 한 번에 100개까지)"""
+        if len(identifiers) > 100:
+            raise ValueError("get_users는 한 번에 100개까지 조회할 수 있습니다")
+        found, not_found = [], []
+        for identifier in identifiers:
+            uid = getattr(identifier, "uid", None)
+            email = getattr(identifier, "email", None)
+            matches = [user for user in self.users.values()
+                       if (uid is not None and user.uid == uid) or (email is not None and user.email == email)]
+            if matches:
+                found.extend(user for user in matches if user not in found)
+            else:
+                not_found.append(identifier)
+        return SimpleNamespace(users=found, not_found=not_found)
+
+    def import_users(self, users, hash_alg=None):
+        """
+        실제 import_users처럼 이메일 중복을 검사하지 않고, 같은 uid는 덮어씁니다.
+        (같은 이메일로 두 번 가져오면 계정이 둘 생김)
+        """
+        if len(users) > 1000:
+            raise ValueError("import_users는 한 번에 1000명까지 가져올 수 있습니다")
+        for user in users:
+            self.users[user.uid] = SimpleNamespace(uid=user.uid, email=user.email, display_name=user.display_name)
+        return SimpleNamespace(success_count=len(users), failure_count=0, errors=[])
+
+
+# Redis 스텁
+class FakeRedis:
+    """
+    admission.SharedBucketBackend 등이 사용하는 Redis 명령의 메모리 구현
+    값은 redis-py와 같이 bytes로 반환하며 pexpire 만료를 흉내냅니다.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._expires = {}
+        self._lock = threading.Lock()
+        self.commands = 0
+
+    def _expire_if_needed(self, key):
+        expires_at = self._expires.get(key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+
+    @staticmethod
+    def _encode(value) -> bytes:
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    def ping(self):
+        return True
+
+    def hmget(self, name, *keys):
+        with self._lock:
+            self.commands += 1
+            self._expire_if_needed(name)
+            mapping = self._data.get(name, {})
+            if len(keys) == 1 and isinstance(keys[0], (list, tuple)):
+                keys = keys[0]
+            return [mapping.get(key) for key in keys]
+
+    def hset(self, name, key=None, value=None, mapping=None):
+        with self._lock:
+            self.commands += 1
+            self._expire_if_needed(name)
+            hash_value = self._data.setdefault(name, {})
+            items = dict(mapping or {})
+            if key is not None:
+                items[key] = value
+            added = sum(1 for k in items if k not in hash_value)
+            hash_value.update({k: self._encode(v) for k, v in items.items()})
+            return added
+
+    def pexpire(self, name, milliseconds):
+        with self._lock:
+            self.commands += 1
+            if name not in self._data:
+                return False
+            self._expires[name] = time.monotonic() + milliseconds / 1000
+            return True
+
+    def delete(self, *names):
+        with self._lock:
+            self.commands += 1
+            removed = 0
+            for name in names:
+                self._expires.pop(name, None)
+                removed += self._data.pop(name, None) is not None
+            return removed
+
+    def flushall(self):
+        with self._lock:
+            self._data.clear()
+            self._expires.clear()
+
+
+def install(latency: Union[float, dict, None] = None, openai_latency: float = 0.0, jitter: float = 0.0,
+            seed: Optional[int] = None, openai_responder: Optional[Callable] = None) -> FakeFirestore:
+    """메모리 Firestore, OpenAI 스텁, Auth 스텁을 전역으로 설치합니다."""
+    import utils
+    db = FakeFirestore(latency=latency, jitter=jitter, seed=seed)
+    utils.set_db(db)
+    utils.set_openai_caller(StubOpenAI(latency=openai_latency, responder=openai_responder, seed=seed))
+    utils.set_auth(FakeAuth())
+    return db
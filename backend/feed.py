@@ -0,0 +1,131 @@
+"""
+실시간 피드 API 엔드포인트
+스케줄/예약 변경을 SSE 또는 WebSocket으로 푸시하여
+/worker/my-schedule, /booking/{business_id} 반복 조회(polling)를 대체합니다.
+"""
+
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Depends, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+
+from responses import FastJSONResponse, dumps
+from realtime import hub
+from utils import get_current_user, authenticate_token
+from app_logging import get_logger, fields
+import tenants
+
+router = APIRouter(prefix="/feed", tags=["실시간 피드"], default_response_class=FastJSONResponse)
+logger = get_logger("feed")
+
+
+def _resolve_worker_filter(business_id: str, current_user: dict, worker_id: Optional[str]) -> Optional[str]:
+    """
+    구독 권한을 확인하고 적용할 직원 필터를 반환합니다.
+    비즈니스 본인은 전체(또는 요청한 직원) 변경을, 권한이 있는 직원은 본인 변경만 받습니다.
+    """
+    if current_user["uid"] == business_id:
+        return worker_id
+    permission_doc = tenants.collection("permissions").get(business_id, f"{business_id}_{current_user['uid']}")
+    if not permission_doc.exists:
+        raise HTTPException(status_code=403, detail="권한이 없습니다")
+    return current_user["uid"]
+
+
+def _sse_message(event: dict) -> str:
+    if event["type"] == "heartbeat":
+        return ": heartbeat\n\n"
+    return f"event: {event['type']}\ndata: {dumps(event).decode('utf-8')}\n\n"
+
+
+# SSE 구독
+@router.get("/{business_id}/events")
+async def stream_feed_events(business_id: str, request: Request, worker_id: Optional[str] = None,
+                             current_user: dict = Depends(get_current_user)):
+    """스케줄/예약 변경 이벤트를 Server-Sent Events로 전송합니다."""
+    try:
+        worker_filter = _resolve_worker_filter(business_id, current_user, worker_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def event_stream():
+        # 응답이 시작되지 않고 끝나도 구독이 남지 않도록 스트림 안에서 구독
+        subscription = None
+        try:
+            yield "retry: 5000\n\n"
+            try:
+                subscription = await hub.subscribe(business_id, worker_filter)
+            except Exception:
+                # 클라이언트는 retry 간격 뒤에 다시 연결
+                yield _sse_message({"type": "error", "message": "실시간 피드를 시작할 수 없습니다"})
+                return
+            while True:
+                event = await subscription.next_event()
+                if await request.is_disconnected():
+                    break
+                yield _sse_message(event)
+                if event["type"] == "close":
+                    break
+        finally:
+            if subscription is not None:
+                hub.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# WebSocket 구독
+@router.websocket("/{business_id}/ws")
+async def websocket_feed(websocket: WebSocket, business_id: str, token: str, worker_id: Optional[str] = None):
+    """스케줄/예약 변경 이벤트를 WebSocket으로 전송합니다. (브라우저 호환을 위해 토큰은 쿼리로 전달)"""
+    try:
+        current_user = authenticate_token(token)
+        worker_filter = _resolve_worker_filter(business_id, current_user, worker_id)
+    except HTTPException as e:
+        await websocket.close(code=4401 if e.status_code == 401 else 4403)
+        return
+
+    await websocket.accept()
+    subscription = None
+    receiver = None
+    try:
+        try:
+            subscription = await hub.subscribe(business_id, worker_filter)
+        except Exception:
+            await websocket.close(code=1011)
+            return
+        # 클라이언트 종료를 감지하기 위해 수신을 따로 기다림 (클라이언트 메시지는 무시)
+        receiver = asyncio.ensure_future(_drain(websocket))
+        while True:
+            sender = asyncio.ensure_future(subscription.next_event())
+            done, _ = await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if receiver in done:
+                sender.cancel()
+                break
+            event = sender.result()
+            await websocket.send_text(dumps(event).decode("utf-8"))
+            if event["type"] == "close":
+                await websocket.close()
+                break
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.warning("실시간 피드 WebSocket 오류", extra=fields(business_id=business_id, error=str(e)))
+    finally:
+        if receiver is not None:
+            receiver.cancel()
+        if subscription is not None:
+            hub.unsubscribe(subscription)
+
+
+async def _drain(websocket: WebSocket):
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
@@ -0,0 +1,97 @@
+"""
+스케줄 생성 요청 지문(fingerprint)
+AIScheduleRequest를 정규화(목록 순서 무시, 결과에 영향 없는 필드 제외)한 뒤 해시하여,
+같은 입력으로 다시 생성을 요청하면 LLM 호출 없이 기존 스케줄을 돌려줄 수 있게 합니다.
+"""
+
+import hashlib
+import json
+from typing import Optional
+
+from archive import rehydrate
+import tenants
+
+# 정규화 규칙이 바뀌면 올려서 이전 지문과 섞이지 않게 함
+FINGERPRINT_VERSION = "v1"
+
+
+def _sorted_unique(values) -> list:
+    return sorted(set(values or []))
+
+
+def _normalize_hours(work_hours: dict) -> dict:
+    return {
+        day: _sorted_unique(hours) if isinstance(hours, (list, tuple)) else hours
+        for day, hours in (work_hours or {}).items()
+    }
+
+
+def normalize_schedule_request(schedule_request) -> dict:
+    """
+    스케줄 결과에 영향을 주는 필드만 정규화된 형태로 추출합니다.
+    하위 항목의 business_id(상위와 중복)와 부서 표시 이름은 제외하고,
+    부서/직원 목록과 요일·시간대 목록은 정렬합니다.
+    """
+    departments = sorted(
+        (
+            {
+                "department_id": staffing.department_id,
+                "required_staff_count": staffing.required_staff_count,
+                "work_hours": _normalize_hours(staffing.work_hours),
+                "priority_level": staffing.priority_level,
+            }
+            for staffing in schedule_request.department_staffing
+        ),
+        key=lambda item: item["department_id"],
+    )
+    employees = sorted(
+        (
+            {
+                "worker_id": employee.worker_id,
+                "department_id": employee.department_id,
+                "work_fields": _sorted_unique(employee.work_fields),
+                "preferred_off_days": _sorted_unique(employee.preferred_off_days),
+                "preferred_work_days": _sorted_unique(employee.preferred_work_days),
+                "preferred_work_hours": _sorted_unique(employee.preferred_work_hours),
+                "min_work_hours": employee.min_work_hours,
+                "max_work_hours": employee.max_work_hours,
+                "availability_score": employee.availability_score,
+                "priority_level": employee.priority_level,
+            }
+            for employee in schedule_request.employee_preferences
+        ),
+        key=lambda item: (item["worker_id"], item["department_id"]),
+    )
+    return {
+        "business_id": schedule_request.business_id,
+        "week_start_date": schedule_request.week_start_date,
+        "week_end_date": schedule_request.week_end_date,
+        "department_staffing": departments,
+        "employee_preferences": employees,
+        "schedule_constraints": schedule_request.schedule_constraints or {},
+    }
+
+
+def fingerprint_schedule_request(schedule_request) -> str:
+    """정규화된 요청의 SHA-256 지문을 반환합니다."""
+    canonical = json.dumps(
+        normalize_schedule_request(schedule_request),
+        sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str,
+    )
+    digest = hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+    return f"{FINGERPRINT_VERSION}:{digest}"
+
+
+def find_schedule_by_fingerprint(db, business_id: str, week_start_date: str, fingerprint: str) -> Optional[dict]:
+    """같은 (business_id, 주, 지문)으로 생성된 완료 상태의 스케줄을 찾습니다."""
+    docs = (
+        tenants.collection("ai_schedules", db).query(business_id)
+        .where("week_start_date", "==", week_start_date)
+        .where("request_fingerprint", "==", fingerprint)
+        .where("status", "==", "completed")
+        .limit(1)
+        .stream()
+    )
+    for doc in docs:
+        return rehydrate(doc.id, doc.to_dict())
+    return None
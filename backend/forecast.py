@@ -0,0 +1,376 @@
+"""
+예약 수요 기반 필요 인원 예측
+예약 기록을 요일 × 시간대 수요 히스토그램으로 모아 다음 주 파트별 필요 인원(DepartmentStaffing)을 제안합니다.
+
+집계는 예약이 생길 때마다 주 단위 문서(booking_demand/{business_id}_{주 시작일})의 칸을 Increment로 올리므로
+예측은 최근 FORECAST_HISTORY_WEEKS개의 주 문서만 읽고 예약 기록 전체를 다시 훑지 않습니다.
+이 기능을 켜기 전 예약은 python forecast.py로 한 번 채웁니다.
+
+예측 방법:
+    1. 주별 히스토그램(파트마다 7 × 시간대 칸)을 최근 주에 더 큰 가중치를 주는 지수 평활로 합침 (요일/시간대 계절성)
+    2. 이웃 시간대끼리 조금씩 섞어 한 주의 우연한 예약 몰림을 완화
+    3. 예약 길이(EXPORT_BOOKING_MINUTES)만큼 이어지는 동시 예약 수를 구해 가동률로 나눈 값을 필요 인원으로 사용
+numpy(requirements.txt)로 배열 연산을 하고, numpy가 없는 환경(로컬 스크립트 등)에서는 리스트로 같은 계산을 합니다.
+
+환경 변수:
+    FORECAST_SLOT_MINUTES=60       히스토그램 시간대 길이(분, 1440의 약수)
+    FORECAST_HISTORY_WEEKS=8       예측에 쓰는 지난 주 수
+    FORECAST_SMOOTHING=0.3         주별 지수 평활 계수 (클수록 최근 주 비중이 큼)
+    FORECAST_SLOT_SMOOTHING=0.2    이웃 시간대로 나누는 비율
+    FORECAST_UTILIZATION=0.8       직원 한 명의 목표 가동률
+    FORECAST_MIN_LOAD=0.2          운영 시간으로 볼 최소 동시 예약 수
+    FORECAST_CACHE_TTL=300         주 문서 캐시 시간(초)
+"""
+
+import argparse
+import json
+import math
+import os
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Depends
+
+from responses import FastJSONResponse
+from utils import get_current_user
+from config_cache import ReadThroughCache, list_departments
+from export import BOOKING_MINUTES, DAYS, _parse_date
+import tenants
+from app_logging import get_logger, fields
+
+router = APIRouter(prefix="/forecast", tags=["수요 예측"], default_response_class=FastJSONResponse)
+logger = get_logger("forecast")
+
+SLOT_MINUTES = int(os.getenv("FORECAST_SLOT_MINUTES", 60))
+HISTORY_WEEKS = int(os.getenv("FORECAST_HISTORY_WEEKS", 8))
+SMOOTHING = float(os.getenv("FORECAST_SMOOTHING", 0.3))
+SLOT_SMOOTHING = float(os.getenv("FORECAST_SLOT_SMOOTHING", 0.2))
+UTILIZATION = float(os.getenv("FORECAST_UTILIZATION", 0.8))
+MIN_LOAD = float(os.getenv("FORECAST_MIN_LOAD", 0.2))
+CACHE_TTL = float(os.getenv("FORECAST_CACHE_TTL", 300))
+
+SLOTS = 24 * 60 // SLOT_MINUTES
+CELLS = len(DAYS) * SLOTS
+# 파트를 알 수 없는 예약도 포함한 비즈니스 전체 합계
+ALL = "_all"
+COLLECTION = "booking_demand"
+
+_week_cache = ReadThroughCache(COLLECTION, CACHE_TTL, int(os.getenv("FORECAST_CACHE_MAX", 20000)))
+_stats = {"recorded": 0, "record_failures": 0, "forecasts": 0}
+_numpy = None
+
+
+def _np():
+    """numpy (없으면 None). 서버 시작 시간을 늘리지 않도록 처음 예측할 때 불러옵니다."""
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError:
+            _numpy = False
+    return _numpy or None
+
+
+# 예약 → 히스토그램 칸
+def week_start(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+
+def demand_doc_id(business_id: str, start: date) -> str:
+    return f"{business_id}_{start.isoformat()}"
+
+
+def booking_cell(booking: dict) -> Optional[tuple]:
+    """예약 → (주 시작일, 칸 번호), 취소됐거나 날짜/시간을 읽을 수 없으면 None"""
+    if booking.get("status") == "cancelled":
+        return None
+    try:
+        start = datetime.strptime(f"{booking.get('date')} {booking.get('time')}", "%Y-%m-%d %H:%M")
+    except (TypeError, ValueError):
+        return None
+    slot = (start.hour * 60 + start.minute) // SLOT_MINUTES
+    return week_start(start.date()), start.weekday() * SLOTS + slot
+
+
+def _worker_department(business_id: str, worker_id: Optional[str]) -> Optional[str]:
+    if not worker_id:
+        return None
+    doc = tenants.collection("worker_schedules").get(business_id, f"{worker_id}_{business_id}")
+    return (doc.to_dict() or {}).get("department_id") if doc.exists else None
+
+
+def record_booking(booking: dict, department_id: Optional[str] = None):
+    """
+    예약을 주 단위 수요 집계에 더합니다. (예약 저장 후 호출)
+    집계 실패는 예약을 막지 않고 기록만 합니다.
+    """
+    from google.cloud import firestore
+    business_id = booking.get("business_id")
+    cell = booking_cell(booking)
+    if not business_id or cell is None:
+        return
+    start, index = cell
+    try:
+        department_id = department_id or _worker_department(business_id, booking.get("worker_id"))
+        cells = {ALL: {str(index): firestore.Increment(1)}}
+        if department_id:
+            cells[department_id] = {str(index): firestore.Increment(1)}
+        doc_id = demand_doc_id(business_id, start)
+        tenants.collection(COLLECTION).set(business_id, doc_id, {
+            "business_id": business_id,
+            "week_start_date": start.isoformat(),
+            "slot_minutes": SLOT_MINUTES,
+            "total": firestore.Increment(1),
+            "cells": cells,
+            "updated_at": datetime.now().isoformat(),
+        }, merge=True)
+        _week_cache.invalidate(doc_id)
+        _stats["recorded"] += 1
+    except Exception as e:
+        _stats["record_failures"] += 1
+        logger.warning("예약 수요 집계 실패", extra=fields(booking_id=booking.get("booking_id"), error=str(e)))
+
+
+# 주 문서 → 벡터
+def _load_week(business_id: str, start: date) -> Optional[dict]:
+    """주 문서의 파트별 칸 값 {파트: {칸: 수}} (문서가 없으면 None)"""
+    doc_id = demand_doc_id(business_id, start)
+
+    def load():
+        doc = tenants.collection(COLLECTION).get(business_id, doc_id)
+        if not doc.exists:
+            return None
+        data = doc.to_dict() or {}
+        if data.get("slot_minutes", SLOT_MINUTES) != SLOT_MINUTES:
+            logger.warning("시간대 길이가 다른 집계 문서", extra=fields(doc_id=doc_id))
+            return None
+        return {department: {int(index): count for index, count in (cells or {}).items()}
+                for department, cells in (data.get("cells") or {}).items()}
+    return _week_cache.get(doc_id, load)
+
+
+def _vector(cells: dict) -> list:
+    vector = [0.0] * CELLS
+    for index, count in cells.items():
+        if 0 <= index < CELLS:
+            vector[index] = float(count)
+    return vector
+
+
+def week_weights(observed: list) -> list:
+    """
+    최근 주부터의 지수 평활 가중치 (합 1)
+    첫 예약이 있던 주보다 오래된 주는 데이터가 없는 것이므로 빼고, 그 뒤의 빈 주는 수요 0으로 셉니다.
+    """
+    if True not in observed:
+        return []
+    span = len(observed) - observed[::-1].index(True)
+    weights = [SMOOTHING * (1 - SMOOTHING) ** age for age in range(span)]
+    total = sum(weights)
+    return [weight / total for weight in weights]
+
+
+def expected_demand(history: list, weights: list):
+    """주별 벡터(최근 주 먼저)의 가중 평균 후 이웃 시간대 평활 → 요일 × 시간대 예상 예약 수"""
+    np = _np()
+    if np is not None:
+        matrix = np.asarray(weights, dtype=float) @ np.asarray(history[:len(weights)], dtype=float)
+        matrix = matrix.reshape(len(DAYS), SLOTS)
+        padded = np.pad(matrix, ((0, 0), (1, 1)))
+        return (1 - 2 * SLOT_SMOOTHING) * matrix + SLOT_SMOOTHING * (padded[:, :-2] + padded[:, 2:])
+    combined = [sum(weight * row[index] for weight, row in zip(weights, history)) for index in range(CELLS)]
+    rows = [combined[day * SLOTS:(day + 1) * SLOTS] for day in range(len(DAYS))]
+    return [
+        [(1 - 2 * SLOT_SMOOTHING) * row[slot]
+         + SLOT_SMOOTHING * ((row[slot - 1] if slot > 0 else 0.0) + (row[slot + 1] if slot + 1 < SLOTS else 0.0))
+         for slot in range(SLOTS)]
+        for row in rows
+    ]
+
+
+def staff_by_slot(demand) -> list:
+    """시간대별 필요 인원 (예약 길이만큼 이어지는 동시 예약 수 ÷ 가동률)"""
+    span = max(1, math.ceil(BOOKING_MINUTES / SLOT_MINUTES))
+    np = _np()
+    if np is not None:
+        matrix = np.asarray(demand, dtype=float)
+        cumulative = np.concatenate([np.zeros((len(DAYS), 1)), np.cumsum(matrix, axis=1)], axis=1)
+        lagged = np.concatenate([np.zeros((len(DAYS), span)), cumulative[:, :-span]], axis=1)[:, 1:]
+        load = cumulative[:, 1:] - lagged
+        staff = np.where(load >= MIN_LOAD, np.ceil(load / UTILIZATION - 1e-9), 0)
+        return staff.astype(int).tolist()
+    result = []
+    for row in demand:
+        loads = [sum(row[max(0, slot - span + 1):slot + 1]) for slot in range(SLOTS)]
+        result.append([math.ceil(load / UTILIZATION - 1e-9) if load >= MIN_LOAD else 0 for load in loads])
+    return result
+
+
+def _format_minutes(minutes: int) -> str:
+    minutes %= 24 * 60
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def work_hours(staff: list) -> dict:
+    """필요 인원이 있는 연속 시간대 → {"월": ["09:00-18:00"], ...}"""
+    result = {}
+    for day, row in zip(DAYS, staff):
+        ranges, start = [], None
+        for slot, count in enumerate(list(row) + [0]):
+            if count and start is None:
+                start = slot
+            elif not count and start is not None:
+                ranges.append(f"{_format_minutes(start * SLOT_MINUTES)}-{_format_minutes(slot * SLOT_MINUTES)}")
+                start = None
+        result[day] = ranges
+    return result
+
+
+# 예측
+def forecast_staffing(business_id: str, target_week: date, history_weeks: int = HISTORY_WEEKS) -> dict:
+    """target_week 주의 파트별 필요 인원 제안"""
+    target_week = week_start(target_week)
+    weeks = [_load_week(business_id, target_week - timedelta(weeks=age)) for age in range(1, history_weeks + 1)]
+    weights = week_weights([week is not None for week in weeks])
+
+    departments = {dept.get("department_id"): dept for dept in list_departments(business_id) if dept.get("department_id")}
+    observed = {name for week in weeks if week for name in week}
+    # 파트가 없는 비즈니스는 전체 합계만 제안
+    names = list(departments) or ([ALL] if ALL in observed else [])
+
+    suggestions, details = {}, {}
+    for name in names:
+        history = [_vector((week or {}).get(name, {})) for week in weeks]
+        demand = expected_demand(history, weights) if weights else [[0.0] * SLOTS for _ in DAYS]
+        staff = staff_by_slot(demand)
+        expected = float(sum(sum(row) for row in demand))
+        department = departments.get(name, {})
+        suggestions[name] = {
+            "business_id": business_id,
+            "department_id": name,
+            "department_name": department.get("department_name") or ("전체" if name == ALL else name),
+            "required_staff_count": max((max(row) for row in staff), default=0)
+                                    or int(department.get("required_staff_count") or 0),
+            "work_hours": work_hours(staff),
+            "priority_level": 3,
+        }
+        details[name] = {
+            "expected_bookings": round(expected, 2),
+            "has_history": expected > 0,
+            "staff_by_slot": dict(zip(DAYS, staff)),
+        }
+
+    # 예상 예약이 많은 파트일수록 우선순위를 높게 (1~5)
+    busiest = max((detail["expected_bookings"] for detail in details.values()), default=0)
+    if busiest > 0:
+        for name, suggestion in suggestions.items():
+            suggestion["priority_level"] = 1 + round(4 * details[name]["expected_bookings"] / busiest)
+
+    _stats["forecasts"] += 1
+    return {
+        "business_id": business_id,
+        "week_start_date": target_week.isoformat(),
+        "week_end_date": (target_week + timedelta(days=6)).isoformat(),
+        "history_weeks": len(weights),
+        "slot_minutes": SLOT_MINUTES,
+        "department_staffing": list(suggestions.values()),
+        "details": details,
+    }
+
+
+def collect_metrics() -> list:
+    """metrics.registry.register_collector 용 수요 예측 메트릭을 반환합니다."""
+    cache = _week_cache.stats()
+    return [
+        ("booking_demand_recorded_total", "counter", "수요 집계에 더한 예약 수", [({}, _stats["recorded"])]),
+        ("booking_demand_record_failures_total", "counter", "수요 집계 실패 수", [({}, _stats["record_failures"])]),
+        ("staffing_forecasts_total", "counter", "필요 인원 예측 수", [({}, _stats["forecasts"])]),
+        ("booking_demand_cache_hits_total", "counter", "주 집계 문서 캐시 적중 수", [({}, cache["hits"])]),
+        ("booking_demand_cache_misses_total", "counter", "주 집계 문서 캐시 미스 수", [({}, cache["misses"])]),
+    ]
+
+
+# 필요 인원 예측
+@router.get("/staffing/{business_id}")
+async def get_staffing_forecast(business_id: str, week_start_date: Optional[str] = None,
+                                history_weeks: int = HISTORY_WEEKS, current_user: dict = Depends(get_current_user)):
+    """예약 기록으로 다음 주(또는 week_start_date 주)의 파트별 필요 인원과 운영 시간을 제안합니다."""
+    try:
+        if current_user["uid"] != business_id:
+            raise HTTPException(status_code=403, detail="권한이 없습니다")
+        if not 1 <= history_weeks <= 52:
+            raise HTTPException(status_code=400, detail="history_weeks는 1~52 사이여야 합니다")
+        target = _parse_date(week_start_date) or week_start(date.today()) + timedelta(weeks=1)
+        return forecast_staffing(business_id, target, history_weeks)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# 기존 예약 집계 (한 번 실행)
+def backfill(db=None, business_id: Optional[str] = None) -> dict:
+    """
+    예약 기록으로 주 단위 집계 문서를 다시 만듭니다.
+    기존 집계 문서를 덮어쓰므로 예약이 적은 시간에 실행합니다.
+    """
+    from export import iter_documents
+
+    bookings = tenants.collection("bookings", db)
+    query = bookings.query(business_id) if business_id else bookings.all()
+    scoped = not business_id and bookings.reads_scoped()
+    departments = {}
+    weeks = defaultdict(lambda: {"total": 0, "cells": defaultdict(lambda: defaultdict(int))})
+    scanned = 0
+    for doc in iter_documents(query.order_by("date")):
+        if scoped and not bookings.is_scoped(doc.reference):
+            continue
+        booking = doc.to_dict() or {}
+        owner = booking.get("business_id")
+        cell = booking_cell(booking)
+        scanned += 1
+        if not owner or cell is None:
+            continue
+        worker_key = (owner, booking.get("worker_id"))
+        if worker_key not in departments:
+            departments[worker_key] = _worker_department(*worker_key)
+        start, index = cell
+        week = weeks[(owner, start)]
+        week["total"] += 1
+        week["cells"][ALL][str(index)] += 1
+        if departments[worker_key]:
+            week["cells"][departments[worker_key]][str(index)] += 1
+
+    now = datetime.now().isoformat()
+    demand = tenants.collection(COLLECTION, db)
+    for (owner, start), week in weeks.items():
+        doc_id = demand_doc_id(owner, start)
+        demand.set(owner, doc_id, {
+            "business_id": owner,
+            "week_start_date": start.isoformat(),
+            "slot_minutes": SLOT_MINUTES,
+            "total": week["total"],
+            "cells": {name: dict(cells) for name, cells in week["cells"].items()},
+            "updated_at": now,
+        })
+        _week_cache.invalidate(doc_id)
+    result = {"scanned": scanned, "weeks": len(weeks)}
+    logger.info("예약 수요 집계 완료", extra=fields(**result))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="예약 기록으로 주 단위 수요 집계를 만듭니다")
+    parser.add_argument("--business-id")
+    args = parser.parse_args()
+
+    from utils import load_environment
+    load_environment()
+    result = backfill(business_id=args.business_id)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
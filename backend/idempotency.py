@@ -0,0 +1,298 @@
+"""
+Idempotency-Key 지원
+모바일 클라이언트의 재시도로 같은 생성 요청이 여러 번 들어와도 문서가 중복 생성되거나
+LLM 호출이 반복되지 않도록, 같은 키의 첫 응답을 저장해 두었다가 그대로 재생합니다.
+첫 요청이 아직 처리 중이면 중복 요청은 그 결과를 기다립니다.
+
+키는 (라우트, 검증된 사용자 uid, Idempotency-Key)로 구분하므로 토큰이 갱신된 뒤의 재시도도 같은 기록을 찾습니다.
+같은 키로 다른 본문을 보내면 422로 거절합니다. 2xx와 재시도해도 결과가 같은 거절(403/404/422)만 저장하고,
+그 밖의 응답은 키를 풀어 재시도가 다시 실행되도록 합니다. (핸들러가 일시적인 Firestore/OpenAI 오류도
+400으로 감싸므로 400을 저장하면 재시도가 영구 실패로 재생됨)
+
+환경 변수:
+    IDEMPOTENCY_ROUTES=/booking/create,...   적용 라우트 (쉼표 구분)
+    IDEMPOTENCY_TTL=86400                    응답 보관 시간(초)
+    IDEMPOTENCY_MAX_ENTRIES=10000            메모리 저장소 최대 항목 수
+    IDEMPOTENCY_WAIT_TIMEOUT=120             처리 중인 첫 요청을 기다리는 최대 시간(초)
+    IDEMPOTENCY_STORE=memory                 memory 또는 firestore (인스턴스 간 공유)
+"""
+
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from admission import buffer_body, caller_key
+from responses import FastJSONResponse
+from app_logging import get_logger, fields
+
+logger = get_logger("idempotency")
+
+HEADER_NAME = b"idempotency-key"
+DEFAULT_ROUTES = "/booking/create,/chatbot/create-booking,/ai/schedule/generate"
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", 86400))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", 10000))
+WAIT_TIMEOUT = float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", 120))
+
+# 2xx 외에 저장해서 재생하는 결정적인 거절 (권한 없음, 대상 없음, 본문 검증 실패)
+FINAL_CLIENT_ERRORS = {403, 404, 422}
+
+# begin() 결과
+NEW = "new"
+REPLAY = "replay"
+MISMATCH = "mismatch"
+IN_PROGRESS = "in_progress"
+
+
+class StoredResponse:
+    """저장된 응답 (상태 코드, 헤더, 본문)"""
+
+    __slots__ = ("status", "headers", "body")
+
+    def __init__(self, status: int, headers: list, body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+
+# 메모리 저장소
+class _Entry:
+    __slots__ = ("fingerprint", "response", "done", "expires_at")
+
+    def __init__(self, fingerprint: str, ttl: float):
+        self.fingerprint = fingerprint
+        self.response = None
+        self.done = asyncio.Event()
+        self.expires_at = time.monotonic() + ttl
+
+
+class MemoryIdempotencyStore:
+    """인스턴스 메모리 저장소 (TTL + 최대 항목 수 제한)"""
+
+    def __init__(self, ttl: float = IDEMPOTENCY_TTL, max_entries: int = IDEMPOTENCY_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    async def begin(self, key: str, fingerprint: str, wait_timeout: float = WAIT_TIMEOUT):
+        """(결과, 저장된 응답)을 반환합니다. 처리 중인 같은 키가 있으면 완료될 때까지 기다립니다."""
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at < time.monotonic() and entry.done.is_set():
+            del self._entries[key]
+            entry = None
+
+        if entry is None:
+            self._entries[key] = _Entry(fingerprint, self.ttl)
+            self._evict()
+            return NEW, None
+
+        if entry.fingerprint != fingerprint:
+            return MISMATCH, None
+        if not entry.done.is_set():
+            try:
+                await asyncio.wait_for(entry.done.wait(), wait_timeout)
+            except asyncio.TimeoutError:
+                return IN_PROGRESS, None
+        if entry.response is None:
+            # 첫 요청이 실패하여 기록이 지워진 경우 이 요청이 다시 실행
+            return await self.begin(key, fingerprint, wait_timeout)
+        return REPLAY, entry.response
+
+    async def complete(self, key: str, response: StoredResponse):
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry.response = response
+            entry.expires_at = time.monotonic() + self.ttl
+            entry.done.set()
+
+    async def abandon(self, key: str):
+        """저장하지 않을 응답(최종 결과가 아닌 응답, 예외)으로 끝난 키를 지우고 대기자를 깨웁니다."""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            entry.done.set()
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            oldest_key = next(iter(self._entries))
+            if not self._entries[oldest_key].done.is_set():
+                break
+            del self._entries[oldest_key]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Firestore 저장소
+class FirestoreIdempotencyStore:
+    """
+    idempotency_keys 컬렉션을 사용하는 인스턴스 간 공유 저장소
+    create()로 처리 중 표식을 선점하고, 다른 인스턴스의 중복 요청은 완료될 때까지 폴링합니다.
+    expires_at 필드에 Firestore TTL 정책을 걸면 만료 문서가 자동 삭제됩니다.
+    """
+
+    collection = "idempotency_keys"
+
+    def __init__(self, ttl: float = IDEMPOTENCY_TTL, poll_interval: float = 0.5):
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+
+    def _ref(self, key: str):
+        from utils import db
+        return db.collection(self.collection).document(key)
+
+    def _expires_at(self) -> datetime:
+        return datetime.now(timezone.utc) + timedelta(seconds=self.ttl)
+
+    async def begin(self, key: str, fingerprint: str, wait_timeout: float = WAIT_TIMEOUT):
+        from google.api_core.exceptions import AlreadyExists
+        ref = self._ref(key)
+        deadline = time.monotonic() + wait_timeout
+        while True:
+            try:
+                ref.create({"state": "in_progress", "fingerprint": fingerprint, "expires_at": self._expires_at()})
+                return NEW, None
+            except AlreadyExists:
+                pass
+
+            doc = ref.get()
+            data = doc.to_dict() if doc.exists else None
+            if data is None:
+                continue
+            expires_at = data.get("expires_at")
+            if expires_at is not None and expires_at < datetime.now(timezone.utc) and data.get("state") == "completed":
+                ref.delete()
+                continue
+            if data.get("fingerprint") != fingerprint:
+                return MISMATCH, None
+            if data.get("state") == "completed":
+                return REPLAY, StoredResponse(
+                    data["status"], [tuple(pair) for pair in data.get("headers", [])], data.get("body", b"")
+                )
+            if time.monotonic() >= deadline:
+                return IN_PROGRESS, None
+            await asyncio.sleep(self.poll_interval)
+
+    async def complete(self, key: str, response: StoredResponse):
+        self._ref(key).update({
+            "state": "completed",
+            "status": response.status,
+            "headers": [list(pair) for pair in response.headers],
+            "body": response.body,
+            "expires_at": self._expires_at(),
+        })
+
+    async def abandon(self, key: str):
+        self._ref(key).delete()
+
+
+def store_from_env():
+    if os.getenv("IDEMPOTENCY_STORE", "memory").lower() == "firestore":
+        return FirestoreIdempotencyStore()
+    return MemoryIdempotencyStore()
+
+
+# 미들웨어
+routes = set()
+store = None
+
+
+def configure(route_list: Optional[list] = None, idempotency_store=None):
+    """적용 라우트와 저장소를 설정합니다."""
+    global store
+    if route_list is None:
+        route_list = [route.strip() for route in os.getenv("IDEMPOTENCY_ROUTES", DEFAULT_ROUTES).split(",")]
+    routes.clear()
+    routes.update(route for route in route_list if route)
+    store = idempotency_store if idempotency_store is not None else store_from_env()
+
+
+def is_final(status: int) -> bool:
+    """저장해서 재생해도 되는 최종 결과인지 (2xx와 결정적인 거절)"""
+    return 200 <= status < 300 or status in FINAL_CLIENT_ERRORS
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def _record_key(path: str, caller: str, idempotency_key: str) -> str:
+    # 다른 사용자가 같은 키를 써도 섞이지 않도록 uid를 키에 포함 (ID 토큰은 1시간마다 바뀌므로 헤더 원문은 쓰지 않음)
+    raw = "\n".join([path, caller, idempotency_key])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+async def _send_stored(send, response: StoredResponse):
+    headers = [(k, v) for k, v in response.headers if k != b"idempotent-replayed"]
+    headers.append((b"idempotent-replayed", b"true"))
+    await send({"type": "http.response.start", "status": response.status, "headers": headers})
+    await send({"type": "http.response.body", "body": response.body})
+
+
+async def _reject(scope, receive, send, status_code: int, detail: str):
+    await FastJSONResponse({"detail": detail}, status_code=status_code)(scope, receive, send)
+
+
+class IdempotencyMiddleware:
+    """Idempotency-Key 헤더가 있는 생성 요청의 첫 응답을 저장하고 중복 요청에 재생하는 ASGI 미들웨어"""
+
+    def __init__(self, app):
+        self.app = app
+        if store is None:
+            configure()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("method") != "POST" or scope.get("path") not in routes:
+            await self.app(scope, receive, send)
+            return
+        idempotency_key = _header(scope, HEADER_NAME)
+        if not idempotency_key:
+            await self.app(scope, receive, send)
+            return
+        if len(idempotency_key) > 255:
+            await _reject(scope, receive, send, 400, "Idempotency-Key가 너무 깁니다")
+            return
+
+        body, receive = await buffer_body(receive)
+        key = _record_key(scope["path"], await caller_key(scope), idempotency_key)
+        outcome, stored = await store.begin(key, hashlib.sha256(body).hexdigest())
+        if outcome == REPLAY:
+            logger.info("중복 요청에 저장된 응답 재생", extra=fields(path=scope["path"]))
+            await _send_stored(send, stored)
+            return
+        if outcome == MISMATCH:
+            await _reject(scope, receive, send, 422, "Idempotency-Key가 다른 요청 본문에 재사용되었습니다")
+            return
+        if outcome == IN_PROGRESS:
+            await _reject(scope, receive, send, 409, "같은 Idempotency-Key의 요청이 아직 처리 중입니다")
+            return
+
+        start_message = None
+        chunks = []
+
+        async def send_wrapper(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException:
+            await store.abandon(key)
+            raise
+
+        if start_message is None or not is_final(start_message["status"]):
+            await store.abandon(key)
+            return
+        await store.complete(key, StoredResponse(
+            start_message["status"], list(start_message.get("headers", [])), b"".join(chunks)
+        ))
+
@@ -5,29 +5,109 @@ Firebase Authentication, Firestore 데이터베이스 연동
 사용자 인증, 예약 관리, 챗봇, 구독 등 모든 기능의 API 제공
 """
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from contextlib import asynccontextmanager
+import asyncio
 import os
+import time
+from app_logging import setup_logging, get_logger, fields, collect_metrics as collect_logging_metrics
 
-# FastAPI 앱 생성
-app = FastAPI(title="Calendar Booking System API")
+# 구조화 로깅 설정 (큐 기반 비동기 출력)
+setup_logging()
+logger = get_logger("main")
+from responses import FastJSONResponse, CompressionMiddleware
+from metrics import MetricsMiddleware, registry as metrics_registry
+from admission import AdmissionMiddleware, collect_metrics as collect_admission_metrics
+from idempotency import IdempotencyMiddleware
+from profiling import ProfilingMiddleware
+import profiling
+import config_cache
+import write_behind
+import realtime
+import archive
+import circuit_breaker
+import chat_sessions
+import shift_index
+import swap
+import forecast
 
 # 환경 변수에서 설정 가져오기
 ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
 
-# Firebase 및 OpenAI 초기화 (선택적)
-try:
-    from utils import load_environment, setup_openai, initialize_firebase, set_db
-    load_environment()
-    setup_openai()
-    db = initialize_firebase()
-    set_db(db)
-    print("✅ Firebase and OpenAI initialized")
-except Exception as e:
-    print(f"⚠️ Firebase/OpenAI initialization failed: {e}")
-    db = None
+# 시작 직후 백그라운드에서 Firebase/OpenAI 클라이언트를 미리 초기화할지 여부
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "1") == "1"
+
+# 워밍업 상태 (readiness 판단용)
+warmup_state = {
+    "status": "pending" if STARTUP_WARMUP else "skipped",
+    "duration_ms": None,
+    "firebase": None,
+    "openai": None,
+    "error": None,
+}
+
+def _warm_up():
+    """
+    Firebase/OpenAI 클라이언트를 미리 초기화합니다. (스레드에서 실행)
+    import 시점에는 아무 클라이언트도 만들지 않으므로 서버는 즉시 요청을 받을 수 있고,
+    워밍업 전에 들어온 요청은 utils.get_db()/get_openai()의 지연 초기화를 사용합니다.
+    """
+    from utils import load_environment, get_db, get_openai
+    start_time = time.perf_counter()
+    warmup_state["status"] = "running"
+    try:
+        load_environment()
+        db = get_db()
+        warmup_state["firebase"] = db is not None
+        warmup_state["openai"] = bool(getattr(get_openai(), "api_key", None))
+
+        # 설정 캐시 푸시 무효화 (선택)
+        if db is not None and os.getenv("CONFIG_CACHE_LISTEN", "0") == "1":
+            config_cache.start_listeners(db)
+        warmup_state["status"] = "done"
+    except Exception as e:
+        warmup_state["status"] = "failed"
+        warmup_state["error"] = str(e)
+        logger.warning("Firebase/OpenAI warm-up failed", extra=fields(error=str(e)))
+    warmup_state["duration_ms"] = round((time.perf_counter() - start_time) * 1000, 1)
+    logger.info("Firebase and OpenAI warm-up finished", extra=fields(**warmup_state))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """앱 시작 시 워밍업 작업을 백그라운드로 띄우고, 종료 시 리스너를 정리합니다."""
+    warmup_task = asyncio.create_task(asyncio.to_thread(_warm_up)) if STARTUP_WARMUP else None
+    yield
+    if warmup_task is not None and not warmup_task.done():
+        logger.info("워밍업이 끝나기 전에 종료합니다")
+    config_cache.stop_listeners()
+    realtime.hub.close()
+    # 쓰기 지연 큐에 남은 스케줄 저장
+    await asyncio.to_thread(write_behind.stop_all)
+
+def is_ready() -> bool:
+    """트래픽을 받을 준비가 되었는지 반환합니다. (개발 환경은 Firebase 없이도 준비 완료)"""
+    if warmup_state["status"] == "skipped":
+        return True
+    if warmup_state["status"] != "done":
+        return False
+    return bool(warmup_state["firebase"]) or ENVIRONMENT == "development"
+
+# FastAPI 앱 생성
+app = FastAPI(title="Calendar Booking System API", default_response_class=FastJSONResponse, lifespan=lifespan)
+
+# 미들웨어는 나중에 추가한 것이 바깥쪽에서 실행됩니다.
+# 비싼 AI 라우트의 동시 실행 제한 및 사용자별 요청 제한 (429 + Retry-After)
+app.add_middleware(AdmissionMiddleware)
 
-# CORS 설정 (모든 origin 허용)
+# Idempotency-Key 재시도 흡수 (재생되는 중복 요청은 요청 제한/대기열을 거치지 않음)
+app.add_middleware(IdempotencyMiddleware)
+
+# 응답 압축 (Accept-Encoding 협상, COMPRESSION_MIN_SIZE 이상만 압축)
+app.add_middleware(CompressionMiddleware)
+
+# CORS 설정 (모든 origin 허용, 429 등 미들웨어 응답에도 헤더가 붙도록 안쪽 미들웨어를 감쌈)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -36,6 +116,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# X-Profile-Token 헤더나 샘플링에 걸린 요청의 표본 프로파일과 Firestore/OpenAI 호출 타임라인 수집
+app.add_middleware(ProfilingMiddleware)
+
+# 라우트별 지연 시간 및 Firestore/OpenAI 비용 집계 (가장 바깥쪽)
+app.add_middleware(MetricsMiddleware)
+metrics_registry.register_collector(config_cache.collect_metrics)
+metrics_registry.register_collector(collect_logging_metrics)
+metrics_registry.register_collector(collect_admission_metrics)
+metrics_registry.register_collector(write_behind.collect_metrics)
+metrics_registry.register_collector(realtime.collect_metrics)
+metrics_registry.register_collector(archive.collect_metrics)
+metrics_registry.register_collector(circuit_breaker.collect_metrics)
+metrics_registry.register_collector(chat_sessions.collect_metrics)
+metrics_registry.register_collector(shift_index.collect_metrics)
+metrics_registry.register_collector(swap.collect_metrics)
+metrics_registry.register_collector(forecast.collect_metrics)
+metrics_registry.register_collector(profiling.collect_metrics)
+
 # 헬스 체크 엔드포인트
 @app.get("/health")
 async def health_check():
@@ -47,6 +145,19 @@ async def health_check():
         "port": os.getenv("PORT", "8080")
     }
 
+# 라이브니스 엔드포인트 (프로세스가 살아 있으면 항상 200)
+@app.get("/health/live")
+async def liveness():
+    """라이브니스 프로브 엔드포인트"""
+    return {"status": "alive"}
+
+# 레디니스 엔드포인트 (워밍업 완료 전에는 503)
+@app.get("/health/ready")
+async def readiness():
+    """레디니스 프로브 엔드포인트"""
+    body = {"status": "ready" if is_ready() else "not_ready", "warmup": warmup_state}
+    return FastJSONResponse(body, status_code=200 if is_ready() else 503)
+
 # 루트 엔드포인트
 @app.get("/")
 async def root():
@@ -68,6 +179,46 @@ async def test():
         "environment": ENVIRONMENT
     }
 
+# 설정 캐시 통계 엔드포인트
+@app.get("/cache/stats")
+async def cache_stats():
+    """설정 캐시 히트율 등 통계를 반환합니다."""
+    return {"config_cache": config_cache.get_stats()}
+
+# 메트릭 엔드포인트 (Prometheus 텍스트 형식)
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """라우트별 지연 시간, 상태 코드, Firestore/OpenAI 비용 메트릭을 반환합니다."""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# 요청 프로파일 조회 (PROFILE_TOKEN이 없으면 비활성화)
+def _require_profile_token(request: Request):
+    if not profiling.PROFILE_TOKEN:
+        raise HTTPException(status_code=404, detail="프로파일링이 비활성화되어 있습니다")
+    if not profiling.token_matches(request.headers.get("x-profile-token")):
+        raise HTTPException(status_code=403, detail="권한이 없습니다")
+
+@app.get("/admin/profiles")
+async def list_profiles(request: Request):
+    """최근 요청 프로파일 목록을 반환합니다. (X-Profile-Token 필요)"""
+    _require_profile_token(request)
+    return {"profiles": profiling.ring.list()}
+
+@app.get("/admin/profiles/{profile_id}")
+async def get_profile(profile_id: str, request: Request, format: str = "speedscope"):
+    """요청 프로파일을 speedscope JSON 또는 호출 타임라인으로 반환합니다. (X-Profile-Token 필요)"""
+    _require_profile_token(request)
+    profile = profiling.ring.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="프로파일을 찾을 수 없습니다")
+    if format == "timeline":
+        return {**profile.summary(), "timeline": profile.timeline_dict()}
+    if format != "speedscope":
+        raise HTTPException(status_code=400, detail="format은 speedscope 또는 timeline이어야 합니다")
+    return FastJSONResponse(profile.to_speedscope(), headers={
+        "Content-Disposition": f'attachment; filename="profile_{profile_id}.speedscope.json"'
+    })
+
 # 라우터들 import 및 등록
 try:
     from auth import router as auth_router
@@ -76,6 +227,11 @@ try:
     from booking import router as booking_router
     from chatbot import router as chatbot_router
     from ai_schedule import router as ai_schedule_router
+    from feed import router as feed_router
+    from export import router as export_router
+    from provisioning import router as provisioning_router
+    from swap import router as swap_router
+    from forecast import router as forecast_router
 
     # 라우터들 등록
     app.include_router(auth_router)
@@ -84,8 +240,12 @@ try:
     app.include_router(booking_router)
     app.include_router(chatbot_router)
     app.include_router(ai_schedule_router)
+    app.include_router(feed_router)
+    app.include_router(export_router)
+    app.include_router(provisioning_router)
+    app.include_router(swap_router)
+    app.include_router(forecast_router)
 
-    print("✅ 모든 라우터가 성공적으로 로드되었습니다!")
+    logger.info("모든 라우터가 성공적으로 로드되었습니다")
 except Exception as e:
-    print(f"❌ 라우터 로딩 실패: {e}")
-    print("기본 엔드포인트만 사용합니다.")
\ No newline at end of file
+    logger.error("라우터 로딩 실패, 기본 엔드포인트만 사용합니다", extra=fields(error=str(e)))
\ No newline at end of file
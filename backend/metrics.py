@@ -0,0 +1,526 @@
+"""
+라우트별 메트릭 및 비용 집계
+요청별 지연 시간 히스토그램과 상태 코드 수를 기록하고,
+컨텍스트 로컬 카운터로 요청마다의 Firestore 읽기/쓰기/스트리밍 문서 수와
+OpenAI 호출 수/토큰/지연 시간을 집계하여 /metrics 에서 Prometheus 텍스트 형식으로 제공합니다.
+외부 서비스나 추가 패키지 없이 동작합니다.
+"""
+
+import contextvars
+import threading
+import time
+from typing import Callable, Optional
+
+# 지연 시간 히스토그램 버킷 (초)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# 요청당 Firestore 읽기 수 버킷
+READS_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250, 500, 1000)
+
+
+class RequestCost:
+    """한 요청 동안 누적되는 비용 카운터"""
+
+    __slots__ = (
+        "scope", "firestore_reads", "firestore_writes", "firestore_streamed",
+        "openai_calls", "openai_errors", "openai_prompt_tokens",
+        "openai_completion_tokens", "openai_seconds", "timeline",
+    )
+
+    def __init__(self, scope: Optional[dict] = None):
+        self.scope = scope or {}
+        self.firestore_reads = 0
+        self.firestore_writes = 0
+        self.firestore_streamed = 0
+        self.openai_calls = 0
+        self.openai_errors = 0
+        self.openai_prompt_tokens = 0
+        self.openai_completion_tokens = 0
+        self.openai_seconds = 0.0
+        # 프로파일 중인 요청만 외부 호출 타임라인을 기록 (profiling.ProfilingMiddleware가 설정)
+        self.timeline = None
+
+    @property
+    def route(self) -> str:
+        """라우팅 이후 매칭된 경로 템플릿 (예: /ai/schedule/{schedule_id})"""
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or self.scope.get("route_hint") or "unmatched"
+
+
+# 현재 요청의 비용 카운터 (요청 밖에서는 None)
+_current_cost: contextvars.ContextVar = contextvars.ContextVar("request_cost", default=None)
+
+
+def current_cost() -> Optional[RequestCost]:
+    """현재 요청의 비용 카운터를 반환합니다."""
+    return _current_cost.get()
+
+
+class Histogram:
+    """누적 버킷 히스토그램"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.total += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    """메트릭 저장소 (프로세스 단위)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = {}          # (method, route) -> Histogram
+        self.reads_per_request = {}  # (method, route) -> Histogram
+        self.status_counts = {}    # (method, route, status) -> int
+        self.counters = {}         # (name, route, extra_label) -> float
+        self.openai_latency = {}   # route -> Histogram
+        self._collectors = []
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, cost: RequestCost):
+        key = (method, route)
+        with self._lock:
+            self.latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(seconds)
+            self.reads_per_request.setdefault(key, Histogram(READS_BUCKETS)).observe(cost.firestore_reads)
+            status_key = (method, route, status)
+            self.status_counts[status_key] = self.status_counts.get(status_key, 0) + 1
+            self._add("firestore_reads_total", route, cost.firestore_reads)
+            self._add("firestore_writes_total", route, cost.firestore_writes)
+            self._add("firestore_streamed_documents_total", route, cost.firestore_streamed)
+            self._add("openai_calls_total", route, cost.openai_calls)
+            self._add("openai_errors_total", route, cost.openai_errors)
+            self._add("openai_tokens_total", route, cost.openai_prompt_tokens, ("kind", "prompt"))
+            self._add("openai_tokens_total", route, cost.openai_completion_tokens, ("kind", "completion"))
+
+    def observe_openai_latency(self, route: str, seconds: float):
+        with self._lock:
+            self.openai_latency.setdefault(route, Histogram(LATENCY_BUCKETS)).observe(seconds)
+
+    def register_collector(self, collector: Callable[[], list]):
+        """
+        추가 게이지/카운터 수집 함수를 등록합니다.
+        collector는 (이름, 타입, 설명, [(라벨 dict, 값), ...]) 튜플 목록을 반환해야 합니다.
+        """
+        self._collectors.append(collector)
+
+    def reset(self):
+        with self._lock:
+            self.latency.clear()
+            self.reads_per_request.clear()
+            self.status_counts.clear()
+            self.counters.clear()
+            self.openai_latency.clear()
+
+    def _add(self, name: str, route: str, value, extra=None):
+        if not value:
+            return
+        key = (name, route, extra)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def render(self) -> str:
+        """Prometheus 텍스트 형식으로 렌더링합니다."""
+        lines = []
+        with self._lock:
+            _render_histograms(
+                lines, "http_request_duration_seconds", "요청 처리 시간",
+                {(("method", m), ("route", r)): h for (m, r), h in self.latency.items()},
+            )
+            lines.append("# HELP http_requests_total 상태 코드별 요청 수")
+            lines.append("# TYPE http_requests_total counter")
+            for (method, route, status), count in sorted(self.status_counts.items()):
+                labels = _labels((("method", method), ("route", route), ("status", str(status))))
+                lines.append(f"http_requests_total{labels} {count}")
+            _render_histograms(
+                lines, "firestore_reads_per_request", "요청당 Firestore 읽기 수",
+                {(("method", m), ("route", r)): h for (m, r), h in self.reads_per_request.items()},
+            )
+            counter_help = {
+                "firestore_reads_total": "Firestore 문서 읽기 수",
+                "firestore_writes_total": "Firestore 문서 쓰기 수",
+                "firestore_streamed_documents_total": "쿼리 스트림으로 읽은 문서 수",
+                "openai_calls_total": "OpenAI 호출 수",
+                "openai_errors_total": "OpenAI 호출 실패 수",
+                "openai_tokens_total": "OpenAI 토큰 사용량",
+            }
+            for name, help_text in counter_help.items():
+                samples = sorted(
+                    (key, value) for key, value in self.counters.items() if key[0] == name
+                )
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} counter")
+                for (_, route, extra), value in samples:
+                    label_pairs = [("route", route)]
+                    if extra:
+                        label_pairs.append(extra)
+                    lines.append(f"{name}{_labels(label_pairs)} {_number(value)}")
+            _render_histograms(
+                lines, "openai_request_duration_seconds", "OpenAI 호출 시간",
+                {(("route", r),): h for r, h in self.openai_latency.items()},
+            )
+            collectors = list(self._collectors)
+
+        for collector in collectors:
+            try:
+                for name, metric_type, help_text, samples in collector():
+                    lines.append(f"# HELP {name} {help_text}")
+                    lines.append(f"# TYPE {name} {metric_type}")
+                    for labels, value in samples:
+                        lines.append(f"{name}{_labels(sorted(labels.items()))} {_number(value)}")
+            except Exception as e:
+                from app_logging import get_logger
+                get_logger("metrics").warning(f"메트릭 수집 실패: {e}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs) -> str:
+    pairs = list(pairs)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _number(value) -> str:
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+def _render_histograms(lines: list, name: str, help_text: str, histograms: dict):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for label_pairs, histogram in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            labels = _labels(list(label_pairs) + [("le", _number(float(bound)))])
+            lines.append(f"{name}_bucket{labels} {cumulative}")
+        lines.append(f"{name}_bucket{_labels(list(label_pairs) + [('le', '+Inf')])} {histogram.total}")
+        lines.append(f"{name}_sum{_labels(label_pairs)} {_number(histogram.sum)}")
+        lines.append(f"{name}_count{_labels(label_pairs)} {histogram.total}")
+
+
+# 전역 메트릭 저장소
+registry = MetricsRegistry()
+
+
+# 비용 기록 헬퍼 (요청 밖에서 호출되면 무시)
+def record_firestore(reads: int = 0, writes: int = 0, streamed: int = 0):
+    cost = _current_cost.get()
+    if cost is None:
+        return
+    cost.firestore_reads += reads
+    cost.firestore_writes += writes
+    cost.firestore_streamed += streamed
+
+
+def record_openai(seconds: float, prompt_tokens: int = 0, completion_tokens: int = 0, error: bool = False):
+    cost = _current_cost.get()
+    route = cost.route if cost is not None else "background"
+    registry.observe_openai_latency(route, seconds)
+    if cost is None:
+        return
+    if cost.timeline is not None:
+        now = time.perf_counter()
+        cost.timeline.append(("openai", "chat completion (error)" if error else "chat completion", now - seconds, now))
+    cost.openai_calls += 1
+    cost.openai_errors += 1 if error else 0
+    cost.openai_prompt_tokens += prompt_tokens
+    cost.openai_completion_tokens += completion_tokens
+    cost.openai_seconds += seconds
+
+
+# 외부 호출 타임라인 (프로파일 중인 요청에서만 기록)
+class _Call:
+    __slots__ = ("timeline", "kind", "name", "start")
+
+    def __init__(self, timeline: list, kind: str, name: str):
+        self.timeline = timeline
+        self.kind = kind
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.timeline.append((self.kind, self.name, self.start, time.perf_counter()))
+
+
+class _NoCall:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return None
+
+
+_NO_CALL = _NoCall()
+
+
+def timed_call(kind: str, name: str):
+    """현재 요청이 프로파일 중이면 with 블록의 시작/종료 시각을 타임라인에 남깁니다."""
+    cost = _current_cost.get()
+    if cost is None or cost.timeline is None:
+        return _NO_CALL
+    return _Call(cost.timeline, kind, name)
+
+
+def _describe(target) -> str:
+    """타임라인 표시용 문서/컬렉션 경로"""
+    path = getattr(target, "path", None)
+    if isinstance(path, str):
+        return path
+    parent = getattr(target, "_parent", None)
+    parent_path = getattr(parent, "path", None) if parent is not None else None
+    if isinstance(parent_path, str):
+        return parent_path
+    return getattr(target, "_collection_path", None) or type(target).__name__
+
+
+class MetricsMiddleware:
+    """요청별 지연 시간/상태 코드/비용을 기록하는 ASGI 미들웨어"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        cost = RequestCost(scope)
+        token = _current_cost.set(cost)
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            registry.observe_request(
+                scope.get("method", "GET"), cost.route, status_code, time.perf_counter() - start, cost
+            )
+            _current_cost.reset(token)
+
+
+# Firestore 클라이언트 계측 프록시
+def _unwrap(obj):
+    return getattr(obj, "_target", obj) if isinstance(obj, _Instrumented) else obj
+
+
+def _unwrap_kwargs(kwargs: dict) -> dict:
+    if "transaction" in kwargs:
+        kwargs = {**kwargs, "transaction": _unwrap(kwargs["transaction"])}
+    return kwargs
+
+
+class _Instrumented:
+    """대상 객체로 속성 접근을 위임하는 기본 프록시"""
+
+    def __init__(self, target):
+        object.__setattr__(self, "_target", target)
+
+    def __getattr__(self, name):
+        return getattr(self._target, name)
+
+    def __eq__(self, other):
+        return self._target == _unwrap(other)
+
+    def __hash__(self):
+        return hash(self._target)
+
+    def __repr__(self):
+        return f"<instrumented {self._target!r}>"
+
+
+class _InstrumentedQuery(_Instrumented):
+    def where(self, *args, **kwargs):
+        return _InstrumentedQuery(self._target.where(*args, **kwargs))
+
+    def order_by(self, *args, **kwargs):
+        return _InstrumentedQuery(self._target.order_by(*args, **kwargs))
+
+    def limit(self, *args, **kwargs):
+        return _InstrumentedQuery(self._target.limit(*args, **kwargs))
+
+    def offset(self, *args, **kwargs):
+        return _InstrumentedQuery(self._target.offset(*args, **kwargs))
+
+    def select(self, *args, **kwargs):
+        return _InstrumentedQuery(self._target.select(*args, **kwargs))
+
+    def start_after(self, *args, **kwargs):
+        return _InstrumentedQuery(self._target.start_after(*args, **kwargs))
+
+    def start_at(self, *args, **kwargs):
+        return _InstrumentedQuery(self._target.start_at(*args, **kwargs))
+
+    def end_before(self, *args, **kwargs):
+        return _InstrumentedQuery(self._target.end_before(*args, **kwargs))
+
+    def end_at(self, *args, **kwargs):
+        return _InstrumentedQuery(self._target.end_at(*args, **kwargs))
+
+    def stream(self, *args, **kwargs):
+        streamed = 0
+        # 타임라인에는 첫 요청부터 마지막 문서까지 (호출한 쪽의 처리 시간 포함)
+        with timed_call("firestore", f"query {_describe(self._target)}"):
+            for snapshot in self._target.stream(*args, **_unwrap_kwargs(kwargs)):
+                streamed += 1
+                record_firestore(reads=1, streamed=1)
+                yield snapshot
+        # 결과가 없는 쿼리도 최소 1회 읽기로 과금됨
+        if streamed == 0:
+            record_firestore(reads=1)
+
+    def get(self, *args, **kwargs):
+        return list(self.stream(*args, **kwargs))
+
+
+class _InstrumentedCollection(_InstrumentedQuery):
+    def document(self, *args, **kwargs):
+        return _InstrumentedDocument(self._target.document(*args, **kwargs))
+
+    def add(self, *args, **kwargs):
+        record_firestore(writes=1)
+        update_time, ref = self._target.add(*args, **kwargs)
+        return update_time, _InstrumentedDocument(ref)
+
+
+class _InstrumentedDocument(_Instrumented):
+    def collection(self, *args, **kwargs):
+        return _InstrumentedCollection(self._target.collection(*args, **kwargs))
+
+    def get(self, *args, **kwargs):
+        record_firestore(reads=1)
+        with timed_call("firestore", f"get {_describe(self._target)}"):
+            return self._target.get(*args, **_unwrap_kwargs(kwargs))
+
+    def set(self, *args, **kwargs):
+        record_firestore(writes=1)
+        with timed_call("firestore", f"set {_describe(self._target)}"):
+            return self._target.set(*args, **kwargs)
+
+    def create(self, *args, **kwargs):
+        record_firestore(writes=1)
+        with timed_call("firestore", f"create {_describe(self._target)}"):
+            return self._target.create(*args, **kwargs)
+
+    def update(self, *args, **kwargs):
+        record_firestore(writes=1)
+        with timed_call("firestore", f"update {_describe(self._target)}"):
+            return self._target.update(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        record_firestore(writes=1)
+        with timed_call("firestore", f"delete {_describe(self._target)}"):
+            return self._target.delete(*args, **kwargs)
+
+
+class _InstrumentedBatch(_Instrumented):
+    def __init__(self, target):
+        super().__init__(target)
+        object.__setattr__(self, "_pending", 0)
+
+    def _queue(self, method: str, reference, *args, **kwargs):
+        object.__setattr__(self, "_pending", self._pending + 1)
+        return getattr(self._target, method)(_unwrap(reference), *args, **kwargs)
+
+    def set(self, reference, *args, **kwargs):
+        return self._queue("set", reference, *args, **kwargs)
+
+    def create(self, reference, *args, **kwargs):
+        return self._queue("create", reference, *args, **kwargs)
+
+    def update(self, reference, *args, **kwargs):
+        return self._queue("update", reference, *args, **kwargs)
+
+    def delete(self, reference, *args, **kwargs):
+        return self._queue("delete", reference, *args, **kwargs)
+
+    def commit(self, *args, **kwargs):
+        with timed_call("firestore", f"batch commit ({self._pending} writes)"):
+            record_firestore(writes=self._pending)
+            object.__setattr__(self, "_pending", 0)
+            return self._target.commit(*args, **kwargs)
+
+    def __len__(self):
+        return len(self._target)
+
+
+class _InstrumentedTransaction(_InstrumentedBatch):
+    def get(self, ref_or_query, *args, **kwargs):
+        with timed_call("firestore", f"transaction get {_describe(_unwrap(ref_or_query))}"):
+            if isinstance(ref_or_query, _InstrumentedQuery):
+                results = list(self._target.get(_unwrap(ref_or_query), *args, **kwargs))
+                record_firestore(reads=len(results), streamed=len(results))
+                return iter(results)
+            record_firestore(reads=1)
+            return self._target.get(_unwrap(ref_or_query), *args, **kwargs)
+
+    def _commit(self, *args, **kwargs):
+        with timed_call("firestore", f"transaction commit ({self._pending} writes)"):
+            record_firestore(writes=self._pending)
+            object.__setattr__(self, "_pending", 0)
+            return self._target._commit(*args, **kwargs)
+
+    def _clean_up(self, *args, **kwargs):
+        object.__setattr__(self, "_pending", 0)
+        return self._target._clean_up(*args, **kwargs)
+
+
+class InstrumentedFirestore(_Instrumented):
+    """Firestore 클라이언트 계측 프록시 (읽기/쓰기 수를 현재 요청 비용에 기록)"""
+
+    def collection(self, *args, **kwargs):
+        return _InstrumentedCollection(self._target.collection(*args, **kwargs))
+
+    def collection_group(self, *args, **kwargs):
+        return _InstrumentedQuery(self._target.collection_group(*args, **kwargs))
+
+    def document(self, *args, **kwargs):
+        return _InstrumentedDocument(self._target.document(*args, **kwargs))
+
+    def batch(self, *args, **kwargs):
+        return _InstrumentedBatch(self._target.batch(*args, **kwargs))
+
+    def transaction(self, *args, **kwargs):
+        return _InstrumentedTransaction(self._target.transaction(*args, **kwargs))
+
+    def get_all(self, references, *args, **kwargs):
+        refs = [_unwrap(ref) for ref in references]
+        with timed_call("firestore", f"get_all ({len(refs)} documents)"):
+            for snapshot in self._target.get_all(refs, *args, **_unwrap_kwargs(kwargs)):
+                record_firestore(reads=1)
+                yield snapshot
+
+
+def instrument_firestore(client):
+    """Firestore 클라이언트를 계측 프록시로 감쌉니다. (None이면 그대로 반환)"""
+    if client is None or isinstance(client, InstrumentedFirestore):
+        return client
+    return InstrumentedFirestore(client)
+
+
+def unwrap_firestore(client):
+    """계측 프록시에서 원래 클라이언트를 꺼냅니다."""
+    return _unwrap(client)
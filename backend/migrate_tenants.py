@@ -0,0 +1,150 @@
+"""
+최상위 컬렉션 → businesses/{business_id}/{컬렉션} 이전 도구
+문서 ID 순서로 페이지 단위로 읽어 트랜잭션으로 복사하고, 페이지마다 진행 위치를
+migrations/tenant_subcollections 문서에 기록하므로 중단돼도 이어서 실행할 수 있습니다.
+
+이전 중에도 서비스가 계속 쓰므로 먼저 TENANT_STORAGE_MODE=dual로 배포해야 합니다.
+하위 컬렉션에 이미 있는 문서(dual 쓰기로 생긴 최신 문서)는 덮어쓰지 않으며,
+트랜잭션이라 복사와 동시에 들어온 쓰기가 있으면 재시도합니다.
+컬렉션 이전이 끝나면 done으로 기록되고, dual 모드의 읽기가 그 컬렉션부터 하위 컬렉션으로 전환됩니다.
+
+실행:
+    python migrate_tenants.py [--collections bookings permissions] [--page-size 200] [--reset] [--dry-run]
+"""
+
+import argparse
+import json
+from datetime import datetime
+from typing import Iterable, Optional
+
+import tenants
+from app_logging import get_logger, fields
+
+logger = get_logger("migrate_tenants")
+
+# 트랜잭션 하나의 쓰기 한도(500)보다 작게
+DEFAULT_PAGE_SIZE = 200
+
+
+def load_checkpoint(db) -> dict:
+    doc = tenants.migration_ref(db).get()
+    return (doc.to_dict() or {}) if doc.exists else {}
+
+
+def save_checkpoint(db, name: str, progress: dict):
+    tenants.migration_ref(db).set({name: {**progress, "updated_at": datetime.now().isoformat()}}, merge=True)
+
+
+def _copy_page(db, name: str, page: list) -> tuple:
+    """한 페이지를 트랜잭션으로 복사합니다. (복사 수, 이미 있던 수) 반환"""
+    targets = []
+    for doc in page:
+        data = doc.to_dict() or {}
+        business_id = data.get("business_id")
+        if business_id:
+            targets.append((db.collection(tenants.TENANT_ROOT).document(business_id).collection(name).document(doc.id), data))
+    if not targets:
+        return 0, 0
+
+    transaction = db.transaction()
+    counts = {}
+
+    def copy_missing(transaction):
+        existing = {
+            snapshot.reference.path
+            for snapshot in db.get_all([ref for ref, _ in targets], transaction=transaction)
+            if snapshot.exists
+        }
+        copied = 0
+        for ref, data in targets:
+            if ref.path not in existing:
+                transaction.set(ref, data)
+                copied += 1
+        counts.update(copied=copied, existing=len(existing))
+
+    _run_transaction(transaction, copy_missing)
+    return counts["copied"], counts["existing"]
+
+
+def _run_transaction(transaction, fn):
+    # google-cloud-firestore의 @transactional과 같은 재시도 (메모리 구현은 run()을 제공)
+    if hasattr(transaction, "run"):
+        return transaction.run(fn)
+    from google.cloud import firestore
+    return firestore.transactional(fn)(transaction)
+
+
+def migrate_collection(db, name: str, page_size: int = DEFAULT_PAGE_SIZE, dry_run: bool = False,
+                       checkpoint: Optional[dict] = None) -> dict:
+    """컬렉션 하나를 이전합니다. checkpoint가 있으면 마지막 문서 다음부터 이어서 진행합니다."""
+    progress = {"last_doc_id": None, "copied": 0, "existing": 0, "orphaned": 0, "done": False}
+    progress.update(checkpoint or {})
+    if progress["done"]:
+        logger.info("이미 이전된 컬렉션", extra=fields(collection=name))
+        return progress
+
+    base = db.collection(name).order_by("__name__")
+    while True:
+        query = base.limit(page_size)
+        if progress["last_doc_id"]:
+            query = query.start_after({"__name__": progress["last_doc_id"]})
+        page = list(query.stream())
+        if not page:
+            break
+        orphaned = sum(1 for doc in page if not (doc.to_dict() or {}).get("business_id"))
+        if dry_run:
+            copied, existing = len(page) - orphaned, 0
+        else:
+            copied, existing = _copy_page(db, name, page)
+        progress["copied"] += copied
+        progress["existing"] += existing
+        progress["orphaned"] += orphaned
+        progress["last_doc_id"] = page[-1].id
+        if not dry_run:
+            save_checkpoint(db, name, progress)
+        logger.info("이전 진행", extra=fields(collection=name, **progress))
+        if len(page) < page_size:
+            break
+
+    progress["done"] = True
+    if not dry_run:
+        save_checkpoint(db, name, progress)
+        tenants.invalidate_migration_state()
+    return progress
+
+
+def migrate(db=None, collections: Optional[Iterable[str]] = None, page_size: int = DEFAULT_PAGE_SIZE,
+            reset: bool = False, dry_run: bool = False) -> dict:
+    """여러 컬렉션을 차례로 이전합니다. reset이면 진행 기록을 지우고 처음부터 다시 합니다."""
+    if db is None:
+        from utils import db
+    if tenants.get_mode() == tenants.GLOBAL and not dry_run:
+        logger.warning("TENANT_STORAGE_MODE=global 상태입니다. 이전 중 들어오는 쓰기는 하위 컬렉션에 반영되지 않습니다")
+    names = list(collections or tenants.TENANT_COLLECTIONS)
+    for name in names:
+        if name not in tenants.TENANT_COLLECTIONS:
+            raise ValueError(f"비즈니스 단위 컬렉션이 아닙니다: {name}")
+    checkpoints = {} if reset else load_checkpoint(db)
+    results = {}
+    for name in names:
+        checkpoint = checkpoints.get(name) if isinstance(checkpoints.get(name), dict) else None
+        results[name] = migrate_collection(db, name, page_size=page_size, dry_run=dry_run, checkpoint=checkpoint)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="최상위 컬렉션을 비즈니스 하위 컬렉션으로 이전합니다")
+    parser.add_argument("--collections", nargs="*", choices=tenants.TENANT_COLLECTIONS)
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE)
+    parser.add_argument("--reset", action="store_true", help="진행 기록을 무시하고 처음부터 이전")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    from utils import load_environment
+    load_environment()
+    results = migrate(collections=args.collections, page_size=args.page_size, reset=args.reset, dry_run=args.dry_run)
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -41,6 +41,19 @@ class SubscriptionCreate(BaseModel):
     plan_type: str  # "basic", "premium", "enterprise"
 
 
+class WorkerCodeBatch(BaseModel):
+    count: int  # 생성할 초대 코드 수 (1~500)
+    expires_in_hours: int = 24
+
+
+class SwapOfferCreate(BaseModel):
+    business_id: str
+    schedule_id: str
+    day: str  # "월" ~ "일"
+    slot: str  # "09:00-17:00"
+    worker_id: Optional[str] = None  # 비즈니스가 직원 대신 올릴 때만 지정
+
+
 # 스케줄 관련 모델들
 class BusinessCategory(BaseModel):
     business_id: str
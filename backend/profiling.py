@@ -0,0 +1,319 @@
+"""
+요청 단위 프로파일링 (선택적)
+특정 비즈니스의 생성/조회가 느리다는 보고가 있을 때 운영 중인 서버에서 요청 하나의 시간이 어디에 쓰이는지 봅니다.
+
+X-Profile-Token 헤더가 PROFILE_TOKEN과 같거나 샘플링(PROFILE_SAMPLE_RATE)에 걸린 요청만
+    - 이벤트 루프 스레드의 호출 스택을 PROFILE_INTERVAL_MS마다 수집하고 (표본 프로파일)
+    - 요청 중의 Firestore/OpenAI 호출 시작/종료 시각을 기록해 (metrics의 계측 프록시가 기록)
+최근 PROFILE_RING_SIZE개를 메모리에 보관합니다. 다른 요청은 헤더 확인 외의 비용이 없습니다.
+
+/admin/profiles에서 목록을, /admin/profiles/{profile_id}에서 speedscope(https://www.speedscope.app) 형식 JSON을 받습니다.
+라우트 핸들러가 모두 async이므로 이벤트 루프 스레드만 표본으로 삼으며,
+같은 시각 루프에서 실행된 다른 요청의 코드도 표본에 섞일 수 있습니다.
+
+환경 변수:
+    PROFILE_TOKEN=                  프로파일 요청/조회용 비밀 값 (비어 있으면 헤더 요청과 조회 비활성화)
+    PROFILE_SAMPLE_RATE=0           무작위로 프로파일할 요청 비율 (0~1)
+    PROFILE_SAMPLE_ROUTES=          샘플링할 경로 접두사 (쉼표 구분, 비우면 전체)
+    PROFILE_INTERVAL_MS=5           스택 수집 간격
+    PROFILE_RING_SIZE=20            보관할 프로파일 수
+    PROFILE_MAX_SAMPLES=20000       프로파일 하나의 최대 표본 수
+"""
+
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Optional
+
+from metrics import current_cost
+from app_logging import get_logger, fields
+
+logger = get_logger("profiling")
+
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+SAMPLE_ROUTES = tuple(route.strip() for route in os.getenv("PROFILE_SAMPLE_ROUTES", "").split(",") if route.strip())
+INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", 5)) / 1000
+RING_SIZE = int(os.getenv("PROFILE_RING_SIZE", 20))
+MAX_SAMPLES = int(os.getenv("PROFILE_MAX_SAMPLES", 20000))
+MAX_DEPTH = 200
+
+HEADER = b"x-profile-token"
+# 프로파일 조회/메트릭/헬스 체크 요청은 프로파일하지 않음
+EXCLUDED_PREFIXES = ("/admin/profiles", "/metrics", "/health")
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+
+def configure(token: Optional[str] = None, sample_rate: Optional[float] = None, routes: Optional[tuple] = None,
+              interval_ms: Optional[float] = None):
+    """설정을 바꿉니다. (테스트/벤치마크용)"""
+    global PROFILE_TOKEN, SAMPLE_RATE, SAMPLE_ROUTES, INTERVAL
+    if token is not None:
+        PROFILE_TOKEN = token
+    if sample_rate is not None:
+        SAMPLE_RATE = sample_rate
+    if routes is not None:
+        SAMPLE_ROUTES = tuple(routes)
+    if interval_ms is not None:
+        INTERVAL = interval_ms / 1000
+
+
+def token_matches(value) -> bool:
+    """비밀 값 비교 (PROFILE_TOKEN이 비어 있으면 항상 False)"""
+    if not PROFILE_TOKEN or not value:
+        return False
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+    return hmac.compare_digest(value, PROFILE_TOKEN.encode("utf-8"))
+
+
+def _trigger(scope) -> Optional[str]:
+    """프로파일할 요청이면 이유("header"/"sampled"), 아니면 None"""
+    path = scope.get("path", "")
+    if path.startswith(EXCLUDED_PREFIXES):
+        return None
+    for name, value in scope.get("headers") or ():
+        if name == HEADER:
+            return "header" if token_matches(value) else None
+    if SAMPLE_RATE <= 0:
+        return None
+    if SAMPLE_ROUTES and not path.startswith(SAMPLE_ROUTES):
+        return None
+    return "sampled" if random.random() < SAMPLE_RATE else None
+
+
+class StackSampler:
+    """대상 스레드의 호출 스택을 일정 간격으로 수집하는 백그라운드 스레드"""
+
+    def __init__(self, thread_id: int, interval: float = None, max_samples: int = None):
+        self.thread_id = thread_id
+        self.interval = interval or INTERVAL
+        self.max_samples = max_samples or MAX_SAMPLES
+        self.frames = {}
+        self.samples = []
+        self.truncated = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self.started = time.perf_counter()
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _frame_index(self, code) -> int:
+        key = (code.co_filename, code.co_firstlineno, getattr(code, "co_qualname", code.co_name))
+        index = self.frames.get(key)
+        if index is None:
+            index = self.frames[key] = len(self.frames)
+        return index
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < MAX_DEPTH:
+                stack.append(self._frame_index(frame.f_code))
+                frame = frame.f_back
+            stack.reverse()
+            self.samples.append((time.perf_counter() - self.started, stack))
+            if len(self.samples) >= self.max_samples:
+                self.truncated = True
+                return
+
+
+class RequestProfile:
+    """요청 하나의 표본 프로파일과 외부 호출 타임라인"""
+
+    def __init__(self, scope, trigger: str, sampler: StackSampler, timeline: list):
+        self.profile_id = uuid.uuid4().hex[:16]
+        self.method = scope.get("method", "GET")
+        self.path = scope.get("path", "")
+        self.trigger = trigger
+        self.started_at = datetime.now().isoformat()
+        self.started = sampler.started
+        self.sampler = sampler
+        self.timeline = timeline
+        self.route = None
+        self.status = None
+        self.duration = 0.0
+
+    def summary(self) -> dict:
+        return {
+            "profile_id": self.profile_id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": self.status,
+            "trigger": self.trigger,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration * 1000, 3),
+            "samples": len(self.sampler.samples),
+            "truncated": self.sampler.truncated,
+            "calls": len(self.timeline),
+            "call_ms": {
+                kind: round(sum((end - start) * 1000 for k, _, start, end in self.timeline if k == kind), 3)
+                for kind in sorted({event[0] for event in self.timeline})
+            },
+        }
+
+    def timeline_dict(self) -> list:
+        return [
+            {"kind": kind, "name": name, "start_ms": round((start - self.started) * 1000, 3),
+             "duration_ms": round((end - start) * 1000, 3)}
+            for kind, name, start, end in self.timeline
+        ]
+
+    def to_speedscope(self) -> dict:
+        """speedscope 파일 형식 (표본 프로파일 1개 + 겹치지 않는 호출끼리 묶은 타임라인 레인)"""
+        frames = [{"name": name, "file": filename, "line": line}
+                  for (filename, line, name), _ in sorted(self.sampler.frames.items(), key=lambda item: item[1])]
+        end_ms = self.duration * 1000
+        samples, weights, previous = [], [], 0.0
+        for offset, stack in self.sampler.samples:
+            samples.append(stack)
+            weights.append(round(offset * 1000 - previous, 3))
+            previous = offset * 1000
+        name = f"{self.method} {self.path}"
+        profiles = [{
+            "type": "sampled",
+            "name": f"{name} (표본 {len(samples)}개)",
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": round(previous, 3),
+            "samples": samples,
+            "weights": weights,
+        }]
+
+        # 동시에 진행된 호출은 다른 레인에 넣어 열고 닫는 순서가 어긋나지 않게 함
+        lanes = []
+        for kind, call, start, end in sorted(self.timeline, key=lambda event: event[2]):
+            start_ms = max(0.0, (start - self.started) * 1000)
+            end_ms_call = max(start_ms, (end - self.started) * 1000)
+            index = len(frames)
+            frames.append({"name": f"{kind}: {call}", "file": kind})
+            for lane in lanes:
+                if lane["end"] <= start_ms:
+                    break
+            else:
+                lane = {"end": 0.0, "events": []}
+                lanes.append(lane)
+            lane["events"] += [{"type": "O", "frame": index, "at": round(start_ms, 3)},
+                               {"type": "C", "frame": index, "at": round(end_ms_call, 3)}]
+            lane["end"] = end_ms_call
+        for number, lane in enumerate(lanes, 1):
+            profiles.append({
+                "type": "evented",
+                "name": f"Firestore/OpenAI 호출 #{number}",
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": round(max(end_ms, lane["end"]), 3),
+                "events": lane["events"],
+            })
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": name,
+            "exporter": "uriwork-profiling",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": profiles,
+        }
+
+
+class ProfileRing:
+    """최근 프로파일을 보관하는 고정 크기 링 버퍼"""
+
+    def __init__(self, size: int = RING_SIZE):
+        self._profiles = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.captured = {"header": 0, "sampled": 0}
+
+    def add(self, profile: RequestProfile):
+        with self._lock:
+            self._profiles.append(profile)
+            self.captured[profile.trigger] += 1
+
+    def list(self) -> list:
+        with self._lock:
+            return [profile.summary() for profile in reversed(self._profiles)]
+
+    def get(self, profile_id: str) -> Optional[RequestProfile]:
+        with self._lock:
+            return next((profile for profile in self._profiles if profile.profile_id == profile_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"stored": len(self._profiles), "captured": dict(self.captured)}
+
+
+ring = ProfileRing()
+
+
+class ProfilingMiddleware:
+    """X-Profile-Token 헤더나 샘플링에 걸린 요청을 프로파일하는 ASGI 미들웨어 (MetricsMiddleware 안쪽에 둠)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        trigger = _trigger(scope) if scope["type"] == "http" else None
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        # 계측 프록시가 Firestore/OpenAI 호출을 이 목록에 기록
+        timeline = []
+        cost = current_cost()
+        if cost is not None:
+            cost.timeline = timeline
+        sampler = StackSampler(threading.get_ident())
+        profile = RequestProfile(scope, trigger, sampler, timeline)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                headers = list(message.get("headers") or [])
+                headers.append((b"x-profile-id", profile.profile_id.encode("ascii")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            sampler.stop()
+            profile.duration = time.perf_counter() - sampler.started
+            profile.route = cost.route if cost is not None else None
+            if cost is not None:
+                cost.timeline = None
+            ring.add(profile)
+            logger.info("요청 프로파일 저장", extra=fields(
+                profile_id=profile.profile_id, path=profile.path, trigger=trigger,
+                duration_ms=round(profile.duration * 1000, 1), samples=len(sampler.samples), calls=len(timeline)
+            ))
+
+
+def collect_metrics() -> list:
+    """metrics.registry.register_collector 용 프로파일링 메트릭을 반환합니다."""
+    stats = ring.stats()
+    return [
+        ("profiles_stored", "gauge", "메모리에 보관된 요청 프로파일 수", [({}, stats["stored"])]),
+        ("profiles_captured_total", "counter", "수집한 요청 프로파일 수",
+         [({"trigger": trigger}, count) for trigger, count in stats["captured"].items()]),
+    ]
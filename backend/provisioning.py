@@ -0,0 +1,424 @@
+"""
+직원 일괄 등록 (Firebase Auth import_users)
+직원 명단(CSV/JSON)을 스트리밍으로 읽어 1000명 단위로 Auth import_users를 호출하고,
+가져온 직원의 users, permissions, 기본 worker_schedules 문서를 여러 배치 쓰기로 병렬 저장합니다.
+행마다 결과(created/exists/invalid/failed)를 담은 보고서를 반환합니다.
+
+import_users는 이메일 중복을 검사하지 않으므로, 가져오기 전에 get_users로 이미 있는 이메일을 찾아
+가져오지 않고 exists로 보고합니다. (직접 가입한 직원, 실패 후 같은 명단을 다시 올린 경우)
+uid는 (비즈니스, 이메일)에서 만들어 같은 명단이 동시에 올라와도 계정이 둘 생기지 않습니다.
+이 비즈니스가 만든 계정인데 문서 저장이 실패했던 경우에만 문서를 다시 씁니다. 다른 경로로 생긴
+계정의 문서는 건드리지 않으므로 비즈니스 연결은 초대 코드로 합니다.
+
+명단 형식 (헤더 또는 키 이름):
+    email (필수), name, password, phone_number, department_id, work_fields (CSV에서는 ;로 구분)
+    Content-Type: text/csv | application/x-ndjson | application/json (배열)
+
+비밀번호가 있는 행은 passlib의 bcrypt로 해시해서 가져옵니다. (없으면 비밀번호 재설정으로 첫 로그인)
+Firebase Auth/Firestore 에뮬레이터에 대해 실행:
+    FIREBASE_AUTH_EMULATOR_HOST=localhost:9099 FIRESTORE_EMULATOR_HOST=localhost:8080 \\
+        python provisioning.py roster.csv --business-id <business_id>
+
+환경 변수:
+    PROVISION_MAX_ROWS=20000          한 번에 등록할 수 있는 최대 행 수
+    PROVISION_WRITE_CONCURRENCY=4     동시에 커밋하는 배치 수
+    PROVISION_BCRYPT_ROUNDS=10        비밀번호 해시 비용
+"""
+
+import argparse
+import asyncio
+import codecs
+import csv
+import hashlib
+import json
+import os
+import re
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
+from fastapi import APIRouter, HTTPException, Depends, Request
+from responses import FastJSONResponse
+from utils import get_current_user, get_auth
+import tenants
+from app_logging import get_logger, fields
+
+try:
+    from passlib.hash import bcrypt as bcrypt_hash
+except ImportError:
+    bcrypt_hash = None
+
+router = APIRouter(prefix="/provisioning", tags=["직원 등록"], default_response_class=FastJSONResponse)
+logger = get_logger("provisioning")
+
+# Auth import_users 한 번의 최대 사용자 수
+IMPORT_CHUNK_SIZE = 1000
+# Auth get_users 한 번의 최대 식별자 수
+LOOKUP_CHUNK_SIZE = 100
+# Firestore 배치 하나의 최대 쓰기 수
+BATCH_WRITE_LIMIT = 500
+MAX_ROWS = int(os.getenv("PROVISION_MAX_ROWS", 20000))
+WRITE_CONCURRENCY = int(os.getenv("PROVISION_WRITE_CONCURRENCY", 4))
+BCRYPT_ROUNDS = int(os.getenv("PROVISION_BCRYPT_ROUNDS", 10))
+
+ROSTER_FIELDS = ("email", "name", "password", "phone_number", "department_id", "work_fields")
+EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+CREATED = "created"
+EXISTS = "exists"
+INVALID = "invalid"
+FAILED = "failed"
+
+
+# 명단 읽기 (스트리밍)
+async def iter_csv_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[dict]:
+    """바이트 청크를 줄 단위로 나눠 CSV 행을 만듭니다. (따옴표 안의 줄바꿈 지원)"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    header = None
+    buffer = ""
+    record = ""
+
+    def parse(text: str):
+        nonlocal header
+        values = next(csv.reader([text]), [])
+        if header is None:
+            header = [value.strip().lower() for value in values]
+            return None
+        if not any(value.strip() for value in values):
+            return None
+        return dict(zip(header, values))
+
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            record += line + "\n"
+            # 따옴표가 닫히지 않았으면 다음 줄까지 이어서 한 행
+            if record.count('"') % 2:
+                continue
+            row = parse(record.rstrip("\r\n"))
+            record = ""
+            if row is not None:
+                yield row
+    record += buffer + decoder.decode(b"", final=True)
+    if record.strip():
+        row = parse(record.rstrip("\r\n"))
+        if row is not None:
+            yield row
+
+
+async def iter_ndjson_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[dict]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            if line.strip():
+                yield _json_row(line)
+    buffer += decoder.decode(b"", final=True)
+    if buffer.strip():
+        yield _json_row(buffer)
+
+
+async def iter_json_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[dict]:
+    # JSON 배열은 끝까지 읽어야 파싱할 수 있음 (큰 명단은 CSV나 NDJSON 권장)
+    body = b"".join([chunk async for chunk in chunks])
+    rows = json.loads(body.decode("utf-8-sig") or "[]")
+    if not isinstance(rows, list):
+        raise ValueError("JSON 명단은 배열이어야 합니다")
+    for row in rows:
+        yield row if isinstance(row, dict) else {}
+
+
+def _json_row(line: str) -> dict:
+    try:
+        row = json.loads(line)
+    except ValueError:
+        return {}
+    return row if isinstance(row, dict) else {}
+
+
+def roster_reader(content_type: Optional[str]):
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type in ("text/csv", "application/csv"):
+        return iter_csv_rows
+    if content_type in ("application/x-ndjson", "application/jsonl"):
+        return iter_ndjson_rows
+    if content_type == "application/json":
+        return iter_json_rows
+    raise ValueError("명단은 text/csv, application/x-ndjson, application/json 형식이어야 합니다")
+
+
+# 행 검증
+def normalize_row(row: dict) -> dict:
+    """명단 행을 정리합니다. 문제가 있으면 ValueError"""
+    entry = {field: row.get(field) for field in ROSTER_FIELDS}
+    email = str(entry["email"] or "").strip().lower()
+    if not EMAIL_PATTERN.match(email):
+        raise ValueError("이메일 형식이 올바르지 않습니다")
+    work_fields = entry["work_fields"] or []
+    if isinstance(work_fields, str):
+        work_fields = [field.strip() for field in work_fields.split(";") if field.strip()]
+    password = entry["password"] or None
+    if password is not None and len(str(password)) < 6:
+        raise ValueError("비밀번호는 6자 이상이어야 합니다")
+    if password is not None and bcrypt_hash is None:
+        raise ValueError("비밀번호를 가져오려면 passlib[bcrypt]가 필요합니다")
+    return {
+        "email": email,
+        "name": str(entry["name"] or "").strip() or email.split("@")[0],
+        "password": None if password is None else str(password),
+        "phone_number": str(entry["phone_number"] or "").strip() or None,
+        "department_id": str(entry["department_id"] or "").strip(),
+        "work_fields": list(work_fields),
+    }
+
+
+# Auth 가져오기
+def _hash_password(password: str) -> bytes:
+    return bcrypt_hash.using(rounds=BCRYPT_ROUNDS).hash(password).encode("utf-8")
+
+
+def provisioned_uid(business_id: str, email: str) -> str:
+    """(비즈니스, 이메일)로 정해지는 uid (같은 명단을 다시 가져와도 같은 계정)"""
+    return hashlib.sha256(f"{business_id}\n{email}".encode("utf-8")).hexdigest()[:28]
+
+
+def _existing_uids(auth, entries: list) -> dict:
+    """이미 Auth에 있는 이메일의 {행 위치: uid}"""
+    from firebase_admin import auth as firebase_auth
+    by_email = {}
+    for start in range(0, len(entries), LOOKUP_CHUNK_SIZE):
+        chunk = entries[start:start + LOOKUP_CHUNK_SIZE]
+        result = auth.get_users([firebase_auth.EmailIdentifier(entry["email"]) for entry in chunk])
+        for user in result.users:
+            by_email[(user.email or "").lower()] = user.uid
+    return {index: by_email[entry["email"]] for index, entry in enumerate(entries) if entry["email"] in by_email}
+
+
+def _import_chunk(auth, entries: list) -> tuple:
+    """
+    이미 있는 계정을 빼고 import_users 한 번으로 가져옵니다. (작업 스레드에서 실행)
+    ({행 위치: 실패 사유}, {행 위치: 기존 uid})를 반환합니다.
+    """
+    from firebase_admin import auth as firebase_auth
+    existing = _existing_uids(auth, entries)
+    to_import = [(index, entry) for index, entry in enumerate(entries) if index not in existing]
+    if not to_import:
+        return {}, existing
+    records = []
+    hashed = False
+    for _, entry in to_import:
+        password_hash = None
+        if entry["password"] is not None:
+            password_hash = _hash_password(entry["password"])
+            hashed = True
+        records.append(firebase_auth.ImportUserRecord(
+            uid=entry["uid"],
+            email=entry["email"],
+            display_name=entry["name"],
+            phone_number=entry["phone_number"],
+            password_hash=password_hash,
+        ))
+    result = auth.import_users(records, hash_alg=firebase_auth.UserImportHash.bcrypt() if hashed else None)
+    return {to_import[error.index][0]: error.reason for error in result.errors}, existing
+
+
+# Firestore 쓰기
+def _documents(db, business_id: str, entry: dict, now: str) -> list:
+    """직원 한 명에 대한 (문서 참조, 데이터) 목록"""
+    uid = entry["uid"]
+    documents = [(db.collection("users").document(uid), {
+        "uid": uid,
+        "email": entry["email"],
+        "name": entry["name"],
+        "user_type": "worker",
+        "provisioned_by": business_id,
+        "created_at": now,
+    })]
+    permission = {
+        "business_id": business_id,
+        "worker_id": uid,
+        "permission_level": "read",
+        "created_at": now,
+    }
+    for ref in tenants.collection("permissions", db).refs(business_id, f"{business_id}_{uid}"):
+        documents.append((ref, permission))
+    preferences = {
+        "worker_id": uid,
+        "business_id": business_id,
+        "department_id": entry["department_id"],
+        "work_fields": entry["work_fields"],
+        "preferred_off_days": [],
+        "min_work_hours": 4,
+        "max_work_hours": 8,
+        "preferred_work_days": [],
+        "preferred_work_hours": [],
+        "availability_score": 5,
+        "created_at": now,
+        "updated_at": now,
+    }
+    for ref in tenants.collection("worker_schedules", db).refs(business_id, f"{uid}_{business_id}"):
+        documents.append((ref, preferences))
+    return documents
+
+
+def _linked_uids(db, business_id: str, entries: list) -> set:
+    """비즈니스 권한 문서가 이미 있는 직원의 uid (직원 문서는 한 배치로 저장되므로 권한 문서로 판단)"""
+    permissions = tenants.collection("permissions", db)
+    return {entry["uid"] for entry in entries
+            if permissions.get(business_id, f"{business_id}_{entry['uid']}").exists}
+
+
+def _commit_batch(db, rows: list):
+    batch = db.batch()
+    for _, documents in rows:
+        for ref, data in documents:
+            batch.set(ref, data)
+    batch.commit()
+
+
+async def write_documents(db, business_id: str, entries: list, concurrency: int = WRITE_CONCURRENCY) -> dict:
+    """
+    가져온 직원의 문서를 배치로 나눠 병렬로 커밋합니다. {행 번호: 실패 사유} 반환
+    한 직원의 문서는 항상 같은 배치에 들어가므로 직원 단위로 성공/실패가 갈립니다.
+    """
+    now = datetime.now().isoformat()
+    batches, current, size = [], [], 0
+    for entry in entries:
+        documents = _documents(db, business_id, entry, now)
+        if current and size + len(documents) > BATCH_WRITE_LIMIT:
+            batches.append(current)
+            current, size = [], 0
+        current.append((entry["row"], documents))
+        size += len(documents)
+    if current:
+        batches.append(current)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    failures = {}
+
+    async def commit(rows):
+        async with semaphore:
+            try:
+                await asyncio.to_thread(_commit_batch, db, rows)
+            except Exception as e:
+                logger.warning("직원 문서 배치 저장 실패", extra=fields(rows=len(rows), error=str(e)))
+                failures.update({row: f"문서 저장 실패: {e}" for row, _ in rows})
+
+    await asyncio.gather(*(commit(rows) for rows in batches))
+    return failures
+
+
+# 전체 흐름
+async def provision(business_id: str, rows: AsyncIterator[dict], db=None, auth=None,
+                    max_rows: int = MAX_ROWS) -> dict:
+    """명단을 읽으며 1000명씩 Auth로 가져오고 문서를 저장합니다. 행별 결과 보고서를 반환합니다."""
+    if db is None:
+        from utils import db
+    auth = auth or get_auth()
+    results = []
+    seen_emails = set()
+    pending = []
+
+    async def flush():
+        if not pending:
+            return
+        entries = list(pending)
+        pending.clear()
+        try:
+            auth_errors, existing = await asyncio.to_thread(_import_chunk, auth, entries)
+        except Exception as e:
+            logger.warning("Auth 가져오기 실패", extra=fields(rows=len(entries), error=str(e)))
+            auth_errors = {index: f"Auth 가져오기 실패: {e}" for index in range(len(entries))}
+            existing = {}
+        # 이 비즈니스가 가져온 계정인데 문서가 없으면 (이전 실행의 문서 저장 실패) 문서만 다시 저장
+        own = [index for index, uid in existing.items() if uid == entries[index]["uid"]]
+        if own:
+            linked = await asyncio.to_thread(_linked_uids, db, business_id, [entries[index] for index in own])
+            for index in own:
+                if entries[index]["uid"] not in linked:
+                    del existing[index]
+        imported = [entry for index, entry in enumerate(entries) if index not in auth_errors and index not in existing]
+        write_errors = await write_documents(db, business_id, imported) if imported else {}
+        for index, entry in enumerate(entries):
+            if index in existing:
+                results.append({"row": entry["row"], "email": entry["email"], "status": EXISTS,
+                                "uid": existing[index], "error": "이미 가입된 이메일입니다"})
+                continue
+            error = auth_errors.get(index) or write_errors.get(entry["row"])
+            result = {"row": entry["row"], "email": entry["email"], "status": FAILED if error else CREATED}
+            if index not in auth_errors:
+                # 문서 저장만 실패한 경우에도 Auth 계정은 생성됨
+                result["uid"] = entry["uid"]
+            if error:
+                result["error"] = str(error)
+            results.append(result)
+
+    row_number = 0
+    async for row in rows:
+        row_number += 1
+        if row_number > max_rows:
+            results.append({"row": row_number, "email": row.get("email"), "status": INVALID,
+                            "error": f"한 번에 {max_rows}명까지 등록할 수 있습니다"})
+            continue
+        try:
+            entry = normalize_row(row)
+            if entry["email"] in seen_emails:
+                raise ValueError("명단에 같은 이메일이 이미 있습니다")
+        except ValueError as e:
+            results.append({"row": row_number, "email": row.get("email"), "status": INVALID, "error": str(e)})
+            continue
+        seen_emails.add(entry["email"])
+        pending.append({**entry, "row": row_number, "uid": provisioned_uid(business_id, entry["email"])})
+        if len(pending) >= IMPORT_CHUNK_SIZE:
+            await flush()
+    await flush()
+
+    results.sort(key=lambda result: result["row"])
+    summary = {status: sum(1 for result in results if result["status"] == status) for status in (CREATED, EXISTS, INVALID, FAILED)}
+    logger.info("직원 일괄 등록 완료", extra=fields(business_id=business_id, total=len(results), **summary))
+    return {"business_id": business_id, "total": len(results), **summary, "results": results}
+
+
+@router.post("/staff")
+async def provision_staff(request: Request, current_user: dict = Depends(get_current_user)):
+    """직원 명단(CSV/NDJSON/JSON 본문)으로 직원 계정을 일괄 생성하고 비즈니스에 등록합니다."""
+    try:
+        reader = roster_reader(request.headers.get("content-type"))
+        return await provision(current_user["uid"], reader(request.stream()))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def _file_chunks(path: str, chunk_size: int = 64 * 1024) -> AsyncIterator[bytes]:
+    with open(path, "rb") as roster:
+        while True:
+            chunk = roster.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def main():
+    parser = argparse.ArgumentParser(description="직원 명단으로 계정을 일괄 생성합니다")
+    parser.add_argument("roster", help="명단 파일 (.csv, .ndjson, .json)")
+    parser.add_argument("--business-id", required=True)
+    args = parser.parse_args()
+
+    from utils import load_environment
+    load_environment()
+    content_types = {".csv": "text/csv", ".ndjson": "application/x-ndjson", ".jsonl": "application/x-ndjson",
+                     ".json": "application/json"}
+    reader = roster_reader(content_types.get(os.path.splitext(args.roster)[1].lower()))
+    report = asyncio.run(provision(args.business_id, reader(_file_chunks(args.roster))))
+    print(json.dumps({key: value for key, value in report.items() if key != "results"}, ensure_ascii=False, indent=2))
+    for result in report["results"]:
+        if result["status"] != CREATED:
+            print(json.dumps(result, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+"""
+실시간 스케줄/예약 변경 피드 (fan-out 허브)
+인스턴스마다 구독 중인 비즈니스 하나당 Firestore on_snapshot 리스너 묶음(ai_schedules, bookings)을
+하나만 유지하고, 변경 사항을 그 비즈니스를 구독한 모든 클라이언트에게 나눠 보냅니다.
+직원 구독은 자신의 스케줄/예약 변경만 받습니다.
+
+느린 클라이언트의 큐가 가득 차면 쌓인 이벤트를 버리고 resync 이벤트 하나만 남겨
+클라이언트가 REST로 다시 조회하게 합니다. (메모리 무한 증가 방지)
+
+환경 변수:
+    FEED_QUEUE_SIZE=100          구독자별 이벤트 큐 크기
+    FEED_HEARTBEAT_INTERVAL=15   이벤트가 없을 때 하트비트 간격(초)
+"""
+
+import asyncio
+import os
+import threading
+from typing import Optional
+
+from app_logging import get_logger, fields
+import tenants
+
+logger = get_logger("realtime")
+
+QUEUE_SIZE = int(os.getenv("FEED_QUEUE_SIZE", 100))
+HEARTBEAT_INTERVAL = float(os.getenv("FEED_HEARTBEAT_INTERVAL", 15))
+
+# 구독하는 컬렉션과 이벤트 타입
+FEED_COLLECTIONS = {"ai_schedules": "schedule", "bookings": "booking"}
+
+
+class Subscription:
+    """클라이언트 하나의 구독 (크기 제한 이벤트 큐)"""
+
+    def __init__(self, business_id: str, worker_id: Optional[str] = None, queue_size: int = QUEUE_SIZE):
+        self.business_id = business_id
+        self.worker_id = worker_id
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def offer(self, event: dict) -> bool:
+        """이벤트를 큐에 넣습니다. 가득 차면 큐를 비우고 resync 이벤트로 대체합니다."""
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+                self.dropped += 1
+            self.queue.put_nowait({"type": "resync", "reason": "slow_consumer"})
+            return False
+
+    async def next_event(self, timeout: float = HEARTBEAT_INTERVAL) -> dict:
+        """다음 이벤트를 기다립니다. timeout 동안 없으면 하트비트 이벤트를 반환합니다."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return {"type": "heartbeat"}
+
+
+# 이벤트 변환 (직원 구독은 본인 데이터만)
+def _schedule_event(change: str, doc_id: str, data: dict, worker_id: Optional[str]) -> Optional[dict]:
+    event = {"type": "schedule", "change": change, "schedule_id": doc_id}
+    if worker_id is not None:
+        # 삭제 이벤트도 삭제 직전 내용에 본인 근무가 있던 스케줄만 보냄
+        my_schedule = (data.get("schedule_data") or {}).get(worker_id)
+        if my_schedule is None:
+            return None
+    if change == "removed":
+        return event
+    if worker_id is not None:
+        event["data"] = {
+            "schedule_id": doc_id,
+            "week_start_date": data.get("week_start_date"),
+            "week_end_date": data.get("week_end_date"),
+            "my_schedule": my_schedule,
+            "created_at": data.get("created_at"),
+        }
+        return event
+    event["data"] = {
+        "schedule_id": doc_id,
+        "week_start_date": data.get("week_start_date"),
+        "week_end_date": data.get("week_end_date"),
+        "total_workers": data.get("total_workers", 0),
+        "total_hours": data.get("total_hours", 0),
+        "satisfaction_score": data.get("satisfaction_score", 0.0),
+        "created_at": data.get("created_at"),
+        "updated_at": data.get("updated_at"),
+        "status": data.get("status", "unknown"),
+        "content_hash": data.get("content_hash"),
+    }
+    return event
+
+
+def _booking_event(change: str, doc_id: str, data: dict, worker_id: Optional[str]) -> Optional[dict]:
+    if worker_id is not None and data.get("worker_id") != worker_id:
+        return None
+    event = {"type": "booking", "change": change, "booking_id": doc_id}
+    if change != "removed":
+        event["data"] = data
+    return event
+
+
+_EVENT_BUILDERS = {"schedule": _schedule_event, "booking": _booking_event}
+
+
+class BusinessFeed:
+    """비즈니스 하나의 리스너 묶음과 구독자 목록"""
+
+    def __init__(self, hub, business_id: str):
+        self.hub = hub
+        self.business_id = business_id
+        self.subscribers = set()
+        self._watches = []
+
+    def start(self, db):
+        for collection, event_type in FEED_COLLECTIONS.items():
+            query = tenants.collection(collection, db).query(self.business_id)
+            self._watches.append(query.on_snapshot(self._callback(event_type)))
+        logger.info("실시간 피드 리스너 시작", extra=fields(business_id=self.business_id))
+
+    def stop(self):
+        while self._watches:
+            watch = self._watches.pop()
+            try:
+                watch.unsubscribe()
+            except Exception as e:
+                logger.warning("실시간 피드 리스너 해제 실패", extra=fields(business_id=self.business_id, error=str(e)))
+        logger.info("실시간 피드 리스너 종료", extra=fields(business_id=self.business_id))
+
+    def _callback(self, event_type: str):
+        initial = True
+
+        def callback(doc_snapshots, changes, read_time):
+            nonlocal initial
+            # 첫 콜백은 현재 상태 전체이므로 건너뜀 (클라이언트는 구독 전에 REST로 조회)
+            if initial:
+                initial = False
+                return
+            items = [
+                (change.type.name.lower(), change.document.id, change.document.to_dict() or {})
+                for change in changes
+            ]
+            if items:
+                # Firestore 콜백은 별도 스레드에서 호출되므로 이벤트 루프로 넘김
+                self.hub.call_in_loop(self.publish, event_type, items)
+
+        return callback
+
+    def publish(self, event_type: str, items: list):
+        build = _EVENT_BUILDERS[event_type]
+        for subscription in list(self.subscribers):
+            for change, doc_id, data in items:
+                event = build(change, doc_id, data, subscription.worker_id)
+                if event is None:
+                    continue
+                self.hub.events_total += 1
+                if not subscription.offer(event):
+                    self.hub.resyncs_total += 1
+
+
+class FeedHub:
+    """인스턴스 전체의 비즈니스 피드 관리자"""
+
+    def __init__(self):
+        self.feeds = {}
+        self._loop = None
+        self._lock = threading.Lock()
+        self.events_total = 0
+        self.resyncs_total = 0
+
+    def call_in_loop(self, fn, *args):
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            if loop.is_running() and _running_loop() is loop:
+                fn(*args)
+            else:
+                loop.call_soon_threadsafe(fn, *args)
+        except RuntimeError:
+            pass
+
+    async def subscribe(self, business_id: str, worker_id: Optional[str] = None, db=None) -> Subscription:
+        """비즈니스 피드를 구독합니다. 첫 구독자면 리스너를 시작합니다."""
+        self._loop = asyncio.get_running_loop()
+        subscription = Subscription(business_id, worker_id)
+        with self._lock:
+            feed = self.feeds.get(business_id)
+            created = feed is None
+            if created:
+                feed = self.feeds[business_id] = BusinessFeed(self, business_id)
+            feed.subscribers.add(subscription)
+        if created:
+            if db is None:
+                from utils import db
+            # on_snapshot 등록은 네트워크 왕복이 있어 스레드에서 실행 (요청이 취소돼도 등록은 끝까지 진행)
+            starting = asyncio.ensure_future(asyncio.to_thread(feed.start, db))
+            starting.add_done_callback(lambda task: self._started(feed, subscription, task))
+            try:
+                await asyncio.shield(starting)
+            except asyncio.CancelledError:
+                self.unsubscribe(subscription)
+                raise
+        return subscription
+
+    def _started(self, feed: BusinessFeed, subscription: Subscription, task: asyncio.Future):
+        """리스너 시작이 끝난 뒤 호출됩니다. 실패했으면 피드를 지우고, 그사이 구독자가 모두 떠났으면 리스너를 해제합니다."""
+        error = asyncio.CancelledError() if task.cancelled() else task.exception()
+        if error is not None:
+            self._discard(feed, subscription)
+            logger.warning("실시간 피드 리스너 시작 실패", extra=fields(business_id=feed.business_id, error=str(error)))
+            return
+        with self._lock:
+            orphaned = self.feeds.get(feed.business_id) is not feed
+        if orphaned:
+            feed.stop()
+
+    def _discard(self, feed: BusinessFeed, failed: Subscription):
+        """시작에 실패한 피드를 지우고 이미 시작한 리스너를 해제합니다. (그사이 합류한 구독자에게는 종료 이벤트)"""
+        with self._lock:
+            if self.feeds.get(feed.business_id) is feed:
+                del self.feeds[feed.business_id]
+            others = [subscription for subscription in feed.subscribers if subscription is not failed]
+            feed.subscribers.clear()
+        for subscription in others:
+            subscription.offer({"type": "close"})
+        feed.stop()
+
+    def unsubscribe(self, subscription: Subscription):
+        """구독을 해제합니다. 마지막 구독자면 리스너도 해제합니다."""
+        with self._lock:
+            feed = self.feeds.get(subscription.business_id)
+            if feed is None:
+                return
+            feed.subscribers.discard(subscription)
+            if feed.subscribers:
+                return
+            del self.feeds[subscription.business_id]
+        feed.stop()
+
+    def close(self):
+        """모든 리스너를 해제합니다. (앱 종료 시 호출)"""
+        with self._lock:
+            feeds = list(self.feeds.values())
+            self.feeds.clear()
+        for feed in feeds:
+            for subscription in list(feed.subscribers):
+                subscription.offer({"type": "close"})
+            feed.stop()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "businesses": len(self.feeds),
+                "subscribers": sum(len(feed.subscribers) for feed in self.feeds.values()),
+                "events_total": self.events_total,
+                "resyncs_total": self.resyncs_total,
+            }
+
+
+def _running_loop():
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+hub = FeedHub()
+
+
+def collect_metrics() -> list:
+    """metrics.registry.register_collector 용 실시간 피드 메트릭을 반환합니다."""
+    stats = hub.stats()
+    return [
+        ("feed_active_businesses", "gauge", "리스너가 열려 있는 비즈니스 수", [({}, stats["businesses"])]),
+        ("feed_subscribers", "gauge", "실시간 피드 구독자 수", [({}, stats["subscribers"])]),
+        ("feed_events_total", "counter", "구독자에게 보낸 변경 이벤트 수", [({}, stats["events_total"])]),
+        ("feed_resyncs_total", "counter", "느린 구독자 큐를 비우고 resync를 보낸 횟수", [({}, stats["resyncs_total"])]),
+    ]
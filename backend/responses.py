@@ -0,0 +1,184 @@
+"""
+응답 직렬화 및 압축
+대용량 스케줄 응답을 빠르게 직렬화하는 JSON 응답 클래스와
+Accept-Encoding 협상 기반 gzip/brotli 압축 미들웨어를 제공합니다.
+"""
+
+import gzip
+import json
+import os
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+# orjson은 선택적 의존성 (없으면 표준 json 사용)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# brotli도 선택적 의존성 (없으면 gzip만 협상)
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 환경 설정
+FAST_JSON_ENABLED = os.getenv("FAST_JSON", "1").lower() not in ("0", "false", "no")
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", 4))
+
+# 압축 대상 Content-Type
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "text/",
+    "application/javascript",
+    "application/xml",
+)
+
+
+def dumps(content: Any) -> bytes:
+    """객체를 JSON 바이트로 직렬화합니다. (orjson 우선)"""
+    if orjson is not None and FAST_JSON_ENABLED:
+        return orjson.dumps(content, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+        default=str,
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """orjson 기반 JSON 응답 클래스 (FAST_JSON=0 이면 표준 json 사용)"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def _parse_accept_encoding(header: str) -> dict:
+    """Accept-Encoding 헤더를 {인코딩: q값} 형태로 파싱합니다. (q=0은 거부)"""
+    encodings = {}
+    for part in header.split(","):
+        name, *params = part.split(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = min(1.0, max(0.0, float(value.strip())))
+                except ValueError:
+                    q = 0.0
+        encodings[name] = q
+    return encodings
+
+
+def negotiate_encoding(accept_encoding: str) -> str:
+    """클라이언트가 허용하는 압축 방식 중 q값이 가장 큰 것을 선택합니다. (같으면 br 우선, 목록에 없으면 * 값)"""
+    encodings = _parse_accept_encoding(accept_encoding or "")
+    wildcard = encodings.get("*", 0.0)
+    best, best_q = "identity", 0.0
+    for name in (("br",) if brotli is not None else ()) + ("gzip",):
+        q = encodings.get(name, wildcard)
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def weak_etag(value: bytes) -> bytes:
+    """압축한 본문은 원본과 바이트가 달라 강한 ETag를 쓸 수 없으므로 약한 ETag로 바꿉니다."""
+    return value if value.startswith(b"W/") else b"W/" + value
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """지정된 방식으로 본문을 압축합니다."""
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL)
+    return body
+
+
+class CompressionMiddleware:
+    """
+    응답 압축 ASGI 미들웨어
+    단일 청크 응답 중 임계값 이상이고 압축 가능한 타입만 압축합니다.
+    스트리밍 응답(more_body)은 그대로 전달합니다. 압축한 응답의 ETag는 약한 ETag(W/)로 바꿉니다.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = ""
+        for key, value in scope.get("headers", []):
+            if key == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+
+        encoding = negotiate_encoding(accept_encoding)
+        if encoding == "identity":
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                if message["status"] == 304:
+                    # 304는 압축했을 200과 같은 (약한) ETag를 보냄
+                    start_message = {**message, "headers": [
+                        (k, weak_etag(v) if k == b"etag" else v) for k, v in message.get("headers", [])
+                    ]}
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            headers = dict(start_message.get("headers", []))
+            content_type = headers.get(b"content-type", b"").decode("latin-1")
+            already_encoded = b"content-encoding" in headers
+
+            if (
+                more_body
+                or already_encoded
+                or len(body) < self.minimum_size
+                or not content_type.startswith(COMPRESSIBLE_TYPES)
+            ):
+                # 압축하지 않고 그대로 전달
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            compressed = compress(body, encoding)
+            new_headers = [
+                (k, weak_etag(v) if k == b"etag" else v) for k, v in start_message.get("headers", [])
+                if k != b"content-length"
+            ]
+            new_headers.append((b"content-encoding", encoding.encode("latin-1")))
+            new_headers.append((b"content-length", str(len(compressed)).encode("latin-1")))
+            new_headers.append((b"vary", b"Accept-Encoding"))
+
+            await send({**start_message, "headers": new_headers})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,380 @@
+"""
+직원별 근무 구간 색인 (비즈니스 간 이중 근무 검사)
+한 직원이 여러 비즈니스에 속할 수 있으므로(worker_schedules/{worker_id}_{business_id}),
+서로 다른 비즈니스의 스케줄이나 예약이 같은 직원을 같은 시각에 배치하지 않는지 확인합니다.
+
+직원마다 소속된 모든 비즈니스의 근무/예약 구간을 시작 시각 순으로 정렬해 두고,
+"이 구간과 겹치는 것이 있는가"를 bisect로 찾습니다. 가장 긴 구간 길이만큼만 앞으로 거슬러 보면 되므로
+조회는 O(log n + 겹치는 수)입니다.
+
+겹침으로 보는 경우:
+    - 다른 비즈니스의 근무/예약과 겹치는 경우
+    - 같은 직원의 예약끼리 겹치는 경우
+같은 비즈니스의 스케줄끼리(재생성한 다른 버전)나 근무 중의 예약은 정상이므로 제외합니다.
+
+색인은 인스턴스 메모리에 있고 처음 검사하는 직원은 Firestore에서 읽어 채우며,
+다른 인스턴스의 쓰기를 반영하도록 SHIFT_INDEX_TTL마다 다시 읽습니다.
+스케줄 하나의 직원들은 한 번에 읽습니다. 소속 비즈니스는 worker_id in [...] 쿼리(30명 단위)로 찾고,
+비즈니스마다 근무/예약을 한 번씩 읽어 직원별로 나눕니다. (직원 수가 아니라 비즈니스 수에 비례)
+필요한 Firestore 색인은 firestore.indexes.json에 있습니다.
+
+환경 변수:
+    SHIFT_INDEX_TTL=60                직원 색인을 다시 읽는 주기(초)
+    SHIFT_INDEX_MAX_WORKERS=10000     메모리에 둘 최대 직원 수 (LRU)
+    SHIFT_INDEX_LOOKBACK_DAYS=7       오늘 기준 이만큼 이전 근무부터 읽음
+"""
+
+import bisect
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Iterable, NamedTuple, Optional
+
+import tenants
+from app_logging import get_logger, fields
+from export import BOOKING_MINUTES, iter_shifts
+from write_behind import schedule_writer, merge_pending
+
+logger = get_logger("shift_index")
+
+INDEX_TTL = float(os.getenv("SHIFT_INDEX_TTL", 60))
+MAX_WORKERS = int(os.getenv("SHIFT_INDEX_MAX_WORKERS", 10000))
+LOOKBACK_DAYS = int(os.getenv("SHIFT_INDEX_LOOKBACK_DAYS", 7))
+
+SCHEDULE = "schedule"
+BOOKING = "booking"
+
+# Firestore in 쿼리의 최대 값 개수
+IN_QUERY_LIMIT = 30
+
+
+class Interval(NamedTuple):
+    start: datetime
+    end: datetime
+    worker_id: str
+    business_id: str
+    kind: str
+    source_id: str
+    label: str = ""
+
+    def conflicts_with(self, other: "Interval") -> bool:
+        if (self.kind, self.source_id) == (other.kind, other.source_id):
+            return False
+        if self.business_id != other.business_id:
+            return True
+        return self.kind == BOOKING and other.kind == BOOKING
+
+    def to_dict(self, viewer_business_id: Optional[str] = None) -> dict:
+        """응답용 표현 (다른 비즈니스의 구간은 시각만 공개)"""
+        other = viewer_business_id is not None and self.business_id != viewer_business_id
+        return {
+            "kind": self.kind,
+            "worker_id": self.worker_id,
+            "start": self.start.isoformat(),
+            "end": self.end.isoformat(),
+            "other_business": other,
+            "business_id": None if other else self.business_id,
+            "source_id": None if other else self.source_id,
+            "label": None if other else self.label,
+        }
+
+
+class WorkerIntervals:
+    """한 직원의 구간 목록 (시작 시각 순 정렬)"""
+
+    def __init__(self, businesses: Iterable[str] = ()):
+        self._starts = []
+        self._items = []
+        self.max_length = timedelta(0)
+        self.businesses = set(businesses)
+        self.loaded_at = time.monotonic()
+
+    def __len__(self):
+        return len(self._items)
+
+    def add(self, interval: Interval):
+        index = bisect.bisect_right(self._starts, interval.start)
+        self._starts.insert(index, interval.start)
+        self._items.insert(index, interval)
+        self.max_length = max(self.max_length, interval.end - interval.start)
+
+    def remove_source(self, kind: str, source_id: str):
+        items = [item for item in self._items if (item.kind, item.source_id) != (kind, source_id)]
+        if len(items) != len(self._items):
+            self._items = items
+            self._starts = [item.start for item in items]
+
+    def overlapping(self, start: datetime, end: datetime) -> list:
+        """[start, end)와 겹치는 구간 (start가 end - max_length 이후인 구간만 후보)"""
+        lo = bisect.bisect_left(self._starts, start - self.max_length)
+        hi = bisect.bisect_left(self._starts, end)
+        return [item for item in self._items[lo:hi] if item.end > start]
+
+
+# 문서 → 구간
+def schedule_intervals(schedule: dict, worker_id: Optional[str] = None) -> list:
+    business_id = schedule.get("business_id")
+    return [
+        Interval(shift["start"], shift["end"], shift["worker_id"], business_id, SCHEDULE,
+                 schedule.get("schedule_id"), f"{shift['day']}#{shift['index']}")
+        for shift in iter_shifts(schedule, worker_id)
+    ]
+
+
+def booking_intervals(booking: dict) -> list:
+    if not booking.get("worker_id") or booking.get("status") == "cancelled":
+        return []
+    try:
+        start = datetime.strptime(f"{booking.get('date')} {booking.get('time')}", "%Y-%m-%d %H:%M")
+    except (TypeError, ValueError):
+        return []
+    return [Interval(start, start + timedelta(minutes=BOOKING_MINUTES), booking["worker_id"],
+                     booking.get("business_id"), BOOKING, booking.get("booking_id"), booking.get("service_type") or "")]
+
+
+class ShiftIndex:
+    """직원별 구간 색인 (TTL + LRU)"""
+
+    def __init__(self, ttl: float = INDEX_TTL, max_workers: int = MAX_WORKERS, lookback_days: int = LOOKBACK_DAYS):
+        self.ttl = ttl
+        self.max_workers = max_workers
+        self.lookback_days = lookback_days
+        self._workers = OrderedDict()
+        self._sources = {}
+        self._lock = threading.RLock()
+        self.loads = 0
+        self.failures = 0
+        self.conflicts = {SCHEDULE: 0, BOOKING: 0}
+
+    # 조회
+    def workers(self, worker_ids: Iterable[str], db=None, business_id: Optional[str] = None) -> dict:
+        """직원들의 구간 목록 (없거나 TTL이 지난 직원만 한 번에 Firestore에서 읽음)"""
+        entries, missing = {}, []
+        now = time.monotonic()
+        with self._lock:
+            for worker_id in dict.fromkeys(worker_ids):
+                entry = self._workers.get(worker_id)
+                if entry is not None and now - entry.loaded_at < self.ttl and (
+                        business_id is None or business_id in entry.businesses):
+                    self._workers.move_to_end(worker_id)
+                    entries[worker_id] = entry
+                else:
+                    missing.append(worker_id)
+        if missing:
+            loaded = self._load(missing, db, business_id)
+            with self._lock:
+                for worker_id, entry in loaded.items():
+                    self._workers[worker_id] = entry
+                    self._workers.move_to_end(worker_id)
+                while len(self._workers) > self.max_workers:
+                    self._workers.popitem(last=False)
+            entries.update(loaded)
+        return entries
+
+    def worker(self, worker_id: str, db=None, business_id: Optional[str] = None) -> WorkerIntervals:
+        """직원 한 명의 구간 목록"""
+        return self.workers([worker_id], db, business_id)[worker_id]
+
+    def find_conflicts(self, intervals: list, db=None) -> list:
+        """각 구간과 겹치는 다른 구간을 찾습니다. [(구간, [겹치는 구간, ...]), ...]"""
+        entries = {}
+        by_business = {}
+        for interval in intervals:
+            by_business.setdefault(interval.business_id, set()).add(interval.worker_id)
+        for business_id, worker_ids in by_business.items():
+            entries[business_id] = self.workers(worker_ids, db, business_id)
+
+        result = []
+        for interval in intervals:
+            entry = entries[interval.business_id][interval.worker_id]
+            with self._lock:
+                overlaps = [item for item in entry.overlapping(interval.start, interval.end)
+                            if interval.conflicts_with(item)]
+            if overlaps:
+                result.append((interval, overlaps))
+        return result
+
+    # 쓰기 반영
+    def record(self, kind: str, source_id: str, intervals: list, db=None) -> list:
+        """
+        문서의 구간으로 색인을 갱신하고 기존 구간과의 겹침을 반환합니다.
+        같은 문서를 다시 기록하면 이전 구간을 바꿉니다. (스케줄 수정)
+        """
+        conflicts = self.find_conflicts(intervals, db)
+        with self._lock:
+            # 이전 구간 제거 (방금 읽은 색인에 이미 들어 있을 수도 있음: 쓰기 지연 큐의 스케줄)
+            previous = self._sources.pop((kind, source_id), set())
+            for worker_id in previous | {interval.worker_id for interval in intervals}:
+                entry = self._workers.get(worker_id)
+                if entry is not None:
+                    entry.remove_source(kind, source_id)
+            workers = set()
+            for interval in intervals:
+                entry = self._workers.get(interval.worker_id)
+                if entry is not None:
+                    entry.add(interval)
+                    workers.add(interval.worker_id)
+            if workers:
+                self._sources[(kind, source_id)] = workers
+            if conflicts:
+                self.conflicts[kind] += len(conflicts)
+        return conflicts
+
+    def invalidate(self, worker_id: Optional[str] = None):
+        with self._lock:
+            if worker_id is None:
+                self._workers.clear()
+                self._sources.clear()
+            else:
+                self._workers.pop(worker_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": len(self._workers),
+                "intervals": sum(len(entry) for entry in self._workers.values()),
+                "loads": self.loads,
+                "failures": self.failures,
+                "conflicts": dict(self.conflicts),
+            }
+
+    def _load(self, worker_ids: list, db, business_id: Optional[str]) -> dict:
+        db = db or _get_db()
+        cutoff = (date.today() - timedelta(days=self.lookback_days)).isoformat()
+
+        # 직원들이 속한 비즈니스 (선호도 등록 또는 초대 코드 사용)
+        memberships = {worker_id: {business_id} if business_id else set() for worker_id in worker_ids}
+        for name in ("worker_schedules", "permissions"):
+            for start in range(0, len(worker_ids), IN_QUERY_LIMIT):
+                chunk = worker_ids[start:start + IN_QUERY_LIMIT]
+                for doc in tenants.collection(name, db).all().where("worker_id", "in", chunk).stream():
+                    data = doc.to_dict() or {}
+                    if data.get("worker_id") in memberships:
+                        memberships[data["worker_id"]].add(data.get("business_id"))
+
+        members = {}
+        for worker_id, businesses in memberships.items():
+            businesses.discard(None)
+            for member_business_id in businesses:
+                members.setdefault(member_business_id, set()).add(worker_id)
+        entries = {worker_id: WorkerIntervals(businesses) for worker_id, businesses in memberships.items()}
+
+        # 비즈니스마다 근무와 예약을 한 번씩 읽어 직원별로 나눔
+        for member_business_id, worker_set in sorted(members.items()):
+            schedules = tenants.collection("ai_schedules", db).query(member_business_id).where(
+                "week_end_date", ">=", cutoff
+            ).stream()
+            pending = lambda d, b=member_business_id: d.get("business_id") == b and (d.get("week_end_date") or "") >= cutoff
+            for _, schedule in merge_pending(schedules, schedule_writer, pending):
+                for interval in schedule_intervals(schedule or {}):
+                    if interval.worker_id in worker_set:
+                        entries[interval.worker_id].add(interval)
+
+            bookings = tenants.collection("bookings", db).query(member_business_id).where(
+                "date", ">=", cutoff
+            ).stream()
+            for doc in bookings:
+                booking = doc.to_dict() or {}
+                if booking.get("worker_id") not in worker_set:
+                    continue
+                booking.setdefault("booking_id", doc.id)
+                for interval in booking_intervals(booking):
+                    entries[interval.worker_id].add(interval)
+
+        with self._lock:
+            self.loads += 1
+        logger.debug("직원 근무 색인 로드", extra=fields(
+            workers=len(worker_ids), businesses=len(members), intervals=sum(len(e) for e in entries.values())
+        ))
+        return entries
+
+
+def _get_db():
+    from utils import db
+    return db
+
+
+index = ShiftIndex()
+
+
+def _record_failure():
+    with index._lock:
+        index.failures += 1
+
+
+def conflicts_to_dict(conflicts: list, viewer_business_id: Optional[str] = None) -> list:
+    return [
+        {
+            "shift": interval.to_dict(viewer_business_id),
+            "conflicts": [other.to_dict(viewer_business_id) for other in overlaps],
+        }
+        for interval, overlaps in conflicts
+    ]
+
+
+def record_schedule(schedule: dict, db=None) -> list:
+    """
+    저장하는 스케줄을 색인에 반영하고 다른 비즈니스 근무/예약과 겹치는 근무를 반환합니다.
+    스케줄은 자동 생성되므로 거절하지 않고 겹침만 알려주며, 검사에 실패해도 저장은 계속합니다.
+    """
+    try:
+        conflicts = index.record(SCHEDULE, schedule.get("schedule_id"), schedule_intervals(schedule), db)
+    except Exception as e:
+        _record_failure()
+        logger.warning("이중 근무 검사 실패", extra=fields(schedule_id=schedule.get("schedule_id"), error=str(e)))
+        return []
+    if conflicts:
+        logger.info("다른 비즈니스와 겹치는 근무", extra=fields(
+            schedule_id=schedule.get("schedule_id"), conflicts=len(conflicts)
+        ))
+    return conflicts_to_dict(conflicts, schedule.get("business_id"))
+
+
+def check_booking(booking: dict, db=None) -> list:
+    """예약 시간에 담당 직원이 다른 근무나 예약과 겹치는지 확인합니다. (검사에 실패하면 겹침 없음으로 처리)"""
+    try:
+        conflicts = index.find_conflicts(booking_intervals(booking), db)
+    except Exception as e:
+        _record_failure()
+        logger.warning("이중 근무 검사 실패", extra=fields(booking_id=booking.get("booking_id"), error=str(e)))
+        return []
+    if conflicts:
+        with index._lock:
+            index.conflicts[BOOKING] += len(conflicts)
+    return conflicts_to_dict(conflicts, booking.get("business_id"))
+
+
+def check_schedule(schedule: dict, db=None) -> list:
+    """스케줄 근무가 같은 직원의 다른 비즈니스 근무/예약과 겹치는지 확인합니다. (색인은 바꾸지 않음)"""
+    try:
+        conflicts = index.find_conflicts(schedule_intervals(schedule), db)
+    except Exception as e:
+        _record_failure()
+        logger.warning("이중 근무 검사 실패", extra=fields(schedule_id=schedule.get("schedule_id"), error=str(e)))
+        return []
+    return conflicts_to_dict(conflicts, schedule.get("business_id"))
+
+
+def record_booking(booking: dict, db=None):
+    """저장한 예약을 색인에 반영합니다."""
+    try:
+        index.record(BOOKING, booking.get("booking_id"), booking_intervals(booking), db)
+    except Exception as e:
+        _record_failure()
+        logger.warning("예약 색인 반영 실패", extra=fields(booking_id=booking.get("booking_id"), error=str(e)))
+
+
+def collect_metrics() -> list:
+    """metrics.registry.register_collector 용 근무 색인 메트릭을 반환합니다."""
+    stats = index.stats()
+    return [
+        ("shift_index_workers", "gauge", "메모리에 색인된 직원 수", [({}, stats["workers"])]),
+        ("shift_index_intervals", "gauge", "색인된 근무/예약 구간 수", [({}, stats["intervals"])]),
+        ("shift_index_loads_total", "counter", "Firestore에서 직원 색인을 읽은 횟수 (스케줄/예약 단위 일괄)", [({}, stats["loads"])]),
+        ("shift_index_check_failures_total", "counter", "검사에 실패해 겹침 없음으로 처리한 수 (Firestore 색인 누락 등)",
+         [({}, stats["failures"])]),
+        ("shift_conflicts_total", "counter", "겹치는 근무/예약이 발견된 수",
+         [({"kind": kind}, count) for kind, count in stats["conflicts"].items()]),
+    ]
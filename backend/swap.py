@@ -0,0 +1,658 @@
+"""
+근무 교대(스왑) 마켓
+직원이 맡기 어려운 근무를 내놓으면(오퍼) 그 근무를 대신 맡을 수 있는 같은 파트 직원을 찾아 주고,
+다른 직원이 수락하면 AI 스케줄 문서의 해당 요일 근무만 필드 단위로 바꿉니다.
+비즈니스가 손으로 조정한 뒤 스케줄을 다시 생성할 필요가 없습니다.
+
+비즈니스마다 메모리에 두 색인을 둡니다.
+    오퍼    (department_id, work_fields, day, slot) → 열린 오퍼
+    직원    (department_id, day) → 그 요일에 일할 수 있는 직원 (선호 요일/휴무 희망 반영)
+새 오퍼의 후보는 (파트, 요일) 버킷의 직원만 선호 시간대/담당 분야로 거른 뒤
+(파트, 요일, 시간대)별로 캐시하므로 비즈니스 전체 직원이나 오퍼를 훑지 않습니다.
+하루 최대 근무 시간(max_work_hours)과 같은 날 겹치는 근무는 스케줄 문서를 보고 후보마다 확인합니다.
+
+수락은 트랜잭션 안에서 오퍼와 스케줄을 다시 읽어 검증한 뒤
+schedule_data.{직원}.schedule.{요일} 필드만 갱신하므로 동시에 들어온 수락 중 하나만 반영됩니다.
+
+환경 변수:
+    SWAP_BOOK_TTL=60                 비즈니스 색인을 다시 읽는 주기(초)
+    SWAP_BOOK_MAX_BUSINESSES=1000    메모리에 둘 최대 비즈니스 수 (LRU)
+    SWAP_MAX_CANDIDATES=20           오퍼 응답에 담을 최대 후보 수
+"""
+
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from fastapi import APIRouter, HTTPException, Depends
+
+from models import SwapOfferCreate
+from responses import FastJSONResponse
+from utils import get_current_user
+from etag import compute_content_hash, invalidate_schedule
+from export import DAYS, _parse_slot
+from write_behind import schedule_writer
+from archive import is_archived, rehydrate, restore
+import shift_index
+import tenants
+from app_logging import get_logger, fields
+
+router = APIRouter(prefix="/swap", tags=["근무 교대"], default_response_class=FastJSONResponse)
+logger = get_logger("swap")
+
+BOOK_TTL = float(os.getenv("SWAP_BOOK_TTL", 60))
+MAX_BUSINESSES = int(os.getenv("SWAP_BOOK_MAX_BUSINESSES", 1000))
+MAX_CANDIDATES = int(os.getenv("SWAP_MAX_CANDIDATES", 20))
+
+OPEN = "open"
+ACCEPTED = "accepted"
+CANCELLED = "cancelled"
+
+
+def _minutes(slot: str):
+    """'09:00-17:00' → (시작 분, 종료 분), 형식이 잘못되면 None"""
+    try:
+        return _parse_slot(slot)
+    except (AttributeError, ValueError):
+        return None
+
+
+def _slot_hours(slot: str) -> float:
+    minutes = _minutes(slot)
+    return (minutes[1] - minutes[0]) / 60 if minutes else 0.0
+
+
+def _overlaps(first, second) -> bool:
+    return first[0] < second[1] and second[0] < first[1]
+
+
+class Profile(NamedTuple):
+    """교대 후보 판단에 필요한 직원 선호도"""
+    worker_id: str
+    department_id: Optional[str]
+    work_fields: frozenset
+    days: frozenset
+    windows: tuple
+    max_work_hours: float
+    availability_score: float
+
+    @classmethod
+    def from_preferences(cls, data: dict) -> "Profile":
+        off_days = set(data.get("preferred_off_days") or [])
+        days = set(data.get("preferred_work_days") or DAYS) - off_days
+        windows = tuple(sorted(filter(None, (_minutes(hours) for hours in data.get("preferred_work_hours") or []))))
+        return cls(
+            worker_id=data.get("worker_id"),
+            department_id=data.get("department_id"),
+            work_fields=frozenset(data.get("work_fields") or []),
+            days=frozenset(days),
+            windows=_merge_windows(windows),
+            max_work_hours=float(data.get("max_work_hours") or 24),
+            availability_score=float(data.get("availability_score") or 0),
+        )
+
+    def allows_slot(self, slot_minutes) -> bool:
+        """선호 시간대가 근무 시간을 모두 덮는지 (선호 시간대가 없으면 언제든 가능)"""
+        if not self.windows:
+            return True
+        return any(start <= slot_minutes[0] and slot_minutes[1] <= end for start, end in self.windows)
+
+
+def _merge_windows(windows: tuple) -> tuple:
+    """이어지는 선호 시간대를 합칩니다. ('09:00-12:00', '12:00-18:00' → 09:00~18:00)"""
+    merged = []
+    for start, end in windows:
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return tuple(merged)
+
+
+def offer_key(offer: dict) -> tuple:
+    return (offer.get("department_id"), tuple(sorted(offer.get("work_fields") or [])), offer.get("day"), offer.get("slot"))
+
+
+def offer_id(schedule_id: str, worker_id: str, day: str, slot: str) -> str:
+    """같은 근무에 대한 오퍼는 하나만 생기도록 근무에서 문서 ID를 만듭니다."""
+    return hashlib.sha1(f"{schedule_id}|{worker_id}|{day}|{slot}".encode("utf-8")).hexdigest()[:24]
+
+
+def day_load(schedule: dict, worker_id: str, day: str) -> list:
+    """스케줄에서 직원의 해당 요일 근무 시간대 목록"""
+    entry = (schedule.get("schedule_data") or {}).get(worker_id) or {}
+    return list((entry.get("schedule") or {}).get(day) or [])
+
+
+def check_taker(profile: Profile, schedule: dict, day: str, slot: str) -> Optional[str]:
+    """근무를 맡을 수 없는 이유 (맡을 수 있으면 None)"""
+    slot_minutes = _minutes(slot)
+    existing = [_minutes(current) for current in day_load(schedule, profile.worker_id, day)]
+    if any(current and _overlaps(current, slot_minutes) for current in existing):
+        return "같은 날 겹치는 근무가 있습니다"
+    worked = sum((current[1] - current[0]) / 60 for current in existing if current)
+    if worked + _slot_hours(slot) > profile.max_work_hours:
+        return "하루 최대 근무 시간을 넘습니다"
+    return None
+
+
+class SwapBook:
+    """한 비즈니스의 열린 오퍼와 직원 선호도 색인"""
+
+    def __init__(self, business_id: str):
+        self.business_id = business_id
+        self.offers = {}
+        self.profiles = {}
+        self._offer_keys = defaultdict(set)
+        self._day_keys = defaultdict(set)
+        self._day_workers = defaultdict(set)
+        self._eligible = {}
+        self.loaded_at = time.monotonic()
+
+    # 오퍼 색인
+    def add_offer(self, offer: dict):
+        self.remove_offer(offer["offer_id"])
+        key = offer_key(offer)
+        self.offers[offer["offer_id"]] = offer
+        self._offer_keys[key].add(offer["offer_id"])
+        self._day_keys[(key[0], key[2])].add(key)
+
+    def remove_offer(self, offer_id: str):
+        offer = self.offers.pop(offer_id, None)
+        if offer is None:
+            return
+        key = offer_key(offer)
+        ids = self._offer_keys.get(key)
+        if ids is not None:
+            ids.discard(offer_id)
+            if not ids:
+                del self._offer_keys[key]
+                self._day_keys[(key[0], key[2])].discard(key)
+
+    # 직원 색인
+    def set_profile(self, profile: Profile):
+        previous = self.profiles.get(profile.worker_id)
+        if previous is not None:
+            for day in previous.days:
+                self._day_workers[(previous.department_id, day)].discard(previous.worker_id)
+        self.profiles[profile.worker_id] = profile
+        for day in profile.days:
+            self._day_workers[(profile.department_id, day)].add(profile.worker_id)
+        self._eligible.clear()
+
+    def eligible(self, department_id: Optional[str], day: str, slot: str) -> tuple:
+        """선호 요일/시간대로 근무를 맡을 수 있는 파트 직원 (시간대별 캐시)"""
+        cache_key = (department_id, day, slot)
+        workers = self._eligible.get(cache_key)
+        if workers is None:
+            slot_minutes = _minutes(slot)
+            workers = tuple(sorted(
+                worker_id for worker_id in self._day_workers.get((department_id, day), ())
+                if slot_minutes and self.profiles[worker_id].allows_slot(slot_minutes)
+            ))
+            self._eligible[cache_key] = workers
+        return workers
+
+    # 매칭
+    def candidates(self, offer: dict, schedule: dict) -> list:
+        """오퍼를 맡을 수 있는 직원 (가용성 점수 높은 순, 같은 날 근무가 적은 순)"""
+        required = set(offer.get("work_fields") or [])
+        result = []
+        for worker_id in self.eligible(offer.get("department_id"), offer["day"], offer["slot"]):
+            profile = self.profiles[worker_id]
+            if worker_id == offer["worker_id"] or not required <= profile.work_fields:
+                continue
+            if check_taker(profile, schedule, offer["day"], offer["slot"]) is None:
+                hours = sum(_slot_hours(slot) for slot in day_load(schedule, worker_id, offer["day"]))
+                result.append((-profile.availability_score, hours, worker_id))
+        result.sort()
+        return [{"worker_id": worker_id, "availability_score": -score, "hours_that_day": hours}
+                for score, hours, worker_id in result]
+
+    def offers_for(self, profile: Profile) -> list:
+        """직원이 선호 요일/시간대/담당 분야로 맡을 수 있는 열린 오퍼 (스케줄 확인 전)"""
+        result = []
+        for day in profile.days:
+            for key in self._day_keys.get((profile.department_id, day), ()):
+                slot_minutes = _minutes(key[3])
+                if not set(key[1]) <= profile.work_fields or not slot_minutes or not profile.allows_slot(slot_minutes):
+                    continue
+                result.extend(self.offers[offer_id] for offer_id in self._offer_keys[key]
+                              if self.offers[offer_id]["worker_id"] != profile.worker_id)
+        return result
+
+
+class SwapIndex:
+    """비즈니스별 SwapBook (TTL + LRU)"""
+
+    def __init__(self, ttl: float = BOOK_TTL, max_businesses: int = MAX_BUSINESSES):
+        self.ttl = ttl
+        self.max_businesses = max_businesses
+        self._books = OrderedDict()
+        self._lock = threading.RLock()
+        self.loads = 0
+        self.events = {"created": 0, "accepted": 0, "cancelled": 0, "rejected": 0}
+
+    @property
+    def lock(self):
+        return self._lock
+
+    def book(self, business_id: str, db=None) -> SwapBook:
+        with self._lock:
+            book = self._books.get(business_id)
+            if book is not None and time.monotonic() - book.loaded_at < self.ttl:
+                self._books.move_to_end(business_id)
+                return book
+        book = self._load(business_id, db)
+        with self._lock:
+            self._books[business_id] = book
+            self._books.move_to_end(business_id)
+            while len(self._books) > self.max_businesses:
+                self._books.popitem(last=False)
+        return book
+
+    def loaded(self, business_id: str) -> Optional[SwapBook]:
+        """메모리에 있는 색인 (없으면 None, 읽지 않음)"""
+        with self._lock:
+            return self._books.get(business_id)
+
+    def invalidate(self, business_id: Optional[str] = None):
+        with self._lock:
+            if business_id is None:
+                self._books.clear()
+            else:
+                self._books.pop(business_id, None)
+
+    def count(self, event: str):
+        with self._lock:
+            self.events[event] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "businesses": len(self._books),
+                "open_offers": sum(len(book.offers) for book in self._books.values()),
+                "profiles": sum(len(book.profiles) for book in self._books.values()),
+                "loads": self.loads,
+                "events": dict(self.events),
+            }
+
+    def _load(self, business_id: str, db) -> SwapBook:
+        book = SwapBook(business_id)
+        for doc in tenants.collection("worker_schedules", db).query(business_id).stream():
+            data = doc.to_dict() or {}
+            if data.get("worker_id"):
+                book.set_profile(Profile.from_preferences(data))
+        offers = tenants.collection("swap_offers", db).query(business_id).where("status", "==", OPEN).stream()
+        for doc in offers:
+            book.add_offer({**(doc.to_dict() or {}), "offer_id": doc.id})
+        with self._lock:
+            self.loads += 1
+        logger.debug("교대 색인 로드", extra=fields(
+            business_id=business_id, offers=len(book.offers), profiles=len(book.profiles)
+        ))
+        return book
+
+
+index = SwapIndex()
+
+
+def record_profile(preferences: dict):
+    """직원 선호도가 바뀌면 메모리에 있는 색인에 반영합니다. (worker.py에서 호출)"""
+    with index.lock:
+        book = index.loaded(preferences.get("business_id"))
+        if book is not None:
+            book.set_profile(Profile.from_preferences(preferences))
+
+
+def collect_metrics() -> list:
+    """metrics.registry.register_collector 용 교대 마켓 메트릭을 반환합니다."""
+    stats = index.stats()
+    return [
+        ("swap_books", "gauge", "메모리에 색인된 비즈니스 수", [({}, stats["businesses"])]),
+        ("swap_open_offers", "gauge", "색인된 열린 교대 오퍼 수", [({}, stats["open_offers"])]),
+        ("swap_profiles", "gauge", "색인된 직원 선호도 수", [({}, stats["profiles"])]),
+        ("swap_book_loads_total", "counter", "Firestore에서 교대 색인을 읽은 횟수", [({}, stats["loads"])]),
+        ("swap_offers_total", "counter", "교대 오퍼 처리 수",
+         [({"event": event}, count) for event, count in stats["events"].items()]),
+    ]
+
+
+# 조회 헬퍼
+def _load_schedule(schedule_id: str, business_id: str) -> dict:
+    """스케줄 (저장 대기 중이면 큐에서, 보관됐으면 복원해서 읽음)"""
+    schedule = schedule_writer.get(schedule_id)
+    if schedule is None:
+        doc = tenants.collection("ai_schedules").get(business_id, schedule_id)
+        if not doc.exists:
+            raise HTTPException(status_code=404, detail="스케줄을 찾을 수 없습니다")
+        schedule = doc.to_dict()
+        if is_archived(schedule):
+            schedule = rehydrate(schedule_id, schedule)
+    if schedule.get("business_id") != business_id:
+        raise HTTPException(status_code=404, detail="스케줄을 찾을 수 없습니다")
+    return schedule
+
+
+def _load_offer(business_id: str, offer_id: str) -> dict:
+    doc = tenants.collection("swap_offers").get(business_id, offer_id)
+    if not doc.exists:
+        raise HTTPException(status_code=404, detail="오퍼를 찾을 수 없습니다")
+    return {**doc.to_dict(), "offer_id": doc.id}
+
+
+def _check_member(business_id: str, current_user: dict) -> bool:
+    """비즈니스 본인이면 True, 권한이 있는 직원이면 False, 아니면 403"""
+    if current_user["uid"] == business_id:
+        return True
+    permission_doc = tenants.collection("permissions").get(business_id, f"{business_id}_{current_user['uid']}")
+    if not permission_doc.exists:
+        raise HTTPException(status_code=403, detail="권한이 없습니다")
+    return False
+
+
+def _taker_profile(book: SwapBook, business_id: str, worker_id: str) -> Profile:
+    profile = book.profiles.get(worker_id)
+    if profile is None:
+        doc = tenants.collection("worker_schedules").get(business_id, f"{worker_id}_{business_id}")
+        if not doc.exists:
+            raise HTTPException(status_code=400, detail="스케줄 선호도를 먼저 등록해야 합니다")
+        profile = Profile.from_preferences(doc.to_dict())
+    return profile
+
+
+def _field(*parts: str) -> str:
+    """요일처럼 한글이 들어간 필드 경로는 백틱으로 감싸야 합니다."""
+    from google.cloud.firestore_v1.field_path import FieldPath
+    return FieldPath(*parts).to_api_repr()
+
+
+def _read_refs(transaction, collection: str, business_id: str, doc_id: str):
+    """트랜잭션 안에서 문서의 모든 저장 경로를 읽어 (읽기 경로의 데이터, [(참조, 존재 여부)])를 반환합니다."""
+    hot = tenants.collection(collection)
+    refs = hot.refs(business_id, doc_id)
+    snapshots = [ref.get(transaction=transaction) for ref in refs]
+    # dual 모드 refs는 최상위 → 하위 순서, 이전된 컬렉션은 하위 컬렉션을 우선
+    ordered = list(zip(refs, snapshots))
+    if hot.reads_scoped():
+        ordered.reverse()
+    data = next((snapshot.to_dict() for _, snapshot in ordered if snapshot.exists), None)
+    return data, [(ref, snapshot.exists) for ref, snapshot in zip(refs, snapshots)]
+
+
+def _write_refs(transaction, refs: list, updates: dict, full_document: dict):
+    """존재하는 경로는 필드만 갱신하고, 아직 이전되지 않은 경로에는 갱신된 전체 문서를 씁니다."""
+    for ref, exists in refs:
+        if exists:
+            transaction.update(ref, updates)
+        else:
+            transaction.set(ref, full_document)
+
+
+def _accept_offer(transaction, business_id: str, offer_id: str, taker: Profile, now: str) -> tuple:
+    offer, offer_refs = _read_refs(transaction, "swap_offers", business_id, offer_id)
+    if offer is None:
+        raise HTTPException(status_code=404, detail="오퍼를 찾을 수 없습니다")
+    if offer.get("status") != OPEN:
+        raise HTTPException(status_code=409, detail="이미 처리된 오퍼입니다")
+    schedule_id, day, slot, giver = offer["schedule_id"], offer["day"], offer["slot"], offer["worker_id"]
+    schedule, schedule_refs = _read_refs(transaction, "ai_schedules", business_id, schedule_id)
+    if schedule is None:
+        raise HTTPException(status_code=404, detail="스케줄을 찾을 수 없습니다")
+
+    # 트랜잭션 안에서 다시 검증 (오퍼 이후 스케줄이 바뀌었을 수 있음)
+    giver_slots = day_load(schedule, giver, day)
+    if slot not in giver_slots:
+        raise HTTPException(status_code=409, detail="오퍼한 근무가 스케줄에 더 이상 없습니다")
+    reason = check_taker(taker, schedule, day, slot)
+    if reason:
+        raise HTTPException(status_code=409, detail=reason)
+
+    # 바뀌는 요일 필드만 갱신
+    giver_slots.remove(slot)
+    taker_slots = sorted(day_load(schedule, taker.worker_id, day) + [slot], key=lambda s: _minutes(s) or (0, 0))
+    schedule_data = schedule.setdefault("schedule_data", {})
+    updates = {_field("schedule_data", giver, "schedule", day): giver_slots}
+    schedule_data[giver]["schedule"][day] = giver_slots
+    if taker.worker_id in schedule_data:
+        updates[_field("schedule_data", taker.worker_id, "schedule", day)] = taker_slots
+        schedule_data[taker.worker_id].setdefault("schedule", {})[day] = taker_slots
+    else:
+        entry = {
+            "employee_id": taker.worker_id,
+            "department_id": taker.department_id,
+            "work_fields": sorted(taker.work_fields),
+            "schedule": {name: (taker_slots if name == day else []) for name in DAYS},
+        }
+        updates[_field("schedule_data", taker.worker_id)] = entry
+        schedule_data[taker.worker_id] = entry
+    schedule["updated_at"] = now
+    schedule["content_hash"] = compute_content_hash(schedule)
+    updates.update(updated_at=now, content_hash=schedule["content_hash"])
+    _write_refs(transaction, schedule_refs, updates, schedule)
+
+    offer_updates = {"status": ACCEPTED, "accepted_by": taker.worker_id, "accepted_at": now, "updated_at": now}
+    offer.update(offer_updates)
+    _write_refs(transaction, offer_refs, offer_updates, offer)
+    return {**offer, "offer_id": offer_id}, schedule
+
+
+def _cancel_offer(transaction, business_id: str, offer_id: str, user_id: str, is_owner: bool, now: str):
+    offer, offer_refs = _read_refs(transaction, "swap_offers", business_id, offer_id)
+    if offer is None:
+        raise HTTPException(status_code=404, detail="오퍼를 찾을 수 없습니다")
+    if not is_owner and offer.get("worker_id") != user_id:
+        raise HTTPException(status_code=403, detail="권한이 없습니다")
+    if offer.get("status") != OPEN:
+        raise HTTPException(status_code=409, detail="이미 처리된 오퍼입니다")
+    updates = {"status": CANCELLED, "updated_at": now}
+    _write_refs(transaction, offer_refs, updates, {**offer, **updates})
+
+
+# 교대 오퍼 등록
+@router.post("/offers")
+async def create_swap_offer(request: SwapOfferCreate, current_user: dict = Depends(get_current_user)):
+    """맡기 어려운 근무를 오퍼로 올리고 대신 맡을 수 있는 직원 후보를 반환합니다."""
+    try:
+        is_owner = _check_member(request.business_id, current_user)
+        worker_id = request.worker_id or current_user["uid"]
+        if worker_id != current_user["uid"] and not is_owner:
+            raise HTTPException(status_code=403, detail="본인의 근무만 오퍼할 수 있습니다")
+        if request.day not in DAYS or _minutes(request.slot) is None:
+            raise HTTPException(status_code=400, detail="요일 또는 시간대 형식이 올바르지 않습니다")
+
+        schedule = _load_schedule(request.schedule_id, request.business_id)
+        entry = (schedule.get("schedule_data") or {}).get(worker_id)
+        if request.slot not in day_load(schedule, worker_id, request.day):
+            raise HTTPException(status_code=400, detail="스케줄에 없는 근무입니다")
+
+        book = index.book(request.business_id)
+        new_offer_id = offer_id(request.schedule_id, worker_id, request.day, request.slot)
+        offers = tenants.collection("swap_offers")
+        existing = offers.get(request.business_id, new_offer_id)
+        if existing.exists and existing.to_dict().get("status") == OPEN:
+            offer = {**existing.to_dict(), "offer_id": new_offer_id}
+        else:
+            now = datetime.now().isoformat()
+            offer = {
+                "offer_id": new_offer_id,
+                "business_id": request.business_id,
+                "schedule_id": request.schedule_id,
+                "week_start_date": schedule.get("week_start_date"),
+                "worker_id": worker_id,
+                "department_id": entry.get("department_id"),
+                "work_fields": sorted(entry.get("work_fields") or []),
+                "day": request.day,
+                "slot": request.slot,
+                "hours": _slot_hours(request.slot),
+                "status": OPEN,
+                "created_at": now,
+                "updated_at": now,
+            }
+            offers.set(request.business_id, new_offer_id, offer)
+            index.count("created")
+        with index.lock:
+            book.add_offer(offer)
+            candidates = book.candidates(offer, schedule)
+
+        logger.info("교대 오퍼 등록", extra=fields(
+            business_id=request.business_id, offer_id=new_offer_id, candidates=len(candidates)
+        ))
+        return {"offer": offer, "candidates": candidates[:MAX_CANDIDATES], "candidate_count": len(candidates)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# 열린 오퍼 조회
+@router.get("/offers/{business_id}")
+async def list_swap_offers(business_id: str, current_user: dict = Depends(get_current_user)):
+    """비즈니스는 모든 열린 오퍼를, 직원은 본인이 올린 오퍼와 맡을 수 있는 오퍼를 조회합니다."""
+    try:
+        is_owner = _check_member(business_id, current_user)
+        book = index.book(business_id)
+        if is_owner:
+            with index.lock:
+                return {"offers": list(book.offers.values())}
+
+        worker_id = current_user["uid"]
+        with index.lock:
+            mine = [offer for offer in book.offers.values() if offer["worker_id"] == worker_id]
+            profile = book.profiles.get(worker_id)
+            matches = book.offers_for(profile) if profile else []
+        # 하루 최대 근무 시간/겹치는 근무는 스케줄별로 한 번만 읽어 확인
+        schedules, available = {}, []
+        for offer in matches:
+            schedule_id = offer["schedule_id"]
+            if schedule_id not in schedules:
+                try:
+                    schedules[schedule_id] = _load_schedule(schedule_id, business_id)
+                except HTTPException:
+                    schedules[schedule_id] = None
+            schedule = schedules[schedule_id]
+            if schedule is not None and check_taker(profile, schedule, offer["day"], offer["slot"]) is None:
+                available.append(offer)
+        return {"offers": mine, "available": available}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# 오퍼 후보 조회
+@router.get("/offers/{business_id}/{offer_id}/candidates")
+async def get_swap_candidates(business_id: str, offer_id: str, current_user: dict = Depends(get_current_user)):
+    """오퍼를 대신 맡을 수 있는 직원 후보를 반환합니다."""
+    try:
+        is_owner = _check_member(business_id, current_user)
+        offer = _load_offer(business_id, offer_id)
+        if not is_owner and offer["worker_id"] != current_user["uid"]:
+            raise HTTPException(status_code=403, detail="권한이 없습니다")
+        if offer.get("status") != OPEN:
+            return {"offer": offer, "candidates": [], "candidate_count": 0}
+        schedule = _load_schedule(offer["schedule_id"], business_id)
+        book = index.book(business_id)
+        with index.lock:
+            candidates = book.candidates(offer, schedule)
+        return {"offer": offer, "candidates": candidates[:MAX_CANDIDATES], "candidate_count": len(candidates)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# 오퍼 수락
+@router.post("/offers/{business_id}/{offer_id}/accept")
+async def accept_swap_offer(business_id: str, offer_id: str, current_user: dict = Depends(get_current_user)):
+    """오퍼를 수락해 스케줄의 해당 근무를 수락한 직원에게 넘깁니다."""
+    try:
+        if _check_member(business_id, current_user):
+            raise HTTPException(status_code=400, detail="오퍼는 직원만 수락할 수 있습니다")
+        from utils import db
+        offer = _load_offer(business_id, offer_id)
+        if offer.get("status") != OPEN:
+            raise HTTPException(status_code=409, detail="이미 처리된 오퍼입니다")
+        if offer["worker_id"] == current_user["uid"]:
+            raise HTTPException(status_code=400, detail="본인이 올린 오퍼입니다")
+
+        book = index.book(business_id)
+        taker = _taker_profile(book, business_id, current_user["uid"])
+        if taker.department_id != offer.get("department_id") or not set(offer.get("work_fields") or []) <= taker.work_fields:
+            raise HTTPException(status_code=409, detail="담당 파트나 분야가 맞지 않습니다")
+
+        # 다른 비즈니스 근무/예약과 겹치면 거절
+        schedule_id = offer["schedule_id"]
+        schedule = _load_schedule(schedule_id, business_id)
+        shift_conflicts = await asyncio.to_thread(shift_index.check_schedule, {
+            "schedule_id": schedule_id,
+            "business_id": business_id,
+            "week_start_date": schedule.get("week_start_date"),
+            "week_end_date": schedule.get("week_end_date"),
+            "schedule_data": {taker.worker_id: {"schedule": {offer["day"]: [offer["slot"]]}}},
+        }, db)
+        if shift_conflicts:
+            index.count("rejected")
+            raise HTTPException(status_code=409, detail={
+                "message": "다른 근무나 예약과 겹칩니다", "conflicts": shift_conflicts
+            })
+
+        # 아직 저장 대기 중이거나 보관된 스케줄이면 원래 문서로 만든 뒤 갱신
+        if not await asyncio.to_thread(schedule_writer.ensure_persisted, schedule_id):
+            raise HTTPException(status_code=503, detail="스케줄이 아직 저장되지 않았습니다. 잠시 후 다시 시도해주세요")
+        restore(schedule_id, business_id)
+        from google.cloud import firestore
+        try:
+            accepted, updated_schedule = firestore.transactional(_accept_offer)(
+                db.transaction(), business_id, offer_id, taker, datetime.now().isoformat()
+            )
+        except HTTPException:
+            index.count("rejected")
+            raise
+
+        invalidate_schedule(schedule_id, business_id)
+        await asyncio.to_thread(
+            shift_index.record_schedule,
+            {**updated_schedule, "schedule_id": schedule_id, "business_id": business_id}, db
+        )
+        with index.lock:
+            book.remove_offer(offer_id)
+        index.count("accepted")
+        logger.info("교대 오퍼 수락", extra=fields(
+            business_id=business_id, offer_id=offer_id, schedule_id=schedule_id,
+            from_worker=accepted["worker_id"], to_worker=taker.worker_id
+        ))
+        return {"message": "근무 교대가 반영되었습니다", "offer": accepted}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# 오퍼 취소
+@router.delete("/offers/{business_id}/{offer_id}")
+async def cancel_swap_offer(business_id: str, offer_id: str, current_user: dict = Depends(get_current_user)):
+    """오퍼를 올린 직원이나 비즈니스가 열린 오퍼를 취소합니다."""
+    try:
+        is_owner = _check_member(business_id, current_user)
+        # 수락과 동시에 들어와도 한쪽만 반영되도록 트랜잭션으로 상태 확인
+        from utils import db
+        from google.cloud import firestore
+        firestore.transactional(_cancel_offer)(
+            db.transaction(), business_id, offer_id, current_user["uid"], is_owner, datetime.now().isoformat()
+        )
+        book = index.loaded(business_id)
+        if book is not None:
+            with index.lock:
+                book.remove_offer(offer_id)
+        index.count("cancelled")
+        return {"message": "오퍼가 취소되었습니다"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -0,0 +1,190 @@
+"""
+비즈니스 단위 하위 컬렉션 저장소
+business_id 필드로 거르던 최상위 컬렉션(bookings, ai_schedules, ...)을
+businesses/{business_id}/{컬렉션} 하위 컬렉션으로 옮기기 위한 저장소 계층입니다.
+비즈니스별 조회가 전체 테넌트의 색인을 거치지 않게 되어 다른 비즈니스의 데이터 양에 영향을 받지 않습니다.
+
+TENANT_STORAGE_MODE:
+    global  기존 최상위 컬렉션만 사용 (기본)
+    dual    전환 기간. 쓰기는 양쪽에 하고, 읽기는 이전(migrate_tenants.py)이 끝난 컬렉션만
+            하위 컬렉션에서 읽고 없으면 최상위 컬렉션으로 대체
+    scoped  하위 컬렉션만 사용
+
+전환 순서: dual로 배포 → python migrate_tenants.py → 모든 컬렉션 이전 완료 확인 → scoped로 배포
+worker_codes는 비즈니스를 모르는 상태에서 코드로 조회하므로 최상위 컬렉션으로 유지합니다.
+"""
+
+import os
+import threading
+import time
+from typing import Optional
+
+from app_logging import get_logger, fields
+
+logger = get_logger("tenants")
+
+GLOBAL = "global"
+DUAL = "dual"
+SCOPED = "scoped"
+
+TENANT_STORAGE_MODE = os.getenv("TENANT_STORAGE_MODE", GLOBAL)
+TENANT_ROOT = "businesses"
+
+# 하위 컬렉션으로 옮기는 컬렉션 (모두 business_id 필드를 가짐)
+TENANT_COLLECTIONS = ("ai_schedules", "bookings", "permissions", "departments", "work_fields", "worker_schedules",
+                      "swap_offers", "booking_demand")
+
+# 컬렉션별 이전 진행 상황 (migrate_tenants.py가 기록)
+MIGRATION_DOC = ("migrations", "tenant_subcollections")
+MIGRATION_STATE_TTL = float(os.getenv("TENANT_MIGRATION_STATE_TTL", 30))
+
+_mode = TENANT_STORAGE_MODE
+_migration_state = {"loaded_at": None, "done": set()}
+_state_lock = threading.Lock()
+
+
+def configure(mode: Optional[str] = None):
+    """저장 모드를 바꿉니다. (테스트/벤치마크용)"""
+    global _mode
+    mode = mode or TENANT_STORAGE_MODE
+    if mode not in (GLOBAL, DUAL, SCOPED):
+        raise ValueError(f"알 수 없는 TENANT_STORAGE_MODE: {mode}")
+    _mode = mode
+    invalidate_migration_state()
+
+
+def get_mode() -> str:
+    return _mode
+
+
+def _get_db():
+    from utils import db
+    return db
+
+
+def migration_ref(db=None):
+    db = db or _get_db()
+    return db.collection(MIGRATION_DOC[0]).document(MIGRATION_DOC[1])
+
+
+def invalidate_migration_state():
+    with _state_lock:
+        _migration_state["loaded_at"] = None
+
+
+def migrated_collections() -> set:
+    """이전이 끝난 컬렉션 이름 (TTL 동안 캐시)"""
+    with _state_lock:
+        loaded_at = _migration_state["loaded_at"]
+        if loaded_at is not None and time.monotonic() - loaded_at < MIGRATION_STATE_TTL:
+            return _migration_state["done"]
+    try:
+        doc = migration_ref().get()
+        state = doc.to_dict() if doc.exists else {}
+        done = {name for name, progress in (state or {}).items() if isinstance(progress, dict) and progress.get("done")}
+    except Exception as e:
+        logger.warning("이전 상태 조회 실패", extra=fields(error=str(e)))
+        done = set()
+    with _state_lock:
+        _migration_state.update(loaded_at=time.monotonic(), done=done)
+    return done
+
+
+class TenantCollection:
+    """컬렉션 하나에 대한 저장 모드별 읽기/쓰기 경로"""
+
+    def __init__(self, name: str, db=None):
+        self.name = name
+        self._db = db
+
+    @property
+    def db(self):
+        return self._db or _get_db()
+
+    def scoped(self, business_id: str):
+        return self.db.collection(TENANT_ROOT).document(business_id).collection(self.name)
+
+    def top_level(self):
+        return self.db.collection(self.name)
+
+    def reads_scoped(self) -> bool:
+        if _mode == SCOPED:
+            return True
+        return _mode == DUAL and self.name in migrated_collections()
+
+    # 읽기
+    def query(self, business_id: str):
+        """비즈니스의 문서 쿼리 (where/order_by를 이어서 붙일 수 있음)"""
+        if self.reads_scoped():
+            return self.scoped(business_id)
+        return self.top_level().where("business_id", "==", business_id)
+
+    def all(self):
+        """
+        전체 비즈니스 대상 쿼리 (보관/이전 작업용)
+        collection_group은 이름이 같은 최상위 컬렉션의 문서도 함께 돌려주므로 is_scoped로 걸러야 합니다.
+        """
+        if self.reads_scoped():
+            return self.db.collection_group(self.name)
+        return self.top_level()
+
+    def get(self, business_id: str, doc_id: str):
+        """문서 스냅샷 (dual 모드에서는 주 경로에 없으면 다른 경로에서 읽음)"""
+        if _mode == GLOBAL:
+            return self.top_level().document(doc_id).get()
+        if _mode == SCOPED:
+            return self.scoped(business_id).document(doc_id).get()
+        primary, secondary = self.scoped(business_id), self.top_level()
+        if not self.reads_scoped():
+            primary, secondary = secondary, primary
+        snapshot = primary.document(doc_id).get()
+        if snapshot.exists:
+            return snapshot
+        return secondary.document(doc_id).get()
+
+    def is_scoped(self, reference) -> bool:
+        """문서 참조가 businesses/{business_id}/ 아래에 있는지"""
+        return reference.path.startswith(f"{TENANT_ROOT}/")
+
+    # 쓰기
+    def refs(self, business_id: str, doc_id: str) -> list:
+        """쓰기 대상 문서 참조 목록 (배치 쓰기용)"""
+        if _mode == GLOBAL:
+            return [self.top_level().document(doc_id)]
+        if _mode == SCOPED:
+            return [self.scoped(business_id).document(doc_id)]
+        return [self.top_level().document(doc_id), self.scoped(business_id).document(doc_id)]
+
+    def set(self, business_id: str, doc_id: str, data: dict, merge: bool = False):
+        for ref in self.refs(business_id, doc_id):
+            ref.set(data, merge=merge)
+
+    def update(self, business_id: str, doc_id: str, updates: dict):
+        if _mode != DUAL:
+            self.refs(business_id, doc_id)[0].update(updates)
+            return
+        top_ref, scoped_ref = self.refs(business_id, doc_id)
+        top_ref.update(updates)
+        # 아직 이전되지 않은 문서면 수정된 전체 문서를 복사 (부분 문서가 생기지 않도록)
+        if scoped_ref.get().exists:
+            scoped_ref.update(updates)
+        else:
+            scoped_ref.set(top_ref.get().to_dict())
+
+    def delete(self, business_id: str, doc_id: str):
+        for ref in self.refs(business_id, doc_id):
+            ref.delete()
+
+
+_collections = {}
+
+
+def collection(name: str, db=None) -> TenantCollection:
+    """비즈니스 단위 컬렉션 (db를 주지 않으면 utils.db 사용)"""
+    if name not in TENANT_COLLECTIONS:
+        raise ValueError(f"비즈니스 단위 컬렉션이 아닙니다: {name}")
+    if db is not None:
+        return TenantCollection(name, db)
+    if name not in _collections:
+        _collections[name] = TenantCollection(name)
+    return _collections[name]
@@ -0,0 +1,66 @@
+"""
+백엔드 테스트 공통 설정
+fakes.install()로 메모리 Firestore/Auth/OpenAI 스텁을 설치하고, 모듈 전역 상태(설정, 캐시, 큐)를 테스트마다 초기화합니다.
+
+실행: cd backend && python -m pytest tests -q
+"""
+
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+# 테스트에서는 Firebase/OpenAI 워밍업을 띄우지 않음
+os.environ.setdefault("STARTUP_WARMUP", "0")
+
+import fakes  # noqa: E402
+
+
+def auth_header(uid: str) -> dict:
+    """FakeAuth가 uid로 검증하는 Bearer 토큰 헤더"""
+    return {"Authorization": f"Bearer tok:{uid}"}
+
+
+def _reset_caches():
+    """이전 테스트의 메모리 Firestore를 기준으로 채워진 모듈 캐시를 비웁니다."""
+    import config_cache
+    import etag
+    import forecast
+    import shift_index
+    import swap
+
+    for cache in config_cache.caches.values():
+        cache.clear()
+    etag.validators.clear()
+    forecast._week_cache.clear()
+    shift_index.index.invalidate()
+    swap.index.invalidate()
+
+
+@pytest.fixture
+def db():
+    """메모리 Firestore를 설치하고 테스트가 끝나면 전역 상태를 정리합니다."""
+    import admission
+    import circuit_breaker
+    import idempotency
+    import write_behind
+
+    fake_db = fakes.install()
+    _reset_caches()
+    circuit_breaker.openai_breaker.reset()
+    admission.configure(per_minute=0)
+    idempotency.configure()
+    yield fake_db
+    write_behind.stop_all()
+
+
+@pytest.fixture
+def client(db):
+    """main.app에 대한 동기 테스트 클라이언트 (lifespan은 실행하지 않음)"""
+    from fastapi.testclient import TestClient
+    import main
+    return TestClient(main.app)
@@ -0,0 +1,49 @@
+"""사용자별 요청 제한: 버킷은 검증된 uid로 나뉘며 요청 본문의 business_id로 남의 버킷을 소진할 수 없어야 함"""
+
+import admission
+from conftest import auth_header
+
+BOOKING = {
+    "business_id": "biz_victim",
+    "worker_id": "worker_admission",
+    "date": "2024-01-03",
+    "service_type": "컷",
+}
+
+
+def _post(client, uid, time):
+    return client.post("/booking/create", json={**BOOKING, "time": time}, headers=auth_header(uid))
+
+
+def test_other_caller_cannot_drain_business_bucket(client):
+    admission.configure(limits={"/booking/create": (4, 8)}, per_minute=1, burst=2)
+
+    # 공격자가 피해 비즈니스의 business_id로 버킷 한도를 넘겨 요청
+    statuses = [_post(client, "attacker", f"0{hour}:00").status_code for hour in range(4)]
+    assert statuses.count(429) == 2
+
+    # 피해 비즈니스 소유자의 요청은 자신의 버킷을 사용
+    response = _post(client, "biz_victim", "15:00")
+    assert response.status_code == 200
+
+
+def test_limit_applies_per_verified_user(client):
+    admission.configure(limits={"/booking/create": (4, 8)}, per_minute=1, burst=1)
+
+    assert _post(client, "caller_a", "09:00").status_code == 200
+    limited = _post(client, "caller_a", "10:00")
+    assert limited.status_code == 429
+    assert int(limited.headers["retry-after"]) >= 1
+    assert _post(client, "caller_b", "11:00").status_code == 200
+
+
+def test_invalid_token_falls_back_to_client_address(client, monkeypatch):
+    import utils
+
+    def reject(token):
+        raise ValueError("invalid")
+
+    monkeypatch.setattr(utils, "authenticate_token", reject)
+    scope = {"headers": [(b"authorization", b"Bearer forged")], "client": ("10.0.0.1", 1234)}
+    import asyncio
+    assert asyncio.run(admission.caller_key(scope)) == "client:10.0.0.1"
@@ -0,0 +1,55 @@
+"""
+스케줄 보관 테스트
+보관 작업이 조회한 뒤 수정된 스케줄을 묘비로 덮어쓰지 않는지 확인합니다.
+"""
+
+from datetime import date
+
+import pytest
+
+import archive
+
+SCHEDULE = {
+    "schedule_id": "sched_old",
+    "business_id": "biz_archive",
+    "week_start_date": "2023-01-02",
+    "week_end_date": "2023-01-08",
+    "schedule_data": {"w1": {"schedule": {"월": ["09:00-13:00"]}}},
+}
+
+
+class EditingStore(archive.FirestoreArchiveStore):
+    """blob을 저장하는 사이에 다른 요청이 스케줄을 수정하는 상황"""
+
+    def put(self, schedule_id, record):
+        super().put(schedule_id, record)
+        self._db.collection("ai_schedules").document(schedule_id).update({"ai_modified": True})
+
+
+@pytest.fixture
+def hot(db):
+    db.collection("ai_schedules").document("sched_old").set(SCHEDULE)
+    yield db.collection("ai_schedules").document("sched_old")
+    archive.configure()
+
+
+def test_schedule_is_replaced_by_tombstone(db, hot):
+    archive.configure(archive.FirestoreArchiveStore(db=db))
+
+    result = archive.archive_schedules(today=date(2024, 1, 1))
+
+    assert result["archived"] == 1
+    assert archive.is_archived(hot.get().to_dict())
+    assert archive.rehydrate("sched_old", hot.get().to_dict()) == SCHEDULE
+
+
+def test_edit_during_archive_is_kept(db, hot):
+    archive.configure(EditingStore(db=db))
+
+    result = archive.archive_schedules(today=date(2024, 1, 1))
+
+    assert result["archived"] == 0 and result["skipped"] == 1
+    current = hot.get().to_dict()
+    assert not archive.is_archived(current)
+    assert current["ai_modified"] is True
+    assert db.collection(archive.ARCHIVE_COLLECTION).document("sched_old").get().exists is False
@@ -0,0 +1,78 @@
+"""
+AI 스케줄 수정 테스트
+OpenAI 호출이 회로 차단기를 거치고, 실패하면 스케줄을 바꾸지 않고 돌려주는지 확인합니다.
+"""
+
+import circuit_breaker
+import utils
+from conftest import auth_header
+
+BUSINESS_ID = "biz_chat"
+SCHEDULE = {"business_id": BUSINESS_ID, "schedule_data": {"w1": {"schedule": {"월": ["09:00-13:00"]}}}}
+
+
+def _edit(client, uid=BUSINESS_ID, schedule_id="sched_chat", business_id=BUSINESS_ID):
+    return client.post("/chatbot/edit-schedule", headers=auth_header(uid), json={
+        "scheduleId": schedule_id,
+        "editRequest": "월요일 근무를 오후로",
+        "currentSchedule": SCHEDULE,
+        "businessId": business_id,
+    })
+
+
+def test_edit_applies_ai_suggestion(db, client):
+    db.collection("ai_schedules").document("sched_chat").set(SCHEDULE)
+
+    response = _edit(client)
+
+    assert response.status_code == 200
+    assert response.json()["ai_generated"] is True
+    stored = db.collection("ai_schedules").document("sched_chat").get().to_dict()
+    assert stored["ai_modified"] is True
+
+
+def test_open_circuit_leaves_schedule_unchanged(db, client):
+    db.collection("ai_schedules").document("sched_chat").set(SCHEDULE)
+    breaker = circuit_breaker.openai_breaker
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    calls = utils.openai_caller.calls
+
+    response = _edit(client)
+
+    assert response.status_code == 200
+    assert response.json()["ai_generated"] is False
+    assert response.json()["fallback_reason"] == "circuit_open"
+    assert utils.openai_caller.calls == calls
+    assert db.collection("ai_schedules").document("sched_chat").get().to_dict() == SCHEDULE
+
+
+def test_upstream_error_falls_back(db, client):
+    db.collection("ai_schedules").document("sched_chat").set(SCHEDULE)
+    utils.openai_caller.fail_rate = 1.0
+
+    response = _edit(client)
+
+    assert response.status_code == 200
+    assert response.json()["fallback_reason"] == "upstream_error"
+    assert db.collection("ai_schedules").document("sched_chat").get().to_dict() == SCHEDULE
+
+
+def test_other_users_cannot_edit(db, client):
+    db.collection("ai_schedules").document("sched_chat").set(SCHEDULE)
+
+    response = _edit(client, uid="intruder")
+
+    assert response.status_code == 403
+    assert db.collection("ai_schedules").document("sched_chat").get().to_dict() == SCHEDULE
+
+
+def test_schedule_of_another_business_is_not_found(db, client):
+    other = {**SCHEDULE, "business_id": "biz_other"}
+    db.collection("ai_schedules").document("sched_other").set(other)
+
+    # 자기 비즈니스 ID로 다른 비즈니스의 스케줄 ID를 보내도 수정되지 않음
+    response = _edit(client, schedule_id="sched_other")
+
+    assert response.status_code == 404
+    assert db.collection("ai_schedules").document("sched_other").get().to_dict() == other
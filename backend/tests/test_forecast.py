@@ -0,0 +1,46 @@
+"""
+수요 예측 테스트
+numpy 배열 연산과 리스트 계산이 같은 결과를 내는지, 예약 생성이 주 단위 집계에 더해지는지 확인합니다.
+"""
+
+import random
+
+import pytest
+
+import forecast
+from conftest import auth_header
+
+
+def _history(weeks: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    return [[float(rng.choice([0, 0, 0, 1, 2, 5])) for _ in range(forecast.CELLS)] for _ in range(weeks)]
+
+
+def test_vectorized_path_matches_list_path(monkeypatch):
+    pytest.importorskip("numpy")
+    history = _history(4)
+    weights = forecast.week_weights([True, False, True, True])
+
+    monkeypatch.setattr(forecast, "_numpy", None)
+    assert forecast._np() is not None
+    vector_demand = forecast.expected_demand(history, weights)
+    vector_staff = forecast.staff_by_slot(vector_demand)
+
+    monkeypatch.setattr(forecast, "_numpy", False)
+    list_demand = forecast.expected_demand(history, weights)
+    list_staff = forecast.staff_by_slot(list_demand)
+
+    for row, expected in zip(vector_demand.tolist(), list_demand):
+        assert row == pytest.approx(expected)
+    assert vector_staff == list_staff
+
+
+def test_booking_is_added_to_weekly_demand(db, client):
+    response = client.post("/booking/create", headers=auth_header("customer_fc"), json={
+        "business_id": "biz_fc", "worker_id": "worker_fc", "date": "2024-01-03", "time": "10:00", "service_type": "컷",
+    })
+
+    assert response.status_code == 200
+    demand = db.collection("booking_demand").document("biz_fc_2024-01-01").get().to_dict()
+    assert demand["total"] == 1
+    assert sum(demand["cells"][forecast.ALL].values()) == 1
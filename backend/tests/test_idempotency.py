@@ -0,0 +1,94 @@
+"""Idempotency-Key 재생: 최종 결과만 저장하고 일시적 거절(429 등)은 재시도가 다시 실행되어야 함"""
+
+import admission
+import idempotency
+from conftest import auth_header
+
+BOOKING = {
+    "business_id": "biz_idem",
+    "worker_id": "worker_idem",
+    "date": "2024-01-02",
+    "time": "10:00",
+    "service_type": "컷",
+}
+
+
+def _post(client, key, uid="customer_idem", body=BOOKING):
+    return client.post("/booking/create", json=body, headers={**auth_header(uid), "Idempotency-Key": key})
+
+
+def test_success_is_replayed(client, db):
+    first = _post(client, "key-1")
+    second = _post(client, "key-1")
+
+    assert first.status_code == 200
+    assert second.status_code == 200
+    assert second.headers["idempotent-replayed"] == "true"
+    assert second.json()["booking_id"] == first.json()["booking_id"]
+    assert len(list(db.collection("bookings").stream())) == 1
+
+
+def test_rate_limited_response_is_not_replayed(client, db):
+    # /booking/create에도 요청 제한을 걸고 버킷을 한 번에 소진
+    admission.configure(limits={"/booking/create": (4, 8)}, per_minute=1, burst=1)
+    assert _post(client, "warm-up").status_code == 200
+
+    rejected = _post(client, "key-429", body={**BOOKING, "time": "11:00"})
+    assert rejected.status_code == 429
+    assert "idempotent-replayed" not in rejected.headers
+
+    # 제한이 풀린 뒤 같은 키로 재시도하면 저장된 429가 아니라 실제로 실행됨
+    admission.configure(per_minute=0)
+    retried = _post(client, "key-429", body={**BOOKING, "time": "11:00"})
+    assert retried.status_code == 200
+    assert "idempotent-replayed" not in retried.headers
+
+
+def test_mismatched_body_is_rejected(client):
+    assert _post(client, "key-body").status_code == 200
+    assert _post(client, "key-body", body={**BOOKING, "time": "12:00"}).status_code == 422
+
+
+def test_retry_after_token_refresh_is_replayed(client, db):
+    first = _post(client, "key-refresh")
+    # 같은 uid의 새 ID 토큰 (FakeAuth는 마지막 ':' 뒤를 uid로 검증)
+    refreshed = client.post("/booking/create", json=BOOKING, headers={
+        "Authorization": "Bearer refreshed:customer_idem", "Idempotency-Key": "key-refresh",
+    })
+
+    assert refreshed.status_code == 200
+    assert refreshed.headers["idempotent-replayed"] == "true"
+    assert refreshed.json()["booking_id"] == first.json()["booking_id"]
+    assert len(list(db.collection("bookings").stream())) == 1
+
+
+def test_other_users_key_is_not_shared(client, db):
+    _post(client, "key-shared")
+    other = _post(client, "key-shared", uid="someone_else", body={**BOOKING, "time": "15:00"})
+
+    assert other.status_code == 200
+    assert "idempotent-replayed" not in other.headers
+    assert len(list(db.collection("bookings").stream())) == 2
+
+
+def test_wrapped_failure_is_not_replayed(client, db, monkeypatch):
+    import booking
+
+    def unavailable(*args, **kwargs):
+        raise RuntimeError("Firestore 일시 오류")
+
+    # 핸들러가 일시적인 오류를 400으로 감싸도 저장되지 않아야 함
+    monkeypatch.setattr(booking.shift_index, "check_booking", unavailable)
+    assert _post(client, "key-400").status_code == 400
+    monkeypatch.undo()
+
+    retried = _post(client, "key-400")
+    assert retried.status_code == 200
+    assert "idempotent-replayed" not in retried.headers
+
+
+def test_final_statuses():
+    for status in (200, 201, 403, 404, 422):
+        assert idempotency.is_final(status)
+    for status in (400, 401, 408, 409, 425, 429, 500, 503):
+        assert not idempotency.is_final(status)
@@ -0,0 +1,45 @@
+"""
+Firestore 계측 프록시 테스트
+collection_group 쿼리 읽기도 현재 요청 비용과 타임라인에 기록되는지 확인합니다.
+"""
+
+import metrics
+import utils
+
+
+def _seed(db):
+    for business_id in ("b1", "b2"):
+        for index in range(3):
+            (db.collection("businesses").document(business_id)
+               .collection("bookings").document(f"{business_id}-{index}")
+               .set({"business_id": business_id, "date": f"2024-01-0{index + 1}"}))
+
+
+def test_collection_group_reads_are_counted(db):
+    _seed(db)
+    cost = metrics.RequestCost()
+    cost.timeline = []
+    token = metrics._current_cost.set(cost)
+    try:
+        query = utils.get_db().collection_group("bookings").where("date", ">=", "2024-01-02")
+        docs = list(query.stream())
+    finally:
+        metrics._current_cost.reset(token)
+
+    assert isinstance(query, metrics._InstrumentedQuery)
+    assert len(docs) == 4
+    assert cost.firestore_reads == 4
+    assert cost.firestore_streamed == 4
+    assert len(cost.timeline) == 1
+
+
+def test_empty_collection_group_query_costs_one_read(db):
+    cost = metrics.RequestCost()
+    token = metrics._current_cost.set(cost)
+    try:
+        docs = utils.get_db().collection_group("bookings").get()
+    finally:
+        metrics._current_cost.reset(token)
+
+    assert docs == []
+    assert cost.firestore_reads == 1
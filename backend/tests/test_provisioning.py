@@ -0,0 +1,69 @@
+"""직원 일괄 등록: 이미 있는 이메일은 다시 가져오지 않아 같은 이메일의 계정이 둘 생기지 않아야 함"""
+
+import asyncio
+
+import provisioning
+import utils
+
+
+async def _rows(rows):
+    for row in rows:
+        yield row
+
+
+def _provision(db, business_id, emails):
+    return asyncio.run(provisioning.provision(business_id, _rows([{"email": email} for email in emails]), db=db))
+
+
+def _accounts(email):
+    return [user for user in utils.get_auth().users.values() if user.email == email]
+
+
+def test_reposting_roster_does_not_duplicate_accounts(db):
+    first = _provision(db, "biz_roster", ["a@example.com", "b@example.com"])
+    assert first["created"] == 2
+
+    second = _provision(db, "biz_roster", ["a@example.com", "b@example.com", "c@example.com"])
+    assert [result["status"] for result in second["results"]] == ["exists", "exists", "created"]
+    assert len(_accounts("a@example.com")) == 1
+    assert second["results"][0]["uid"] == first["results"][0]["uid"]
+
+
+def test_self_registered_user_is_reported_as_existing(client, db):
+    response = client.post("/auth/register", json={
+        "email": "self@example.com", "password": "secret1", "name": "직접 가입", "user_type": "worker"
+    })
+    assert response.status_code == 200
+
+    report = _provision(db, "biz_roster", ["self@example.com"])
+    assert report["results"][0]["status"] == "exists"
+    assert len(_accounts("self@example.com")) == 1
+    # 다른 경로로 생긴 계정은 이 비즈니스에 자동으로 연결하지 않음
+    uid = report["results"][0]["uid"]
+    assert not db.collection("permissions").document(f"biz_roster_{uid}").get().exists
+
+
+def test_documents_are_repaired_after_failed_write(db, monkeypatch):
+    def fail(db, rows):
+        raise RuntimeError("commit failed")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(provisioning, "_commit_batch", fail)
+        first = _provision(db, "biz_roster", ["retry@example.com"])
+    assert first["results"][0]["status"] == "failed"
+    uid = first["results"][0]["uid"]
+
+    second = _provision(db, "biz_roster", ["retry@example.com"])
+    assert second["results"][0]["status"] == "created"
+    assert len(_accounts("retry@example.com")) == 1
+    assert db.collection("permissions").document(f"biz_roster_{uid}").get().exists
+
+
+def test_fake_import_users_does_not_enforce_email_uniqueness():
+    from firebase_admin import auth as firebase_auth
+    import fakes
+
+    auth = fakes.FakeAuth()
+    records = [firebase_auth.ImportUserRecord(uid=uid, email="same@example.com") for uid in ("u1", "u2")]
+    assert auth.import_users(records).failure_count == 0
+    assert len(auth.get_users([firebase_auth.EmailIdentifier("same@example.com")]).users) == 2
@@ -0,0 +1,89 @@
+"""실시간 피드: 리스너 시작 실패/취소 시 정리, 직원 구독의 이벤트 범위"""
+
+import asyncio
+import threading
+
+import pytest
+
+import realtime
+from realtime import FeedHub
+
+
+def test_failed_start_is_cleaned_up_and_next_subscriber_gets_events(db, monkeypatch):
+    hub = FeedHub()
+    original_watch = db._watch
+    started = []
+
+    def failing_watch(target, callback):
+        if started:
+            raise RuntimeError("listen failed")
+        watch = original_watch(target, callback)
+        started.append(watch)
+        return watch
+
+    async def scenario():
+        monkeypatch.setattr(db, "_watch", failing_watch)
+        with pytest.raises(RuntimeError):
+            await hub.subscribe("biz_feed", db=db)
+        # 피드가 남지 않고, 먼저 시작한 리스너도 해제됨
+        assert hub.feeds == {}
+        assert started and not started[0].active
+        assert started[0] not in db._watches
+
+        monkeypatch.setattr(db, "_watch", original_watch)
+        subscription = await hub.subscribe("biz_feed", db=db)
+        db.collection("bookings").document("booking_1").set({
+            "booking_id": "booking_1", "business_id": "biz_feed", "worker_id": "w1",
+            "date": "2024-01-02", "time": "10:00",
+        })
+        event = await subscription.next_event(timeout=1)
+        hub.unsubscribe(subscription)
+        return event
+
+    event = asyncio.run(scenario())
+    assert event["type"] == "booking"
+    assert hub.feeds == {}
+
+
+def test_cancelled_subscribe_does_not_leave_listeners(db, monkeypatch):
+    hub = FeedHub()
+    original_watch = db._watch
+    release = threading.Event()
+    registered = []
+
+    def slow_watch(target, callback):
+        release.wait(2)
+        watch = original_watch(target, callback)
+        registered.append(watch)
+        return watch
+
+    async def scenario():
+        monkeypatch.setattr(db, "_watch", slow_watch)
+        pending = asyncio.ensure_future(hub.subscribe("biz_feed", db=db))
+        await asyncio.sleep(0.05)
+        pending.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await pending
+        assert hub.feeds == {}
+
+        # 스레드의 리스너 등록이 끝나면 버려진 피드의 리스너도 해제됨
+        release.set()
+        for _ in range(200):
+            if len(registered) == len(realtime.FEED_COLLECTIONS) and not db._watches:
+                break
+            await asyncio.sleep(0.01)
+
+    asyncio.run(scenario())
+    assert len(registered) == len(realtime.FEED_COLLECTIONS)
+    assert not any(watch.active for watch in registered)
+    assert db._watches == []
+
+
+def test_schedule_removal_only_reaches_workers_on_it():
+    data = {"schedule_data": {"w1": {"schedule": {"월": ["09:00-13:00"]}}}}
+
+    assert realtime._schedule_event("removed", "s1", data, None) == {
+        "type": "schedule", "change": "removed", "schedule_id": "s1",
+    }
+    assert realtime._schedule_event("removed", "s1", data, "w1")["change"] == "removed"
+    assert realtime._schedule_event("removed", "s1", data, "w2") is None
@@ -0,0 +1,59 @@
+"""응답 압축: Accept-Encoding q값 협상, 압축 응답의 약한 ETag와 조건부 요청"""
+
+from fastapi import FastAPI, Request, Response
+from fastapi.testclient import TestClient
+
+import responses
+from etag import etag_matches, not_modified
+from responses import CompressionMiddleware, negotiate_encoding
+
+ETAG = '"abc123"'
+BODY = b'{"schedule": "' + b"x" * 4096 + b'"}'
+
+
+def _client() -> TestClient:
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=64)
+
+    @app.get("/schedule")
+    def schedule(request: Request):
+        if etag_matches(request.headers.get("if-none-match"), ETAG):
+            return not_modified(ETAG)
+        return Response(BODY, media_type="application/json", headers={"ETag": ETAG})
+
+    return TestClient(app)
+
+
+def test_zero_q_codings_are_refused(monkeypatch):
+    monkeypatch.setattr(responses, "brotli", object())
+    assert negotiate_encoding("br;q=0, gzip") == "gzip"
+    assert negotiate_encoding("br;level=1;Q=0, gzip;q=0.5") == "gzip"
+    assert negotiate_encoding("br;q=0.2, gzip;q=0.8") == "gzip"
+    assert negotiate_encoding("br, gzip") == "br"
+    assert negotiate_encoding("gzip;q=0, br;q=0") == "identity"
+    assert negotiate_encoding("*;q=0, identity") == "identity"
+    assert negotiate_encoding("*") == "br"
+    assert negotiate_encoding("gzip, *;q=0") == "gzip"
+    assert negotiate_encoding("gzip;q=abc") == "identity"
+
+
+def test_compressed_response_has_weak_etag():
+    client = _client()
+
+    compressed = client.get("/schedule", headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.headers["etag"] == f"W/{ETAG}"
+    assert compressed.content == BODY
+
+    identity = client.get("/schedule", headers={"Accept-Encoding": "gzip;q=0"})
+    assert "content-encoding" not in identity.headers
+    assert identity.headers["etag"] == ETAG
+
+
+def test_weak_etag_revalidates_to_304():
+    client = _client()
+
+    response = client.get("/schedule", headers={"Accept-Encoding": "gzip", "If-None-Match": f"W/{ETAG}"})
+
+    assert response.status_code == 304
+    assert response.headers["etag"] == f"W/{ETAG}"
@@ -0,0 +1,78 @@
+"""이중 근무 검사: 같은 직원이 다른 비즈니스에서 같은 시각에 배치되면 겹침으로 보고, 색인은 비즈니스 단위로 한 번에 읽어야 함"""
+
+from datetime import date, timedelta
+
+import shift_index
+from conftest import auth_header
+
+WEEK_START = date.today() + timedelta(days=7 - date.today().weekday())
+
+
+def _schedule(schedule_id, business_id, slots_by_worker):
+    return {
+        "schedule_id": schedule_id,
+        "business_id": business_id,
+        "week_start_date": WEEK_START.isoformat(),
+        "week_end_date": (WEEK_START + timedelta(days=6)).isoformat(),
+        "schedule_data": {worker_id: {"schedule": {"월": slots}} for worker_id, slots in slots_by_worker.items()},
+    }
+
+
+def _member(db, worker_id, business_id):
+    db.collection("worker_schedules").document(f"{worker_id}_{business_id}").set(
+        {"worker_id": worker_id, "business_id": business_id}
+    )
+
+
+def test_overlap_with_other_business_is_reported(db):
+    _member(db, "shared", "biz_a")
+    _member(db, "shared", "biz_b")
+    assert shift_index.record_schedule(_schedule("sched_a", "biz_a", {"shared": ["09:00-13:00"]}), db) == []
+
+    conflicts = shift_index.record_schedule(
+        _schedule("sched_b", "biz_b", {"shared": ["12:00-18:00"], "only_b": ["09:00-18:00"]}), db
+    )
+    assert len(conflicts) == 1
+    assert conflicts[0]["shift"]["worker_id"] == "shared"
+    other = conflicts[0]["conflicts"][0]
+    # 다른 비즈니스의 근무는 시각만 공개
+    assert other["other_business"] is True
+    assert other["business_id"] is None
+
+
+def test_regenerated_schedule_of_same_business_is_not_a_conflict(db):
+    _member(db, "worker", "biz_a")
+    shift_index.record_schedule(_schedule("v1", "biz_a", {"worker": ["09:00-18:00"]}), db)
+    assert shift_index.record_schedule(_schedule("v2", "biz_a", {"worker": ["09:00-18:00"]}), db) == []
+
+
+def test_persisted_schedules_are_loaded_per_business(db):
+    workers = [f"worker_{index:03d}" for index in range(100)]
+    for worker_id in workers:
+        _member(db, worker_id, "biz_a")
+    _member(db, "worker_007", "biz_other")
+    db.collection("ai_schedules").document("other_week").set(
+        _schedule("other_week", "biz_other", {"worker_007": ["10:00-11:00"]})
+    )
+
+    queries_before = db.stats["queries"]
+    conflicts = shift_index.record_schedule(
+        _schedule("sched_a", "biz_a", {worker_id: ["09:00-17:00"] for worker_id in workers}), db
+    )
+    # 직원 수가 아니라 (in 쿼리 묶음 수 + 비즈니스 수)에 비례
+    assert db.stats["queries"] - queries_before <= 12
+    assert [c["shift"]["worker_id"] for c in conflicts] == ["worker_007"]
+
+
+def test_booking_overlapping_booking_is_rejected(client):
+    booking = {
+        "business_id": "biz_booking",
+        "worker_id": "stylist",
+        "date": WEEK_START.isoformat(),
+        "time": "10:00",
+        "service_type": "컷",
+    }
+    assert client.post("/booking/create", json=booking, headers=auth_header("customer_1")).status_code == 200
+    response = client.post("/booking/create", json=booking, headers=auth_header("customer_2"))
+    assert response.status_code == 409
+    assert response.json()["detail"]["conflicts"]
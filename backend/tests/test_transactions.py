@@ -0,0 +1,126 @@
+"""
+동시 요청 경합 테스트
+초대 코드 사용, 교대 오퍼 수락, 같은 직원/시간 예약을 여러 스레드에서 동시에 보내 한 요청만 성공하는지 확인합니다.
+메모리 Firestore에 읽기 지연을 넣어 트랜잭션이 서로 겹치도록 합니다.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import fakes
+from conftest import auth_header
+
+BUSINESS_ID = "biz"
+CONTENDERS = 6
+
+
+def _race(client, path: str, uids: list, json=None) -> dict:
+    """uid마다 같은 요청을 동시에 보내고 uid → 응답을 돌려줍니다."""
+    barrier = threading.Barrier(len(uids))
+
+    def send(uid):
+        barrier.wait()
+        return uid, client.post(path, headers=auth_header(uid), json=json)
+
+    with ThreadPoolExecutor(max_workers=len(uids)) as pool:
+        return dict(pool.map(send, uids))
+
+
+def test_invite_code_is_redeemed_once(db, client):
+    db.collection("worker_codes").document("CODE1").set({"business_id": BUSINESS_ID, "used": False})
+    db._latency = fakes.LatencyModel({"read": 0.01})
+    workers = [f"worker{index}" for index in range(CONTENDERS)]
+
+    responses = _race(client, "/worker/use-code/CODE1", workers)
+
+    winners = [uid for uid, response in responses.items() if response.status_code == 200]
+    assert len(winners) == 1
+    assert all(response.status_code == 400 for uid, response in responses.items() if uid not in winners)
+    assert db.collection("worker_codes").document("CODE1").get().to_dict()["used_by"] == winners[0]
+    permissions = [doc.id for doc in db.collection("permissions").stream()]
+    assert permissions == [f"{BUSINESS_ID}_{winners[0]}"]
+
+    # 이긴 직원의 재시도는 성공으로 처리
+    assert client.post("/worker/use-code/CODE1", headers=auth_header(winners[0])).status_code == 200
+
+
+def _seed_swap(db, takers: list):
+    schedule = {
+        "business_id": BUSINESS_ID,
+        "week_start_date": "2024-01-01",
+        "week_end_date": "2024-01-07",
+        "schedule_data": {
+            "giver": {
+                "employee_id": "giver",
+                "department_id": "hall",
+                "work_fields": ["cash"],
+                "schedule": {"월": ["09:00-13:00"]},
+            },
+        },
+    }
+    db.collection("ai_schedules").document("sched1").set(schedule)
+    for worker_id in ["giver", *takers]:
+        db.collection("permissions").document(f"{BUSINESS_ID}_{worker_id}").set(
+            {"business_id": BUSINESS_ID, "worker_id": worker_id, "permission_level": "read"}
+        )
+        db.collection("worker_schedules").document(f"{worker_id}_{BUSINESS_ID}").set(
+            {"business_id": BUSINESS_ID, "worker_id": worker_id, "department_id": "hall", "work_fields": ["cash"]}
+        )
+
+
+def test_swap_offer_is_accepted_once(db, client):
+    takers = [f"taker{index}" for index in range(CONTENDERS)]
+    _seed_swap(db, takers)
+    created = client.post("/swap/offers", headers=auth_header("giver"), json={
+        "business_id": BUSINESS_ID, "schedule_id": "sched1", "day": "월", "slot": "09:00-13:00",
+    })
+    assert created.status_code == 200
+    offer_id = created.json()["offer"]["offer_id"]
+
+    db._latency = fakes.LatencyModel({"read": 0.01})
+    responses = _race(client, f"/swap/offers/{BUSINESS_ID}/{offer_id}/accept", takers)
+
+    winners = [uid for uid, response in responses.items() if response.status_code == 200]
+    assert len(winners) == 1
+    assert all(response.status_code == 409 for uid, response in responses.items() if uid not in winners)
+
+    # 근무는 이긴 직원에게만 넘어가고 다른 직원 스케줄에는 생기지 않음
+    schedule_data = db.collection("ai_schedules").document("sched1").get().to_dict()["schedule_data"]
+    assert schedule_data["giver"]["schedule"]["월"] == []
+    assert schedule_data[winners[0]]["schedule"]["월"] == ["09:00-13:00"]
+    assert set(schedule_data) == {"giver", winners[0]}
+    offer = db.collection("swap_offers").document(offer_id).get().to_dict()
+    assert offer["status"] == "accepted" and offer["accepted_by"] == winners[0]
+
+
+def test_overlapping_bookings_are_created_once(db, client):
+    db._latency = fakes.LatencyModel({"read": 0.01})
+    customers = [f"customer{index}" for index in range(CONTENDERS)]
+
+    responses = _race(client, "/booking/create", customers, json={
+        "business_id": BUSINESS_ID, "worker_id": "worker_busy", "date": "2024-01-02", "time": "10:00",
+        "service_type": "컷",
+    })
+
+    statuses = sorted(response.status_code for response in responses.values())
+    assert statuses == [200] + [409] * (CONTENDERS - 1)
+    assert len(list(db.collection("bookings").stream())) == 1
+    slots = db.collection("booking_slots").document("worker_busy_2024-01-02").get().to_dict()["slots"]
+    assert len(slots) == 1
+
+
+def test_booking_across_midnight_blocks_next_day(db, client, monkeypatch):
+    import booking
+
+    def book(day, time):
+        return client.post("/booking/create", headers=auth_header("customer"), json={
+            "business_id": BUSINESS_ID, "worker_id": "worker_night", "date": day, "time": time, "service_type": "컷",
+        })
+
+    # 색인 사전 검사를 통과한 경우에도 장부로 겹침을 찾음
+    monkeypatch.setattr(booking.shift_index, "check_booking", lambda *args, **kwargs: [])
+    assert book("2024-01-02", "23:30").status_code == 200
+    rejected = book("2024-01-03", "00:00")
+    assert rejected.status_code == 409
+    assert rejected.json()["detail"]["conflicts"][0]["conflicts"][0]["start"] == "2024-01-02T23:30:00"
+    assert book("2024-01-03", "00:30").status_code == 200
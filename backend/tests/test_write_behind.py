@@ -0,0 +1,82 @@
+"""쓰기 지연 큐: 재시도를 소진한 문서는 보관 한도 안에서 나중에 다시 저장되고, 저장되지 않은 스케줄 수정은 503이어야 함"""
+
+import time
+
+import pytest
+
+import write_behind
+from conftest import auth_header
+from write_behind import WriteBehindQueue
+
+
+class FlakyCommit:
+    """처음 failures번은 실패하는 커밋"""
+
+    def __init__(self, queue, failures):
+        self.original = queue._commit
+        self.failures = failures
+
+    def __call__(self, batch):
+        if self.failures > 0:
+            self.failures -= 1
+            raise RuntimeError("unavailable")
+        self.original(batch)
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def queue(db):
+    queue = WriteBehindQueue("wb_test", flush_interval=0, max_attempts=1, base_backoff=0,
+                             failed_retry=0.05, max_failed=2)
+    yield queue
+    queue._commit = lambda batch: None
+    queue.stop(timeout=1)
+
+
+def test_failed_documents_are_retried_later(db, queue):
+    queue._commit = FlakyCommit(queue, failures=1)
+    queue.enqueue("doc_1", {"value": 1})
+    assert _wait_for(lambda: queue.status("doc_1") == write_behind.FAILED)
+
+    assert _wait_for(lambda: queue.status("doc_1") == write_behind.PERSISTED)
+    assert db.collection("wb_test").document("doc_1").get().to_dict() == {"value": 1}
+    assert queue.stats()["failed"] == 0
+
+
+def test_failed_documents_are_bounded(queue):
+    queue._commit = FlakyCommit(queue, failures=10 ** 6)
+    queue.failed_retry = 60
+    for index in range(3):
+        queue.enqueue(f"doc_{index}", {"value": index})
+        assert _wait_for(lambda i=index: queue.status(f"doc_{i}") == write_behind.FAILED)
+    stats = queue.stats()
+    assert stats["failed"] == 2
+    assert stats["dropped_total"] == 1
+
+
+def test_edit_of_unpersisted_schedule_returns_503(client, db, monkeypatch):
+    writer = write_behind.schedule_writer
+    monkeypatch.setattr(writer, "max_attempts", 1)
+    monkeypatch.setattr(writer, "_commit", FlakyCommit(writer, failures=10 ** 6))
+    writer.enqueue("sched_unsaved", {"schedule_id": "sched_unsaved", "business_id": "biz_edit"})
+    assert _wait_for(lambda: writer.status("sched_unsaved") == write_behind.FAILED)
+
+    response = client.post("/chatbot/edit-schedule", headers=auth_header("biz_edit"), json={
+        "scheduleId": "sched_unsaved",
+        "editRequest": "월요일 근무를 오후로",
+        "currentSchedule": {"business_id": "biz_edit", "schedule_data": {}},
+        "businessId": "biz_edit",
+    })
+    assert response.status_code == 503
+
+    # 다음 테스트에 실패 문서가 남지 않도록 정리
+    monkeypatch.setattr(writer, "_commit", lambda batch: None)
+    assert writer.ensure_persisted("sched_unsaved")
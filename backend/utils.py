@@ -4,16 +4,24 @@
 """
 
 import os
+import threading
+import time
 from dotenv import load_dotenv
-import openai
-import firebase_admin
-from firebase_admin import credentials, firestore, auth
 from fastapi import HTTPException, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from app_logging import get_logger, fields
+
+logger = get_logger("utils")
 
 # 환경변수 로드 (여러 경로에서 시도)
+_environment_loaded = False
+
 def load_environment():
-    """환경변수를 로드합니다."""
+    """환경변수를 로드합니다. (여러 번 호출해도 한 번만 로드)"""
+    global _environment_loaded
+    if _environment_loaded:
+        return
+    _environment_loaded = True
     env_paths = [
         ".env",
         "backend/.env", 
@@ -24,10 +32,10 @@ def load_environment():
     for env_path in env_paths:
         if os.path.exists(env_path):
             load_dotenv(env_path)
-            print(f"환경 변수 파일 로드됨: {env_path}")
+            logger.info("환경 변수 파일 로드됨", extra=fields(path=env_path))
             break
     else:
-        print("⚠️ .env 파일을 찾을 수 없습니다. 시스템 환경 변수를 사용합니다.")
+        logger.info(".env 파일을 찾을 수 없습니다. 시스템 환경 변수를 사용합니다.")
 
 # 환경 설정
 ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
@@ -35,51 +43,96 @@ HOST = os.getenv("HOST", "0.0.0.0")
 PORT = int(os.getenv("PORT", 8080))  # Cloud Run 기본 포트로 변경
 
 # OpenAI API 설정
+# openai 패키지는 import 비용이 커서 첫 호출 시점(또는 워밍업)에 로드합니다.
+_openai_module = None
+_openai_lock = threading.Lock()
+
 def setup_openai():
     """OpenAI API를 설정합니다."""
+    global _openai_module
+    import openai
+    load_environment()
     openai.api_key = os.getenv("OPENAI_API_KEY")
     if not openai.api_key:
-        print("⚠️ OpenAI API 키가 설정되지 않았습니다. AI 기능이 제한됩니다.")
-        print("💡 환경 변수 OPENAI_API_KEY를 설정하거나 .env 파일을 생성하세요.")
-        print("💡 .env 파일 예시:")
-        print("   OPENAI_API_KEY=your_api_key_here")
-        print("   HOST=0.0.0.0")
-        print("   PORT=8080")
+        logger.warning(
+            "OpenAI API 키가 설정되지 않았습니다. AI 기능이 제한됩니다. "
+            "환경 변수 OPENAI_API_KEY를 설정하거나 .env 파일을 생성하세요."
+        )
     else:
-        print("✅ OpenAI API 키가 설정되었습니다.")
+        logger.info("OpenAI API 키가 설정되었습니다.")
+    _openai_module = openai
+    return openai
+
+def get_openai():
+    """설정된 openai 모듈을 반환합니다. (최초 호출 시 설정)"""
+    if _openai_module is None:
+        with _openai_lock:
+            if _openai_module is None:
+                setup_openai()
+    return _openai_module
+
+# OpenAI 호출 대체 함수 (오프라인 벤치마크/테스트용, fakes.install에서 설정됨)
+openai_caller = None
+
+def set_openai_caller(caller):
+    """call_openai_api가 사용할 대체 호출 함수를 설정합니다. (None이면 실제 API 사용)"""
+    global openai_caller
+    openai_caller = caller
 
 # OpenAI API 호출 헬퍼 함수 (버전 호환성)
 def call_openai_api(messages, model="gpt-3.5-turbo", temperature=0.1, max_tokens=2000):
     """OpenAI API 호출을 버전에 관계없이 처리하는 헬퍼 함수"""
+    from metrics import record_openai
+    start_time = time.perf_counter()
+    if openai_caller is not None:
+        try:
+            content = openai_caller(messages, model=model, temperature=temperature, max_tokens=max_tokens)
+        except Exception:
+            record_openai(time.perf_counter() - start_time, error=True)
+            raise
+        record_openai(time.perf_counter() - start_time)
+        return content
+    openai = get_openai()
     try:
-        # 최신 버전 (1.0.0+) 시도
-        from openai import OpenAI
-        client = OpenAI(api_key=openai.api_key)
-        response = client.chat.completions.create(
-            model=model,
-            messages=messages,
-            temperature=temperature,
-            max_tokens=max_tokens
-        )
-        return response.choices[0].message.content
-    except ImportError:
-        # 구버전 (0.28.x) 사용
-        response = openai.ChatCompletion.create(
-            model=model,
-            messages=messages,
-            temperature=temperature,
-            max_tokens=max_tokens
-        )
-        return response.choices[0].message.content
+        try:
+            # 최신 버전 (1.0.0+) 시도
+            from openai import OpenAI
+            client = OpenAI(api_key=openai.api_key)
+            response = client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+        except ImportError:
+            # 구버전 (0.28.x) 사용
+            response = openai.ChatCompletion.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
     except Exception as e:
-        print(f"OpenAI API 호출 실패: {e}")
+        record_openai(time.perf_counter() - start_time, error=True)
+        logger.warning("OpenAI API 호출 실패", extra=fields(model=model, error=str(e)))
         raise e
 
+    usage = getattr(response, "usage", None)
+    record_openai(
+        time.perf_counter() - start_time,
+        prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+        completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+    )
+    return response.choices[0].message.content
+
 # Firebase 초기화
 def initialize_firebase():
     """Firebase를 초기화합니다."""
     db = None
+    cred = None
     try:
+        import firebase_admin
+        from firebase_admin import credentials, firestore
         if not firebase_admin._apps:
             # 서비스 계정 키 파일 경로들 확인
             service_account_paths = [
@@ -93,52 +146,106 @@ def initialize_firebase():
                 try:
                     if os.path.exists(path):
                         cred = credentials.Certificate(path)
-                        print(f"Firebase 서비스 계정 키 로드됨: {path}")
+                        logger.info("Firebase 서비스 계정 키 로드됨", extra=fields(path=path))
                         break
                 except Exception as e:
-                    print(f"서비스 계정 키 로드 실패 ({path}): {e}")
+                    logger.warning("서비스 계정 키 로드 실패", extra=fields(path=path, error=str(e)))
                     continue
             
             if cred:
                 firebase_admin.initialize_app(cred)
+            elif _emulator_project():
+                # 에뮬레이터는 자격 증명 없이 프로젝트 ID만 있으면 됨
+                firebase_admin.initialize_app(options={"projectId": _emulator_project()})
+                logger.info("Firebase 에뮬레이터 사용", extra=fields(project=_emulator_project()))
             else:
                 # 서비스 계정 키가 없으면 기본 초기화 (개발용)
-                print("서비스 계정 키를 찾을 수 없습니다. 기본 초기화를 시도합니다.")
+                logger.info("서비스 계정 키를 찾을 수 없습니다. 기본 초기화를 시도합니다.")
                 firebase_admin.initialize_app()
         
         # Firestore 클라이언트 초기화
-        db = firestore.client()
-        print("Firebase 초기화 성공")
+        if cred is None and os.getenv("FIRESTORE_EMULATOR_HOST"):
+            db = _emulator_firestore_client()
+        else:
+            db = firestore.client()
+        logger.info("Firebase 초기화 성공")
     except Exception as e:
-        print(f"Firebase 초기화 실패: {e}")
-        print("Firebase 없이 실행됩니다.")
+        logger.warning("Firebase 초기화 실패, Firebase 없이 실행됩니다", extra=fields(error=str(e)))
         db = None
     
     return db
 
+def _emulator_project():
+    """에뮬레이터(FIREBASE_AUTH_EMULATOR_HOST/FIRESTORE_EMULATOR_HOST) 사용 시 프로젝트 ID"""
+    if os.getenv("FIREBASE_AUTH_EMULATOR_HOST") or os.getenv("FIRESTORE_EMULATOR_HOST"):
+        return os.getenv("GOOGLE_CLOUD_PROJECT", "demo-uriwork")
+    return None
+
+def _emulator_firestore_client():
+    # firestore.client()는 에뮬레이터에서도 기본 자격 증명을 요구하므로 익명 자격 증명으로 직접 생성
+    from google.auth.credentials import AnonymousCredentials
+    from google.cloud import firestore as cloud_firestore
+    return cloud_firestore.Client(project=_emulator_project(), credentials=AnonymousCredentials())
+
 # 인증 함수
 security = HTTPBearer()
 
-# 전역 db 변수 (main.py에서 설정됨)
-db = None
+# 전역 db (첫 사용 시 또는 main.py의 워밍업 작업에서 초기화됨)
+# 기존 호출부의 `from utils import db`는 모듈 __getattr__를 통해 get_db()로 연결됩니다.
+_db = None
+_db_initialized = False
+_db_lock = threading.Lock()
 
 def set_db(database):
-    """전역 db 변수를 설정합니다."""
-    global db
-    db = database
+    """전역 db 변수를 설정합니다. (읽기/쓰기 수 집계를 위해 계측 프록시로 감쌈)"""
+    global _db, _db_initialized
+    from metrics import instrument_firestore
+    _db = instrument_firestore(database)
+    _db_initialized = True
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """현재 사용자를 인증합니다."""
+def get_db():
+    """Firestore 클라이언트를 반환합니다. (최초 호출 시 Firebase 초기화, 실패하면 None)"""
+    if not _db_initialized:
+        with _db_lock:
+            if not _db_initialized:
+                load_environment()
+                set_db(initialize_firebase())
+    return _db
+
+def is_db_initialized() -> bool:
+    """Firebase 초기화가 (성공 여부와 관계없이) 끝났는지 반환합니다."""
+    return _db_initialized
+
+# Firebase Auth (firebase_admin.auth 또는 fakes.FakeAuth)
+_auth_module = None
+
+def set_auth(module):
+    """토큰 검증/사용자 생성에 사용할 auth 구현을 설정합니다."""
+    global _auth_module
+    _auth_module = module
+
+def get_auth():
+    """firebase_admin.auth 모듈을 반환합니다. (최초 호출 시 import)"""
+    if _auth_module is None:
+        from firebase_admin import auth
+        set_auth(auth)
+    return _auth_module
+
+def __getattr__(name):
+    if name == "db":
+        return get_db()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def authenticate_token(token: str) -> dict:
+    """토큰을 검증하고 사용자 정보를 반환합니다. (WebSocket 등 헤더를 쓸 수 없는 경로에서도 사용)"""
     try:
-        token = credentials.credentials
-        
         # 개발 모드 토큰 확인 (Firebase가 있더라도 개발 토큰 허용)
         if token == "dev_token_123":
             return {"uid": "dev_user_123", "email": "dev@example.com"}
         
         # Firebase가 있으면 실제 토큰 검증
-        if db is not None:
-            decoded_token = auth.verify_id_token(token)
+        if get_db() is not None:
+            decoded_token = get_auth().verify_id_token(token)
             return decoded_token
         else:
             # Firebase가 없고 개발 토큰이 아니면 오류
@@ -147,14 +254,11 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
                 detail="Firebase 인증이 필요합니다"
             )
     except Exception as e:
-        try:
-            if token == "dev_token_123":
-                # 개발 모드에서는 더미 사용자 정보 반환
-                return {"uid": "dev_user_123", "email": "dev@example.com"}
-        except NameError:
-            # token 변수가 정의되지 않은 경우
-            pass
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="유효하지 않은 토큰입니다"
         )
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """현재 사용자를 인증합니다."""
+    return authenticate_token(credentials.credentials)
@@ -3,49 +3,78 @@
 직원 코드 사용, 스케줄 선호도 설정 등의 직원 기능을 제공합니다.
 """
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
 from datetime import datetime
 from models import WorkerSchedule
+from responses import FastJSONResponse
+from etag import (
+    validators, compute_content_hash, make_etag, etag_matches, not_modified,
+    set_etag_headers, check_cached_validator, my_schedule_key, preference_key,
+    business_schedules_tag
+)
 from utils import get_current_user
+from write_behind import schedule_writer, merge_pending
+from archive import is_archived, rehydrate
+import swap
+import tenants
+from app_logging import get_logger, fields
 
-router = APIRouter(prefix="/worker", tags=["직원"])
+router = APIRouter(prefix="/worker", tags=["직원"], default_response_class=FastJSONResponse)
+logger = get_logger("worker")
 
 # 노동자 코드 사용
 @router.post("/use-code/{code}")
 async def use_worker_code(code: str, current_user: dict = Depends(get_current_user)):
     """직원 초대 코드를 사용하여 비즈니스에 참여합니다."""
     try:
-        worker_id = current_user["uid"]
-        
-        # 코드 확인
+        from google.cloud import firestore
         from utils import db
-        code_doc = db.collection("worker_codes").document(code).get()
-        if not code_doc.exists:
-            raise HTTPException(status_code=404, detail="유효하지 않은 코드입니다")
-        
-        code_data = code_doc.to_dict()
         
-        # 코드 만료 확인
-        if code_data.get("used", False):
-            raise HTTPException(status_code=400, detail="이미 사용된 코드입니다")
+        # 코드 확인, 사용 처리, 권한 설정을 한 트랜잭션으로 (같은 코드를 두 명이 동시에 쓰지 못하도록)
+        redeem = firestore.transactional(_redeem_worker_code)
+        business_id = redeem(db.transaction(), db.collection("worker_codes").document(code), current_user["uid"])
         
-        # 코드 사용 처리
-        db.collection("worker_codes").document(code).update({"used": True, "used_by": worker_id})
-        
-        # 권한 설정
-        permission_data = {
-            "business_id": code_data["business_id"],
-            "worker_id": worker_id,
-            "permission_level": "read",
-            "created_at": datetime.now().isoformat()
-        }
-        
-        db.collection("permissions").document(f"{code_data['business_id']}_{worker_id}").set(permission_data)
-        
-        return {"message": "코드가 성공적으로 사용되었습니다", "business_id": code_data["business_id"]}
+        return {"message": "코드가 성공적으로 사용되었습니다", "business_id": business_id}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+def _redeem_worker_code(transaction, code_ref, worker_id: str) -> str:
+    """트랜잭션 안에서 초대 코드를 사용 처리하고 비즈니스 ID를 반환합니다. (충돌 시 재실행됨)"""
+    code_doc = code_ref.get(transaction=transaction)
+    if not code_doc.exists:
+        raise HTTPException(status_code=404, detail="유효하지 않은 코드입니다")
+    
+    code_data = code_doc.to_dict()
+    business_id = code_data["business_id"]
+    now = datetime.now()
+    
+    if code_data.get("used", False):
+        # 같은 직원의 재시도는 성공으로 처리
+        if code_data.get("used_by") == worker_id:
+            return business_id
+        raise HTTPException(status_code=400, detail="이미 사용된 코드입니다")
+    
+    # 코드 만료 확인
+    expires_at = code_data.get("expires_at")
+    if expires_at and datetime.fromisoformat(expires_at) <= now:
+        raise HTTPException(status_code=400, detail="만료된 코드입니다")
+    
+    # 코드 사용 처리
+    transaction.update(code_ref, {"used": True, "used_by": worker_id, "used_at": now.isoformat()})
+    
+    # 권한 설정
+    permission_data = {
+        "business_id": business_id,
+        "worker_id": worker_id,
+        "permission_level": "read",
+        "created_at": now.isoformat()
+    }
+    for permission_ref in tenants.collection("permissions").refs(business_id, f"{business_id}_{worker_id}"):
+        transaction.set(permission_ref, permission_data)
+    return business_id
+
 # 직원 스케줄 선호도 설정
 @router.post("/schedule-preferences")
 async def set_worker_schedule_preferences(worker_schedule: WorkerSchedule, current_user: dict = Depends(get_current_user)):
@@ -69,9 +98,10 @@ async def set_worker_schedule_preferences(worker_schedule: WorkerSchedule, curre
             "updated_at": datetime.now().isoformat()
         }
         
-        from utils import db
         doc_id = f"{worker_schedule.worker_id}_{worker_schedule.business_id}"
-        db.collection("worker_schedules").document(doc_id).set(schedule_data)
+        tenants.collection("worker_schedules").set(worker_schedule.business_id, doc_id, schedule_data)
+        validators.invalidate(preference_key(worker_schedule.business_id, worker_schedule.worker_id))
+        swap.record_profile(schedule_data)
         
         return {"message": "스케줄 선호도가 설정되었습니다"}
     except Exception as e:
@@ -79,8 +109,8 @@ async def set_worker_schedule_preferences(worker_schedule: WorkerSchedule, curre
 
 # 직원 개인 스케줄 조회
 @router.get("/my-schedule/{business_id}/{worker_id}")
-async def get_worker_my_schedule(business_id: str, worker_id: str, current_user: dict = Depends(get_current_user)):
-    """직원의 개인 스케줄을 조회합니다."""
+async def get_worker_my_schedule(business_id: str, worker_id: str, request: Request, response: Response, current_user: dict = Depends(get_current_user)):
+    """직원의 개인 스케줄을 조회합니다. (If-None-Match 지원)"""
     try:
         # 데이터 검증
         if not business_id or not worker_id:
@@ -90,31 +120,47 @@ async def get_worker_my_schedule(business_id: str, worker_id: str, current_user:
         if current_user["uid"] != worker_id:
             raise HTTPException(status_code=403, detail="본인의 스케줄만 조회할 수 있습니다")
         
-        from utils import db
+        # 검증자 캐시 적중 시 Firestore 조회 없이 304 응답
+        if_none_match = request.headers.get("if-none-match")
+        cache_key = my_schedule_key(business_id, worker_id)
+        cached_response = check_cached_validator(cache_key, if_none_match, owner=worker_id)
+        if cached_response is not None:
+            return cached_response
+        
         # AI 생성된 스케줄에서 해당 직원의 스케줄 조회
-        schedules = db.collection("ai_schedules").where("business_id", "==", business_id).stream()
+        schedules = tenants.collection("ai_schedules").query(business_id).stream()
         
         worker_schedules = []
-        for schedule_doc in schedules:
-            schedule_data = schedule_doc.to_dict()
+        for schedule_id, schedule_data in merge_pending(schedules, schedule_writer, lambda d: d.get("business_id") == business_id):
+            # 보관된 스케줄은 해당 직원이 포함된 경우에만 복원
+            if is_archived(schedule_data):
+                if worker_id not in schedule_data.get("worker_ids", []):
+                    continue
+                schedule_data = rehydrate(schedule_id, schedule_data)
             if worker_id in schedule_data.get("schedule_data", {}):
                 worker_schedules.append({
-                    "schedule_id": schedule_doc.id,
+                    "schedule_id": schedule_id,
                     "week_start_date": schedule_data.get("week_start_date"),
                     "week_end_date": schedule_data.get("week_end_date"),
                     "my_schedule": schedule_data["schedule_data"][worker_id],
                     "created_at": schedule_data.get("created_at")
                 })
         
+        etag = f'"{compute_content_hash(worker_schedules)}"'
+        validators.set(cache_key, etag, owner=worker_id, tags=[business_schedules_tag(business_id)])
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        
+        set_etag_headers(response, etag)
         return {"worker_schedules": worker_schedules}
     except Exception as e:
-        print(f"직원 스케줄 조회 오류: {e}")
+        logger.warning("직원 스케줄 조회 오류", extra=fields(business_id=business_id, worker_id=worker_id, error=str(e)))
         raise HTTPException(status_code=400, detail=str(e))
 
 # 직원 선호도 기반 스케줄 조회
 @router.get("/preference-schedule/{business_id}/{worker_id}")
-async def get_worker_preference_schedule(business_id: str, worker_id: str, current_user: dict = Depends(get_current_user)):
-    """직원의 선호도 기반 스케줄을 조회합니다."""
+async def get_worker_preference_schedule(business_id: str, worker_id: str, request: Request, response: Response, current_user: dict = Depends(get_current_user)):
+    """직원의 선호도 기반 스케줄을 조회합니다. (If-None-Match 지원)"""
     try:
         # 데이터 검증
         if not business_id or not worker_id:
@@ -124,16 +170,25 @@ async def get_worker_preference_schedule(business_id: str, worker_id: str, curre
         if current_user["uid"] != worker_id:
             raise HTTPException(status_code=403, detail="본인의 선호도만 조회할 수 있습니다")
         
-        from utils import db
+        # 검증자 캐시 적중 시 Firestore 조회 없이 304 응답
+        if_none_match = request.headers.get("if-none-match")
+        cache_key = preference_key(business_id, worker_id)
+        cached_response = check_cached_validator(cache_key, if_none_match, owner=worker_id)
+        if cached_response is not None:
+            return cached_response
+        
         # 직원의 선호도 조회
         doc_id = f"{worker_id}_{business_id}"
-        preference_doc = db.collection("worker_schedules").document(doc_id).get()
+        preference_doc = tenants.collection("worker_schedules").get(business_id, doc_id)
+        preference_data = preference_doc.to_dict() if preference_doc.exists else None
+        
+        etag = make_etag(preference_data)
+        validators.set(cache_key, etag, owner=worker_id)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
         
-        if preference_doc.exists:
-            preference_data = preference_doc.to_dict()
-            return {"preference": preference_data}
-        else:
-            return {"preference": None}
+        set_etag_headers(response, etag)
+        return {"preference": preference_data}
     except Exception as e:
-        print(f"직원 선호도 조회 오류: {e}")
+        logger.warning("직원 선호도 조회 오류", extra=fields(business_id=business_id, worker_id=worker_id, error=str(e)))
         raise HTTPException(status_code=400, detail=str(e))
@@ -0,0 +1,186 @@
+"""
+합성 스케줄 워크로드 생성기
+AIScheduleRequest 형태의 요청 본문을 직원 10명부터 10,000명 규모까지 시드 고정으로 만듭니다.
+같은 (직원 수, 시드)면 항상 같은 본문이 나오므로 벤치마크 기준선(bench_scaling.py)과 회귀 비교에 사용합니다.
+
+분포:
+    파트        직원 수의 제곱근에 비례한 개수, 크기는 순위에 반비례 (큰 파트 몇 개 + 작은 파트 여러 개)
+    담당 분야   파트마다 2~5개, 직원은 파트 안에서 1~3개 (앞쪽 분야가 더 흔함)
+    고용 형태   정규직 35% (주 5일, 6~10시간), 파트타임 50% (주 2~4일, 3~6시간), 주말 15% (토/일)
+    휴무 희망   주말에 몰리고, 근무 요일과 겹치지 않음
+    선호 시간대 오전/오후/저녁 블록 중 고용 형태별로 1~3개
+
+사용법: python workload.py --employees 1000 --seed 7 > request.json
+"""
+
+import argparse
+import json
+import math
+import random
+import sys
+
+DAYS = ["월", "화", "수", "목", "금", "토", "일"]
+WEEKDAYS = DAYS[:5]
+WEEKEND = DAYS[5:]
+
+# 선호 시간대 블록 (서비스 업종 기준)
+HOUR_BLOCKS = ["06:00-09:00", "09:00-12:00", "12:00-18:00", "18:00-22:00", "22:00-02:00"]
+DEPARTMENT_NAMES = ["홀", "주방", "카운터", "배달", "청소", "재고", "예약", "상담", "매장", "물류"]
+FIELD_NAMES = ["서빙", "조리", "설거지", "계산", "포장", "응대", "정리", "발주", "검수", "안내", "홍보", "교육"]
+
+# (고용 형태, 비율, 근무 요일 수 범위, 최소 근무 시간 범위, 최대 근무 시간 범위)
+EMPLOYMENT_TYPES = [
+    ("full_time", 0.35, (5, 5), (6, 8), (8, 10)),
+    ("part_time", 0.50, (2, 4), (3, 4), (5, 6)),
+    ("weekend", 0.15, (1, 2), (4, 6), (6, 8)),
+]
+
+SIZE_TIERS = (10, 100, 1000, 10000)
+
+
+def _weighted_index(rng: random.Random, weights: list) -> int:
+    return rng.choices(range(len(weights)), weights=weights)[0]
+
+
+def _department_count(employee_count: int) -> int:
+    return max(1, min(40, round(math.sqrt(employee_count) / 2)))
+
+
+def build_departments(rng: random.Random, business_id: str, employee_count: int) -> list:
+    """파트 목록과 각 파트의 담당 분야, 크기 가중치"""
+    departments = []
+    for index in range(_department_count(employee_count)):
+        base = DEPARTMENT_NAMES[index % len(DEPARTMENT_NAMES)]
+        name = base if index < len(DEPARTMENT_NAMES) else f"{base} {index // len(DEPARTMENT_NAMES) + 1}"
+        field_count = rng.randint(2, 5)
+        departments.append({
+            "department_id": f"dept_{index:03d}",
+            "department_name": name,
+            "work_fields": rng.sample(FIELD_NAMES, field_count),
+            "weight": 1 / (index + 1) ** 0.8,
+            "priority_level": rng.randint(1, 5),
+            "open_days": DAYS if rng.random() < 0.6 else DAYS[:6],
+            "hours": rng.choice(["09:00-18:00", "10:00-22:00", "07:00-15:00", "11:00-23:00"]),
+            "business_id": business_id,
+        })
+    return departments
+
+
+def build_employee(rng: random.Random, business_id: str, worker_id: str, department: dict) -> dict:
+    """직원 한 명의 선호도 (EmployeePreference 형태)"""
+    kind, _, day_range, min_range, max_range = EMPLOYMENT_TYPES[
+        _weighted_index(rng, [entry[1] for entry in EMPLOYMENT_TYPES])
+    ]
+    day_count = rng.randint(*day_range)
+    if kind == "weekend":
+        work_days = rng.sample(WEEKEND, day_count)
+    elif kind == "full_time":
+        work_days = WEEKDAYS if rng.random() < 0.7 else rng.sample(DAYS, day_count)
+    else:
+        work_days = rng.sample(DAYS, day_count)
+    free_days = [day for day in DAYS if day not in work_days]
+    # 휴무 희망은 주말 쪽으로 치우침
+    off_weights = [3 if day in WEEKEND else 1 for day in free_days]
+    off_count = min(len(free_days), rng.randint(0, 2))
+    off_days = []
+    while len(off_days) < off_count:
+        day = free_days[_weighted_index(rng, off_weights)]
+        if day not in off_days:
+            off_days.append(day)
+
+    fields = department["work_fields"]
+    field_count = min(len(fields), rng.choices([1, 2, 3], weights=[5, 3, 1])[0])
+    field_weights = [1 / (rank + 1) for rank in range(len(fields))]
+    work_fields = []
+    while len(work_fields) < field_count:
+        field = fields[_weighted_index(rng, field_weights)]
+        if field not in work_fields:
+            work_fields.append(field)
+
+    block_count = {"full_time": 2, "part_time": rng.randint(1, 2), "weekend": rng.randint(1, 3)}[kind]
+    first_block = rng.choices(range(len(HOUR_BLOCKS) - block_count + 1),
+                              weights=[1, 5, 5, 3, 1][:len(HOUR_BLOCKS) - block_count + 1])[0]
+    min_hours = rng.randint(*min_range)
+    return {
+        "worker_id": worker_id,
+        "business_id": business_id,
+        "department_id": department["department_id"],
+        "work_fields": work_fields,
+        "preferred_off_days": sorted(off_days, key=DAYS.index),
+        "preferred_work_days": sorted(work_days, key=DAYS.index),
+        "preferred_work_hours": HOUR_BLOCKS[first_block:first_block + block_count],
+        "min_work_hours": min_hours,
+        "max_work_hours": max(min_hours, rng.randint(*max_range)),
+        "availability_score": max(1, min(10, round(rng.gauss(6, 2)))),
+        "priority_level": rng.choices([1, 2, 3, 4, 5], weights=[1, 2, 4, 2, 1])[0],
+    }
+
+
+def generate_schedule_request(employee_count: int, seed: int = 42, business_id: str = "business_bench",
+                              week_start_date: str = "2024-01-01", week_end_date: str = "2024-01-07") -> dict:
+    """AIScheduleRequest 형태의 요청 본문을 생성합니다."""
+    rng = random.Random(f"{seed}:{employee_count}")
+    departments = build_departments(rng, business_id, employee_count)
+    weights = [department["weight"] for department in departments]
+
+    employees, sizes = [], [0] * len(departments)
+    for index in range(employee_count):
+        # 모든 파트에 최소 한 명은 배정
+        department_index = index if index < len(departments) else _weighted_index(rng, weights)
+        sizes[department_index] += 1
+        employees.append(build_employee(rng, business_id, f"worker_{index:05d}", departments[department_index]))
+
+    staffing = [
+        {
+            "business_id": business_id,
+            "department_id": department["department_id"],
+            "department_name": department["department_name"],
+            # 하루에 파트 인원의 절반 안팎이 필요
+            "required_staff_count": max(1, round(size * rng.uniform(0.35, 0.6))),
+            "work_hours": {day: [department["hours"]] for day in department["open_days"]},
+            "priority_level": department["priority_level"],
+        }
+        for department, size in zip(departments, sizes)
+    ]
+    return {
+        "business_id": business_id,
+        "week_start_date": week_start_date,
+        "week_end_date": week_end_date,
+        "department_staffing": staffing,
+        "employee_preferences": employees,
+        "schedule_constraints": {"max_consecutive_days": 6, "min_rest_hours": 11},
+    }
+
+
+def describe(request: dict) -> dict:
+    """생성된 요청의 분포 요약 (생성기 확인용)"""
+    employees = request["employee_preferences"]
+    count = len(employees) or 1
+    return {
+        "employees": len(employees),
+        "departments": len(request["department_staffing"]),
+        "largest_department": max((sum(1 for e in employees if e["department_id"] == d["department_id"])
+                                   for d in request["department_staffing"]), default=0),
+        "mean_work_days": round(sum(len(e["preferred_work_days"]) for e in employees) / count, 2),
+        "weekend_off_share": round(sum(1 for e in employees for day in e["preferred_off_days"] if day in WEEKEND)
+                                   / max(1, sum(len(e["preferred_off_days"]) for e in employees)), 2),
+        "mean_work_fields": round(sum(len(e["work_fields"]) for e in employees) / count, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="합성 AIScheduleRequest 요청 본문 생성")
+    parser.add_argument("--employees", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--business-id", default="business_bench")
+    parser.add_argument("--summary", action="store_true", help="본문 대신 분포 요약 출력")
+    args = parser.parse_args()
+
+    request = generate_schedule_request(args.employees, args.seed, args.business_id)
+    json.dump(describe(request) if args.summary else request, sys.stdout, ensure_ascii=False,
+              indent=2 if args.summary else None)
+    print()
+
+
+if __name__ == "__main__":
+    main()
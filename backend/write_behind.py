@@ -0,0 +1,372 @@
+"""
+쓰기 지연(write-behind) 저장 큐
+생성된 스케줄을 응답 경로에서 바로 Firestore에 쓰지 않고 큐에 넣은 뒤,
+백그라운드 스레드가 모아서 배치로 커밋합니다. 실패하면 지수 백오프로 재시도하고,
+재시도를 모두 소진한 문서도 더 긴 간격(WRITE_BEHIND_FAILED_RETRY부터 두 배씩)으로 다시 큐에 넣습니다.
+종료 시에는 소진한 문서까지 한 번 더 시도하고 남은 쓰기를 모두 비웁니다.
+
+저장이 끝나기 전에도 조회 엔드포인트가 같은 데이터를 돌려줄 수 있도록
+대기 중인 문서 조회(get/pending_items)와 문서별 저장 상태(durability)를 제공합니다.
+    pending    큐에서 저장을 기다리는 중
+    persisted  Firestore 커밋 완료
+    failed     재시도 횟수를 모두 소진 (데이터는 인스턴스 메모리에만 남아 있고 나중에 다시 시도)
+
+환경 변수:
+    WRITE_BEHIND=1                    0이면 enqueue 시 즉시 동기 저장
+    WRITE_BEHIND_BATCH_SIZE=100       배치당 최대 문서 수 (최대 250, dual 모드에서는 문서당 두 번 쓰므로)
+    WRITE_BEHIND_FLUSH_INTERVAL=0.05  첫 쓰기 후 배치를 모으는 시간(초)
+    WRITE_BEHIND_MAX_ATTEMPTS=5       배치 커밋 최대 시도 횟수
+    WRITE_BEHIND_MAX_PENDING=1000     대기 문서가 이보다 많으면 호출 스레드에서 직접 저장
+    WRITE_BEHIND_MAX_FAILED=1000      재시도를 소진한 문서를 메모리에 둘 최대 개수 (넘으면 오래된 것부터 버림)
+    WRITE_BEHIND_FAILED_RETRY=30      소진한 문서를 다시 큐에 넣는 첫 간격(초, 최대 10분)
+"""
+
+import atexit
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Iterable, Optional
+
+from app_logging import get_logger, fields
+import tenants
+
+logger = get_logger("write_behind")
+
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND", "1") == "1"
+# dual 모드에서는 문서 하나가 두 번 쓰이므로 배치 한도(500)의 절반까지
+BATCH_SIZE = min(int(os.getenv("WRITE_BEHIND_BATCH_SIZE", 100)), 250)
+FLUSH_INTERVAL = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", 0.05))
+MAX_ATTEMPTS = int(os.getenv("WRITE_BEHIND_MAX_ATTEMPTS", 5))
+MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", 1000))
+MAX_FAILED = int(os.getenv("WRITE_BEHIND_MAX_FAILED", 1000))
+FAILED_RETRY = float(os.getenv("WRITE_BEHIND_FAILED_RETRY", 30))
+MAX_FAILED_RETRY = 600.0
+
+PENDING = "pending"
+PERSISTED = "persisted"
+FAILED = "failed"
+
+
+class WriteBehindQueue:
+    """한 컬렉션에 대한 쓰기 지연 큐 (같은 문서의 연속 쓰기는 마지막 값으로 합침)"""
+
+    def __init__(self, collection: str, batch_size: int = BATCH_SIZE, flush_interval: float = FLUSH_INTERVAL,
+                 max_attempts: int = MAX_ATTEMPTS, max_pending: int = MAX_PENDING, base_backoff: float = 0.2,
+                 max_backoff: float = 10.0, enabled: bool = WRITE_BEHIND_ENABLED, status_history: int = 10000,
+                 max_failed: int = MAX_FAILED, failed_retry: float = FAILED_RETRY):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.max_pending = max_pending
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.enabled = enabled
+        self.status_history = status_history
+        self.max_failed = max_failed
+        self.failed_retry = failed_retry
+
+        self._pending = OrderedDict()    # doc_id -> data (커밋 대기)
+        self._in_flight = {}             # doc_id -> data (커밋 중)
+        self._failed = OrderedDict()     # doc_id -> data (재시도 소진, 나중에 다시 시도)
+        self._retry_at = {}              # doc_id -> (다시 큐에 넣을 시각, 소진 횟수)
+        self._status = OrderedDict()     # doc_id -> 상태
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+
+        self.persisted_total = 0
+        self.failed_total = 0
+        self.retries_total = 0
+        self.batches_total = 0
+        self.dropped_total = 0
+
+    # 쓰기
+    def enqueue(self, doc_id: str, data: dict):
+        """문서 쓰기를 큐에 넣습니다. 호출 후 data를 수정하지 마세요."""
+        if not self.enabled:
+            self._write_now(doc_id, data)
+            return
+        with self._cond:
+            overflow = len(self._pending) >= self.max_pending and doc_id not in self._pending
+            if not overflow:
+                self._pending[doc_id] = data
+                self._pending.move_to_end(doc_id)
+                self._failed.pop(doc_id, None)
+                self._retry_at.pop(doc_id, None)
+                self._set_status(doc_id, PENDING)
+                self._ensure_thread()
+                self._cond.notify_all()
+        if overflow:
+            # 저장소가 따라오지 못하면 응답 지연을 감수하고 직접 저장 (메모리 무한 증가 방지)
+            logger.warning("쓰기 지연 큐가 가득 차 직접 저장합니다", extra=fields(collection=self.collection))
+            self._write_now(doc_id, data)
+
+    def _refs(self, db, doc_id: str, data: dict) -> list:
+        # 비즈니스 단위 컬렉션은 저장 모드(global/dual/scoped)에 맞는 경로에 씀
+        if self.collection in tenants.TENANT_COLLECTIONS:
+            return tenants.collection(self.collection, db).refs(data.get("business_id"), doc_id)
+        return [db.collection(self.collection).document(doc_id)]
+
+    def _write_now(self, doc_id: str, data: dict):
+        from utils import db
+        for ref in self._refs(db, doc_id, data):
+            ref.set(data)
+        with self._cond:
+            self._set_status(doc_id, PERSISTED)
+            self.persisted_total += 1
+
+    # 조회
+    def get(self, doc_id: str) -> Optional[dict]:
+        """아직 Firestore에 반영되지 않은 문서 데이터를 반환합니다. (없으면 None)"""
+        with self._cond:
+            for source in (self._pending, self._in_flight, self._failed):
+                if doc_id in source:
+                    return source[doc_id]
+        return None
+
+    def pending_items(self, predicate: Optional[Callable[[dict], bool]] = None) -> list:
+        """반영 대기 중인 (doc_id, data) 목록을 반환합니다."""
+        with self._cond:
+            items = {**self._failed, **self._in_flight, **self._pending}
+        return [(doc_id, data) for doc_id, data in items.items() if predicate is None or predicate(data)]
+
+    def status(self, doc_id: str) -> Optional[str]:
+        """문서의 저장 상태를 반환합니다. (이 인스턴스가 최근에 쓴 문서가 아니면 None)"""
+        with self._cond:
+            return self._status.get(doc_id)
+
+    def ensure_persisted(self, doc_id: str, timeout: float = 10.0) -> bool:
+        """
+        문서가 대기 중이면 저장될 때까지 기다립니다. (update 전 호출, 블로킹이므로 asyncio.to_thread로)
+        재시도를 소진한 문서는 바로 다시 시도합니다. 저장되지 않았으면 False
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            if doc_id in self._failed:
+                self._requeue([doc_id])
+            self._cond.notify_all()
+            while doc_id in self._pending or doc_id in self._in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return self._status.get(doc_id) != FAILED
+
+    def flush(self, timeout: float = 30.0) -> bool:
+        """대기 중인 쓰기를 모두 저장할 때까지 기다립니다."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._cond.notify_all()
+            while self._pending or self._in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stop(self, timeout: float = 30.0) -> bool:
+        """재시도를 소진한 문서까지 한 번 더 시도해 남은 쓰기를 비우고 백그라운드 스레드를 종료합니다."""
+        with self._cond:
+            if self._failed:
+                self._requeue(list(self._failed))
+        flushed = self.flush(timeout)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout=max(1.0, timeout))
+        with self._cond:
+            self._thread = None
+            self._stopping = False
+        if not flushed or self._failed:
+            logger.error("종료 시 저장하지 못한 쓰기가 있습니다", extra=fields(
+                collection=self.collection, pending=len(self._pending) + len(self._in_flight),
+                failed=list(self._failed)
+            ))
+        return flushed and not self._failed
+
+    # 백그라운드 처리
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name=f"write-behind-{self.collection}", daemon=True)
+            self._thread.start()
+
+    def _set_status(self, doc_id: str, state: str):
+        self._status[doc_id] = state
+        self._status.move_to_end(doc_id)
+        while len(self._status) > self.status_history:
+            self._status.popitem(last=False)
+
+    def _requeue(self, doc_ids: list):
+        """재시도를 소진한 문서를 다시 큐에 넣습니다. (_cond를 잡은 상태에서 호출)"""
+        for doc_id in doc_ids:
+            data = self._failed.pop(doc_id, None)
+            if data is None or doc_id in self._pending:
+                continue
+            self._pending[doc_id] = data
+            self._set_status(doc_id, PENDING)
+        self._ensure_thread()
+
+    def _park_failed(self, doc_id: str, data: dict):
+        """재시도를 소진한 문서를 보관하고 다음 시도 시각을 정합니다. (_cond를 잡은 상태에서 호출)"""
+        _, rounds = self._retry_at.get(doc_id, (0.0, 0))
+        delay = min(MAX_FAILED_RETRY, self.failed_retry * (2 ** rounds))
+        self._retry_at[doc_id] = (time.monotonic() + delay, rounds + 1)
+        self._failed[doc_id] = data
+        self._failed.move_to_end(doc_id)
+        while len(self._failed) > self.max_failed:
+            dropped_id, _ = self._failed.popitem(last=False)
+            self._retry_at.pop(dropped_id, None)
+            self.dropped_total += 1
+            logger.error("저장하지 못한 문서를 버립니다", extra=fields(collection=self.collection, doc_id=dropped_id))
+
+    def _due_retry(self) -> Optional[float]:
+        """다시 시도할 때가 된 문서를 큐에 넣고, 다음 시도까지 남은 시간을 반환합니다. (_cond를 잡은 상태에서 호출)"""
+        if not self._failed:
+            return None
+        now = time.monotonic()
+        due = [doc_id for doc_id in self._failed if self._retry_at.get(doc_id, (0.0, 0))[0] <= now]
+        if due:
+            self._requeue(due)
+        waits = [self._retry_at[doc_id][0] - now for doc_id in self._failed if doc_id in self._retry_at]
+        return max(0.0, min(waits)) if waits else None
+
+    def _next_batch(self) -> Optional[dict]:
+        with self._cond:
+            while True:
+                retry_in = self._due_retry()
+                if self._pending:
+                    break
+                if self._stopping:
+                    return None
+                self._cond.wait(retry_in)
+            # 첫 쓰기 이후 잠시 기다려 배치를 채움 (종료 중이거나 배치가 차면 즉시)
+            deadline = time.monotonic() + self.flush_interval
+            while len(self._pending) < self.batch_size and not self._stopping:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = {}
+            while self._pending and len(batch) < self.batch_size:
+                doc_id, data = self._pending.popitem(last=False)
+                batch[doc_id] = data
+            self._in_flight.update(batch)
+            return batch
+
+    def _commit(self, batch: dict):
+        from utils import db
+        write_batch = db.batch()
+        for doc_id, data in batch.items():
+            for ref in self._refs(db, doc_id, data):
+                write_batch.set(ref, data)
+        write_batch.commit()
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            attempt = 0
+            while True:
+                attempt += 1
+                try:
+                    self._commit(batch)
+                    state = PERSISTED
+                    break
+                except Exception as e:
+                    if attempt >= self.max_attempts:
+                        logger.error("쓰기 지연 배치 저장 실패", extra=fields(
+                            collection=self.collection, documents=len(batch), attempts=attempt, error=str(e)
+                        ))
+                        state = FAILED
+                        break
+                    self.retries_total += 1
+                    backoff = min(self.max_backoff, self.base_backoff * (2 ** (attempt - 1)))
+                    backoff *= random.uniform(0.5, 1.0)
+                    logger.warning("쓰기 지연 배치 재시도", extra=fields(
+                        collection=self.collection, attempt=attempt, backoff=round(backoff, 3), error=str(e)
+                    ))
+                    time.sleep(backoff)
+
+            with self._cond:
+                self.batches_total += 1
+                for doc_id, data in batch.items():
+                    self._in_flight.pop(doc_id, None)
+                    # 커밋 중 같은 문서가 다시 들어왔으면 새 값의 상태(pending)를 유지
+                    if doc_id in self._pending:
+                        continue
+                    self._set_status(doc_id, state)
+                    if state == FAILED:
+                        self._park_failed(doc_id, data)
+                    else:
+                        self._retry_at.pop(doc_id, None)
+                if state == PERSISTED:
+                    self.persisted_total += len(batch)
+                else:
+                    self.failed_total += len(batch)
+                self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "pending": len(self._pending),
+                "in_flight": len(self._in_flight),
+                "failed": len(self._failed),
+                "persisted_total": self.persisted_total,
+                "failed_total": self.failed_total,
+                "retries_total": self.retries_total,
+                "batches_total": self.batches_total,
+                "dropped_total": self.dropped_total,
+            }
+
+
+# 생성된 스케줄용 큐
+schedule_writer = WriteBehindQueue("ai_schedules")
+queues = [schedule_writer]
+
+
+def merge_pending(docs: Iterable, queue: WriteBehindQueue, predicate: Callable[[dict], bool]) -> list:
+    """
+    Firestore 조회 결과에 반영 대기 중인 문서를 덮어써서 (doc_id, data) 목록으로 반환합니다.
+    docs는 스냅샷 목록, predicate는 쿼리 조건과 같은 필터입니다.
+    """
+    merged = OrderedDict((doc.id, doc.to_dict()) for doc in docs)
+    for doc_id, data in queue.pending_items(predicate):
+        merged[doc_id] = data
+    return list(merged.items())
+
+
+def durability(doc_id: str, queue: WriteBehindQueue = schedule_writer) -> str:
+    """조회 응답에 포함할 저장 상태 (이 인스턴스가 모르는 문서는 Firestore에서 읽은 것이므로 persisted)"""
+    return queue.status(doc_id) or PERSISTED
+
+
+def stop_all(timeout: float = 30.0):
+    """모든 큐를 비우고 종료합니다. (앱 종료 시 호출)"""
+    for queue in queues:
+        queue.stop(timeout)
+
+
+atexit.register(stop_all)
+
+
+def collect_metrics() -> list:
+    """metrics.registry.register_collector 용 쓰기 지연 큐 메트릭을 반환합니다."""
+    stats = [(queue.collection, queue.stats()) for queue in queues]
+    return [
+        ("write_behind_pending", "gauge", "저장 대기 중인 문서 수",
+         [({"collection": name}, s["pending"] + s["in_flight"]) for name, s in stats]),
+        ("write_behind_failed", "gauge", "재시도를 소진한 문서 수",
+         [({"collection": name}, s["failed"]) for name, s in stats]),
+        ("write_behind_persisted_total", "counter", "저장 완료된 문서 수",
+         [({"collection": name}, s["persisted_total"]) for name, s in stats]),
+        ("write_behind_retries_total", "counter", "배치 커밋 재시도 수",
+         [({"collection": name}, s["retries_total"]) for name, s in stats]),
+        ("write_behind_dropped_total", "counter", "보관 한도를 넘어 버린 저장 실패 문서 수",
+         [({"collection": name}, s["dropped_total"]) for name, s in stats]),
+    ]